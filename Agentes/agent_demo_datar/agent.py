@@ -2,29 +2,69 @@ import os # Required for path operations
 from dotenv import load_dotenv # Required for loading environment variables
 from google.adk.agents.llm_agent import Agent
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset
-from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
+from google.adk.tools.mcp_tool.mcp_session_manager import (
+    SseConnectionParams,
+    StdioConnectionParams,
+    StreamableHTTPConnectionParams,
+)
 from mcp import StdioServerParameters
 
+# Con INATURALIST_MCP_URL el agente se conecta a un servidor iNaturalist que ya
+# está corriendo (python main.py --transporte streamable-http), en lugar de
+# lanzar un proceso nuevo por sesión. Una URL terminada en /sse usa SSE.
+#   INATURALIST_MCP_URL=http://127.0.0.1:8001/mcp
+INATURALIST_MCP_URL = os.getenv("INATURALIST_MCP_URL")
+
+# Con INATURALIST_MCP_MODO=proceso las herramientas del servidor se importan y
+# corren en el mismo proceso y event loop del agente, sin JSON-RPC ni proceso
+# hijo (ver herramientas_locales.py). Por defecto (mcp) se usa MCPToolset.
+INATURALIST_MCP_MODO = os.getenv("INATURALIST_MCP_MODO", "mcp")
+
+
+def conexion_inaturalist():
+    """Parámetros de conexión al servidor MCP de iNaturalist"""
+    if INATURALIST_MCP_URL:
+        if INATURALIST_MCP_URL.rstrip("/").endswith("/sse"):
+            return SseConnectionParams(url=INATURALIST_MCP_URL)
+        return StreamableHTTPConnectionParams(url=INATURALIST_MCP_URL)
+
+    return StdioConnectionParams(
+        server_params = StdioServerParameters(
+            command='/Users/manglerojo/.local/bin/uv',
+            args=[
+                "run",
+                "--directory",
+                "/path/to/your/folder/ejercicios-orquestacion/MCP/mcp-server-inaturalist",
+                "python",
+                "-m",
+                "main"
+            ],
+        ),
+    )
+
+
+def herramientas_inaturalist():
+    """Herramientas de iNaturalist por MCP o en el mismo proceso"""
+    if INATURALIST_MCP_MODO == "proceso":
+        from .herramientas_locales import HerramientasEnProceso
+
+        return [HerramientasEnProceso()]
+
+    return [
+        MCPToolset(
+            connection_params=conexion_inaturalist(),
+        )
+    ]
+
+
 root_agent = Agent(
     model='gemini-2.5-flash',
     name='root_agent',
     description='Eres un asistente naturalista.',
-    instruction='Responde las preguntas del usuario con la mayor precisión posible.',
-    tools=[
-        MCPToolset(
-            connection_params=StdioConnectionParams(
-                server_params = StdioServerParameters(
-                    command='/Users/manglerojo/.local/bin/uv',
-                    args=[
-                        "run",
-                        "--directory",
-                        "/path/to/your/folder/ejercicios-orquestacion/MCP/mcp-server-inaturalist",
-                        "python",
-                        "-m",
-                        "main"
-                    ],
-                ),
-            ),
-        )
-    ],
+    instruction=(
+        'Responde las preguntas del usuario con la mayor precisión posible. '
+        "Al listar observaciones o especies usa formato='compacto' en las herramientas, "
+        "y formato='resumen' cuando sólo necesites conteos o totales."
+    ),
+    tools=herramientas_inaturalist(),
 )
@@ -0,0 +1,78 @@
+"""
+Herramientas de iNaturalist registradas en el agente, sin MCP de por medio
+
+Importa el servidor `mcp-server-inaturalist` en el proceso del agente y
+registra cada herramienta de FastMCP como una herramienta de ADK, mediante un
+toolset que las lista con `en_proceso.herramientas` (igual que `MCPToolset`
+las lista por MCP). Cada llamada
+se ejecuta con `en_proceso.ejecutar` en el mismo event loop del agente: no hay
+JSON-RPC ni proceso hijo, y el cliente HTTP, la caché y el limitador se
+comparten entre todas las sesiones del agente.
+
+La declaración que ve el modelo sale del mismo esquema JSON que FastMCP
+publica por MCP, así que el modelo ve las mismas herramientas en ambos modos.
+
+Requiere las dependencias del servidor en el entorno del agente
+(`pip install -e ../MCP/inaturalist-comun "mcp[cli]" httpx numpy`).
+
+- INATURALIST_MCP_DIR: Directorio del servidor
+  (default: MCP/mcp-server-inaturalist de este repositorio)
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+DIR_SERVIDOR = Path(
+    os.getenv("INATURALIST_MCP_DIR", Path(__file__).resolve().parents[2] / "MCP" / "mcp-server-inaturalist")
+)
+
+
+class HerramientaEnProceso(BaseTool):
+    """Herramienta de ADK que llama directamente a una herramienta de FastMCP"""
+
+    def __init__(
+        self,
+        nombre: str,
+        descripcion: str,
+        esquema: Dict[str, Any],
+        ejecutar: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+    ):
+        super().__init__(name=nombre, description=descripcion)
+        self._esquema = esquema
+        self._ejecutar = ejecutar
+
+    def _get_declaration(self) -> Optional[types.FunctionDeclaration]:
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters_json_schema=self._esquema,
+        )
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        return await self._ejecutar(self.name, args)
+
+
+class HerramientasEnProceso(BaseToolset):
+    """Toolset de ADK con una herramienta por cada herramienta del servidor de iNaturalist"""
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        if str(DIR_SERVIDOR) not in sys.path:
+            sys.path.insert(0, str(DIR_SERVIDOR))
+        import en_proceso
+
+        return [
+            HerramientaEnProceso(h.name, h.description or "", h.inputSchema, en_proceso.ejecutar)
+            for h in await en_proceso.herramientas()
+        ]
+
+    async def close(self) -> None:
+        # El ciclo de vida del servidor se comparte entre las sesiones del agente; no se cierra por toolset
+        pass
@@ -0,0 +1,399 @@
+"""
+Caché en disco de fotos de iNaturalist
+
+Las respuestas traen `foto_url` que apuntan al CDN de iNaturalist y las
+interfaces descargan las mismas miniaturas una y otra vez. Este módulo las
+guarda en disco y las sirve desde ahí:
+
+- Deduplicada: cada archivo se guarda una sola vez, con el SHA-256 de su
+  contenido como nombre, aunque varias URLs (observación y taxón) apunten a
+  la misma imagen. El hash es también el ETag
+- Tamaño acotado: al superar `max_bytes` se eliminan los archivos usados
+  hace más tiempo (LRU)
+- El índice (URL → archivo) vive en SQLite junto a los archivos, así que
+  varios workers de la API comparten la misma caché
+- Descargas simultáneas de la misma URL se agrupan en una sola
+- Se sirven con `FileResponse` (sendfile cuando el servidor lo soporta),
+  ETag con `If-None-Match` → 304 y rangos de bytes (`Range` → 206, leído con
+  mmap)
+
+Sólo se aceptan URLs de los dominios de fotos de iNaturalist. Las
+redirecciones se siguen a mano y cada salto se valida contra esos mismos
+dominios; se rechazan las respuestas que no son `image/*` o que superan el
+tamaño máximo por foto.
+
+Configuración por variables de entorno:
+
+- API_FOTOS: "0" deshabilita el endpoint /fotos y la precarga (default: 1)
+- API_FOTOS_DIR: Directorio de la caché (default: cache_fotos)
+- API_FOTOS_MAX_MB: Tamaño máximo de la caché en MB (default: 500)
+- API_FOTOS_MAX_FOTO_MB: Tamaño máximo de una foto en MB (default: 20)
+- API_FOTOS_CONCURRENCIA: Descargas simultáneas hacia el CDN (default: 4)
+- API_FOTOS_PRECARGA: "0" deshabilita la precarga de las fotos del pool (default: 1)
+"""
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple, Union
+from urllib.parse import urljoin, urlparse
+
+import httpx
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from inaturalist_comun import ConsultasEnVuelo, leer_bool
+
+logger = logging.getLogger(__name__)
+
+# Dominios desde los que se aceptan fotos (evita usar el proxy para otras URLs)
+DOMINIOS_FOTOS = ("inaturalist-open-data.s3.amazonaws.com", "static.inaturalist.org")
+
+# Tamaños de foto de iNaturalist: .../photos/<id>/<tamaño>.<ext>
+TAMANOS = ("square", "small", "medium", "large", "original")
+_PATRON_TAMANO = re.compile(r"/(square|small|medium|large|original)\.(\w+)$")
+
+# Un acceso se vuelve a anotar en el índice sólo si el anterior es más viejo que esto
+_INTERVALO_USO = 60.0
+
+# Saltos de redirección que se siguen al descargar una foto
+MAX_REDIRECCIONES = 3
+
+
+class FotoNoPermitida(ValueError):
+    """La URL no es de una foto de iNaturalist"""
+
+
+class FotoRechazada(Exception):
+    """El CDN respondió algo que no se guarda: no es una imagen, es demasiado grande o redirige fuera de iNaturalist"""
+
+
+@dataclass(frozen=True)
+class ConfigFotos:
+    habilitadas: bool = True
+    directorio: str = "cache_fotos"
+    max_bytes: int = 500 * 1024 * 1024
+    max_bytes_foto: int = 20 * 1024 * 1024
+    concurrencia: int = 4
+    precarga: bool = True
+
+    @classmethod
+    def desde_entorno(cls) -> "ConfigFotos":
+        return cls(
+            habilitadas=leer_bool("API_FOTOS", True),
+            directorio=os.getenv("API_FOTOS_DIR", "cache_fotos"),
+            max_bytes=int(float(os.getenv("API_FOTOS_MAX_MB", "500")) * 1024 * 1024),
+            max_bytes_foto=int(float(os.getenv("API_FOTOS_MAX_FOTO_MB", "20")) * 1024 * 1024),
+            concurrencia=int(os.getenv("API_FOTOS_CONCURRENCIA", "4")),
+            precarga=leer_bool("API_FOTOS_PRECARGA", True),
+        )
+
+
+@dataclass(frozen=True)
+class FotoEnDisco:
+    ruta: Path
+    etag: str
+    tipo: str
+    tamano: int
+
+
+def _dominio_permitido(url: str) -> bool:
+    partes = urlparse(url)
+    return partes.scheme in ("http", "https") and partes.hostname in DOMINIOS_FOTOS
+
+
+def normalizar_url(url: str, tamano: Optional[str] = None) -> str:
+    """Valida que la URL sea de una foto de iNaturalist y opcionalmente cambia su tamaño"""
+    if not _dominio_permitido(url):
+        raise FotoNoPermitida(f"Sólo se aceptan fotos de {', '.join(DOMINIOS_FOTOS)}")
+    partes = urlparse(url)
+    url = partes._replace(scheme="https", query="", fragment="").geturl()
+    if tamano is not None:
+        if tamano not in TAMANOS:
+            raise FotoNoPermitida(f"tamano debe ser uno de {', '.join(TAMANOS)}")
+        url = _PATRON_TAMANO.sub(lambda m: f"/{tamano}.{m.group(2)}", url)
+    return url
+
+
+class CacheFotos:
+    """
+    Fotos descargadas del CDN de iNaturalist, guardadas por contenido.
+
+    Args:
+        config: Directorio, tamaño máximo y concurrencia
+        obtener_cliente: Retorna el cliente HTTP abierto de la aplicación
+    """
+
+    def __init__(self, config: ConfigFotos, obtener_cliente: Callable[[], httpx.AsyncClient]):
+        self.config = config
+        self.obtener_cliente = obtener_cliente
+        self._dir = Path(config.directorio)
+        self._dir_objetos = self._dir / "objetos"
+        self._dir_objetos.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(str(self._dir / "indice.sqlite"), check_same_thread=False, timeout=5.0)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS objetos (
+                hash TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                tamano INTEGER NOT NULL,
+                usado REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_objetos_usado ON objetos (usado);
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_urls_hash ON urls (hash);
+            """
+        )
+        self._conexion.commit()
+        self._descargas = ConsultasEnVuelo()
+        self._semaforo: Optional[asyncio.Semaphore] = None  # se crea dentro del event loop
+        self._precargas: Set[asyncio.Task] = set()
+        self._contadores = {
+            "aciertos": 0,
+            "fallos": 0,
+            "deduplicadas": 0,
+            "expulsiones": 0,
+            "bytes_descargados": 0,
+            "precargadas": 0,
+        }
+
+    async def obtener(self, url: str) -> FotoEnDisco:
+        """Foto en disco para la URL, descargándola si todavía no está"""
+        foto = await self._en_hilo(self._buscar, url)
+        if foto is not None:
+            self._contadores["aciertos"] += 1
+            return foto
+        self._contadores["fallos"] += 1
+        return await self._descargas.ejecutar(url, lambda: self._descargar(url))
+
+    def programar_precarga(self, urls: Iterable[str]) -> None:
+        """Descarga en segundo plano las fotos que falten (por ejemplo, las del pool)"""
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if not self.config.precarga or not urls:
+            return
+        tarea = asyncio.get_running_loop().create_task(self._precargar(urls))
+        self._precargas.add(tarea)
+        tarea.add_done_callback(self._precargas.discard)
+
+    async def cerrar(self) -> None:
+        for tarea in list(self._precargas):
+            tarea.cancel()
+        await asyncio.gather(*self._precargas, return_exceptions=True)
+        with self._lock:
+            self._conexion.close()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            archivos, total = self._conexion.execute("SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM objetos").fetchone()
+            urls = self._conexion.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        return {
+            **self._contadores,
+            "archivos": archivos,
+            "urls": urls,
+            "bytes": total,
+            "max_bytes": self.config.max_bytes,
+            "precargas_en_curso": len(self._precargas),
+        }
+
+    # --- Internos ------------------------------------------------------------
+
+    @staticmethod
+    async def _en_hilo(funcion: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, funcion, *args)
+
+    def _ruta(self, digest: str) -> Path:
+        return self._dir_objetos / digest[:2] / digest
+
+    async def _precargar(self, urls: Iterable[str]) -> None:
+        """Una descarga a la vez, para dejar el resto de la concurrencia a los usuarios"""
+        for url in urls:
+            try:
+                url = normalizar_url(url)
+                if await self._en_hilo(self._buscar, url, False) is None:
+                    await self._descargas.ejecutar(url, lambda: self._descargar(url))
+                    self._contadores["precargadas"] += 1
+            except Exception as e:
+                logger.debug("No se pudo precargar %s: %s", url, e)
+
+    async def _descargar(self, url: str) -> FotoEnDisco:
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(max(1, self.config.concurrencia))
+        async with self._semaforo:
+            contenido, tipo = await self._pedir(url)
+        self._contadores["bytes_descargados"] += len(contenido)
+        return await self._en_hilo(self._guardar, url, contenido, tipo)
+
+    async def _pedir(self, url: str) -> Tuple[bytes, str]:
+        """
+        Descarga la foto siguiendo las redirecciones a mano, para validar cada
+        salto, y cortando la descarga si supera `max_bytes_foto`
+        """
+        destino = url
+        for _ in range(MAX_REDIRECCIONES + 1):
+            async with self.obtener_cliente().stream("GET", destino, follow_redirects=False) as response:
+                if response.is_redirect:
+                    destino = urljoin(destino, response.headers["location"])
+                    if not _dominio_permitido(destino):
+                        raise FotoRechazada(f"{url} redirige fuera de los dominios de fotos de iNaturalist")
+                    continue
+                response.raise_for_status()
+                tipo = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                if not tipo.startswith("image/"):
+                    raise FotoRechazada(f"{url} no es una imagen ({tipo or 'sin content-type'})")
+                maximo = self.config.max_bytes_foto
+                largo = response.headers.get("content-length", "")
+                if largo.isdigit() and int(largo) > maximo:
+                    raise FotoRechazada(f"{url} pesa más de {maximo} bytes")
+                partes, total = [], 0
+                async for parte in response.aiter_bytes():
+                    total += len(parte)
+                    if total > maximo:
+                        raise FotoRechazada(f"{url} pesa más de {maximo} bytes")
+                    partes.append(parte)
+                return b"".join(partes), tipo
+        raise FotoRechazada(f"{url} tiene más de {MAX_REDIRECCIONES} redirecciones")
+
+    def _buscar(self, url: str, anotar_uso: bool = True) -> Optional[FotoEnDisco]:
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT o.hash, o.tipo, o.tamano, o.usado FROM urls u JOIN objetos o ON o.hash = u.hash WHERE u.url = ?",
+                (url,),
+            ).fetchone()
+            if fila is None:
+                return None
+            digest, tipo, tamano, usado = fila
+            ruta = self._ruta(digest)
+            if not ruta.exists():
+                # Otro worker lo expulsó: se olvida y se vuelve a descargar
+                self._olvidar(digest)
+                return None
+            ahora = time.time()
+            if anotar_uso and ahora - usado > _INTERVALO_USO:
+                self._conexion.execute("UPDATE objetos SET usado = ? WHERE hash = ?", (ahora, digest))
+                self._conexion.commit()
+        return FotoEnDisco(ruta, digest, tipo, tamano)
+
+    def _guardar(self, url: str, contenido: bytes, tipo: str) -> FotoEnDisco:
+        digest = hashlib.sha256(contenido).hexdigest()
+        ruta = self._ruta(digest)
+        with self._lock:
+            existe = self._conexion.execute("SELECT 1 FROM objetos WHERE hash = ?", (digest,)).fetchone()
+            if existe and ruta.exists():
+                self._contadores["deduplicadas"] += 1
+            else:
+                ruta.parent.mkdir(exist_ok=True)
+                temporal = ruta.with_name(f"{digest}.{os.getpid()}.tmp")
+                temporal.write_bytes(contenido)
+                os.replace(temporal, ruta)
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO objetos (hash, tipo, tamano, usado) VALUES (?, ?, ?, ?)",
+                (digest, tipo, len(contenido), time.time()),
+            )
+            self._conexion.execute("INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)", (url, digest))
+            self._conexion.commit()
+            self._expulsar(conservar=digest)
+        return FotoEnDisco(ruta, digest, tipo, len(contenido))
+
+    def _expulsar(self, conservar: str) -> None:
+        """Elimina los archivos usados hace más tiempo hasta quedar bajo `max_bytes` (con el lock tomado)"""
+        total = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM objetos").fetchone()[0]
+        if total <= self.config.max_bytes:
+            return
+        for digest, tamano in self._conexion.execute(
+            "SELECT hash, tamano FROM objetos WHERE hash != ? ORDER BY usado", (conservar,)
+        ).fetchall():
+            if total <= self.config.max_bytes:
+                break
+            self._olvidar(digest)
+            try:
+                self._ruta(digest).unlink()
+            except FileNotFoundError:
+                pass
+            total -= tamano
+            self._contadores["expulsiones"] += 1
+
+    def _olvidar(self, digest: str) -> None:
+        self._conexion.execute("DELETE FROM urls WHERE hash = ?", (digest,))
+        self._conexion.execute("DELETE FROM objetos WHERE hash = ?", (digest,))
+        self._conexion.commit()
+
+
+def _rango(encabezado: Optional[str], tamano: int) -> Union[None, str, Tuple[int, int]]:
+    """
+    (inicio, fin) inclusivos de un encabezado `Range: bytes=...`, "invalido"
+    si no se puede satisfacer, o None si no hay rango (o hay varios: se
+    responde el archivo completo)
+    """
+    if not encabezado or not encabezado.startswith("bytes=") or "," in encabezado:
+        return None
+    inicio_texto, _, fin_texto = encabezado[len("bytes="):].strip().partition("-")
+    try:
+        if inicio_texto:
+            inicio = int(inicio_texto)
+            fin = min(int(fin_texto), tamano - 1) if fin_texto else tamano - 1
+        else:
+            inicio, fin = max(tamano - int(fin_texto), 0), tamano - 1
+    except ValueError:
+        return None
+    if inicio > fin or inicio >= tamano:
+        return "invalido"
+    return inicio, fin
+
+
+def _coincide_etag(si_no_coincide: str, etag: str) -> bool:
+    """If-None-Match usa comparación débil: `W/"x"` coincide con `"x"`"""
+    for candidato in si_no_coincide.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or (candidato[2:] if candidato.startswith("W/") else candidato) == etag:
+            return True
+    return False
+
+
+def _leer_parte(ruta: Path, inicio: int, fin: int) -> bytes:
+    """Bytes de `inicio` a `fin` (inclusivos) del archivo, leídos con mmap"""
+    with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return m[inicio:fin + 1]
+
+
+async def respuesta_foto(foto: FotoEnDisco, request: Request) -> Response:
+    """
+    Respuesta HTTP para una foto en disco: 304, 206 o el archivo completo.
+    La lectura del disco (mmap del rango, stat del archivo) corre en un hilo,
+    fuera del event loop. Lanza FileNotFoundError si otro worker expulsó el
+    archivo después de buscarlo; el llamador puede pedir la foto de nuevo.
+    """
+    loop = asyncio.get_running_loop()
+    etag = f'"{foto.etag}"'
+    encabezados = {"ETag": etag, "Cache-Control": "public, max-age=86400", "Accept-Ranges": "bytes"}
+    si_no_coincide = request.headers.get("if-none-match")
+    if si_no_coincide and _coincide_etag(si_no_coincide, etag):
+        return Response(status_code=304, headers=encabezados)
+
+    # If-Range con otro ETag: la copia del cliente cambió, se envía completa
+    rango = _rango(request.headers.get("range"), foto.tamano)
+    if rango is not None and request.headers.get("if-range", etag) == etag:
+        if rango == "invalido":
+            return Response(status_code=416, headers={**encabezados, "Content-Range": f"bytes */{foto.tamano}"})
+        inicio, fin = rango
+        parte = await loop.run_in_executor(None, _leer_parte, foto.ruta, inicio, fin)
+        return Response(
+            parte,
+            status_code=206,
+            media_type=foto.tipo,
+            headers={**encabezados, "Content-Range": f"bytes {inicio}-{fin}/{foto.tamano}"},
+        )
+    estado = await loop.run_in_executor(None, os.stat, foto.ruta)
+    return FileResponse(foto.ruta, media_type=foto.tipo, headers=encabezados, stat_result=estado)
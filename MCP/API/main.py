@@ -1,21 +1,285 @@
 """
 API REST para consultar observaciones de iNaturalist Colombia
-Consulta observaciones aleatorias del Humedal La Conejera en tiempo real
+Consulta observaciones aleatorias del Humedal La Conejera desde un pool
+que se renueva en segundo plano
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+import asyncio
+import os
+import time
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-import requests
-import random
-from typing import Optional
+import httpx
+from typing import Any, Optional
+from urllib.parse import quote
+
+from inaturalist_comun import (
+    CacheRespuestas,
+    ConfigCache,
+    ConfigLimitador,
+    ConfigPolitica,
+    ConfigPrecalentamiento,
+    ConfigTeselas,
+    ConsultaTeselada,
+    ConsultasEnVuelo,
+    LimitadorTasa,
+    NoModificada,
+    Observacion as RegistroObservacion,
+    PlazoAgotado,
+    PoliticaSolicitudes,
+    Precalentador,
+    Sitio,
+    Validada,
+    cargar_json,
+    clave_consulta,
+    decodificar_pagina,
+    encabezados_condicionales,
+    enviar_medido,
+    fase,
+    nomenclator,
+    registro,
+    solicitar_con_limite,
+    traza,
+    trazas_recientes,
+)
+
+from fotos import CacheFotos, ConfigFotos, FotoNoPermitida, FotoRechazada, normalizar_url, respuesta_foto
+from pool import PoolObservaciones
+import respuestas_http
+
+INATURALIST_URL = os.getenv("INATURALIST_BASE_URL", "https://api.inaturalist.org/v1")
+
+# Lugares conocidos (humedales, áreas protegidas, quebradas...), cargados una vez al arrancar
+lugares = nomenclator()
+
+# Lugares cuyo pool se llena al arrancar y se renueva siempre; de los demás se
+# renuevan los más pedidos (ver `precalentador`)
+LUGARES_PRECARGADOS = [
+    sitio.nombre
+    for sitio in (lugares.buscar(n) for n in os.getenv("API_LUGARES", "Humedal La Conejera").split(",") if n.strip())
+    if sitio is not None
+]
+
+# Observaciones que se precargan por lugar, cada cuánto se renuevan, la
+# antigüedad a partir de la cual un lugar que ya no se renueva se recarga al
+# pedirlo y cuánto se recuerda un lugar sin observaciones o cuya carga falló
+POOL_TAMANO = int(os.getenv("API_POOL_TAMANO", "200"))
+POOL_INTERVALO = float(os.getenv("API_POOL_INTERVALO", "600"))
+POOL_MAX_ANTIGUEDAD = float(os.getenv("API_POOL_MAX_ANTIGUEDAD", "3600"))
+POOL_TTL_VACIO = float(os.getenv("API_POOL_TTL_VACIO", "30"))
+
+# Caché de respuestas de iNaturalist (TTL + LRU, refresco en segundo plano)
+cache = CacheRespuestas(ConfigCache.desde_entorno())
+
+# Consultas idénticas simultáneas comparten una sola solicitud a iNaturalist
+en_vuelo = ConsultasEnVuelo()
+
+# Limitador de tasa y concurrencia para las solicitudes a iNaturalist
+limitador = LimitadorTasa(ConfigLimitador.desde_entorno())
+
+# Plazo, reintentos con jitter y hedging opcional de las solicitudes a iNaturalist
+politica = PoliticaSolicitudes(ConfigPolitica.desde_entorno(), reintentables=(httpx.TransportError,))
+
+# Métricas propias de la API (las de iNaturalist las registra inaturalist_comun)
+API_DURACION = registro.histograma(
+    "api_solicitud_duracion_segundos", "Duración de las solicitudes a la API", ["ruta", "metodo"]
+)
+API_RESPUESTAS = registro.contador(
+    "api_respuestas_total", "Respuestas de la API por código", ["ruta", "metodo", "status"]
+)
+API_EN_CURSO = registro.medidor("api_solicitudes_en_curso", "Solicitudes a la API en curso")
+
+# Cliente HTTP no bloqueante, abierto durante la vida de la aplicación
+cliente: Optional[httpx.AsyncClient] = None
+
+
+async def consultar_inaturalist(endpoint: str, params: dict, tipo: Optional[type] = None) -> Any:
+    """
+    GET a iNaturalist con caché, agrupación de consultas idénticas, limitador de tasa y
+    la política de plazos, reintentos y hedging.
+    Con `tipo` (por ejemplo RegistroObservacion) retorna una `Pagina` de registros proyectados.
+    Las entradas vencidas de la caché se revalidan con un GET condicional (ETag / Last-Modified).
+    """
+    async def cargar():
+        encabezados = encabezados_condicionales()
+        response = await politica.ejecutar(
+            endpoint,
+            lambda timeout: solicitar_con_limite(
+                limitador,
+                lambda: enviar_medido(
+                    endpoint,
+                    lambda: cliente.get(
+                        f"{INATURALIST_URL}{endpoint}", params=params, headers=encabezados, timeout=timeout
+                    )
+                )
+            )
+        )
+        if response.status_code == 304:
+            raise NoModificada(endpoint)
+        response.raise_for_status()
+        with fase("json"):
+            if tipo is None:
+                valor = cargar_json(response.content)
+            else:
+                valor = decodificar_pagina(response.content, tipo)
+        return Validada(valor, response.headers.get("etag"), response.headers.get("last-modified"))
+
+    # La misma consulta proyectada y sin proyectar son entradas distintas
+    clave_params = params if tipo is None else {**params, "_proyeccion": tipo.__name__}
+    clave = clave_consulta(endpoint, clave_params)
+    return await cache.obtener(endpoint, clave_params, lambda: en_vuelo.ejecutar(clave, cargar))
+
+
+# Las observaciones de cada lugar se arman con teselas guardadas en caché por
+# separado; lugares cercanos o solapados comparten las teselas comunes
+config_teselas = ConfigTeselas.desde_entorno()
+teselas = ConsultaTeselada(
+    config_teselas, lambda params: consultar_inaturalist("/observations", params, RegistroObservacion)
+)
+
+
+# Fotos de iNaturalist servidas desde una caché en disco (ver fotos.py). El
+# directorio y su índice se abren al arrancar la aplicación, no al importarla
+config_fotos = ConfigFotos.desde_entorno()
+fotos: Optional[CacheFotos] = None
+
+
+def extraer_observacion(observacion: RegistroObservacion) -> dict:
+    """Campos que retorna el endpoint, con valores por defecto si faltan"""
+    return {
+        "especie": observacion.taxon_nombre or "Desconocida",
+        "nombre_comun": observacion.taxon_nombre_comun or "N/A",
+        "fecha_observacion": observacion.observada or "Desconocida",
+        "usuario": observacion.usuario_nombre or "Anónimo",
+        "foto_url": observacion.foto_url,
+        "foto_local": f"/fotos?url={quote(observacion.foto_url, safe='')}" if config_fotos.habilitadas and observacion.foto_url else None
+    }
+
+
+def resolver_lugar(lugar: str) -> Sitio:
+    """Lugar del nomenclátor con ese nombre, alias o uno parecido; 400 con sugerencias si no hay"""
+    sitio = lugares.buscar(lugar)
+    if sitio is None:
+        sugerencias = [s.nombre for s, _ in lugares.sugerir(lugar, limite=3, minimo=0.2)]
+        raise HTTPException(
+            status_code=400,
+            detail=f"Lugar '{lugar}' no encontrado. Lugares parecidos: {sugerencias} (ver /lugares)"
+        )
+    return sitio
+
+
+async def cargar_observaciones_lugar(lugar: str) -> list:
+    """Descarga las observaciones recientes de calidad de investigación de un lugar"""
+    sitio = resolver_lugar(lugar)
+    radio_km = sitio.radio_km
+    params = {
+        "lat": sitio.lat,
+        "lng": sitio.lng,
+        "radius": radio_km,
+        "quality_grade": "research",
+        "per_page": min(POOL_TAMANO, 200),
+        "order_by": "created_at",
+        "order": "desc"
+    }
+    teselado = None
+    if config_teselas.habilitadas:
+        teselado = await teselas.buscar(
+            sitio.lat, sitio.lng, radio_km, params["per_page"], {"quality_grade": "research"}
+        )
+    if teselado is not None:
+        resultados = teselado.resultados
+    else:
+        resultados = (await consultar_inaturalist("/observations", params, RegistroObservacion)).resultados
+
+    with fase("formato"):
+        observaciones = [extraer_observacion(obs) for obs in resultados]
+    # Las fotos de las observaciones recientes se descargan antes de que alguien las pida
+    if fotos is not None:
+        fotos.programar_precarga(obs["foto_url"] for obs in observaciones)
+    return observaciones
+
+
+# Pool de observaciones por lugar, rellenado en segundo plano
+pool = PoolObservaciones(
+    cargar_observaciones_lugar, max_antiguedad=POOL_MAX_ANTIGUEDAD, ttl_vacio=POOL_TTL_VACIO
+)
+
+
+async def rellenar_pool(nombre: str, argumentos: dict) -> None:
+    await pool.rellenar(argumentos["lugar"])
+
+
+# Renueva cada API_POOL_INTERVALO el pool de los lugares de API_LUGARES y de los
+# más pedidos, con prioridad baja y cediendo el turno a las solicitudes en espera
+precalentador = Precalentador(
+    ConfigPrecalentamiento.desde_entorno(
+        consultas=[("observaciones", {"lugar": lugar}) for lugar in LUGARES_PRECARGADOS],
+        intervalo=POOL_INTERVALO,
+        habilitado=True,
+    ),
+    rellenar_pool,
+    ocupado=limitador.ocupado,
+)
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    """Abre el cliente HTTP y la caché de fotos y mantiene el pool de observaciones lleno"""
+    global cliente, fotos
+    cliente = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+    )
+    if config_fotos.habilitadas:
+        fotos = CacheFotos(config_fotos, lambda: cliente)
+    relleno = asyncio.create_task(precalentador.ejecutar())
+    try:
+        yield
+    finally:
+        relleno.cancel()
+        await asyncio.gather(relleno, return_exceptions=True)
+        if fotos is not None:
+            await fotos.cerrar()
+            fotos = None
+        await cliente.aclose()
+        await cache.cerrar()
+
 
 # Crear aplicación FastAPI
 app = FastAPI(
     title="iNaturalist API",
     description="API REST para consultar observaciones de iNaturalist Colombia",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=ciclo_de_vida
 )
 
+# ETag, 304 y compresión gzip/brotli de las respuestas JSON (ver respuestas_http.py)
+app.add_middleware(
+    respuestas_http.RespuestasCondicionales, **respuestas_http.RespuestasCondicionales.opciones_desde_entorno()
+)
+
+@app.middleware("http")
+async def medir_solicitudes(request: Request, call_next):
+    """Registra duración, código y solicitudes en curso por ruta"""
+    inicio = time.perf_counter()
+    status = 500
+    API_EN_CURSO.inc(1)
+    try:
+        with traza(f"{request.method} {request.url.path}"):
+            response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        API_EN_CURSO.inc(-1)
+        # Plantilla de la ruta ("/observaciones/aleatoria"), no la URL con parámetros
+        ruta = getattr(request.scope.get("route"), "path", "sin_ruta")
+        API_DURACION.observar(time.perf_counter() - inicio, ruta=ruta, metodo=request.method)
+        API_RESPUESTAS.inc(ruta=ruta, metodo=request.method, status=status)
+
+
 # Modelos de respuesta
 class Observacion(BaseModel):
     """Modelo de una observación"""
@@ -26,6 +290,8 @@ class Observacion(BaseModel):
     nombre_comun: str
     fecha_observacion: str
     usuario: str
+    foto_url: Optional[str] = None
+    foto_local: Optional[str] = None  # la misma foto servida por /fotos
 
 class Error(BaseModel):
     """Modelo de error"""
@@ -43,6 +309,11 @@ async def root():
         "endpoints": {
             "info": "/",
             "observaciones_aleatorias": "/observaciones/aleatoria",
+            "observaciones_recientes": "/observaciones/recientes",
+            "lugares": "/lugares",
+            "fotos": "/fotos?url=...",
+            "cache": "/cache/estadisticas",
+            "metricas": "/metrics",
             "documentacion": "/docs"
         }
     }
@@ -56,89 +327,45 @@ async def obtener_observacion_aleatoria(
     """
     Obtiene una observación aleatoria de iNaturalist para un lugar específico
     
-    - **lugar**: Nombre del lugar (default: Humedal La Conejera)
+    - **lugar**: Nombre o alias del lugar, se aceptan nombres aproximados (default: Humedal La Conejera)
     - **ciudad**: Nombre de la ciudad (default: Bogotá)
     
-    Retorna una observación aleatoria del lugar especificado
+    Retorna una observación aleatoria del lugar especificado, tomada de un
+    pool de observaciones recientes que se renueva en segundo plano
     """
     try:
-        # Coordenadas del Humedal La Conejera en Bogotá
-        coordenadas = {
-            "Humedal La Conejera": {"lat": 4.7519, "lon": -74.0841, "radio": 1000}
-        }
-        
-        if lugar not in coordenadas:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Lugar '{lugar}' no configurado. Lugares disponibles: {list(coordenadas.keys())}"
-            )
-        
-        coords = coordenadas[lugar]
-        
-        # Construir URL y parámetros para la API de iNaturalist
-        url = "https://api.inaturalist.org/v1/observations"
-        params = {
-            "lat": coords["lat"],
-            "lng": coords["lon"],
-            "radius": coords["radio"],
-            "quality_grade": "research",
-            "per_page": 20,
-            "order_by": "created_at",
-            "order": "desc"
-        }
-        
-        # Hacer consulta a la API
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        datos = response.json()
-        observaciones = datos.get("results", [])
+        lugar = resolver_lugar(lugar).nombre
+        precalentador.registrar("observaciones", {"lugar": lugar})
+
+        # Seleccionar una observación al azar del pool precargado
+        observacion_aleatoria = await pool.elegir(lugar)
         
-        if not observaciones:
+        if observacion_aleatoria is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"No se encontraron observaciones en {lugar}"
             )
         
-        # Seleccionar una observación al azar
-        observacion_aleatoria = random.choice(observaciones)
-        
-        # Extraer información de forma segura
-        especie = observacion_aleatoria.get("taxon", {})
-        especie_nombre = especie.get("name") if especie else None
-        especie_nombre = especie_nombre if especie_nombre else "Desconocida"
-        
-        nombre_comun = especie.get("preferred_common_name") if especie else None
-        nombre_comun = nombre_comun if nombre_comun else "N/A"
-        
-        fecha = observacion_aleatoria.get("observed_on")
-        fecha = fecha if fecha else "Desconocida"
-        
-        usuario_obj = observacion_aleatoria.get("user")
-        usuario_nombre = usuario_obj.get("name") if usuario_obj and isinstance(usuario_obj, dict) else None
-        usuario_nombre = usuario_nombre if usuario_nombre else "Anónimo"
-        
         return Observacion(
             exitoso=True,
             lugar=lugar,
             ciudad=ciudad,
-            especie=especie_nombre,
-            nombre_comun=nombre_comun,
-            fecha_observacion=fecha,
-            usuario=usuario_nombre
+            **observacion_aleatoria
         )
         
-    except requests.exceptions.Timeout:
+    except HTTPException:
+        raise
+    except (httpx.TimeoutException, PlazoAgotado):
         raise HTTPException(
             status_code=504,
             detail="Tiempo de espera agotado al consultar iNaturalist"
         )
-    except requests.exceptions.ConnectionError:
+    except httpx.NetworkError:
         raise HTTPException(
             status_code=503,
             detail="Error de conexión al consultar iNaturalist"
         )
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(
             status_code=502,
             detail=f"Error al consultar iNaturalist: {str(e)}"
@@ -150,6 +377,127 @@ async def obtener_observacion_aleatoria(
         )
 
 
+@app.get("/observaciones/recientes", tags=["Observaciones"])
+async def obtener_observaciones_recientes(
+    response: Response,
+    lugar: str = Query("Humedal La Conejera", description="Lugar a consultar")
+):
+    """
+    Todas las observaciones recientes del pool de un lugar.
+
+    Responde con Last-Modified (la última renovación del pool) y ETag: un
+    cliente que consulta periódicamente con If-Modified-Since o If-None-Match
+    recibe 304 sin cuerpo mientras el pool no cambie.
+    """
+    lugar = resolver_lugar(lugar).nombre
+    precalentador.registrar("observaciones", {"lugar": lugar})
+    try:
+        observaciones, actualizado = await pool.instantanea(lugar)
+    except (httpx.TimeoutException, PlazoAgotado):
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado al consultar iNaturalist")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error al consultar iNaturalist: {str(e)}")
+    if actualizado is not None:
+        response.headers["Last-Modified"] = formatdate(actualizado, usegmt=True)
+    return {"lugar": lugar, "total": len(observaciones), "observaciones": observaciones}
+
+
+@app.get("/lugares", tags=["Lugares"])
+async def buscar_lugares(
+    q: Optional[str] = Query(None, description="Nombre aproximado del lugar"),
+    lat: Optional[float] = Query(None, description="Latitud para buscar los lugares más cercanos"),
+    lng: Optional[float] = Query(None, description="Longitud para buscar los lugares más cercanos"),
+    tipo: Optional[str] = Query(None, description="Humedal, Área protegida, Quebrada, Río, Parque o Cerro"),
+    limite: int = Query(10, ge=1, le=100, description="Lugares como máximo")
+):
+    """
+    Lugares del nomenclátor: por nombre aproximado (`q`, con su similitud),
+    los más cercanos a un punto (`lat` y `lng`, con su distancia en km) o,
+    sin parámetros, todos los del tipo indicado.
+    """
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat y lng se indican juntos")
+    if q:
+        encontrados = [
+            {**sitio.como_dict(), "similitud": similitud}
+            for sitio, similitud in lugares.sugerir(q, limite=len(lugares))
+            if sitio.es_de_tipo(tipo)
+        ][:limite]
+    elif lat is not None:
+        encontrados = [
+            {**sitio.como_dict(), "distancia_km": distancia}
+            for sitio, distancia in lugares.cercanos(lat, lng, k=limite, tipo=tipo)
+        ]
+    else:
+        encontrados = [sitio.como_dict() for sitio in lugares if sitio.es_de_tipo(tipo)][:limite]
+    return {"total": len(encontrados), "lugares": encontrados}
+
+
+@app.get("/fotos", tags=["Fotos"])
+async def obtener_foto(
+    request: Request,
+    url: str = Query(..., description="URL de la foto en iNaturalist (foto_url)"),
+    tamano: Optional[str] = Query(None, description="square, small, medium, large u original")
+):
+    """
+    Sirve una foto de observación o de taxón de iNaturalist desde la caché en
+    disco, descargándola la primera vez. Responde con ETag (304 con
+    If-None-Match) y acepta rangos de bytes.
+    """
+    if fotos is None:
+        raise HTTPException(status_code=404, detail="La caché de fotos está deshabilitada (API_FOTOS=0)")
+    try:
+        url = normalizar_url(url, tamano)
+    except FotoNoPermitida as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Si otro worker expulsa el archivo entre la búsqueda y la respuesta, se pide otra vez
+    for _ in range(2):
+        try:
+            foto = await fotos.obtener(url)
+        except FotoRechazada as e:
+            raise HTTPException(status_code=502, detail=str(e))
+        except httpx.HTTPStatusError as e:
+            estado = 404 if e.response.status_code in (403, 404) else 502
+            raise HTTPException(status_code=estado, detail=f"iNaturalist respondió {e.response.status_code} para la foto")
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Tiempo de espera agotado al descargar la foto")
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Error al descargar la foto: {str(e)}")
+        try:
+            return await respuesta_foto(foto, request)
+        except FileNotFoundError:
+            continue
+    raise HTTPException(status_code=404, detail="La foto se eliminó de la caché mientras se servía")
+
+
+@app.get("/cache/estadisticas", tags=["Info"])
+async def estadisticas_cache():
+    """Contadores de la caché, consultas agrupadas, teselas, pool, precalentamiento, respuestas HTTP, política y limitador de tasa"""
+    return {
+        **cache.estadisticas(),
+        "en_vuelo": en_vuelo.estadisticas(),
+        "pool": pool.estado(),
+        "precalentamiento": precalentador.estadisticas(),
+        "teselas": teselas.estadisticas(),
+        "fotos": fotos.estadisticas() if fotos is not None else None,
+        "respuestas": respuestas_http.estadisticas(),
+        "politica": politica.estadisticas(),
+        "limitador": limitador.estadisticas()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Info"])
+async def metricas():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(registro.exponer(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metricas/trazas", tags=["Info"])
+async def trazas():
+    """Últimas trazas por solicitud, con la duración de cada fase (requiere INATURALIST_TRAZAS=1)"""
+    return trazas_recientes()
+
+
 @app.get("/health", tags=["Info"])
 async def health_check():
     """Verificar que el servidor está funcionando"""
@@ -0,0 +1,102 @@
+"""
+Pool en memoria de observaciones por lugar
+
+Cada lugar mantiene una lista de observaciones de calidad de investigación
+que el precalentador de la API rellena en segundo plano (los lugares de
+API_LUGARES y los más pedidos). Elegir una observación al azar es una lectura
+en memoria: la consulta a iNaturalist queda fuera del camino de cada solicitud.
+
+Un lugar sin observaciones o cuya carga falló se recuerda durante `ttl_vacio`
+segundos, para que las solicitudes a ese lugar no consulten iNaturalist cada vez.
+"""
+
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from inaturalist_comun import ConsultasEnVuelo
+
+
+class PoolObservaciones:
+    """
+    Observaciones precargadas por lugar.
+
+    Args:
+        cargar: Función asíncrona que retorna las observaciones de un lugar
+        max_antiguedad: Segundos después de los cuales un lugar que ya no se
+            precalienta se vuelve a cargar en la siguiente solicitud
+        ttl_vacio: Segundos durante los cuales una carga vacía o fallida se
+            reutiliza en lugar de volver a consultar iNaturalist
+    """
+
+    def __init__(
+        self,
+        cargar: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+        max_antiguedad: float = 3600.0,
+        ttl_vacio: float = 30.0,
+    ):
+        self.cargar = cargar
+        self.max_antiguedad = max_antiguedad
+        self.ttl_vacio = ttl_vacio
+        self._observaciones: Dict[str, List[Dict[str, Any]]] = {}
+        self._actualizado: Dict[str, float] = {}
+        # Último error de carga de cada lugar y el momento en que ocurrió
+        self._errores: Dict[str, Tuple[float, Exception]] = {}
+        self._rellenos = ConsultasEnVuelo()
+
+    async def elegir(self, lugar: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna una observación al azar del lugar. Sólo consulta iNaturalist si
+        el pool todavía no se cargó (por ejemplo, justo después de arrancar),
+        tiene más de `max_antiguedad` segundos o quedó vacío hace más de
+        `ttl_vacio` segundos.
+        """
+        await self._asegurar(lugar)
+        observaciones = self._observaciones.get(lugar)
+        return random.choice(observaciones) if observaciones else None
+
+    async def instantanea(self, lugar: str) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+        """Observaciones del lugar y el momento (time.time()) en que se cargaron"""
+        await self._asegurar(lugar)
+        return self._observaciones.get(lugar, []), self._actualizado.get(lugar)
+
+    async def rellenar(self, lugar: str) -> None:
+        """Reemplaza las observaciones del lugar; rellenos simultáneos se agrupan"""
+        async def cargar():
+            try:
+                observaciones = await self.cargar(lugar)
+            except Exception as e:
+                self._errores[lugar] = (time.time(), e)
+                raise
+            self._errores.pop(lugar, None)
+            self._observaciones[lugar] = observaciones
+            self._actualizado[lugar] = time.time()
+
+        await self._rellenos.ejecutar(lugar, cargar)
+
+    def estado(self) -> Dict[str, Any]:
+        """Tamaño y antigüedad del pool de cada lugar cargado"""
+        ahora = time.time()
+        return {
+            lugar: {
+                "observaciones": len(observaciones),
+                "antiguedad_s": round(ahora - self._actualizado[lugar], 1),
+            }
+            for lugar, observaciones in self._observaciones.items()
+        }
+
+    async def _asegurar(self, lugar: str) -> None:
+        """Recarga el lugar si hace falta; una carga fallida reciente se repite sin consultar"""
+        if not self._vacio_o_viejo(lugar):
+            return
+        error = self._errores.get(lugar)
+        if error is not None and time.time() - error[0] <= self.ttl_vacio:
+            raise error[1].with_traceback(None)
+        await self.rellenar(lugar)
+
+    def _vacio_o_viejo(self, lugar: str) -> bool:
+        observaciones = self._observaciones.get(lugar)
+        if observaciones is None:
+            return True
+        max_antiguedad = self.max_antiguedad if observaciones else self.ttl_vacio
+        return time.time() - self._actualizado[lugar] > max_antiguedad
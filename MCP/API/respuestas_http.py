@@ -0,0 +1,177 @@
+"""
+Respuestas condicionales y comprimidas
+
+Middleware ASGI para las respuestas JSON y de texto de la API:
+
+- Agrega un ETag débil calculado sobre el cuerpo (si la ruta no puso uno) y
+  responde 304 sin cuerpo cuando coincide con `If-None-Match`. Si la ruta
+  puso `Last-Modified`, también responde 304 ante `If-Modified-Since`
+- Comprime con brotli (si el paquete `brotli` está instalado) o gzip según
+  `Accept-Encoding`, sólo por encima de un tamaño mínimo
+
+Las respuestas en streaming y las que no son JSON o texto (por ejemplo las
+fotos, que ya traen su ETag) pasan sin cambios.
+
+Configuración por variables de entorno:
+
+- API_COMPRESION_MIN_BYTES: Tamaño mínimo del cuerpo para comprimir (default: 500)
+- API_COMPRESION_NIVEL_GZIP: Nivel de gzip de 1 a 9 (default: 6)
+- API_COMPRESION_NIVEL_BROTLI: Nivel de brotli de 0 a 11 (default: 5)
+"""
+
+import gzip
+import hashlib
+import os
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ("application/json", "text/")
+
+# Contadores de todas las instancias del middleware (una por aplicación)
+_contadores = {"no_modificadas": 0, "comprimidas": 0, "bytes_sin_comprimir": 0, "bytes_comprimidos": 0}
+
+
+def estadisticas() -> Dict[str, Any]:
+    """Respuestas 304 enviadas y bytes ahorrados por la compresión"""
+    ahorro = _contadores["bytes_sin_comprimir"] - _contadores["bytes_comprimidos"]
+    return {**_contadores, "bytes_ahorrados": ahorro, "brotli": brotli is not None}
+
+
+def elegir_codificacion(accept_encoding: str) -> Optional[str]:
+    """"br" o "gzip" según lo que acepte el cliente (respetando q=0)"""
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre.strip().lower()] = q
+    comodin = aceptadas.get("*", 0.0)
+    if brotli is not None and aceptadas.get("br", comodin) > 0:
+        return "br"
+    if aceptadas.get("gzip", comodin) > 0:
+        return "gzip"
+    return None
+
+
+def _etags(valor: str) -> List[str]:
+    """Lista de ETags de If-None-Match, sin el prefijo de ETag débil"""
+    etags = [e.strip() for e in valor.split(",")]
+    return [e[2:] if e.startswith("W/") else e for e in etags]
+
+
+def no_modificado(solicitud: Headers, etag: str, ultima_modificacion: Optional[str]) -> bool:
+    """Indica si la copia del cliente sigue vigente (If-None-Match tiene prioridad)"""
+    si_no_coincide = solicitud.get("if-none-match")
+    if si_no_coincide is not None:
+        candidatos = _etags(si_no_coincide)
+        return "*" in candidatos or _etags(etag)[0] in candidatos
+    si_modificado = solicitud.get("if-modified-since")
+    if si_modificado and ultima_modificacion:
+        try:
+            return parsedate_to_datetime(ultima_modificacion) <= parsedate_to_datetime(si_modificado)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class RespuestasCondicionales:
+    """Middleware ASGI: ETag, 304 y compresión para respuestas GET de JSON o texto"""
+
+    def __init__(self, app: Callable, minimo: int = 500, nivel_gzip: int = 6, nivel_brotli: int = 5):
+        self.app = app
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.nivel_brotli = nivel_brotli
+
+    @classmethod
+    def opciones_desde_entorno(cls) -> Dict[str, int]:
+        """Argumentos para `app.add_middleware(RespuestasCondicionales, **opciones)`"""
+        return {
+            "minimo": int(os.getenv("API_COMPRESION_MIN_BYTES", "500")),
+            "nivel_gzip": int(os.getenv("API_COMPRESION_NIVEL_GZIP", "6")),
+            "nivel_brotli": int(os.getenv("API_COMPRESION_NIVEL_BROTLI", "5")),
+        }
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable[[Dict[str, Any]], Awaitable[None]]):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        solicitud = Headers(scope=scope)
+        inicio: Optional[Dict[str, Any]] = None
+        partes: List[bytes] = []
+        pasar = False
+
+        async def enviar(mensaje: Dict[str, Any]) -> None:
+            nonlocal inicio, pasar
+            if pasar:
+                await send(mensaje)
+                return
+            if mensaje["type"] == "http.response.start":
+                inicio = mensaje
+                if not self._procesable(mensaje):
+                    pasar = True
+                    await send(mensaje)
+                return
+            if mensaje["type"] != "http.response.body" or (mensaje.get("more_body") and not partes):
+                # Streaming u otras extensiones (pathsend): se envía tal cual
+                pasar = True
+                await send(inicio)
+                await send(mensaje)
+                return
+            partes.append(mensaje.get("body", b""))
+            if not mensaje.get("more_body"):
+                await self._responder(solicitud, inicio, b"".join(partes), send)
+
+        await self.app(scope, receive, enviar)
+
+    def _procesable(self, inicio: Dict[str, Any]) -> bool:
+        encabezados = Headers(raw=inicio["headers"])
+        return (
+            inicio["status"] == 200
+            and "content-encoding" not in encabezados
+            and encabezados.get("content-type", "").startswith(TIPOS_COMPRIMIBLES)
+        )
+
+    async def _responder(self, solicitud: Headers, inicio: Dict[str, Any], cuerpo: bytes, send: Callable) -> None:
+        encabezados = MutableHeaders(raw=list(inicio["headers"]))
+        etag = encabezados.get("etag")
+        if etag is None:
+            etag = f'W/"{hashlib.blake2b(cuerpo, digest_size=16).hexdigest()}"'
+            encabezados["etag"] = etag
+        encabezados.add_vary_header("Accept-Encoding")
+
+        if no_modificado(solicitud, etag, encabezados.get("last-modified")):
+            _contadores["no_modificadas"] += 1
+            for nombre in ("content-length", "content-type"):
+                if nombre in encabezados:
+                    del encabezados[nombre]
+            await send({"type": "http.response.start", "status": 304, "headers": encabezados.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        codificacion = elegir_codificacion(solicitud.get("accept-encoding", "")) if len(cuerpo) >= self.minimo else None
+        if codificacion is not None:
+            _contadores["comprimidas"] += 1
+            _contadores["bytes_sin_comprimir"] += len(cuerpo)
+            if codificacion == "br":
+                cuerpo = brotli.compress(cuerpo, quality=self.nivel_brotli)
+            else:
+                cuerpo = gzip.compress(cuerpo, compresslevel=self.nivel_gzip)
+            _contadores["bytes_comprimidos"] += len(cuerpo)
+            encabezados["content-encoding"] = codificacion
+            encabezados["content-length"] = str(len(cuerpo))
+
+        await send({**inicio, "headers": encabezados.raw})
+        await send({"type": "http.response.body", "body": cuerpo})
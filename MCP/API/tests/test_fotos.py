@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+from fastapi import Request
+from fastapi.responses import FileResponse
+
+import fotos as modulo_fotos
+from fotos import CacheFotos, ConfigFotos, FotoNoPermitida, FotoRechazada, normalizar_url, respuesta_foto
+
+S3 = "https://inaturalist-open-data.s3.amazonaws.com/photos"
+ESTATICO = "https://static.inaturalist.org/photos"
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000_000.0
+
+    def time(self):
+        return self.ahora
+
+
+class CDN:
+    """CDN simulado: cada ruta responde los bytes, encabezados y estado indicados"""
+
+    def __init__(self):
+        self.rutas = {}
+        self.solicitudes = []
+
+    def foto(self, url, contenido, tipo="image/jpeg", **encabezados):
+        self.rutas[url] = (200, contenido, {"content-type": tipo, **encabezados})
+
+    def redirigir(self, url, destino):
+        self.rutas[url] = (302, b"", {"location": destino})
+
+    async def __call__(self, request):
+        self.solicitudes.append(str(request.url))
+        await asyncio.sleep(0)
+        estado, contenido, encabezados = self.rutas.get(str(request.url), (404, b"", {}))
+        return httpx.Response(estado, content=contenido, headers=encabezados)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo_fotos, "time", reloj)
+    return reloj
+
+
+@pytest.fixture
+def cdn():
+    return CDN()
+
+
+@pytest.fixture
+async def crear_cache(tmp_path, cdn, reloj):
+    cliente = httpx.AsyncClient(transport=httpx.MockTransport(cdn))
+    creadas = []
+
+    def crear(**config):
+        cache = CacheFotos(ConfigFotos(directorio=str(tmp_path / "fotos"), **config), lambda: cliente)
+        creadas.append(cache)
+        return cache
+
+    yield crear
+    for cache in creadas:
+        await cache.cerrar()
+    await cliente.aclose()
+
+
+def _request(**encabezados):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/fotos",
+        "query_string": b"",
+        "headers": [(nombre.replace("_", "-").encode(), valor.encode()) for nombre, valor in encabezados.items()],
+    })
+
+
+# --- Dominios permitidos ------------------------------------------------------
+
+@pytest.mark.parametrize("url", [
+    "https://evil.example.com/photos/1/square.jpg",
+    "https://static.inaturalist.org.evil.example.com/photos/1/square.jpg",
+    "ftp://static.inaturalist.org/photos/1/square.jpg",
+    "file:///etc/passwd",
+])
+def test_rechaza_urls_fuera_de_los_dominios_de_fotos(url):
+    with pytest.raises(FotoNoPermitida):
+        normalizar_url(url)
+
+
+def test_normaliza_esquema_consulta_y_tamano():
+    assert normalizar_url("http://static.inaturalist.org/photos/12/medium.jpg?1700000000") == f"{ESTATICO}/12/medium.jpg"
+    assert normalizar_url(f"{S3}/12/square.jpeg", "large") == f"{S3}/12/large.jpeg"
+    with pytest.raises(FotoNoPermitida):
+        normalizar_url(f"{S3}/12/square.jpeg", "gigante")
+
+
+# --- Descarga -----------------------------------------------------------------
+
+async def test_descarga_una_vez_y_luego_sirve_del_disco(crear_cache, cdn):
+    cdn.foto(f"{S3}/1/square.jpg", b"jpeg-1")
+    cache = crear_cache()
+    foto = await cache.obtener(f"{S3}/1/square.jpg")
+    assert foto.ruta.read_bytes() == b"jpeg-1"
+    assert foto.etag == hashlib.sha256(b"jpeg-1").hexdigest()
+    assert foto.ruta.name == foto.etag
+    assert (await cache.obtener(f"{S3}/1/square.jpg")).ruta == foto.ruta
+    assert len(cdn.solicitudes) == 1
+    assert cache.estadisticas()["aciertos"] == 1
+
+
+async def test_descargas_simultaneas_se_agrupan(crear_cache, cdn):
+    cdn.foto(f"{S3}/1/square.jpg", b"jpeg-1")
+    cache = crear_cache()
+    resultados = await asyncio.gather(*(cache.obtener(f"{S3}/1/square.jpg") for _ in range(5)))
+    assert len({foto.ruta for foto in resultados}) == 1
+    assert len(cdn.solicitudes) == 1
+
+
+async def test_urls_con_el_mismo_contenido_comparten_archivo(crear_cache, cdn):
+    cdn.foto(f"{S3}/1/medium.jpg", b"misma-imagen")
+    cdn.foto(f"{ESTATICO}/1/medium.jpg", b"misma-imagen")
+    cache = crear_cache()
+    primera = await cache.obtener(f"{S3}/1/medium.jpg")
+    segunda = await cache.obtener(f"{ESTATICO}/1/medium.jpg")
+    assert primera.ruta == segunda.ruta
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["archivos"], estadisticas["urls"], estadisticas["deduplicadas"]) == (1, 2, 1)
+
+
+async def test_sigue_redirecciones_dentro_de_los_dominios(crear_cache, cdn):
+    cdn.redirigir(f"{ESTATICO}/1/square.jpg", f"{S3}/1/square.jpg")
+    cdn.foto(f"{S3}/1/square.jpg", b"jpeg-1")
+    foto = await crear_cache().obtener(f"{ESTATICO}/1/square.jpg")
+    assert foto.ruta.read_bytes() == b"jpeg-1"
+    assert cdn.solicitudes == [f"{ESTATICO}/1/square.jpg", f"{S3}/1/square.jpg"]
+
+
+async def test_rechaza_redirecciones_fuera_de_los_dominios(crear_cache, cdn):
+    cdn.redirigir(f"{S3}/1/square.jpg", "http://169.254.169.254/latest/meta-data")
+    with pytest.raises(FotoRechazada):
+        await crear_cache().obtener(f"{S3}/1/square.jpg")
+    assert cdn.solicitudes == [f"{S3}/1/square.jpg"]
+
+
+async def test_rechaza_demasiadas_redirecciones(crear_cache, cdn):
+    for i in range(modulo_fotos.MAX_REDIRECCIONES + 1):
+        cdn.redirigir(f"{S3}/{i}/square.jpg", f"{S3}/{i + 1}/square.jpg")
+    with pytest.raises(FotoRechazada):
+        await crear_cache().obtener(f"{S3}/0/square.jpg")
+
+
+async def test_rechaza_lo_que_no_es_imagen(crear_cache, cdn):
+    cdn.foto(f"{S3}/1/square.jpg", b"<html></html>", tipo="text/html; charset=utf-8")
+    with pytest.raises(FotoRechazada):
+        await crear_cache().obtener(f"{S3}/1/square.jpg")
+
+
+async def test_rechaza_fotos_demasiado_grandes(crear_cache, cdn):
+    cdn.foto(f"{S3}/1/original.jpg", b"x" * 101)
+    cache = crear_cache(max_bytes_foto=100)
+    with pytest.raises(FotoRechazada):
+        await cache.obtener(f"{S3}/1/original.jpg")
+    assert cache.estadisticas()["archivos"] == 0
+
+
+async def test_corta_la_descarga_sin_content_length_al_pasar_el_maximo(crear_cache, cdn):
+    async def partes():
+        for _ in range(10):
+            yield b"x" * 40
+
+    cdn.rutas[f"{S3}/1/original.jpg"] = (200, partes(), {"content-type": "image/jpeg"})
+    with pytest.raises(FotoRechazada):
+        await crear_cache(max_bytes_foto=100).obtener(f"{S3}/1/original.jpg")
+
+
+async def test_expulsa_la_usada_hace_mas_tiempo(crear_cache, cdn, reloj, monkeypatch):
+    monkeypatch.setattr(modulo_fotos, "_INTERVALO_USO", 0)
+    for i in range(3):
+        cdn.foto(f"{S3}/{i}/square.jpg", bytes([i]) * 100)
+    cache = crear_cache(max_bytes=250)
+
+    primera = await cache.obtener(f"{S3}/0/square.jpg")
+    reloj.ahora += 1
+    segunda = await cache.obtener(f"{S3}/1/square.jpg")
+    reloj.ahora += 1
+    await cache.obtener(f"{S3}/0/square.jpg")  # la primera se vuelve a usar
+    reloj.ahora += 1
+    await cache.obtener(f"{S3}/2/square.jpg")
+
+    assert primera.ruta.exists()
+    assert not segunda.ruta.exists()
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["archivos"], estadisticas["bytes"], estadisticas["expulsiones"]) == (2, 200, 1)
+    # La expulsada se descarga otra vez al pedirla
+    await cache.obtener(f"{S3}/1/square.jpg")
+    assert cdn.solicitudes.count(f"{S3}/1/square.jpg") == 2
+
+
+# --- Respuestas ---------------------------------------------------------------
+
+@pytest.fixture
+async def foto(crear_cache, cdn):
+    cdn.foto(f"{S3}/1/large.jpg", bytes(range(100)))
+    return await crear_cache().obtener(f"{S3}/1/large.jpg")
+
+
+async def test_respuesta_completa_con_etag(foto):
+    respuesta = await respuesta_foto(foto, _request())
+    assert isinstance(respuesta, FileResponse)
+    assert respuesta.status_code == 200
+    assert respuesta.headers["etag"] == f'"{foto.etag}"'
+    assert respuesta.headers["accept-ranges"] == "bytes"
+    assert respuesta.headers["content-length"] == "100"
+
+
+@pytest.mark.parametrize("si_no_coincide", ["{etag}", 'W/{etag}', '"otro", {etag}', "*"])
+async def test_304_con_if_none_match(foto, si_no_coincide):
+    etag = f'"{foto.etag}"'
+    respuesta = await respuesta_foto(foto, _request(if_none_match=si_no_coincide.format(etag=etag)))
+    assert respuesta.status_code == 304
+    assert respuesta.body == b""
+
+
+@pytest.mark.parametrize("rango, inicio, fin", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=90-", 90, 99),
+    ("bytes=-5", 95, 99),
+    ("bytes=95-500", 95, 99),
+])
+async def test_206_con_rango(foto, rango, inicio, fin):
+    respuesta = await respuesta_foto(foto, _request(range=rango))
+    assert respuesta.status_code == 206
+    assert respuesta.body == bytes(range(inicio, fin + 1))
+    assert respuesta.headers["content-range"] == f"bytes {inicio}-{fin}/100"
+    assert respuesta.headers["content-type"] == "image/jpeg"
+
+
+@pytest.mark.parametrize("rango", ["bytes=100-", "bytes=50-10"])
+async def test_416_con_rango_insatisfacible(foto, rango):
+    respuesta = await respuesta_foto(foto, _request(range=rango))
+    assert respuesta.status_code == 416
+    assert respuesta.headers["content-range"] == "bytes */100"
+
+
+@pytest.mark.parametrize("encabezados", [
+    {"range": "bytes=0-9,20-29"},  # varios rangos: se responde completa
+    {"range": "items=0-9"},
+    {"range": "bytes=0-9", "if_range": '"version-anterior"'},
+])
+async def test_rangos_no_soportados_o_if_range_distinto_responden_completa(foto, encabezados):
+    respuesta = await respuesta_foto(foto, _request(**encabezados))
+    assert respuesta.status_code == 200
+    assert isinstance(respuesta, FileResponse)
+
+
+async def test_archivo_expulsado_por_otro_worker(foto):
+    foto.ruta.unlink()
+    with pytest.raises(FileNotFoundError):
+        await respuesta_foto(foto, _request())
+    with pytest.raises(FileNotFoundError):
+        await respuesta_foto(foto, _request(range="bytes=0-9"))
@@ -0,0 +1,26 @@
+from starlette.testclient import TestClient
+
+import main
+
+
+def test_metrics_expone_las_solicitudes_a_la_api():
+    cliente = TestClient(main.app)
+    assert cliente.get("/health").status_code == 200
+    assert cliente.get("/no-existe").status_code == 404
+
+    respuesta = cliente.get("/metrics")
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lineas = respuesta.text.splitlines()
+    assert "# TYPE api_solicitud_duracion_segundos histogram" in lineas
+    assert "# TYPE api_respuestas_total counter" in lineas
+    assert "# TYPE inaturalist_upstream_respuestas_total counter" in lineas
+    assert any(
+        linea.startswith('api_respuestas_total{ruta="/health",metodo="GET",status="200"} ') for linea in lineas
+    )
+    # Las rutas inexistentes comparten una etiqueta en lugar de una por URL
+    assert any(
+        linea.startswith('api_respuestas_total{ruta="sin_ruta",metodo="GET",status="404"} ') for linea in lineas
+    )
+    assert any(linea.startswith('api_solicitud_duracion_segundos_count{ruta="/health",metodo="GET"} ') for linea in lineas)
+    assert 'api_solicitud_duracion_segundos_bucket{ruta="/health",metodo="GET",le="+Inf"}' in respuesta.text
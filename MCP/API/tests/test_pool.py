@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+import pytest
+
+import pool as modulo_pool
+from pool import PoolObservaciones
+
+OBSERVACIONES = [{"id": i, "especie": "Tingua bogotana"} for i in range(5)]
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000_000.0
+
+    def time(self):
+        return self.ahora
+
+
+class Cargador:
+    """`cargar` simulado: responde `respuesta` (una lista de observaciones o una excepción)"""
+
+    def __init__(self, respuesta=OBSERVACIONES):
+        self.respuesta = respuesta
+        self.llamadas = []
+
+    async def __call__(self, lugar):
+        self.llamadas.append(lugar)
+        await asyncio.sleep(0)
+        if isinstance(self.respuesta, Exception):
+            raise self.respuesta
+        return list(self.respuesta)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo_pool, "time", reloj)
+    return reloj
+
+
+async def test_elegir_carga_una_vez_y_luego_lee_de_memoria(reloj):
+    cargar = Cargador()
+    pool = PoolObservaciones(cargar)
+    for _ in range(5):
+        assert await pool.elegir("Humedal La Conejera") in OBSERVACIONES
+    assert cargar.llamadas == ["Humedal La Conejera"]
+
+
+async def test_cargas_simultaneas_se_agrupan(reloj):
+    cargar = Cargador()
+    pool = PoolObservaciones(cargar)
+    await asyncio.gather(*(pool.elegir("Humedal La Conejera") for _ in range(10)))
+    assert len(cargar.llamadas) == 1
+
+
+async def test_pool_viejo_se_recarga(reloj):
+    cargar = Cargador()
+    pool = PoolObservaciones(cargar, max_antiguedad=60)
+    await pool.elegir("Humedal La Conejera")
+    reloj.ahora += 59
+    await pool.elegir("Humedal La Conejera")
+    assert len(cargar.llamadas) == 1
+    reloj.ahora += 2
+    await pool.elegir("Humedal La Conejera")
+    assert len(cargar.llamadas) == 2
+
+
+async def test_lugar_sin_observaciones_se_recuerda_durante_ttl_vacio(reloj):
+    cargar = Cargador([])
+    pool = PoolObservaciones(cargar, ttl_vacio=30)
+    for _ in range(3):
+        assert await pool.elegir("Humedal Torca") is None
+    assert await pool.instantanea("Humedal Torca") == ([], reloj.ahora)
+    assert len(cargar.llamadas) == 1
+
+    reloj.ahora += 31
+    cargar.respuesta = OBSERVACIONES
+    assert await pool.elegir("Humedal Torca") in OBSERVACIONES
+    assert len(cargar.llamadas) == 2
+
+
+async def test_carga_fallida_se_repite_sin_consultar_durante_ttl_vacio(reloj):
+    cargar = Cargador(httpx.ConnectError("sin conexión"))
+    pool = PoolObservaciones(cargar, ttl_vacio=30)
+    for _ in range(3):
+        with pytest.raises(httpx.ConnectError):
+            await pool.elegir("Humedal La Conejera")
+    with pytest.raises(httpx.ConnectError):
+        await pool.instantanea("Humedal La Conejera")
+    assert len(cargar.llamadas) == 1
+
+    reloj.ahora += 31
+    cargar.respuesta = OBSERVACIONES
+    assert await pool.elegir("Humedal La Conejera") in OBSERVACIONES
+    assert len(cargar.llamadas) == 2
+    # Una carga correcta olvida el error
+    reloj.ahora += 1
+    assert await pool.elegir("Humedal La Conejera") in OBSERVACIONES
+    assert len(cargar.llamadas) == 2
+
+
+async def test_renovacion_fallida_conserva_las_observaciones(reloj):
+    cargar = Cargador()
+    pool = PoolObservaciones(cargar)
+    await pool.rellenar("Humedal La Conejera")
+    cargar.respuesta = httpx.ReadTimeout("lento")
+    with pytest.raises(httpx.ReadTimeout):
+        await pool.rellenar("Humedal La Conejera")
+    assert await pool.elegir("Humedal La Conejera") in OBSERVACIONES
+    assert len(cargar.llamadas) == 2
+
+
+async def test_instantanea_y_estado(reloj):
+    pool = PoolObservaciones(Cargador())
+    observaciones, actualizado = await pool.instantanea("Humedal La Conejera")
+    assert observaciones == OBSERVACIONES
+    assert actualizado == reloj.ahora
+    reloj.ahora += 12.34
+    assert pool.estado() == {"Humedal La Conejera": {"observaciones": 5, "antiguedad_s": 12.3}}
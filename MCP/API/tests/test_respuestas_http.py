@@ -0,0 +1,138 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import respuestas_http
+from respuestas_http import RespuestasCondicionales, elegir_codificacion, no_modificado
+
+DATOS = {"observaciones": [{"id": i, "especie": "Tingua bogotana"} for i in range(50)]}
+ULTIMA_MODIFICACION = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+def _json(request):
+    return JSONResponse(DATOS)
+
+
+def _pequena(request):
+    return JSONResponse({"ok": True})
+
+
+def _con_validadores(request):
+    return JSONResponse(DATOS, headers={"ETag": '"propio"', "Last-Modified": ULTIMA_MODIFICACION})
+
+
+def _foto(request):
+    return Response(b"\xff\xd8" * 1000, media_type="image/jpeg")
+
+
+def _streaming(request):
+    return StreamingResponse(iter([b"a" * 600, b"b" * 600]), media_type="text/plain")
+
+
+def _error(request):
+    return PlainTextResponse("no", status_code=404)
+
+
+@pytest.fixture
+def cliente():
+    app = Starlette(routes=[
+        Route("/json", _json),
+        Route("/json", _json, methods=["POST"], name="json_post"),
+        Route("/pequena", _pequena),
+        Route("/validadores", _con_validadores),
+        Route("/foto", _foto),
+        Route("/streaming", _streaming),
+        Route("/error", _error),
+    ])
+    app.add_middleware(RespuestasCondicionales, minimo=500)
+    return TestClient(app)
+
+
+def test_etag_y_304(cliente):
+    respuesta = cliente.get("/json", headers={"Accept-Encoding": "identity"})
+    etag = respuesta.headers["etag"]
+    assert etag.startswith('W/"')
+    assert respuesta.json() == DATOS
+    assert "Accept-Encoding" in respuesta.headers["vary"]
+
+    no_modificada = cliente.get("/json", headers={"If-None-Match": etag})
+    assert no_modificada.status_code == 304
+    assert no_modificada.content == b""
+    assert no_modificada.headers["etag"] == etag
+    assert "content-type" not in no_modificada.headers
+
+
+def test_etag_fuerte_o_debil_coincide(cliente):
+    etag = cliente.get("/json").headers["etag"]
+    assert cliente.get("/json", headers={"If-None-Match": etag[2:]}).status_code == 304
+    assert cliente.get("/json", headers={"If-None-Match": f'"otro", {etag}'}).status_code == 304
+    assert cliente.get("/json", headers={"If-None-Match": "*"}).status_code == 304
+    assert cliente.get("/json", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_respeta_el_etag_y_last_modified_de_la_ruta(cliente):
+    respuesta = cliente.get("/validadores")
+    assert respuesta.headers["etag"] == '"propio"'
+    assert cliente.get("/validadores", headers={"If-Modified-Since": ULTIMA_MODIFICACION}).status_code == 304
+    assert cliente.get("/validadores", headers={"If-Modified-Since": "Sun, 31 Dec 2023 00:00:00 GMT"}).status_code == 200
+    # If-None-Match tiene prioridad sobre If-Modified-Since
+    encabezados = {"If-None-Match": '"otro"', "If-Modified-Since": ULTIMA_MODIFICACION}
+    assert cliente.get("/validadores", headers=encabezados).status_code == 200
+
+
+def test_compresion_gzip(cliente):
+    respuesta = cliente.get("/json", headers={"Accept-Encoding": "gzip"})
+    assert respuesta.headers["content-encoding"] == "gzip"
+    # httpx descomprime el cuerpo; content-length es el tamaño comprimido
+    assert int(respuesta.headers["content-length"]) < len(respuesta.content)
+    assert respuesta.json() == DATOS
+
+
+def test_el_etag_no_depende_de_la_codificacion(cliente):
+    gzip_etag = cliente.get("/json", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    identidad_etag = cliente.get("/json", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    assert gzip_etag == identidad_etag
+
+
+def test_cuerpos_pequenos_no_se_comprimen(cliente):
+    respuesta = cliente.get("/pequena", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in respuesta.headers
+    assert "etag" in respuesta.headers
+
+
+@pytest.mark.parametrize("ruta", ["/foto", "/streaming", "/error"])
+def test_pasan_sin_cambios(cliente, ruta):
+    respuesta = cliente.get(ruta, headers={"Accept-Encoding": "gzip"})
+    assert "etag" not in respuesta.headers
+    assert "content-encoding" not in respuesta.headers
+
+
+def test_otros_metodos_pasan_sin_cambios(cliente):
+    respuesta = cliente.post("/json", headers={"Accept-Encoding": "gzip"})
+    assert "etag" not in respuesta.headers
+    assert respuesta.json() == DATOS
+
+
+def test_elegir_codificacion(monkeypatch):
+    monkeypatch.setattr(respuestas_http, "brotli", None)
+    assert elegir_codificacion("gzip, deflate") == "gzip"
+    assert elegir_codificacion("br, gzip;q=0") is None
+    assert elegir_codificacion("*") == "gzip"
+    assert elegir_codificacion("*, gzip;q=0") is None
+    assert elegir_codificacion("identity") is None
+    assert elegir_codificacion("") is None
+
+
+def test_elegir_brotli_si_esta_instalado(monkeypatch):
+    monkeypatch.setattr(respuestas_http, "brotli", object())
+    assert elegir_codificacion("gzip, br") == "br"
+    assert elegir_codificacion("gzip, br;q=0") == "gzip"
+
+
+def test_no_modificado_con_fecha_invalida():
+    solicitud = Headers({"if-modified-since": "ayer"})
+    assert not no_modificado(solicitud, 'W/"x"', ULTIMA_MODIFICACION)
+
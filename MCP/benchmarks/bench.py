@@ -0,0 +1,323 @@
+"""
+Benchmark de las herramientas MCP de iNaturalist y de la API REST
+
+Levanta el servidor simulado de iNaturalist (`mock_inaturalist.py`), apunta
+el servidor MCP y la API hacia él y ejecuta cada escenario con la
+concurrencia indicada. Reporta latencias p50/p95/p99, throughput y memoria, y
+guarda los resultados en JSON para comparar corridas.
+
+Uso:
+    python bench.py --solicitudes 200 --concurrencia 8
+    python bench.py --solo mcp --variar --comparar resultados/bench-anterior.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from random import Random
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+DIR_BENCH = Path(__file__).resolve().parent
+DIR_SERVIDOR = DIR_BENCH.parent / "mcp-server-inaturalist"
+DIR_API = DIR_BENCH.parent / "API"
+
+# Herramienta MCP -> argumentos
+ESCENARIOS_MCP: Dict[str, Dict[str, Any]] = {
+    "buscar_observaciones": {"per_page": 50},
+    "buscar_especies": {"nombre": "especie"},
+    "buscar_especies_lote": {
+        "nombres": [f"Especie común {i}" for i in range(1, 11)],
+        "ids": list(range(10011, 10051)),
+    },
+    "obtener_lugares": {},
+    "estadisticas_biodiversidad": {},
+    "analizar_biodiversidad": {"max_observaciones": 1000},
+    "observaciones_por_usuario": {"username": "usuario1"},
+}
+
+# Nombre -> ruta de la API REST
+ESCENARIOS_API: Dict[str, str] = {
+    "api_observacion_aleatoria": "/observaciones/aleatoria",
+}
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def rss_max_kb() -> int:
+    """Memoria residente máxima del proceso en KB"""
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo // 1024 if sys.platform == "darwin" else maximo
+
+
+async def ejecutar_escenario(
+    nombre: str,
+    tipo: str,
+    llamar: Callable[[int], Awaitable[bool]],
+    solicitudes: int,
+    concurrencia: int,
+    calentamiento: int,
+    medir_memoria: bool,
+) -> Dict[str, Any]:
+    """
+    Ejecuta `solicitudes` llamadas con `concurrencia` simultáneas.
+    `llamar(i)` retorna True si la llamada fue exitosa.
+    """
+    for i in range(calentamiento):
+        await llamar(-1 - i)
+
+    latencias: List[float] = []
+    errores = 0
+    siguiente = iter(range(solicitudes))
+
+    async def trabajador():
+        nonlocal errores
+        for i in siguiente:
+            inicio = time.perf_counter()
+            try:
+                exito = await llamar(i)
+            except Exception:
+                exito = False
+            latencias.append(time.perf_counter() - inicio)
+            errores += 0 if exito else 1
+
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    pico_kb = None
+    if medir_memoria:
+        pico_kb = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+    def ms(valor: Optional[float]) -> Optional[float]:
+        return round(valor * 1000, 2) if valor is not None else None
+
+    return {
+        "nombre": nombre,
+        "tipo": tipo,
+        "solicitudes": solicitudes,
+        "concurrencia": concurrencia,
+        "errores": errores,
+        "p50_ms": ms(percentil(latencias, 50)),
+        "p95_ms": ms(percentil(latencias, 95)),
+        "p99_ms": ms(percentil(latencias, 99)),
+        "media_ms": ms(sum(latencias) / len(latencias)) if latencias else None,
+        "rps": round(solicitudes / duracion, 2) if duracion else None,
+        "memoria_pico_kb": pico_kb,
+    }
+
+
+def variar_area(argumentos: Dict[str, Any], i: int, activo: bool) -> Dict[str, Any]:
+    """Desplaza levemente el centro para que cada llamada sea una consulta distinta"""
+    if not activo:
+        return dict(argumentos)
+    rnd = Random(i)
+    return {
+        **argumentos,
+        "lat": round(4.7519 + rnd.uniform(-0.01, 0.01), 5),
+        "lng": round(-74.0841 + rnd.uniform(-0.01, 0.01), 5),
+    }
+
+
+def es_error_mcp(resultado: Any) -> bool:
+    """Las herramientas reportan errores como {"error": ...} dentro del resultado"""
+    if isinstance(resultado, tuple):  # (contenido, resultado estructurado)
+        resultado = resultado[1] if isinstance(resultado[1], dict) else resultado[0]
+    if isinstance(resultado, dict):
+        return "error" in resultado or "error" in resultado.get("result", {})
+    texto = "".join(getattr(bloque, "text", "") for bloque in resultado or [])
+    try:
+        return "error" in json.loads(texto)
+    except (ValueError, TypeError):
+        return False
+
+
+async def escenarios_mcp(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Ejecuta las herramientas en el mismo proceso, a través de FastMCP.call_tool"""
+    sys.path.insert(0, str(DIR_SERVIDOR))
+    import server
+    from cliente import cliente_abierto
+
+    resultados = []
+    async with cliente_abierto():
+        for nombre, argumentos in ESCENARIOS_MCP.items():
+            if args.escenarios and nombre not in args.escenarios:
+                continue
+
+            async def llamar(i: int, nombre=nombre, argumentos=argumentos) -> bool:
+                resultado = await server.mcp.call_tool(nombre, variar_area(argumentos, i, args.variar))
+                return not es_error_mcp(resultado)
+
+            resultado = await ejecutar_escenario(
+                nombre, "mcp", llamar, args.solicitudes, args.concurrencia, args.calentamiento, args.memoria
+            )
+            resultados.append(resultado)
+            imprimir_fila(resultado)
+    return resultados
+
+
+async def escenarios_api(args: argparse.Namespace, entorno: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Levanta la API con uvicorn en un subproceso y la consulta por HTTP"""
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.puerto_api), "--log-level", "warning"],
+        cwd=DIR_API,
+        env=entorno,
+    )
+    resultados = []
+    try:
+        url = f"http://127.0.0.1:{args.puerto_api}"
+        await esperar_disponible(f"{url}/health")
+        async with httpx.AsyncClient(base_url=url, timeout=60.0) as cliente:
+            for nombre, ruta in ESCENARIOS_API.items():
+                if args.escenarios and nombre not in args.escenarios:
+                    continue
+
+                async def llamar(i: int, ruta=ruta) -> bool:
+                    response = await cliente.get(ruta)
+                    return response.status_code == 200
+
+                resultado = await ejecutar_escenario(
+                    nombre, "api", llamar, args.solicitudes, args.concurrencia, args.calentamiento, False
+                )
+                resultados.append(resultado)
+                imprimir_fila(resultado)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+    return resultados
+
+
+async def esperar_disponible(url: str, timeout: float = 20.0) -> None:
+    limite = time.monotonic() + timeout
+    async with httpx.AsyncClient() as cliente:
+        while True:
+            try:
+                if (await cliente.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > limite:
+                raise RuntimeError(f"{url} no respondió en {timeout} s")
+            await asyncio.sleep(0.2)
+
+
+def imprimir_fila(r: Dict[str, Any]) -> None:
+    print(
+        f"{r['nombre']:<32} p50={r['p50_ms']:>8} ms  p95={r['p95_ms']:>8} ms  "
+        f"p99={r['p99_ms']:>8} ms  {r['rps']:>8} req/s  errores={r['errores']}"
+        + (f"  memoria_pico={r['memoria_pico_kb']} KB" if r.get("memoria_pico_kb") is not None else "")
+    )
+
+
+def comparar(actual: Dict[str, Any], ruta_base: Path) -> None:
+    """Imprime la variación de cada escenario respecto a una corrida anterior"""
+    base = {e["nombre"]: e for e in json.loads(ruta_base.read_text())["escenarios"]}
+    print(f"\nComparación con {ruta_base}:")
+    for e in actual["escenarios"]:
+        anterior = base.get(e["nombre"])
+        if anterior is None:
+            continue
+        cambios = []
+        for metrica in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            if e[metrica] and anterior[metrica]:
+                cambios.append(f"{metrica} {100 * (e[metrica] - anterior[metrica]) / anterior[metrica]:+.1f}%")
+        print(f"  {e['nombre']:<32} {'  '.join(cambios)}")
+
+
+def commit_actual() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=DIR_BENCH, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parsear_argumentos(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de las herramientas de iNaturalist")
+    parser.add_argument("--solicitudes", type=int, default=200, help="Llamadas por escenario")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Llamadas simultáneas")
+    parser.add_argument("--calentamiento", type=int, default=5, help="Llamadas previas que no se miden")
+    parser.add_argument("--solo", choices=["mcp", "api"], help="Ejecutar sólo un grupo de escenarios")
+    parser.add_argument("--escenarios", nargs="*", help="Nombres de escenarios a ejecutar (default: todos)")
+    parser.add_argument("--variar", action="store_true", help="Variar el área en cada llamada (evita la caché)")
+    parser.add_argument("--sin-cache", action="store_true", help="Deshabilitar la caché de respuestas")
+    parser.add_argument("--memoria", action="store_true", help="Medir el pico de memoria con tracemalloc (más lento)")
+    parser.add_argument("--tasa", type=float, default=1000.0, help="Tasa del limitador (solicitudes/s)")
+    parser.add_argument("--puerto-mock", type=int, default=9100)
+    parser.add_argument("--puerto-api", type=int, default=9200)
+    parser.add_argument("--salida", type=Path, default=DIR_BENCH / "resultados")
+    parser.add_argument("--comparar", type=Path, help="Resultados anteriores para comparar")
+    parser.add_argument("mock_args", nargs=argparse.REMAINDER,
+                        help="Argumentos para el servidor simulado después de --, ej: -- --latencia 0.1 --tasa-error 0.01")
+    return parser.parse_args(argv)
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    mock_args = [a for a in args.mock_args if a != "--"]
+    mock = subprocess.Popen(
+        [sys.executable, str(DIR_BENCH / "mock_inaturalist.py"), "--puerto", str(args.puerto_mock), *mock_args]
+    )
+    entorno = {
+        **os.environ,
+        "INATURALIST_BASE_URL": f"http://127.0.0.1:{args.puerto_mock}/v1",
+        "INATURALIST_LIMITE_TASA": str(args.tasa),
+        "INATURALIST_LIMITE_RAFAGA": str(max(1, int(args.tasa))),
+        "INATURALIST_LIMITE_CONCURRENCIA": str(args.concurrencia),
+        "INATURALIST_LIMITE_CONCURRENCIA_MAX": str(max(10, args.concurrencia * 2)),
+    }
+    if args.sin_cache:
+        entorno["INATURALIST_CACHE"] = "0"
+    os.environ.update(entorno)
+
+    escenarios = []
+    try:
+        await esperar_disponible(f"http://127.0.0.1:{args.puerto_mock}/estado")
+        if args.solo in (None, "mcp"):
+            escenarios += await escenarios_mcp(args)
+        if args.solo in (None, "api"):
+            escenarios += await escenarios_api(args, entorno)
+    finally:
+        mock.terminate()
+        mock.wait(timeout=10)
+
+    return {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit_actual(),
+        "python": sys.version.split()[0],
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "rss_max_kb": rss_max_kb(),
+        "escenarios": escenarios,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parsear_argumentos(argv)
+    resultado = asyncio.run(main_async(args))
+
+    args.salida.mkdir(parents=True, exist_ok=True)
+    ruta = args.salida / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    ruta.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nResultados guardados en {ruta}")
+
+    if args.comparar:
+        comparar(resultado, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
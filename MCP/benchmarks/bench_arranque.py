@@ -0,0 +1,132 @@
+"""
+Benchmark de arranque en frío vs servidor MCP persistente
+
+Compara el costo por sesión de un agente que se conecta al servidor MCP de
+iNaturalist:
+
+- stdio: cada sesión lanza un proceso nuevo (como StdioConnectionParams),
+  que importa `mcp`/`httpx`, abre conexiones y arranca con la caché vacía
+- streamable-http: un único proceso (`main.py --transporte streamable-http`)
+  atiende todas las sesiones con el cliente HTTP y la caché ya calientes
+
+Por sesión mide el tiempo hasta tener la sesión inicializada, la primera
+llamada a una herramienta y una segunda llamada. Usa el servidor simulado de
+iNaturalist para no depender de la red.
+
+Uso:
+    python bench_arranque.py --sesiones 10
+    python bench_arranque.py --uv  # lanza stdio con `uv run`, como el agente
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, AsyncContextManager, Callable, Dict, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from bench import DIR_BENCH, DIR_SERVIDOR, es_error_mcp, esperar_disponible
+
+HERRAMIENTA = "buscar_observaciones"
+ARGUMENTOS = {"per_page": 20}
+
+
+async def medir_sesion(abrir: Callable[[], AsyncContextManager]) -> Dict[str, float]:
+    """Abre una sesión MCP, la inicializa y llama dos veces a la herramienta"""
+    inicio = time.perf_counter()
+    async with abrir() as transporte:
+        lectura, escritura = transporte[0], transporte[1]
+        async with ClientSession(lectura, escritura) as sesion:
+            await sesion.initialize()
+            inicializada = time.perf_counter()
+            resultado = await sesion.call_tool(HERRAMIENTA, ARGUMENTOS)
+            primera = time.perf_counter()
+            await sesion.call_tool(HERRAMIENTA, ARGUMENTOS)
+            segunda = time.perf_counter()
+    if resultado.isError or es_error_mcp(resultado.content):
+        raise RuntimeError(f"{HERRAMIENTA} retornó un error: {resultado.content}")
+    return {
+        "sesion_ms": (inicializada - inicio) * 1000,
+        "primera_llamada_ms": (primera - inicializada) * 1000,
+        "segunda_llamada_ms": (segunda - primera) * 1000,
+        "total_ms": (segunda - inicio) * 1000,
+    }
+
+
+async def medir_modo(nombre: str, abrir: Callable[[], AsyncContextManager], sesiones: int) -> Dict[str, Any]:
+    mediciones: List[Dict[str, float]] = []
+    for _ in range(sesiones):
+        mediciones.append(await medir_sesion(abrir))
+    resumen = {
+        clave: round(statistics.median(m[clave] for m in mediciones), 1)
+        for clave in mediciones[0]
+    }
+    print(f"{nombre:<18} " + "  ".join(f"{clave}={valor:>8}" for clave, valor in resumen.items()))
+    return resumen
+
+
+def esperar_puerto(puerto: int, timeout: float = 30.0) -> None:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", puerto)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"El puerto {puerto} no respondió en {timeout} s")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    mock = subprocess.Popen(
+        [sys.executable, str(DIR_BENCH / "mock_inaturalist.py"), "--puerto", str(args.puerto_mock)]
+    )
+    entorno = {
+        **os.environ,
+        "INATURALIST_BASE_URL": f"http://127.0.0.1:{args.puerto_mock}/v1",
+        "INATURALIST_LIMITE_TASA": "1000",
+        "INATURALIST_LIMITE_RAFAGA": "1000",
+    }
+    http = None
+    try:
+        await esperar_disponible(f"http://127.0.0.1:{args.puerto_mock}/estado")
+        print(f"{args.sesiones} sesiones por modo, herramienta {HERRAMIENTA} (medianas en ms)\n")
+
+        if args.uv:
+            comando, argumentos = "uv", ["run", "--directory", str(DIR_SERVIDOR), "python", "-m", "main"]
+        else:
+            comando, argumentos = sys.executable, ["main.py"]
+        parametros = StdioServerParameters(command=comando, args=argumentos, cwd=str(DIR_SERVIDOR), env=entorno)
+        await medir_modo("stdio (frío)", lambda: stdio_client(parametros), args.sesiones)
+
+        http = subprocess.Popen(
+            [sys.executable, "main.py", "--transporte", "streamable-http", "--puerto", str(args.puerto_mcp)],
+            cwd=DIR_SERVIDOR,
+            env=entorno,
+        )
+        esperar_puerto(args.puerto_mcp)
+        url = f"http://127.0.0.1:{args.puerto_mcp}/mcp"
+        await medir_modo("http (persistente)", lambda: streamablehttp_client(url), args.sesiones)
+    finally:
+        for proceso in (http, mock):
+            if proceso is not None:
+                proceso.terminate()
+                proceso.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Arranque en frío (stdio) vs servidor MCP persistente (HTTP)")
+    parser.add_argument("--sesiones", type=int, default=10, help="Sesiones por modo")
+    parser.add_argument("--uv", action="store_true", help="Lanzar stdio con `uv run` (incluye resolver el entorno)")
+    parser.add_argument("--puerto-mock", type=int, default=9100)
+    parser.add_argument("--puerto-mcp", type=int, default=9300)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de la decodificación de páginas de observaciones
+
+Compara, sobre una página sintética de iNaturalist (`per_page=200` por
+defecto), la decodificación completa a diccionarios seguida del armado del
+resultado con la decodificación proyectada a registros `Observacion`
+(`inaturalist_comun.decodificacion`). Mide por llamada:
+
+- Tiempo (mediana de varias repeticiones)
+- Pico de memoria durante la decodificación y el armado (tracemalloc)
+- Memoria que queda retenida si el valor decodificado se guarda en la caché
+
+Uso:
+    python bench_decodificacion.py --por-pagina 200 --repeticiones 50
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+from inaturalist_comun import Observacion, decodificar_pagina
+from inaturalist_comun import decodificacion
+
+from mock_inaturalist import generar_datos
+
+
+def resumir_dict(obs: dict) -> dict:
+    """Armado del resultado a partir del JSON completo (como antes de la proyección)"""
+    return {
+        "id": obs.get("id"),
+        "especie": obs.get("species_guess", "No identificado"),
+        "nombre_cientifico": obs.get("taxon", {}).get("name"),
+        "fecha_observacion": obs.get("observed_on_string"),
+        "lugar": obs.get("place_guess"),
+        "usuario": obs.get("user", {}).get("login"),
+        "foto_url": obs.get("photos", [{}])[0].get("url") if obs.get("photos") else None,
+        "url": f"https://www.inaturalist.org/observations/{obs.get('id')}"
+    }
+
+
+def resumir_registro(obs: Observacion) -> dict:
+    return {
+        "id": obs.id,
+        "especie": obs.especie or "No identificado",
+        "nombre_cientifico": obs.taxon_nombre,
+        "fecha_observacion": obs.observada_texto,
+        "lugar": obs.lugar,
+        "usuario": obs.usuario_login,
+        "foto_url": obs.foto_url,
+        "url": f"https://www.inaturalist.org/observations/{obs.id}"
+    }
+
+
+def completo(contenido: bytes) -> Tuple[Any, list]:
+    datos = json.loads(contenido)
+    return datos, [resumir_dict(obs) for obs in datos.get("results", [])]
+
+
+def proyectado(contenido: bytes) -> Tuple[Any, list]:
+    pagina = decodificar_pagina(contenido, Observacion)
+    return pagina, [resumir_registro(obs) for obs in pagina.resultados]
+
+
+def medir(funcion: Callable[[bytes], Tuple[Any, list]], contenido: bytes, repeticiones: int) -> Dict[str, float]:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(contenido)
+        tiempos.append(time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    valor = funcion(contenido)[0]
+    gc.collect()
+    retenido, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del valor
+
+    return {
+        "ms": statistics.median(tiempos) * 1000,
+        "pico_kb": (pico - base) / 1024,
+        "retenido_kb": (retenido - base) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Decodificación completa vs proyectada")
+    parser.add_argument("--por-pagina", type=int, default=200)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    datos = generar_datos(args.por_pagina, 300)
+    pagina = {"total_results": args.por_pagina, "page": 1, "per_page": args.por_pagina,
+              "results": datos["observations"]}
+    contenido = json.dumps(pagina, ensure_ascii=False).encode("utf-8")
+
+    decodificador = "orjson" if decodificacion.orjson is not None else "json"
+    print(f"Página de {args.por_pagina} observaciones, {len(contenido) / 1024:.0f} KB "
+          f"(decodificador proyectado: {decodificador})\n")
+
+    resultados = {
+        "completo (json + dicts)": medir(completo, contenido, args.repeticiones),
+        "proyectado (registros)": medir(proyectado, contenido, args.repeticiones),
+    }
+    print(f"{'variante':<26} {'ms/llamada':>11} {'pico KB':>9} {'retenido KB':>12}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<26} {r['ms']:>11.2f} {r['pico_kb']:>9.0f} {r['retenido_kb']:>12.0f}")
+
+    base, nuevo = resultados.values()
+    print(f"\nTiempo: {1 - nuevo['ms'] / base['ms']:.0%} menos | "
+          f"pico: {1 - nuevo['pico_kb'] / base['pico_kb']:.0%} menos | "
+          f"retenido en caché: {1 - nuevo['retenido_kb'] / base['retenido_kb']:.0%} menos")
+
+
+if __name__ == "__main__":
+    main()
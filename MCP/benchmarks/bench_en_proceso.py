@@ -0,0 +1,172 @@
+"""
+Benchmark del costo por llamada de cada forma de conectar el agente
+
+Compara, para las mismas herramientas y con el servidor simulado de
+iNaturalist, el costo de una llamada a una herramienta según cómo la invoca
+el agente:
+
+- proceso: `en_proceso.ejecutar`, la herramienta corre en el proceso del
+  agente (INATURALIST_MCP_MODO=proceso); llama a `FastMCP.call_tool` y
+  decodifica el contenido MCP de vuelta al dict
+- fastmcp: `FastMCP.call_tool` en el mismo proceso, sin decodificar el
+  resultado (JSON como texto) ni transporte
+- stdio: una sesión MCP con el servidor como proceso hijo (el modo por
+  defecto del agente); agrega JSON-RPC por stdin/stdout
+- http (con --http): una sesión con el servidor en modo streamable-http
+
+Cada modo abre su sesión una sola vez y hace una llamada de calentamiento,
+así que con la caché habilitada se mide sobre todo el costo de la llamada en
+sí y no el de iNaturalist. Con `--sin-cache` cada llamada consulta al
+simulador.
+
+Uso:
+    python bench_en_proceso.py --llamadas 200
+    python bench_en_proceso.py --herramientas buscar_observaciones --http
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from bench import DIR_BENCH, DIR_SERVIDOR, ESCENARIOS_MCP, es_error_mcp, esperar_disponible, percentil
+from bench_arranque import esperar_puerto
+
+MODOS = ("proceso", "fastmcp", "stdio", "http")
+
+
+async def medir_llamadas(llamar: Callable[[str, Dict[str, Any]], Awaitable[Any]], herramienta: str, llamadas: int) -> Dict[str, float]:
+    """Una llamada de calentamiento y luego `llamadas` seguidas; latencias en ms"""
+    argumentos = ESCENARIOS_MCP[herramienta]
+    resultado = await llamar(herramienta, argumentos)
+    if es_error_mcp(resultado):
+        raise RuntimeError(f"{herramienta} retornó un error: {resultado}")
+    tiempos = []
+    for _ in range(llamadas):
+        inicio = time.perf_counter()
+        await llamar(herramienta, argumentos)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(percentil(tiempos, 95), 3),
+        "media_ms": round(statistics.fmean(tiempos), 3),
+    }
+
+
+async def llamar_sesion(sesion: ClientSession) -> Callable[[str, Dict[str, Any]], Awaitable[Any]]:
+    await sesion.initialize()
+
+    async def llamar(herramienta: str, argumentos: Dict[str, Any]) -> Any:
+        resultado = await sesion.call_tool(herramienta, argumentos)
+        return {"error": resultado.content} if resultado.isError else resultado.content
+
+    return llamar
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    mock = subprocess.Popen(
+        [sys.executable, str(DIR_BENCH / "mock_inaturalist.py"), "--puerto", str(args.puerto_mock)]
+    )
+    entorno = {
+        "INATURALIST_BASE_URL": f"http://127.0.0.1:{args.puerto_mock}/v1",
+        "INATURALIST_LIMITE_TASA": "1000",
+        "INATURALIST_LIMITE_RAFAGA": "1000",
+    }
+    if args.sin_cache:
+        entorno["INATURALIST_CACHE"] = "0"
+    os.environ.update(entorno)
+    sys.path.insert(0, str(DIR_SERVIDOR))
+
+    http = None
+    filas = []
+    try:
+        await esperar_disponible(f"http://127.0.0.1:{args.puerto_mock}/estado")
+        import en_proceso
+        import server
+
+        async def llamar_fastmcp(herramienta: str, argumentos: Dict[str, Any]) -> Any:
+            return await server.mcp.call_tool(herramienta, argumentos)
+
+        async with AsyncExitStack() as pila:
+            await pila.enter_async_context(en_proceso.abierto())
+            llamadores = {"proceso": en_proceso.ejecutar, "fastmcp": llamar_fastmcp}
+
+            parametros = StdioServerParameters(
+                command=sys.executable, args=["main.py"], cwd=str(DIR_SERVIDOR), env={**os.environ}
+            )
+            lectura, escritura = await pila.enter_async_context(stdio_client(parametros))
+            sesion = await pila.enter_async_context(ClientSession(lectura, escritura))
+            llamadores["stdio"] = await llamar_sesion(sesion)
+
+            if args.http:
+                http = subprocess.Popen(
+                    [sys.executable, "main.py", "--transporte", "streamable-http", "--puerto", str(args.puerto_mcp)],
+                    cwd=DIR_SERVIDOR,
+                    env={**os.environ},
+                )
+                esperar_puerto(args.puerto_mcp)
+                transporte = await pila.enter_async_context(streamablehttp_client(f"http://127.0.0.1:{args.puerto_mcp}/mcp"))
+                sesion_http = await pila.enter_async_context(ClientSession(transporte[0], transporte[1]))
+                llamadores["http"] = await llamar_sesion(sesion_http)
+
+            for herramienta in args.herramientas:
+                resultado = await en_proceso.ejecutar(herramienta, ESCENARIOS_MCP[herramienta])
+                tamano = len(json.dumps(resultado, ensure_ascii=False, indent=2).encode("utf-8"))
+                base = None
+                for modo in MODOS:
+                    if modo not in llamadores:
+                        continue
+                    medida = await medir_llamadas(llamadores[modo], herramienta, args.llamadas)
+                    base = base or medida
+                    filas.append({
+                        "herramienta": herramienta,
+                        "modo": modo,
+                        "bytes_resultado": tamano,
+                        **medida,
+                        "sobrecosto_p50_ms": round(medida["p50_ms"] - base["p50_ms"], 3),
+                    })
+    finally:
+        for proceso in (http, mock):
+            if proceso is not None:
+                proceso.terminate()
+                proceso.wait(timeout=10)
+    return filas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Costo por llamada: en proceso vs FastMCP vs stdio vs HTTP")
+    parser.add_argument("--llamadas", type=int, default=200, help="Llamadas medidas por herramienta y modo")
+    parser.add_argument("--herramientas", nargs="+", default=["buscar_observaciones", "buscar_especies"],
+                        choices=sorted(ESCENARIOS_MCP))
+    parser.add_argument("--http", action="store_true", help="Medir también el modo streamable-http")
+    parser.add_argument("--sin-cache", action="store_true", help="Deshabilitar la caché de respuestas")
+    parser.add_argument("--json", action="store_true", help="Imprimir los resultados como JSON")
+    parser.add_argument("--puerto-mock", type=int, default=9100)
+    parser.add_argument("--puerto-mcp", type=int, default=9300)
+    args = parser.parse_args()
+
+    filas = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(filas, indent=2, ensure_ascii=False))
+        return
+    print(f"{args.llamadas} llamadas por modo (ms por llamada)")
+    print(f"{'herramienta':<22}{'modo':<9}{'bytes':>8}{'p50':>9}{'p95':>9}{'media':>9}{'+p50':>9}")
+    for f in filas:
+        print(
+            f"{f['herramienta']:<22}{f['modo']:<9}{f['bytes_resultado']:>8}{f['p50_ms']:>9.3f}"
+            f"{f['p95_ms']:>9.3f}{f['media_ms']:>9.3f}{f['sobrecosto_p50_ms']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
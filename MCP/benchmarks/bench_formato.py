@@ -0,0 +1,136 @@
+"""
+Benchmark del tamaño de los resultados de las herramientas según `formato`
+
+Arma, con datos sintéticos del servidor simulado, los resultados de
+`buscar_observaciones` y `buscar_especies` tal como los retorna el servidor
+MCP (módulo `formato.py`) en los formatos completo, compacto y resumen, y
+mide por formato y por tamaño de página:
+
+- Bytes del JSON que recibe el agente (indentado como lo serializa FastMCP)
+- Tokens (con `tiktoken` si está instalado; si no, una aproximación)
+- Bytes y tokens por resultado y la reducción frente al formato completo
+
+También verifica que la tabla compacta se expande a las mismas filas.
+
+Uso:
+    python bench_formato.py --por-pagina 10 50 200
+"""
+
+import argparse
+import importlib.util
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from inaturalist_comun import Observacion, Taxon
+
+from mock_inaturalist import generar_datos
+
+DIR_SERVIDOR = Path(__file__).resolve().parent.parent / "mcp-server-inaturalist"
+sys.path.insert(0, str(DIR_SERVIDOR))
+
+from formato import (  # noqa: E402
+    FORMATOS,
+    URL_OBSERVACION,
+    aplicar_formato,
+    contar_tokens,
+    expandir_tabla,
+    resumir_observacion,
+    resumir_taxon,
+)
+
+
+def resultado_observaciones(observaciones: List[dict], formato: str) -> Dict[str, Any]:
+    """Resultado de buscar_observaciones para las observaciones dadas"""
+    filas = [resumir_observacion(Observacion.desde_inaturalist(o)) for o in observaciones]
+    respuesta = {
+        "total": 5000,
+        "coordenadas": {"lat": 4.7519, "lng": -74.0841, "radius_km": 3.0},
+        "observaciones": filas,
+        "fuente": "live",
+    }
+    return aplicar_formato(
+        respuesta,
+        formato,
+        plantillas={"url": URL_OBSERVACION},
+        contar=("especie", "nombre_cientifico", "usuario", "lugar"),
+        rangos=("fecha_observacion", "fecha"),
+    )
+
+
+def resultado_especies(taxones: List[dict], formato: str) -> Dict[str, Any]:
+    """Resultado de buscar_especies para los taxones dados"""
+    respuesta = {
+        "total": 300,
+        "coordenadas": {"lat": 4.7519, "lng": -74.0841, "radius_km": 3.0},
+        "especies": [resumir_taxon(Taxon.desde_inaturalist(t)) for t in taxones],
+    }
+    return aplicar_formato(
+        respuesta, formato, contar=("rango", "estado_conservacion"), rangos=("observaciones_totales",)
+    )
+
+
+def medir(resultado: Dict[str, Any], indentar: bool) -> Dict[str, int]:
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2 if indentar else None)
+    return {"bytes": len(texto.encode("utf-8")), "tokens": contar_tokens(texto)}
+
+
+def verificar_compacto(armar: Callable[[List[dict], str], Dict[str, Any]], datos: List[dict], clave: str) -> None:
+    completo = armar(datos, "completo")[clave]
+    expandido = expandir_tabla(armar(datos, "compacto")[clave])
+    if expandido != completo:
+        raise AssertionError(f"La tabla compacta de '{clave}' no reproduce las filas originales")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Tamaño de los resultados de las herramientas por formato")
+    parser.add_argument("--por-pagina", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--sin-indentar", action="store_true", help="Medir el JSON sin indentación")
+    parser.add_argument("--json", action="store_true", help="Imprimir los resultados como JSON")
+    args = parser.parse_args(argv)
+
+    datos = generar_datos(max(args.por_pagina), 300)
+    casos = [
+        ("buscar_observaciones", resultado_observaciones, datos["observations"], "observaciones"),
+        ("buscar_especies", resultado_especies, datos["taxa"], "especies"),
+    ]
+
+    filas = []
+    for herramienta, armar, elementos, clave in casos:
+        for por_pagina in args.por_pagina:
+            muestra = elementos[:por_pagina]
+            verificar_compacto(armar, muestra, clave)
+            base = None
+            for formato in FORMATOS:
+                medida = medir(armar(muestra, formato), not args.sin_indentar)
+                base = base or medida
+                filas.append({
+                    "herramienta": herramienta,
+                    "por_pagina": len(muestra),
+                    "formato": formato,
+                    **medida,
+                    "bytes_por_resultado": round(medida["bytes"] / len(muestra), 1),
+                    "tokens_por_resultado": round(medida["tokens"] / len(muestra), 1),
+                    "reduccion_tokens": round(1 - medida["tokens"] / base["tokens"], 3),
+                })
+
+    if args.json:
+        print(json.dumps(filas, indent=2, ensure_ascii=False))
+        return
+
+    if importlib.util.find_spec("tiktoken") is not None:
+        tokenizador = "tiktoken cl100k_base"
+    else:
+        tokenizador = "aproximado (instala tiktoken para contar tokens reales)"
+    print(f"Tokens: {tokenizador}")
+    print(f"{'herramienta':<22}{'n':>5}  {'formato':<10}{'bytes':>9}{'tokens':>8}{'B/res':>8}{'tok/res':>9}{'ahorro':>8}")
+    for f in filas:
+        print(
+            f"{f['herramienta']:<22}{f['por_pagina']:>5}  {f['formato']:<10}{f['bytes']:>9}{f['tokens']:>8}"
+            f"{f['bytes_por_resultado']:>8}{f['tokens_por_resultado']:>9}{f['reduccion_tokens']:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
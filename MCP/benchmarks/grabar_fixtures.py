@@ -0,0 +1,58 @@
+"""
+Graba respuestas reales de iNaturalist como fixtures para el servidor simulado
+
+Descarga observaciones del Humedal la Conejera (varias páginas), los taxones
+que aparecen en ellas y los lugares cercanos, y los guarda en
+`fixtures/observations.json`, `fixtures/taxa.json` y `fixtures/places.json`.
+
+Uso:
+    python grabar_fixtures.py --paginas 10
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import httpx
+
+BASE_URL = "https://api.inaturalist.org/v1"
+AREA = {"lat": 4.7519, "lng": -74.0841, "radius": 3}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Graba fixtures desde la API de iNaturalist")
+    parser.add_argument("--paginas", type=int, default=10, help="Páginas de 200 observaciones")
+    parser.add_argument("--destino", type=Path, default=Path(__file__).parent / "fixtures")
+    args = parser.parse_args()
+    args.destino.mkdir(parents=True, exist_ok=True)
+
+    observaciones = []
+    with httpx.Client(base_url=BASE_URL, timeout=30.0) as cliente:
+        id_above = 0
+        for _ in range(args.paginas):
+            response = cliente.get("/observations", params={
+                **AREA, "per_page": 200, "order_by": "id", "order": "asc", "id_above": id_above
+            })
+            response.raise_for_status()
+            resultados = response.json()["results"]
+            if not resultados:
+                break
+            observaciones.extend(resultados)
+            id_above = resultados[-1]["id"]
+            time.sleep(1)  # respetar el límite de ~60 solicitudes por minuto
+
+        taxones = {o["taxon"]["id"]: o["taxon"] for o in observaciones if o.get("taxon")}
+
+        response = cliente.get("/places", params={**AREA, "radius": 5})
+        response.raise_for_status()
+        lugares = response.json()["results"]
+
+    for nombre, resultados in (("observations", observaciones), ("taxa", list(taxones.values())), ("places", lugares)):
+        ruta = args.destino / f"{nombre}.json"
+        ruta.write_text(json.dumps({"results": resultados}, ensure_ascii=False), encoding="utf-8")
+        print(f"{ruta}: {len(resultados)} resultados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Servidor local que imita los endpoints `/observations`, `/taxa` y `/places`
+de la API de iNaturalist para medir el rendimiento sin salir a la red.
+
+Sirve los fixtures grabados con `grabar_fixtures.py` si existen en el
+directorio indicado; si no, genera datos sintéticos deterministas alrededor
+del Humedal la Conejera. Permite inyectar latencia, respuestas lentas,
+errores 500 y 429 con Retry-After. Como iNaturalist, responde con ETag y
+retorna 304 a los GET condicionales con If-None-Match.
+
+Uso:
+    python mock_inaturalist.py --puerto 9100 --latencia 0.05 --tasa-error 0.01
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+CONEJERA_LAT = 4.7519
+CONEJERA_LNG = -74.0841
+ICONICOS = ["Aves", "Plantae", "Insecta", "Mammalia", "Amphibia", "Reptilia", "Fungi", "Arachnida"]
+
+
+def distancia_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * 6371.0088 * math.asin(min(1.0, math.sqrt(a)))
+
+
+def generar_datos(n_observaciones: int, n_taxones: int, semilla: int = 42) -> Dict[str, List[dict]]:
+    """Datos sintéticos con la forma de las respuestas de iNaturalist"""
+    rnd = random.Random(semilla)
+    taxones = []
+    for i in range(1, n_taxones + 1):
+        iconico = ICONICOS[i % len(ICONICOS)]
+        genero = f"Genero{i // 5}"
+        taxones.append({
+            "id": 10000 + i,
+            "name": f"{genero} especie{i}",
+            "preferred_common_name": f"Especie común {i}",
+            "rank": "species",
+            "iconic_taxon_name": iconico,
+            "ancestor_ids": [1, 100 + ICONICOS.index(iconico), 5000 + i // 5, 10000 + i],
+            "observations_count": rnd.randint(1, 5000),
+            "wikipedia_url": f"https://es.wikipedia.org/wiki/Especie_{i}",
+            "default_photo": {
+                "url": f"https://inaturalist-open-data.s3.amazonaws.com/photos/{i}/square.jpg",
+                "medium_url": f"https://inaturalist-open-data.s3.amazonaws.com/photos/{i}/medium.jpg",
+            },
+            "conservation_status": {"status": "LC"} if i % 7 == 0 else None,
+        })
+
+    usuarios = [{"id": i, "login": f"usuario{i}", "name": f"Usuario {i}"} for i in range(1, 201)]
+    observaciones = []
+    for i in range(1, n_observaciones + 1):
+        taxon = rnd.choice(taxones)
+        lat = CONEJERA_LAT + rnd.uniform(-0.04, 0.04)
+        lng = CONEJERA_LNG + rnd.uniform(-0.04, 0.04)
+        fecha = f"20{rnd.randint(15, 25):02d}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        observaciones.append({
+            "id": i,
+            "species_guess": taxon["preferred_common_name"],
+            "taxon": taxon,
+            "observed_on": fecha,
+            "observed_on_string": fecha,
+            "created_at": f"{fecha}T12:00:00-05:00",
+            "updated_at": f"{fecha}T12:00:00-05:00",
+            "place_guess": "Humedal la Conejera, Bogotá, Colombia",
+            "location": f"{lat:.6f},{lng:.6f}",
+            "quality_grade": rnd.choice(["research", "needs_id", "casual"]),
+            "user": rnd.choice(usuarios),
+            "photos": [{"id": i, "url": f"https://inaturalist-open-data.s3.amazonaws.com/photos/{i}/square.jpg"}],
+            # Campos que las herramientas no usan pero que la API real incluye
+            "identifications": [{"id": i * 10 + k, "body": None, "taxon": taxon} for k in range(rnd.randint(1, 4))],
+            "description": "x" * rnd.randint(0, 300),
+        })
+
+    lugares = [
+        {"id": 1, "display_name": "Humedal la Conejera", "place_type_name": "Open Space",
+         "bounding_box_geojson": None, "observations_count": n_observaciones, "lat": CONEJERA_LAT, "lng": CONEJERA_LNG},
+        {"id": 2, "display_name": "Bogotá", "place_type_name": "Town",
+         "bounding_box_geojson": None, "observations_count": 10 * n_observaciones, "lat": 4.65, "lng": -74.08},
+    ]
+    return {"observations": observaciones, "taxa": taxones, "places": lugares}
+
+
+def cargar_fixtures(directorio: Path) -> Optional[Dict[str, List[dict]]]:
+    """Fixtures grabados (observations.json, taxa.json, places.json) si existen"""
+    archivos = {nombre: directorio / f"{nombre}.json" for nombre in ("observations", "taxa", "places")}
+    if not all(ruta.exists() for ruta in archivos.values()):
+        return None
+    return {nombre: json.loads(ruta.read_text(encoding="utf-8"))["results"] for nombre, ruta in archivos.items()}
+
+
+def crear_app(datos: Dict[str, List[dict]], args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="iNaturalist simulado")
+    rnd = random.Random(args.semilla)
+    contadores = {"solicitudes": 0, "errores_500": 0, "respuestas_429": 0, "respuestas_304": 0}
+
+    async def simular_red() -> Optional[JSONResponse]:
+        contadores["solicitudes"] += 1
+        espera = args.latencia + rnd.uniform(0, args.jitter)
+        if rnd.random() < args.prob_lenta:
+            espera += args.latencia_lenta
+        await asyncio.sleep(espera)
+        if rnd.random() < args.tasa_429:
+            contadores["respuestas_429"] += 1
+            return JSONResponse({"error": "Too Many Requests"}, status_code=429, headers={"Retry-After": "1"})
+        if rnd.random() < args.tasa_error:
+            contadores["errores_500"] += 1
+            return JSONResponse({"error": "Internal Server Error"}, status_code=500)
+        return None
+
+    def paginar(resultados: List[dict], params) -> dict:
+        per_page = int(params.get("per_page", 30))
+        page = int(params.get("page", 1))
+        inicio = (page - 1) * per_page
+        return {
+            "total_results": len(resultados),
+            "page": page,
+            "per_page": per_page,
+            "results": resultados[inicio:inicio + per_page],
+        }
+
+    def responder(request: Request, contenido: dict) -> Response:
+        """JSON con ETag; 304 sin cuerpo si el cliente ya tiene esa versión"""
+        cuerpo = json.dumps(contenido, ensure_ascii=False).encode("utf-8")
+        etag = f'W/"{hashlib.md5(cuerpo).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            contadores["respuestas_304"] += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(cuerpo, media_type="application/json", headers={"ETag": etag})
+
+    def en_area(item: dict, params) -> bool:
+        if "location" in item:
+            lat, lng = (float(v) for v in item["location"].split(","))
+        else:
+            lat, lng = item.get("lat", CONEJERA_LAT), item.get("lng", CONEJERA_LNG)
+        if "swlat" in params:
+            return (float(params["swlat"]) <= lat <= float(params["nelat"])
+                    and float(params["swlng"]) <= lng <= float(params["nelng"]))
+        if "lat" not in params or "lng" not in params:
+            return True
+        return distancia_km(float(params["lat"]), float(params["lng"]), lat, lng) <= float(params.get("radius", 10))
+
+    @app.get("/v1/observations")
+    async def observations(request: Request):
+        if (error := await simular_red()) is not None:
+            return error
+        p = request.query_params
+        resultados = [o for o in datos["observations"] if en_area(o, p)]
+        if "taxon_name" in p:
+            nombre = p["taxon_name"].lower()
+            resultados = [o for o in resultados
+                          if nombre in (o["taxon"]["name"].lower(), o["taxon"]["iconic_taxon_name"].lower())]
+        if "taxon_id" in p:
+            ids = {int(v) for v in p["taxon_id"].split(",")}
+            resultados = [o for o in resultados if ids & set(o["taxon"]["ancestor_ids"])]
+        if "user_login" in p:
+            resultados = [o for o in resultados if o["user"]["login"] == p["user_login"]]
+        if "quality_grade" in p:
+            resultados = [o for o in resultados if o["quality_grade"] == p["quality_grade"]]
+        if "id_above" in p:
+            resultados = [o for o in resultados if o["id"] > int(p["id_above"])]
+        if "id_below" in p:
+            resultados = [o for o in resultados if o["id"] < int(p["id_below"])]
+        if p.get("order_by") == "id" and p.get("order") == "asc":
+            resultados.sort(key=lambda o: o["id"])
+        else:
+            resultados.sort(key=lambda o: o["id"], reverse=True)
+        return responder(request, paginar(resultados, p))
+
+    @app.get("/v1/taxa")
+    async def taxa(request: Request):
+        if (error := await simular_red()) is not None:
+            return error
+        p = request.query_params
+        resultados = datos["taxa"]
+        if "q" in p:
+            q = p["q"].lower()
+            resultados = [t for t in resultados
+                          if q in t["name"].lower() or q in (t.get("preferred_common_name") or "").lower()]
+        if "rank" in p:
+            resultados = [t for t in resultados if t.get("rank") == p["rank"]]
+        return responder(request, paginar(resultados, p))
+
+    @app.get("/v1/taxa/{ids}")
+    async def taxa_por_id(request: Request, ids: str):
+        if (error := await simular_red()) is not None:
+            return error
+        buscados = {int(v) for v in ids.split(",") if v.strip().isdigit()}
+        resultados = [t for t in datos["taxa"] if t["id"] in buscados]
+        return responder(
+            request, {"total_results": len(resultados), "page": 1, "per_page": len(resultados), "results": resultados}
+        )
+
+    @app.get("/v1/places")
+    async def places(request: Request):
+        if (error := await simular_red()) is not None:
+            return error
+        p = request.query_params
+        resultados = [l for l in datos["places"] if en_area(l, p)]
+        if "q" in p:
+            resultados = [l for l in resultados if p["q"].lower() in l["display_name"].lower()]
+        return responder(request, paginar(resultados, p))
+
+    @app.get("/estado")
+    async def estado():
+        return {"observaciones": len(datos["observations"]), **contadores}
+
+    return app
+
+
+def parsear_argumentos(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor simulado de la API de iNaturalist")
+    parser.add_argument("--puerto", type=int, default=9100)
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent / "fixtures",
+                        help="Directorio con observations.json, taxa.json y places.json grabados")
+    parser.add_argument("--observaciones", type=int, default=5000, help="Observaciones sintéticas si no hay fixtures")
+    parser.add_argument("--taxones", type=int, default=300, help="Taxones sintéticos si no hay fixtures")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latencia base por solicitud (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Variación aleatoria de la latencia (s)")
+    parser.add_argument("--prob-lenta", type=float, default=0.0, help="Probabilidad de una respuesta lenta")
+    parser.add_argument("--latencia-lenta", type=float, default=2.0, help="Latencia extra de una respuesta lenta (s)")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Probabilidad de responder 500")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Probabilidad de responder 429")
+    parser.add_argument("--semilla", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parsear_argumentos(argv)
+    datos = cargar_fixtures(args.fixtures) or generar_datos(args.observaciones, args.taxones, args.semilla)
+    uvicorn.run(crear_app(datos, args), host="127.0.0.1", port=args.puerto, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Perfil de arranque de los puntos de entrada
+
+Importa cada punto de entrada en un proceso nuevo con `python -X importtime`
+y reporta el tiempo total de importación, los módulos más costosos y el costo
+por paquete. Es lo que paga cada proceso nuevo antes de poder responder: un
+servidor stdio por sesión, una réplica más de la API o un worker de Reflex.
+
+| Punto de entrada | Módulo |
+|------------------|--------|
+| mcp-inaturalist  | mcp-server-inaturalist/server.py |
+| mcp-demo         | mcp-server-demo/server.py |
+| api              | API/main.py |
+| reflex           | REFLEX/prueba_reflex/prueba_reflex.py |
+
+Uso:
+    python perfil_arranque.py
+    python perfil_arranque.py --solo mcp-inaturalist api --top 20
+    python perfil_arranque.py --uv  # cada uno con su propio entorno (`uv run`)
+"""
+
+import argparse
+import json
+import sys
+
+from inaturalist_comun import perfilar_importacion, reporte_importaciones, resumir_importaciones
+
+from bench import DIR_API, DIR_BENCH, DIR_SERVIDOR
+
+PUNTOS_DE_ENTRADA = {
+    "mcp-inaturalist": (DIR_SERVIDOR, "server"),
+    "mcp-demo": (DIR_BENCH.parent / "mcp-server-demo", "server"),
+    "api": (DIR_API, "main"),
+    "reflex": (DIR_BENCH.parent.parent / "REFLEX", "prueba_reflex.prueba_reflex"),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tiempo de importación por módulo de cada punto de entrada")
+    parser.add_argument("--solo", nargs="+", choices=sorted(PUNTOS_DE_ENTRADA), help="Puntos de entrada a medir")
+    parser.add_argument("--top", type=int, default=15, help="Módulos y paquetes a mostrar")
+    parser.add_argument("--uv", action="store_true", help="Importar con `uv run` en el directorio de cada uno")
+    parser.add_argument("--json", help="Guardar los resúmenes en este archivo")
+    args = parser.parse_args()
+
+    resumenes = {}
+    for nombre in args.solo or PUNTOS_DE_ENTRADA:
+        directorio, modulo = PUNTOS_DE_ENTRADA[nombre]
+        interprete = ("uv", "run", "--directory", str(directorio), "python") if args.uv else (sys.executable,)
+        try:
+            importaciones = perfilar_importacion(modulo, directorio=str(directorio), interprete=interprete)
+        except RuntimeError as e:
+            print(f"{nombre}: {e}\n")
+            continue
+        resumenes[nombre] = resumir_importaciones(importaciones, top=args.top)
+        print(reporte_importaciones(nombre, resumenes[nombre]) + "\n")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resumenes, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Componentes compartidos por los servicios que consultan iNaturalist
+(servidor MCP y API REST)
+"""
+
+from .arranque import perfilar_importacion, reporte_importaciones, resumir_importaciones
+from .cache import (
+    BackendSQLite,
+    CacheRespuestas,
+    ConfigCache,
+    NoModificada,
+    Validada,
+    clave_consulta,
+    encabezados_condicionales,
+    recargar_antes,
+)
+from .coalescencia import ConsultasEnVuelo
+from .decodificacion import Lugar, Observacion, Pagina, Taxon, cargar_json, decodificar_pagina, leer_coordenadas
+from .entorno import leer_bool
+from .limitador import (
+    PRIORIDAD_ALTA,
+    PRIORIDAD_BAJA,
+    PRIORIDAD_NORMAL,
+    ConfigLimitador,
+    LimitadorTasa,
+    solicitar_con_limite,
+    usar_prioridad,
+)
+from .metricas import (
+    RegistroMetricas,
+    enviar_medido,
+    fase,
+    instrumentar_herramienta,
+    registro,
+    traza,
+    trazas_recientes,
+)
+from .nomenclator import Nomenclator, Sitio, nomenclator, normalizar_nombre
+from .politica import ConfigPolitica, PlazoAgotado, PoliticaSolicitudes, plazo, tiempo_restante
+from .precalentamiento import ConfigPrecalentamiento, Precalentador
+from .teselas import (
+    ConfigTeselas,
+    ConsultaTeselada,
+    ResultadoTeselas,
+    Tesela,
+    caja_envolvente,
+    distancia_km,
+    teselas_que_cubren,
+)
+
+__all__ = [
+    "PRIORIDAD_ALTA",
+    "PRIORIDAD_BAJA",
+    "PRIORIDAD_NORMAL",
+    "BackendSQLite",
+    "CacheRespuestas",
+    "ConfigCache",
+    "ConfigLimitador",
+    "ConfigPolitica",
+    "ConfigPrecalentamiento",
+    "ConfigTeselas",
+    "ConsultaTeselada",
+    "ConsultasEnVuelo",
+    "LimitadorTasa",
+    "Lugar",
+    "NoModificada",
+    "Nomenclator",
+    "Observacion",
+    "Pagina",
+    "PlazoAgotado",
+    "PoliticaSolicitudes",
+    "Precalentador",
+    "RegistroMetricas",
+    "ResultadoTeselas",
+    "Sitio",
+    "Taxon",
+    "Tesela",
+    "Validada",
+    "caja_envolvente",
+    "cargar_json",
+    "clave_consulta",
+    "decodificar_pagina",
+    "distancia_km",
+    "encabezados_condicionales",
+    "enviar_medido",
+    "fase",
+    "instrumentar_herramienta",
+    "leer_bool",
+    "leer_coordenadas",
+    "nomenclator",
+    "normalizar_nombre",
+    "perfilar_importacion",
+    "plazo",
+    "recargar_antes",
+    "registro",
+    "reporte_importaciones",
+    "resumir_importaciones",
+    "solicitar_con_limite",
+    "teselas_que_cubren",
+    "tiempo_restante",
+    "traza",
+    "trazas_recientes",
+    "usar_prioridad",
+]
@@ -0,0 +1,107 @@
+"""
+Perfil de arranque: cuánto tarda en importarse cada módulo
+
+Lanza un intérprete nuevo con `python -X importtime -c "import <módulo>"` y
+resume su salida, así el resultado no depende de lo que ya tenga importado el
+proceso que pregunta. Sirve para vigilar el tiempo hasta la primera respuesta
+cuando se lanzan procesos nuevos (un servidor stdio por sesión, réplicas de
+la API, workers de Reflex).
+
+- Tiempo total de importación del punto de entrada
+- Módulos más costosos, por tiempo acumulado (incluye sus dependencias) y
+  propio
+- Costo agregado por paquete de primer nivel (mcp, pydantic, numpy...)
+"""
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+
+@dataclass
+class ImportacionModulo:
+    modulo: str
+    propio_us: int
+    acumulado_us: int
+    nivel: int  # profundidad en el árbol de importaciones (0 = primer nivel)
+
+
+def analizar_importtime(salida: str) -> List[ImportacionModulo]:
+    """Convierte la salida de `-X importtime` (stderr) en registros"""
+    importaciones = []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:"):
+            continue
+        partes = linea[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue  # encabezado
+        nombre = partes[2].rstrip()
+        importaciones.append(ImportacionModulo(
+            modulo=nombre.strip(),
+            propio_us=int(partes[0]),
+            acumulado_us=int(partes[1]),
+            nivel=(len(nombre) - len(nombre.lstrip())) // 2,
+        ))
+    return importaciones
+
+
+def perfilar_importacion(
+    modulo: str,
+    directorio: Optional[str] = None,
+    entorno: Optional[Dict[str, str]] = None,
+    interprete: Sequence[str] = (sys.executable,),
+) -> List[ImportacionModulo]:
+    """
+    Importa `modulo` en un proceso nuevo y retorna el tiempo de cada importación.
+    `interprete` permite usar otro entorno, por ejemplo ("uv", "run", "python").
+    """
+    resultado = subprocess.run(
+        [*interprete, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=directorio,
+        env={**os.environ, **(entorno or {})},
+        capture_output=True,
+        text=True,
+    )
+    if resultado.returncode != 0:
+        ultima = resultado.stderr.strip().splitlines()[-1:] or ["sin detalle"]
+        raise RuntimeError(f"No se pudo importar {modulo}: {ultima[0]}")
+    return analizar_importtime(resultado.stderr)
+
+
+def resumir_importaciones(importaciones: List[ImportacionModulo], top: int = 15) -> Dict[str, object]:
+    """Total, módulos más costosos y costo por paquete de primer nivel"""
+    total_us = sum(i.acumulado_us for i in importaciones if i.nivel == 0)
+    por_paquete: Dict[str, int] = defaultdict(int)
+    for i in importaciones:
+        por_paquete[i.modulo.split(".")[0]] += i.propio_us
+
+    def ms(us: int) -> float:
+        return round(us / 1000, 1)
+
+    return {
+        "total_ms": ms(total_us),
+        "modulos": len(importaciones),
+        "mas_costosos": [
+            {"modulo": i.modulo, "acumulado_ms": ms(i.acumulado_us), "propio_ms": ms(i.propio_us)}
+            for i in sorted(importaciones, key=lambda i: i.acumulado_us, reverse=True)[:top]
+        ],
+        "por_paquete": {
+            paquete: ms(us)
+            for paquete, us in sorted(por_paquete.items(), key=lambda p: p[1], reverse=True)[:top]
+        },
+    }
+
+
+def reporte_importaciones(modulo: str, resumen: Dict[str, object]) -> str:
+    """Texto legible del resumen de `resumir_importaciones`"""
+    lineas = [f"{modulo}: {resumen['total_ms']} ms importando {resumen['modulos']} módulos", ""]
+    lineas.append(f"  {'acumulado':>10} {'propio':>8}  módulo")
+    for fila in resumen["mas_costosos"]:
+        lineas.append(f"  {fila['acumulado_ms']:>8} ms {fila['propio_ms']:>5} ms  {fila['modulo']}")
+    lineas += ["", "  por paquete:"]
+    for paquete, valor in resumen["por_paquete"].items():
+        lineas.append(f"  {valor:>8} ms  {paquete}")
+    return "\n".join(lineas)
@@ -0,0 +1,476 @@
+"""
+Caché de respuestas de iNaturalist con TTL, expulsión LRU y
+stale-while-revalidate
+
+Las entradas se identifican por el endpoint y los parámetros normalizados de
+la consulta. Una entrada pasa por tres estados:
+
+- fresca: se sirve directamente desde la caché
+- obsoleta: se sirve igual, pero se dispara un refresco en segundo plano
+  (con prioridad baja y sin el plazo de la herramienta que lo disparó)
+- vencida: se descarta y la consulta va a iNaturalist
+
+Si la función de carga retorna un `Validada` con el ETag o Last-Modified de
+la respuesta, al recargar la entrada se exponen con `encabezados_condicionales()`
+para hacer un GET condicional; si iNaturalist responde 304, la función lanza
+`NoModificada` y la caché conserva el valor que ya tenía renovando su TTL.
+
+Dentro de `recargar_antes(segundos)` (lo usa el precalentamiento) una entrada
+que vence en menos de `segundos`, o que ya está obsoleta, se recarga en el
+momento en lugar de servirse, así la entrada sigue fresca hasta la próxima
+ronda.
+
+Opcionalmente las entradas se escriben también en SQLite para que una caché
+caliente sobreviva a un reinicio del proceso.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from .decodificacion import a_json, desde_json
+from .entorno import leer_bool
+from .limitador import PRIORIDAD_BAJA, usar_prioridad
+from .politica import contexto_sin_plazo
+
+logger = logging.getLogger(__name__)
+
+# TTL en segundos por endpoint. Los conteos de observaciones cambian seguido;
+# la taxonomía y los lugares casi nunca.
+TTL_POR_ENDPOINT = {
+    "/observations": 300.0,
+    "/taxa": 3600.0,
+    "/places": 86400.0,
+}
+
+
+def _normalizar_valor(valor: Any) -> str:
+    """Representación estable de un parámetro para construir la clave"""
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if isinstance(valor, float):
+        # 4.8155 y 4.81550 deben producir la misma clave
+        return repr(round(valor, 6))
+    if isinstance(valor, (list, tuple, set)):
+        return ",".join(sorted(_normalizar_valor(v) for v in valor))
+    return str(valor).strip()
+
+
+def clave_consulta(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Construye la clave de caché de una consulta.
+    Ignora parámetros vacíos y el orden en que se pasaron.
+    """
+    partes = sorted(
+        (nombre, _normalizar_valor(valor))
+        for nombre, valor in (params or {}).items()
+        if valor is not None and valor != ""
+    )
+    consulta = "&".join(f"{nombre}={valor}" for nombre, valor in partes)
+    return f"{endpoint}?{consulta}"
+
+
+@dataclass
+class ConfigCache:
+    """Parámetros de la caché de respuestas"""
+    max_entradas: int = 1024
+    ttl_por_defecto: float = 300.0
+    ttl_por_endpoint: Dict[str, float] = field(default_factory=lambda: dict(TTL_POR_ENDPOINT))
+    max_obsoleto: float = 3600.0
+    ruta_sqlite: Optional[str] = None
+    habilitada: bool = True
+
+    @classmethod
+    def desde_entorno(cls, prefijo: str = "INATURALIST_CACHE") -> "ConfigCache":
+        """
+        Lee la configuración de variables de entorno:
+
+        - {prefijo}: "0" deshabilita la caché
+        - {prefijo}_MAX_ENTRADAS: Entradas en memoria antes de expulsar (default: 1024)
+        - {prefijo}_TTL: TTL por defecto en segundos (default: 300)
+        - {prefijo}_TTL_OBSERVATIONS / _TTL_TAXA / _TTL_PLACES: TTL por endpoint
+        - {prefijo}_MAX_OBSOLETO: Segundos que se sirve una entrada vencida mientras se refresca (default: 3600)
+        - {prefijo}_RUTA: Archivo SQLite para persistir la caché (opcional)
+        """
+        ttl_por_endpoint = dict(TTL_POR_ENDPOINT)
+        for endpoint in TTL_POR_ENDPOINT:
+            valor = os.getenv(f"{prefijo}_TTL_{endpoint.strip('/').upper()}")
+            if valor:
+                ttl_por_endpoint[endpoint] = float(valor)
+
+        return cls(
+            max_entradas=int(os.getenv(f"{prefijo}_MAX_ENTRADAS", "1024")),
+            ttl_por_defecto=float(os.getenv(f"{prefijo}_TTL", "300")),
+            ttl_por_endpoint=ttl_por_endpoint,
+            max_obsoleto=float(os.getenv(f"{prefijo}_MAX_OBSOLETO", "3600")),
+            ruta_sqlite=os.getenv(f"{prefijo}_RUTA") or None,
+            habilitada=leer_bool(prefijo, True),
+        )
+
+
+@dataclass
+class Entrada:
+    """Valor almacenado junto con sus marcas de tiempo (time.time()) y validadores HTTP"""
+    valor: Any
+    creada: float
+    expira: float
+    etag: Optional[str] = None
+    ultima_modificacion: Optional[str] = None
+
+
+@dataclass
+class Validada:
+    """Resultado de una función de carga junto con los validadores de la respuesta"""
+    valor: Any
+    etag: Optional[str] = None
+    ultima_modificacion: Optional[str] = None
+
+
+class NoModificada(Exception):
+    """iNaturalist respondió 304 a un GET condicional: el valor en caché sigue vigente"""
+
+
+# Entrada que se está recargando, visible para la función de carga
+_revalidando: ContextVar[Optional[Entrada]] = ContextVar("revalidando", default=None)
+
+
+# Margen de recarga anticipada dentro de `recargar_antes`
+_margen_recarga: ContextVar[float] = ContextVar("margen_recarga", default=0.0)
+
+
+@contextmanager
+def recargar_antes(segundos: float) -> Iterator[None]:
+    """
+    Dentro del bloque, las entradas que vencen en menos de `segundos` (o ya
+    obsoletas) se recargan antes de responder, con GET condicional si tienen
+    validadores.
+    """
+    token = _margen_recarga.set(segundos)
+    try:
+        yield
+    finally:
+        _margen_recarga.reset(token)
+
+
+def encabezados_condicionales() -> Dict[str, str]:
+    """
+    If-None-Match / If-Modified-Since para revalidar la entrada que la caché
+    está recargando. Vacío fuera de una recarga o si la entrada no tiene
+    validadores.
+    """
+    entrada = _revalidando.get()
+    if entrada is None:
+        return {}
+    encabezados = {}
+    if entrada.etag:
+        encabezados["If-None-Match"] = entrada.etag
+    if entrada.ultima_modificacion:
+        encabezados["If-Modified-Since"] = entrada.ultima_modificacion
+    return encabezados
+
+
+class BackendSQLite:
+    """
+    Almacenamiento persistente de entradas en un archivo SQLite.
+    Las operaciones son síncronas; la caché las ejecuta en un hilo aparte.
+    """
+
+    def __init__(self, ruta: str, max_entradas: int = 10000):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                creada REAL NOT NULL,
+                expira REAL NOT NULL,
+                usada REAL NOT NULL
+            )
+            """
+        )
+        # Archivos creados antes de guardar los validadores HTTP
+        columnas = {fila[1] for fila in self._conexion.execute("PRAGMA table_info(respuestas)")}
+        for columna in ("etag", "ultima_modificacion"):
+            if columna not in columnas:
+                self._conexion.execute(f"ALTER TABLE respuestas ADD COLUMN {columna} TEXT")
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_usada ON respuestas (usada)")
+        self._conexion.commit()
+
+    def leer(self, clave: str) -> Optional[Entrada]:
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT valor, creada, expira, etag, ultima_modificacion FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            self._conexion.execute(
+                "UPDATE respuestas SET usada = ? WHERE clave = ?", (time.time(), clave)
+            )
+            self._conexion.commit()
+        return Entrada(
+            valor=json.loads(fila[0], object_hook=desde_json),
+            creada=fila[1],
+            expira=fila[2],
+            etag=fila[3],
+            ultima_modificacion=fila[4],
+        )
+
+    def escribir(self, clave: str, entrada: Entrada) -> None:
+        valor = json.dumps(entrada.valor, ensure_ascii=False, default=a_json)
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, creada, expira, usada, etag, ultima_modificacion) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (clave, valor, entrada.creada, entrada.expira, time.time(), entrada.etag, entrada.ultima_modificacion),
+            )
+            # Mantener el archivo acotado expulsando las menos usadas
+            self._conexion.execute(
+                "DELETE FROM respuestas WHERE clave IN ("
+                "SELECT clave FROM respuestas ORDER BY usada DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,),
+            )
+            self._conexion.commit()
+
+    def purgar(self, antes_de: float) -> int:
+        """Elimina entradas que expiraron antes del instante dado"""
+        with self._lock:
+            cursor = self._conexion.execute("DELETE FROM respuestas WHERE expira < ?", (antes_de,))
+            self._conexion.commit()
+            return cursor.rowcount
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conexion.close()
+
+
+class CacheRespuestas:
+    """
+    Caché en memoria con TTL por endpoint, límite LRU y refresco en segundo
+    plano de entradas obsoletas.
+    """
+
+    def __init__(self, config: Optional[ConfigCache] = None, backend: Optional[BackendSQLite] = None):
+        self.config = config or ConfigCache()
+        self.backend = backend
+        if self.backend is None and self.config.ruta_sqlite:
+            self.backend = BackendSQLite(self.config.ruta_sqlite)
+            self.backend.purgar(time.time() - self.config.max_obsoleto)
+        self._entradas: "OrderedDict[str, Entrada]" = OrderedDict()
+        self._refrescando: Dict[str, asyncio.Task] = {}
+        self._contadores = {
+            "aciertos": 0,
+            "aciertos_obsoletos": 0,
+            "fallos": 0,
+            "expulsiones": 0,
+            "refrescos": 0,
+            "errores_refresco": 0,
+            "aciertos_disco": 0,
+            "condicionales": 0,
+            "no_modificadas": 0,
+            "recargas_anticipadas": 0,
+        }
+
+    def ttl(self, endpoint: str) -> float:
+        """TTL aplicable a un endpoint (/taxa/123 usa el de /taxa)"""
+        ttl = self.config.ttl_por_endpoint.get(endpoint)
+        if ttl is None:
+            ttl = self.config.ttl_por_endpoint.get("/" + endpoint.strip("/").split("/")[0])
+        return self.config.ttl_por_defecto if ttl is None else ttl
+
+    async def obtener(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        cargar: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Retorna la respuesta de la consulta, usando la caché si es posible.
+
+        Args:
+            endpoint: Endpoint de iNaturalist (por ejemplo "/observations")
+            params: Parámetros de la consulta
+            cargar: Función asíncrona que consulta iNaturalist en caso de fallo;
+                puede retornar el valor o un `Validada`
+        """
+        if not self.config.habilitada:
+            resultado = await cargar()
+            return resultado.valor if isinstance(resultado, Validada) else resultado
+
+        clave = clave_consulta(endpoint, params)
+        entrada, estado = await self._buscar(clave)
+
+        margen = _margen_recarga.get()
+        if margen > 0 and estado != "vencida" and entrada.expira - time.time() < margen:
+            self._contadores["recargas_anticipadas"] += 1
+            return await self._cargar(clave, endpoint, cargar, entrada)
+
+        if estado == "fresca":
+            self._contadores["aciertos"] += 1
+            return entrada.valor
+
+        if estado == "obsoleta":
+            self._contadores["aciertos_obsoletos"] += 1
+            self._refrescar_en_segundo_plano(clave, endpoint, cargar, entrada)
+            return entrada.valor
+
+        self._contadores["fallos"] += 1
+        return await self._cargar(clave, endpoint, cargar, entrada)
+
+    def invalidar(self, endpoint: Optional[str] = None) -> int:
+        """Elimina de memoria las entradas de un endpoint (o todas)"""
+        if endpoint is None:
+            total = len(self._entradas)
+            self._entradas.clear()
+            return total
+        claves = [clave for clave in self._entradas if clave.startswith(f"{endpoint}?")]
+        for clave in claves:
+            del self._entradas[clave]
+        return len(claves)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de la caché para ajustar tamaños y TTLs"""
+        consultas = self._contadores["aciertos"] + self._contadores["aciertos_obsoletos"] + self._contadores["fallos"]
+        aciertos = self._contadores["aciertos"] + self._contadores["aciertos_obsoletos"]
+        return {
+            **self._contadores,
+            "entradas": len(self._entradas),
+            "max_entradas": self.config.max_entradas,
+            "tasa_aciertos": round(aciertos / consultas, 4) if consultas else None,
+            "refrescos_en_curso": len(self._refrescando),
+            "persistente": self.backend is not None,
+        }
+
+    async def cerrar(self) -> None:
+        """Cancela los refrescos pendientes y cierra el backend en disco"""
+        for tarea in list(self._refrescando.values()):
+            tarea.cancel()
+        self._refrescando.clear()
+        if self.backend is not None:
+            self.backend.cerrar()
+
+    async def _buscar(self, clave: str) -> Tuple[Optional[Entrada], str]:
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            self._entradas.move_to_end(clave)
+        elif self.backend is not None:
+            entrada = await self._en_hilo(self.backend.leer, clave)
+            if entrada is not None:
+                self._contadores["aciertos_disco"] += 1
+                self._insertar(clave, entrada)
+
+        if entrada is None:
+            return None, "vencida"
+
+        ahora = time.time()
+        if ahora < entrada.expira:
+            return entrada, "fresca"
+        if ahora < entrada.expira + self.config.max_obsoleto:
+            return entrada, "obsoleta"
+
+        # Ya no se sirve, pero sus validadores todavía sirven para el GET condicional
+        self._entradas.pop(clave, None)
+        return entrada, "vencida"
+
+    async def _cargar(
+        self,
+        clave: str,
+        endpoint: str,
+        cargar: Callable[[], Awaitable[Any]],
+        anterior: Optional[Entrada],
+    ) -> Any:
+        """Recarga la entrada, revalidándola si la anterior tiene ETag o Last-Modified"""
+        condicional = anterior is not None and bool(anterior.etag or anterior.ultima_modificacion)
+        token = _revalidando.set(anterior if condicional else None)
+        try:
+            if condicional:
+                self._contadores["condicionales"] += 1
+            try:
+                resultado = await cargar()
+            except NoModificada:
+                if not condicional:
+                    # Se sumó a un GET condicional en vuelo de otra consulta: se pide completo
+                    _revalidando.set(None)
+                    resultado = await cargar()
+                else:
+                    self._contadores["no_modificadas"] += 1
+                    resultado = Validada(anterior.valor, anterior.etag, anterior.ultima_modificacion)
+        finally:
+            _revalidando.reset(token)
+
+        if not isinstance(resultado, Validada):
+            resultado = Validada(resultado)
+        await self._guardar(clave, endpoint, resultado.valor, resultado.etag, resultado.ultima_modificacion)
+        return resultado.valor
+
+    async def _guardar(
+        self,
+        clave: str,
+        endpoint: str,
+        valor: Any,
+        etag: Optional[str] = None,
+        ultima_modificacion: Optional[str] = None,
+    ) -> None:
+        ahora = time.time()
+        entrada = Entrada(
+            valor=valor,
+            creada=ahora,
+            expira=ahora + self.ttl(endpoint),
+            etag=etag,
+            ultima_modificacion=ultima_modificacion,
+        )
+        self._insertar(clave, entrada)
+        if self.backend is not None:
+            try:
+                await self._en_hilo(self.backend.escribir, clave, entrada)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.warning("No se pudo persistir la entrada %s: %s", clave, e)
+
+    def _insertar(self, clave: str, entrada: Entrada) -> None:
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.config.max_entradas:
+            self._entradas.popitem(last=False)
+            self._contadores["expulsiones"] += 1
+
+    def _refrescar_en_segundo_plano(
+        self,
+        clave: str,
+        endpoint: str,
+        cargar: Callable[[], Awaitable[Any]],
+        anterior: Entrada,
+    ) -> None:
+        if clave in self._refrescando:
+            return
+
+        async def refrescar():
+            try:
+                with usar_prioridad(PRIORIDAD_BAJA):
+                    await self._cargar(clave, endpoint, cargar, anterior)
+                self._contadores["refrescos"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._contadores["errores_refresco"] += 1
+                logger.warning("Error al refrescar %s: %s", clave, e)
+            finally:
+                self._refrescando.pop(clave, None)
+
+        # Nadie espera el refresco: sin el plazo de quien lo disparó y con prioridad baja
+        self._refrescando[clave] = contexto_sin_plazo().run(asyncio.get_running_loop().create_task, refrescar())
+
+    @staticmethod
+    async def _en_hilo(funcion: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, funcion, *args)
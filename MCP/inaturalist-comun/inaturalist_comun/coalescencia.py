@@ -0,0 +1,64 @@
+"""
+Coalescencia de solicitudes idénticas en vuelo (single-flight)
+
+Cuando varias sesiones piden lo mismo a la vez, sólo la primera sale hacia
+iNaturalist; las demás esperan el mismo resultado. La consulta corre en una
+tarea propia, así que cancelar a uno de los que esperan no cancela la consulta
+para el resto.
+
+La tarea no hereda el plazo de quien la inicia (tendría el de la primera
+herramienta para todas): usa el plazo por consulta de la política, y cada uno
+de los que esperan deja de esperar cuando vence su propio plazo.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from .politica import PlazoAgotado, contexto_sin_plazo, tiempo_restante
+
+
+class ConsultasEnVuelo:
+    """Agrupa llamadas concurrentes con la misma clave en una sola consulta"""
+
+    def __init__(self):
+        self._en_vuelo: Dict[str, asyncio.Task] = {}
+        self._contadores = {"originales": 0, "coalescidas": 0}
+
+    async def ejecutar(self, clave: str, cargar: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta `cargar()` o se une a una ejecución en curso con la misma clave.
+        Si la consulta falla, la excepción se propaga a todos los que esperan.
+        """
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            self._contadores["originales"] += 1
+            tarea = contexto_sin_plazo().run(asyncio.get_running_loop().create_task, cargar())
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar(clave, t))
+        else:
+            self._contadores["coalescidas"] += 1
+
+        # shield: cancelar este await no cancela la tarea compartida
+        restante = tiempo_restante()
+        if restante is None:
+            return await asyncio.shield(tarea)
+        try:
+            return await asyncio.wait_for(asyncio.shield(tarea), restante)
+        except asyncio.TimeoutError:
+            if tarea.done():
+                raise
+            raise PlazoAgotado(f"Se agotó el plazo esperando la consulta {clave}") from None
+
+    def en_vuelo(self) -> int:
+        """Número de consultas distintas en curso"""
+        return len(self._en_vuelo)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {**self._contadores, "en_vuelo": len(self._en_vuelo)}
+
+    def _terminar(self, clave: str, tarea: asyncio.Task) -> None:
+        if self._en_vuelo.get(clave) is tarea:
+            del self._en_vuelo[clave]
+        # Marcar la excepción como leída aunque todos los que esperaban se hayan cancelado
+        if not tarea.cancelled():
+            tarea.exception()
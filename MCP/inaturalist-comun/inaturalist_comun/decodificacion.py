@@ -0,0 +1,189 @@
+"""
+Decodificación compacta de las respuestas de iNaturalist
+
+Una página de `/observations` con `per_page=200` trae identificaciones,
+arreglos completos de fotos, perfiles de usuario y ancestros de cada taxón,
+pero los servicios sólo usan una docena de campos. Este módulo:
+
+- Decodifica el cuerpo con `orjson` si está instalado (si no, con `json`)
+- Proyecta cada resultado a un registro tipado con `__slots__`
+  (`Observacion`, `Taxon`, `Lugar`) y descarta el resto del payload, de modo
+  que la caché guarda sólo lo que se usa
+
+Los registros se pueden persistir en JSON (`a_json` / `desde_json`), lo que
+permite guardarlos en la caché SQLite.
+"""
+
+import json
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, Tuple, Type
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+def cargar_json(contenido: bytes) -> Any:
+    """Decodifica un cuerpo JSON con el decodificador más rápido disponible"""
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
+
+
+def _foto(fotos: Any) -> Optional[str]:
+    return fotos[0].get("url") if fotos else None
+
+
+def leer_coordenadas(location: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Latitud y longitud del campo `location` ("lat,lng"); (None, None) si falta o no es válido"""
+    if not location:
+        return None, None
+    try:
+        lat, lng = (float(v) for v in location.split(","))
+    except ValueError:
+        return None, None
+    return lat, lng
+
+
+@dataclass(eq=False)
+class Observacion:
+    """Campos de una observación que usan las herramientas y la API"""
+    __slots__ = (
+        "id", "especie", "taxon_id", "taxon_nombre", "taxon_nombre_comun", "observada",
+        "observada_texto", "lugar", "usuario_login", "usuario_nombre", "foto_url",
+        "latitud", "longitud", "taxon_rango", "especie_id",
+    )
+    id: int
+    especie: Optional[str]
+    taxon_id: Optional[int]
+    taxon_nombre: Optional[str]
+    taxon_nombre_comun: Optional[str]
+    observada: Optional[str]
+    observada_texto: Optional[str]
+    lugar: Optional[str]
+    usuario_login: Optional[str]
+    usuario_nombre: Optional[str]
+    foto_url: Optional[str]
+    latitud: Optional[float]
+    longitud: Optional[float]
+    taxon_rango: Optional[str]
+    especie_id: Optional[int]  # especie a la que pertenece el taxón (la misma si es especie)
+
+    @classmethod
+    def desde_inaturalist(cls, obs: dict) -> "Observacion":
+        taxon = obs.get("taxon") or {}
+        usuario = obs.get("user") or {}
+        latitud, longitud = leer_coordenadas(obs.get("location"))
+        return cls(
+            obs.get("id"),
+            obs.get("species_guess"),
+            taxon.get("id"),
+            taxon.get("name"),
+            taxon.get("preferred_common_name"),
+            obs.get("observed_on"),
+            obs.get("observed_on_string"),
+            obs.get("place_guess"),
+            usuario.get("login"),
+            usuario.get("name"),
+            _foto(obs.get("photos")),
+            latitud,
+            longitud,
+            taxon.get("rank"),
+            taxon.get("min_species_taxon_id"),
+        )
+
+
+@dataclass(eq=False)
+class Taxon:
+    """Campos de un taxón que usan las herramientas"""
+    __slots__ = (
+        "id", "nombre", "nombre_comun", "rango", "wikipedia_url", "observaciones",
+        "foto_url", "estado_conservacion",
+    )
+    id: int
+    nombre: Optional[str]
+    nombre_comun: Optional[str]
+    rango: Optional[str]
+    wikipedia_url: Optional[str]
+    observaciones: Optional[int]
+    foto_url: Optional[str]
+    estado_conservacion: Optional[str]
+
+    @classmethod
+    def desde_inaturalist(cls, taxon: dict) -> "Taxon":
+        foto = taxon.get("default_photo") or {}
+        estado = taxon.get("conservation_status") or {}
+        return cls(
+            taxon.get("id"),
+            taxon.get("name"),
+            taxon.get("preferred_common_name"),
+            taxon.get("rank"),
+            taxon.get("wikipedia_url"),
+            taxon.get("observations_count"),
+            foto.get("medium_url"),
+            estado.get("status"),
+        )
+
+
+@dataclass(eq=False)
+class Lugar:
+    """Campos de un lugar que usan las herramientas"""
+    __slots__ = ("id", "nombre", "tipo", "bbox", "observaciones")
+    id: int
+    nombre: Optional[str]
+    tipo: Optional[str]
+    bbox: Optional[dict]
+    observaciones: Optional[int]
+
+    @classmethod
+    def desde_inaturalist(cls, lugar: dict) -> "Lugar":
+        return cls(
+            lugar.get("id"),
+            lugar.get("display_name"),
+            lugar.get("place_type_name"),
+            lugar.get("bounding_box_geojson"),
+            lugar.get("observations_count"),
+        )
+
+
+@dataclass(eq=False)
+class Pagina:
+    """Una página de resultados ya proyectados"""
+    __slots__ = ("total", "resultados")
+    total: Optional[int]
+    resultados: Tuple[Any, ...]
+
+
+_TIPOS: Dict[str, Type] = {tipo.__name__: tipo for tipo in (Observacion, Taxon, Lugar, Pagina)}
+
+
+def decodificar_pagina(contenido: bytes, tipo: Type) -> Pagina:
+    """
+    Decodifica una respuesta paginada de iNaturalist proyectando cada
+    resultado a `tipo`. El diccionario completo se libera al terminar.
+    """
+    datos = cargar_json(contenido)
+    return Pagina(
+        datos.get("total_results"),
+        tuple(tipo.desde_inaturalist(r) for r in datos.get("results", [])),
+    )
+
+
+def a_json(valor: Any) -> Any:
+    """`default` para json.dumps: serializa los registros con su tipo"""
+    tipo = type(valor).__name__
+    if tipo in _TIPOS and isinstance(valor, _TIPOS[tipo]):
+        return {"__tipo__": tipo, **{f.name: getattr(valor, f.name) for f in fields(valor)}}
+    raise TypeError(f"{tipo} no es serializable en JSON")
+
+
+def desde_json(objeto: dict) -> Any:
+    """`object_hook` para json.loads: reconstruye los registros serializados con `a_json`"""
+    tipo = objeto.pop("__tipo__", None)
+    if tipo is None:
+        return objeto
+    if tipo == "Pagina":
+        return Pagina(objeto["total"], tuple(objeto["resultados"]))
+    # Los campos agregados después de guardar el registro quedan en None
+    return _TIPOS[tipo](**{f.name: objeto.get(f.name) for f in fields(_TIPOS[tipo])})
@@ -0,0 +1,26 @@
+"""
+Lectura de variables de entorno compartida por los servicios
+
+Todas las opciones booleanas (INATURALIST_TESELAS, INATURALIST_TRAZAS,
+API_FOTOS, ...) aceptan los mismos valores, sin distinguir mayúsculas:
+
+- Verdadero: "1", "true", "si", "sí", "yes", "on"
+- Falso: "0", "false", "no", "off"
+
+Una variable sin definir, vacía o con otro valor toma el default.
+"""
+
+import os
+
+VERDADEROS = frozenset({"1", "true", "si", "sí", "yes", "on"})
+FALSOS = frozenset({"0", "false", "no", "off"})
+
+
+def leer_bool(nombre: str, default: bool = False) -> bool:
+    """Lee una variable de entorno booleana"""
+    valor = (os.getenv(nombre) or "").strip().lower()
+    if valor in VERDADEROS:
+        return True
+    if valor in FALSOS:
+        return False
+    return default
@@ -0,0 +1,285 @@
+"""
+Limitador de tasa para las solicitudes a iNaturalist
+
+Combina tres mecanismos:
+
+- Token bucket: como máximo `tasa` solicitudes por segundo, con ráfagas de
+  hasta `rafaga` solicitudes
+- Concurrencia adaptativa (AIMD): el número de solicitudes simultáneas crece
+  de a poco mientras iNaturalist responde bien y se reduce a la mitad ante
+  429, errores 5xx o latencias por encima del objetivo
+- Cola por prioridad: las solicitudes que no pueden salir de inmediato
+  esperan su turno en lugar de fallar; las interactivas salen antes que las
+  de fondo (rellenos, sincronizaciones, exportaciones)
+
+Un 429 con Retry-After pausa el limitador completo durante ese tiempo.
+
+Cada proceso (servidor MCP, API) tiene su propio limitador; la tasa
+configurada aplica por proceso.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .metricas import observar_fase
+
+PRIORIDAD_ALTA = 0
+PRIORIDAD_NORMAL = 1
+PRIORIDAD_BAJA = 2
+
+_prioridad_actual: "contextvars.ContextVar[int]" = contextvars.ContextVar(
+    "prioridad_inaturalist", default=PRIORIDAD_NORMAL
+)
+
+
+@contextmanager
+def usar_prioridad(prioridad: int) -> Iterator[None]:
+    """
+    Fija la prioridad de las solicitudes hechas dentro del bloque, incluidas
+    las de tareas creadas dentro de él (heredan el contexto).
+    """
+    token = _prioridad_actual.set(prioridad)
+    try:
+        yield
+    finally:
+        _prioridad_actual.reset(token)
+
+
+def segundos_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Interpreta un encabezado Retry-After (segundos o fecha HTTP)"""
+    if not valor:
+        return None
+    valor = valor.strip()
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class ConfigLimitador:
+    """Parámetros del limitador"""
+    tasa: float = 1.0
+    rafaga: int = 5
+    concurrencia_inicial: float = 4.0
+    concurrencia_min: int = 1
+    concurrencia_max: int = 10
+    latencia_objetivo: float = 2.0
+
+    @classmethod
+    def desde_entorno(cls, prefijo: str = "INATURALIST_LIMITE") -> "ConfigLimitador":
+        """
+        Lee la configuración de variables de entorno:
+
+        - {prefijo}_TASA: Solicitudes por segundo (default: 1)
+        - {prefijo}_RAFAGA: Solicitudes que pueden salir seguidas (default: 5)
+        - {prefijo}_CONCURRENCIA: Concurrencia inicial (default: 4)
+        - {prefijo}_CONCURRENCIA_MIN / _CONCURRENCIA_MAX: Límites de la concurrencia (default: 1 / 10)
+        - {prefijo}_LATENCIA_OBJETIVO: Latencia en segundos por encima de la cual se reduce la concurrencia (default: 2)
+        """
+        return cls(
+            tasa=float(os.getenv(f"{prefijo}_TASA", "1")),
+            rafaga=int(os.getenv(f"{prefijo}_RAFAGA", "5")),
+            concurrencia_inicial=float(os.getenv(f"{prefijo}_CONCURRENCIA", "4")),
+            concurrencia_min=int(os.getenv(f"{prefijo}_CONCURRENCIA_MIN", "1")),
+            concurrencia_max=int(os.getenv(f"{prefijo}_CONCURRENCIA_MAX", "10")),
+            latencia_objetivo=float(os.getenv(f"{prefijo}_LATENCIA_OBJETIVO", "2")),
+        )
+
+
+class Permiso:
+    """Autorización para una solicitud; se informa su resultado con `registrar`"""
+
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+    def registrar(self, status: int, retry_after: Optional[str] = None) -> None:
+        """Informa el código HTTP de la respuesta (y su Retry-After si lo trae)"""
+        self.status = status
+        self.retry_after = segundos_retry_after(retry_after)
+
+
+class LimitadorTasa:
+    """Token bucket con concurrencia AIMD y cola de espera por prioridad"""
+
+    def __init__(self, config: Optional[ConfigLimitador] = None):
+        self.config = config or ConfigLimitador()
+        self._tokens = float(self.config.rafaga)
+        self._ultima_recarga = time.monotonic()
+        self._limite = float(self.config.concurrencia_inicial)
+        self._en_curso = 0
+        self._pausado_hasta = 0.0
+        self._ultima_reduccion = 0.0
+        self._espera: List[Tuple[int, int, asyncio.Future]] = []
+        self._secuencia = itertools.count()
+        self._temporizador: Optional[asyncio.TimerHandle] = None
+        self._contadores = {
+            "concedidos": 0,
+            "esperaron": 0,
+            "respuestas_429": 0,
+            "errores": 0,
+            "aumentos": 0,
+            "reducciones": 0,
+        }
+
+    @asynccontextmanager
+    async def permiso(self, prioridad: Optional[int] = None) -> AsyncIterator[Permiso]:
+        """
+        Espera turno para hacer una solicitud. Al salir del bloque se ajusta la
+        concurrencia según el resultado registrado y la latencia observada.
+        """
+        await self._adquirir(_prioridad_actual.get() if prioridad is None else prioridad)
+        permiso = Permiso()
+        try:
+            yield permiso
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            if permiso.status is None:
+                permiso.status = 0  # error de red o timeout
+            raise
+        finally:
+            self._liberar(permiso)
+
+    def pausar(self, segundos: float) -> None:
+        """Detiene la salida de solicitudes durante `segundos` (por ejemplo, por Retry-After)"""
+        self._pausado_hasta = max(self._pausado_hasta, time.monotonic() + segundos)
+        self._tokens = 0.0
+        self._despachar()
+
+    def ocupado(self, prioridad: int = PRIORIDAD_NORMAL) -> bool:
+        """Hay solicitudes de esa prioridad, o más urgentes, esperando turno"""
+        return any(p <= prioridad and not f.done() for p, _, f in self._espera)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        ahora = time.monotonic()
+        self._recargar(ahora)
+        return {
+            **self._contadores,
+            "concurrencia_limite": round(self._limite, 2),
+            "en_curso": self._en_curso,
+            "en_espera": sum(1 for _, _, f in self._espera if not f.done()),
+            "tokens": round(self._tokens, 2),
+            "pausado_s": round(max(0.0, self._pausado_hasta - ahora), 1),
+        }
+
+    # --- Internos ------------------------------------------------------------
+
+    async def _adquirir(self, prioridad: int) -> None:
+        inicio = time.perf_counter()
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._espera, (prioridad, next(self._secuencia), futuro))
+        self._despachar()
+        if not futuro.done():
+            self._contadores["esperaron"] += 1
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled():
+                # Se concedió justo antes de la cancelación: devolver el turno
+                self._en_curso -= 1
+                self._despachar()
+            raise
+        observar_fase("espera_limitador", time.perf_counter() - inicio)
+
+    def _liberar(self, permiso: Permiso) -> None:
+        self._en_curso -= 1
+        self._ajustar(permiso)
+        self._despachar()
+
+    def _ajustar(self, permiso: Permiso) -> None:
+        ahora = time.monotonic()
+        latencia = ahora - permiso.inicio
+        status = permiso.status
+
+        if status == 429:
+            self._contadores["respuestas_429"] += 1
+            self.pausar(permiso.retry_after if permiso.retry_after is not None else 1.0 / max(self.config.tasa, 1e-6))
+
+        error = status is not None and (status == 0 or status == 429 or status >= 500)
+        if error:
+            self._contadores["errores"] += 1
+
+        if error or latencia > self.config.latencia_objetivo:
+            # Una ráfaga de fallos simultáneos cuenta como una sola señal
+            if ahora - self._ultima_reduccion >= self.config.latencia_objetivo:
+                self._limite = max(float(self.config.concurrencia_min), self._limite / 2)
+                self._ultima_reduccion = ahora
+                self._contadores["reducciones"] += 1
+        elif status is not None:
+            anterior = int(self._limite)
+            self._limite = min(float(self.config.concurrencia_max), self._limite + 1 / self._limite)
+            if int(self._limite) > anterior:
+                self._contadores["aumentos"] += 1
+
+    def _recargar(self, ahora: float) -> None:
+        if ahora < self._pausado_hasta:
+            self._ultima_recarga = ahora
+            return
+        desde = max(self._ultima_recarga, self._pausado_hasta)
+        self._tokens = min(float(self.config.rafaga), self._tokens + (ahora - desde) * self.config.tasa)
+        self._ultima_recarga = ahora
+
+    def _despachar(self) -> None:
+        ahora = time.monotonic()
+        self._recargar(ahora)
+
+        while self._espera and self._en_curso < int(self._limite):
+            if self._espera[0][2].done():
+                heapq.heappop(self._espera)  # cancelado mientras esperaba
+                continue
+            if self._tokens < 1:
+                break
+            _, _, futuro = heapq.heappop(self._espera)
+            self._tokens -= 1
+            self._en_curso += 1
+            self._contadores["concedidos"] += 1
+            futuro.set_result(None)
+
+        # Si hay espera por falta de tokens, despertar cuando haya uno disponible
+        pendientes = any(not f.done() for _, _, f in self._espera)
+        if pendientes and self._en_curso < int(self._limite) and self._temporizador is None:
+            espera = max(self._pausado_hasta - ahora, 0.0) + max(0.0, 1 - self._tokens) / max(self.config.tasa, 1e-6)
+            self._temporizador = asyncio.get_running_loop().call_later(espera, self._despertar)
+
+    def _despertar(self) -> None:
+        self._temporizador = None
+        self._despachar()
+
+
+async def solicitar_con_limite(
+    limitador: LimitadorTasa,
+    enviar: Callable[[], Awaitable[Any]],
+    max_reintentos_429: int = 2,
+) -> Any:
+    """
+    Envía una solicitud respetando el limitador. Si iNaturalist responde 429,
+    el limitador se pausa según Retry-After y la solicitud vuelve a la cola
+    (hasta `max_reintentos_429` veces) en lugar de fallar de inmediato.
+
+    Args:
+        limitador: Limitador compartido del proceso
+        enviar: Función que hace la solicitud y retorna la respuesta
+            (un objeto con `status_code` y `headers`, como httpx.Response)
+    """
+    for intento in range(max_reintentos_429 + 1):
+        async with limitador.permiso() as permiso:
+            respuesta = await enviar()
+            permiso.registrar(respuesta.status_code, respuesta.headers.get("Retry-After"))
+        if respuesta.status_code != 429:
+            break
+    return respuesta
@@ -0,0 +1,376 @@
+"""
+Métricas y trazas de las solicitudes a iNaturalist
+
+Registro mínimo de contadores, medidores e histogramas con etiquetas que se
+exporta en el formato de texto de Prometheus, sin dependencias externas.
+Incluye las métricas estándar que comparten el servidor MCP y la API:
+
+- Latencia, códigos de respuesta, tamaño del payload y solicitudes en curso
+  hacia iNaturalist, por endpoint
+- Duración por fase: espera en el limitador, ida a iNaturalist, decodificación
+  JSON y armado del resultado
+- Duración, errores y llamadas en curso por herramienta MCP
+
+Con INATURALIST_TRAZAS=1 cada llamada a una herramienta (o solicitud a la
+API) guarda además una traza con la duración de cada fase; se conservan las
+últimas INATURALIST_TRAZAS_MAX (default: 50).
+"""
+
+import contextvars
+import functools
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .entorno import leer_bool
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Etiquetas = Tuple[str, ...]
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, valores: Dict[str, Any]) -> Etiquetas:
+        return tuple(str(valores.get(etiqueta, "")) for etiqueta in self.etiquetas)
+
+    def _formato_etiquetas(self, clave: Etiquetas, extra: str = "") -> str:
+        partes = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(self.etiquetas, clave)]
+        if extra:
+            partes.append(extra)
+        return "{" + ",".join(partes) + "}" if partes else ""
+
+    def exponer(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.descripcion}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    """Valor que sólo crece (solicitudes, errores, ...)"""
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Etiquetas, float] = {}
+
+    def inc(self, cantidad: float = 1, **etiquetas: Any) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valores(self) -> Dict[Etiquetas, float]:
+        with self._lock:
+            return dict(self._valores)
+
+    def exponer(self) -> List[str]:
+        lineas = super().exponer()
+        for clave, valor in sorted(self.valores().items()):
+            lineas.append(f"{self.nombre}{self._formato_etiquetas(clave)} {_numero(valor)}")
+        return lineas
+
+
+class Medidor(Contador):
+    """Valor que sube y baja (solicitudes en curso, tamaño de una cola, ...)"""
+    tipo = "gauge"
+
+    def fijar(self, valor: float, **etiquetas: Any) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = valor
+
+    @contextmanager
+    def en_curso(self, **etiquetas: Any) -> Iterator[None]:
+        """Suma 1 mientras dure el bloque"""
+        self.inc(1, **etiquetas)
+        try:
+            yield
+        finally:
+            self.inc(-1, **etiquetas)
+
+
+@dataclass
+class _Serie:
+    cubetas: List[int]
+    suma: float = 0.0
+    cantidad: int = 0
+
+
+class Histograma(_Metrica):
+    """Distribución de valores en cubetas acumuladas (latencias, tamaños)"""
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = (),
+                 limites: Sequence[float] = LIMITES_SEGUNDOS):
+        super().__init__(nombre, descripcion, etiquetas)
+        self.limites = tuple(sorted(limites))
+        self._series: Dict[Etiquetas, _Serie] = {}
+
+    def observar(self, valor: float, **etiquetas: Any) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = _Serie(cubetas=[0] * (len(self.limites) + 1))
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie.cubetas[i] += 1
+                    break
+            else:
+                serie.cubetas[-1] += 1
+            serie.suma += valor
+            serie.cantidad += 1
+
+    @contextmanager
+    def medir(self, **etiquetas: Any) -> Iterator[None]:
+        """Observa la duración del bloque en segundos"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def percentil(self, p: float, **etiquetas: Any) -> Optional[float]:
+        """Estimación del percentil `p` (0-100) a partir de las cubetas"""
+        with self._lock:
+            serie = self._series.get(self._clave(etiquetas))
+            if serie is None or serie.cantidad == 0:
+                return None
+            objetivo = p / 100 * serie.cantidad
+            acumulado = 0
+            for i, cuenta in enumerate(serie.cubetas):
+                acumulado += cuenta
+                if acumulado >= objetivo:
+                    return self.limites[i] if i < len(self.limites) else math.inf
+        return None
+
+    def resumen(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            series = {clave: (serie.cantidad, serie.suma) for clave, serie in self._series.items()}
+        resultado = {}
+        for clave, (cantidad, suma) in sorted(series.items()):
+            etiquetas = dict(zip(self.etiquetas, clave))
+            resultado[",".join(clave) or "total"] = {
+                "cantidad": cantidad,
+                "media": round(suma / cantidad, 6) if cantidad else None,
+                "p50": self.percentil(50, **etiquetas),
+                "p95": self.percentil(95, **etiquetas),
+                "p99": self.percentil(99, **etiquetas),
+            }
+        return resultado
+
+    def exponer(self) -> List[str]:
+        lineas = super().exponer()
+        with self._lock:
+            series = {clave: (list(s.cubetas), s.suma, s.cantidad) for clave, s in self._series.items()}
+        for clave, (cubetas, suma, cantidad) in sorted(series.items()):
+            acumulado = 0
+            for limite, cuenta in zip(list(self.limites) + [math.inf], cubetas):
+                acumulado += cuenta
+                le = 'le="+Inf"' if limite == math.inf else f'le="{_numero(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{self._formato_etiquetas(clave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{self._formato_etiquetas(clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{self._formato_etiquetas(clave)} {cantidad}")
+        return lineas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas de un proceso"""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def _registrar(self, metrica: _Metrica) -> Any:
+        existente = self._metricas.get(metrica.nombre)
+        if existente is not None:
+            return existente
+        self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def contador(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nombre, descripcion, etiquetas))
+
+    def medidor(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = ()) -> Medidor:
+        return self._registrar(Medidor(nombre, descripcion, etiquetas))
+
+    def histograma(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma(nombre, descripcion, etiquetas, limites))
+
+    def exponer(self) -> str:
+        """Todas las métricas en formato de texto de Prometheus"""
+        lineas: List[str] = []
+        for metrica in self._metricas.values():
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+    def resumen(self) -> Dict[str, Any]:
+        """Vista compacta en JSON (percentiles estimados para los histogramas)"""
+        resultado: Dict[str, Any] = {}
+        for nombre, metrica in self._metricas.items():
+            if isinstance(metrica, Histograma):
+                resultado[nombre] = metrica.resumen()
+            else:
+                resultado[nombre] = {",".join(clave) or "total": valor for clave, valor in metrica.valores().items()}
+        return resultado
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+# --- Registro y métricas estándar ---------------------------------------------
+
+registro = RegistroMetricas()
+
+UPSTREAM_DURACION = registro.histograma(
+    "inaturalist_upstream_duracion_segundos", "Duración de cada solicitud HTTP a iNaturalist", ["endpoint"]
+)
+UPSTREAM_RESPUESTAS = registro.contador(
+    "inaturalist_upstream_respuestas_total", "Respuestas de iNaturalist por código (o tipo de error)",
+    ["endpoint", "status"]
+)
+UPSTREAM_BYTES = registro.histograma(
+    "inaturalist_upstream_bytes", "Tamaño del cuerpo de las respuestas de iNaturalist", ["endpoint"],
+    limites=LIMITES_BYTES
+)
+UPSTREAM_EN_CURSO = registro.medidor(
+    "inaturalist_upstream_en_curso", "Solicitudes a iNaturalist en curso"
+)
+FASE_DURACION = registro.histograma(
+    "inaturalist_fase_duracion_segundos",
+    "Duración por fase: espera_limitador, upstream, json, formato", ["fase"]
+)
+HERRAMIENTA_DURACION = registro.histograma(
+    "inaturalist_herramienta_duracion_segundos", "Duración de cada llamada a una herramienta", ["herramienta"]
+)
+HERRAMIENTA_ERRORES = registro.contador(
+    "inaturalist_herramienta_errores_total", "Llamadas a herramientas que retornaron un error", ["herramienta"]
+)
+HERRAMIENTA_EN_CURSO = registro.medidor(
+    "inaturalist_herramienta_en_curso", "Llamadas a herramientas en curso", ["herramienta"]
+)
+
+
+# --- Trazas -------------------------------------------------------------------
+
+@dataclass
+class Traza:
+    """Fases registradas durante una llamada"""
+    nombre: str
+    inicio: float = field(default_factory=time.time)
+    duracion_ms: Optional[float] = None
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+
+
+_traza_actual: "contextvars.ContextVar[Optional[Traza]]" = contextvars.ContextVar("traza_inaturalist", default=None)
+_TRAZAS_HABILITADAS = leer_bool("INATURALIST_TRAZAS")
+_trazas: Deque[Traza] = deque(maxlen=int(os.getenv("INATURALIST_TRAZAS_MAX", "50")))
+
+
+@contextmanager
+def traza(nombre: str) -> Iterator[Optional[Traza]]:
+    """Inicia una traza para el bloque (si las trazas están habilitadas)"""
+    if not _TRAZAS_HABILITADAS:
+        yield None
+        return
+    actual = Traza(nombre)
+    token = _traza_actual.set(actual)
+    inicio = time.perf_counter()
+    try:
+        yield actual
+    finally:
+        actual.duracion_ms = round((time.perf_counter() - inicio) * 1000, 3)
+        _traza_actual.reset(token)
+        _trazas.append(actual)
+
+
+def trazas_recientes() -> List[Dict[str, Any]]:
+    """Últimas trazas registradas, de la más reciente a la más antigua"""
+    return [
+        {"nombre": t.nombre, "inicio": t.inicio, "duracion_ms": t.duracion_ms, "spans": list(t.spans)}
+        for t in reversed(_trazas)
+    ]
+
+
+@contextmanager
+def fase(nombre: str, **atributos: Any) -> Iterator[None]:
+    """Mide una fase: la observa en el histograma y la agrega a la traza actual"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar_fase(nombre, time.perf_counter() - inicio, **atributos)
+
+
+def observar_fase(nombre: str, duracion: float, **atributos: Any) -> None:
+    """Registra una fase ya medida (por ejemplo, la espera en el limitador)"""
+    FASE_DURACION.observar(duracion, fase=nombre)
+    actual = _traza_actual.get()
+    if actual is not None:
+        actual.spans.append({"fase": nombre, "duracion_ms": round(duracion * 1000, 3), **atributos})
+
+
+# --- Instrumentación ----------------------------------------------------------
+
+def etiqueta_endpoint(endpoint: str) -> str:
+    """Endpoint para las etiquetas de las métricas (/taxa/1,2,3 queda como /taxa/{ids})"""
+    return re.sub(r"/\d[\d,]*", "/{ids}", endpoint)
+
+
+async def enviar_medido(endpoint: str, enviar: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Ejecuta una solicitud HTTP registrando latencia, código, tamaño y
+    solicitudes en curso. `enviar` retorna un objeto como httpx.Response.
+    """
+    endpoint = etiqueta_endpoint(endpoint)
+    inicio = time.perf_counter()
+    with UPSTREAM_EN_CURSO.en_curso():
+        try:
+            respuesta = await enviar()
+        except Exception as e:
+            UPSTREAM_RESPUESTAS.inc(endpoint=endpoint, status=type(e).__name__)
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            UPSTREAM_DURACION.observar(duracion, endpoint=endpoint)
+            observar_fase("upstream", duracion, endpoint=endpoint)
+    UPSTREAM_RESPUESTAS.inc(endpoint=endpoint, status=respuesta.status_code)
+    UPSTREAM_BYTES.observar(len(respuesta.content), endpoint=endpoint)
+    return respuesta
+
+
+def instrumentar_herramienta(funcion: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Decorador para herramientas asíncronas: mide la duración, las llamadas en
+    curso y los resultados con "error", y abre una traza por llamada.
+    Conserva la firma de la función (FastMCP la usa para el esquema).
+    """
+    nombre = funcion.__name__
+
+    @functools.wraps(funcion)
+    async def envoltura(*args: Any, **kwargs: Any) -> Any:
+        with traza(nombre), HERRAMIENTA_EN_CURSO.en_curso(herramienta=nombre), \
+                HERRAMIENTA_DURACION.medir(herramienta=nombre):
+            resultado = await funcion(*args, **kwargs)
+        if isinstance(resultado, dict) and "error" in resultado:
+            HERRAMIENTA_ERRORES.inc(herramienta=nombre)
+        return resultado
+
+    return envoltura
@@ -0,0 +1,296 @@
+"""
+Nomenclátor de lugares: áreas protegidas, humedales, quebradas y ríos
+
+Se carga una sola vez por proceso (`nomenclator()`) desde
+`datos/lugares.json` y, opcionalmente, desde un archivo propio. Todas las
+búsquedas se resuelven en memoria:
+
+- Nombre o alias exacto, sin importar mayúsculas, tildes ni signos: un
+  diccionario por nombre normalizado
+- Nombre aproximado ("humedal conejera", "sumapas"): índice invertido de
+  trigramas; se puntúan sólo los lugares que comparten algún trigrama con el
+  texto, por similitud de Jaccard entre los trigramas de ambos
+- Lugares más cercanos a un punto: árbol k-d sobre las coordenadas 3D de los
+  lugares en la esfera unitaria. La distancia euclidiana entre esos puntos
+  crece con la distancia sobre la superficie, así que el árbol ordena igual
+  que haversine sin casos especiales cerca del antimeridiano o los polos
+
+Configuración por variables de entorno:
+
+- INATURALIST_LUGARES_RUTA: Archivo JSON con más lugares (una lista con los
+  campos de `datos/lugares.json`); se suman a los incluidos y, si repiten un
+  nombre, lo reemplazan
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .teselas import RADIO_TIERRA_KM, distancia_km
+
+RUTA_LUGARES = Path(__file__).resolve().parent / "datos" / "lugares.json"
+
+# Similitud mínima de trigramas para aceptar un nombre aproximado
+SIMILITUD_MINIMA = 0.45
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar_nombre(nombre: str) -> str:
+    """Minúsculas, sin tildes y con los signos reemplazados por un espacio"""
+    sin_tildes = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    return _NO_ALFANUMERICO.sub(" ", sin_tildes.lower()).strip()
+
+
+def trigramas(nombre: str) -> frozenset:
+    """Trigramas de cada palabra del nombre normalizado, con bordes ("  co", " co", "con", ...)"""
+    resultado = set()
+    for palabra in normalizar_nombre(nombre).split():
+        relleno = f"  {palabra} "
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return frozenset(resultado)
+
+
+@dataclass(frozen=True)
+class Sitio:
+    """Lugar del nomenclátor; `radio_km` es el radio de búsqueda que lo cubre"""
+    id: int
+    nombre: str
+    tipo: str
+    lat: float
+    lng: float
+    radio_km: float = 1.0
+    descripcion: str = ""
+    alias: Tuple[str, ...] = ()
+
+    @classmethod
+    def desde_dict(cls, datos: Dict[str, Any]) -> "Sitio":
+        return cls(
+            id=int(datos["id"]),
+            nombre=datos["nombre"],
+            tipo=datos.get("tipo", ""),
+            lat=float(datos["lat"]),
+            lng=float(datos["lng"]),
+            radio_km=float(datos.get("radio_km", 1.0)),
+            descripcion=datos.get("descripcion", ""),
+            alias=tuple(datos.get("alias", ())),
+        )
+
+    def como_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "nombre": self.nombre,
+            "tipo": self.tipo,
+            "lat": self.lat,
+            "lng": self.lng,
+            "radio_km": self.radio_km,
+            "descripcion": self.descripcion,
+        }
+
+    def es_de_tipo(self, tipo: Optional[str]) -> bool:
+        """Si el lugar es de `tipo` (sin distinguir mayúsculas ni tildes); con None, siempre"""
+        return tipo is None or normalizar_nombre(self.tipo) == normalizar_nombre(tipo)
+
+
+def _cartesianas(lat: float, lng: float) -> Tuple[float, float, float]:
+    """Punto en la esfera unitaria"""
+    phi, lmb = math.radians(lat), math.radians(lng)
+    return (math.cos(phi) * math.cos(lmb), math.cos(phi) * math.sin(lmb), math.sin(phi))
+
+
+def _cuerda(radio_km: float) -> float:
+    """Distancia euclidiana en la esfera unitaria equivalente a `radio_km` sobre la superficie"""
+    return 2 * math.sin(min(radio_km / RADIO_TIERRA_KM, math.pi) / 2)
+
+
+class _ArbolKD:
+    """Árbol k-d estático en 3D guardado en listas: el nodo de [ini, fin) es su mediana"""
+
+    def __init__(self, puntos: Sequence[Tuple[float, float, float]]):
+        self._puntos = list(puntos)
+        self._orden = list(range(len(self._puntos)))
+        self._construir(0, len(self._orden), 0)
+
+    def _construir(self, ini: int, fin: int, eje: int) -> None:
+        if fin - ini <= 1:
+            return
+        medio = (ini + fin) // 2
+        self._orden[ini:fin] = sorted(self._orden[ini:fin], key=lambda i: self._puntos[i][eje])
+        siguiente = (eje + 1) % 3
+        self._construir(ini, medio, siguiente)
+        self._construir(medio + 1, fin, siguiente)
+
+    def cercanos(self, punto: Tuple[float, float, float], k: int, maximo: float) -> List[Tuple[float, int]]:
+        """Hasta `k` índices a distancia <= `maximo`, del más cercano al más lejano"""
+        # Max-heap de (-distancia², índice) con los mejores k encontrados
+        mejores: List[Tuple[float, int]] = []
+        limite = maximo * maximo
+
+        def visitar(ini: int, fin: int, eje: int) -> None:
+            nonlocal limite
+            if ini >= fin:
+                return
+            medio = (ini + fin) // 2
+            indice = self._orden[medio]
+            nodo = self._puntos[indice]
+            d2 = (punto[0] - nodo[0]) ** 2 + (punto[1] - nodo[1]) ** 2 + (punto[2] - nodo[2]) ** 2
+            if d2 <= limite:
+                heapq.heappush(mejores, (-d2, indice))
+                if len(mejores) > k:
+                    heapq.heappop(mejores)
+                if len(mejores) == k:
+                    limite = min(limite, -mejores[0][0])
+            diferencia = punto[eje] - nodo[eje]
+            cerca, lejos = ((ini, medio), (medio + 1, fin)) if diferencia < 0 else ((medio + 1, fin), (ini, medio))
+            siguiente = (eje + 1) % 3
+            visitar(cerca[0], cerca[1], siguiente)
+            if diferencia * diferencia <= limite:
+                visitar(lejos[0], lejos[1], siguiente)
+
+        if k > 0:
+            visitar(0, len(self._orden), 0)
+        return sorted((math.sqrt(-d2), indice) for d2, indice in mejores)
+
+
+class Nomenclator:
+    """
+    Lugares conocidos con búsqueda por nombre exacto, nombre aproximado y cercanía.
+
+    Args:
+        sitios: Lugares a indexar; si dos tienen el mismo nombre normalizado,
+            el último reemplaza al anterior
+    """
+
+    def __init__(self, sitios: Iterable[Sitio]):
+        por_nombre: Dict[str, Sitio] = {}
+        for sitio in sitios:
+            por_nombre[normalizar_nombre(sitio.nombre)] = sitio
+        self._sitios: List[Sitio] = list(por_nombre.values())
+
+        # Nombre o alias normalizado -> índice del lugar
+        self._exactos: Dict[str, int] = {}
+        # Trigramas de cada nombre o alias, y trigrama -> nombres que lo contienen
+        self._nombres: List[Tuple[int, frozenset]] = []
+        self._indice: Dict[str, List[int]] = defaultdict(list)
+        for i, sitio in enumerate(self._sitios):
+            for nombre in (sitio.nombre, *sitio.alias):
+                self._exactos.setdefault(normalizar_nombre(nombre), i)
+                grupo = trigramas(nombre)
+                for trigrama in grupo:
+                    self._indice[trigrama].append(len(self._nombres))
+                self._nombres.append((i, grupo))
+        # Los nombres propios tienen prioridad sobre los alias de otros lugares
+        for i, sitio in enumerate(self._sitios):
+            self._exactos[normalizar_nombre(sitio.nombre)] = i
+
+        self._arbol = _ArbolKD([_cartesianas(s.lat, s.lng) for s in self._sitios])
+
+    @classmethod
+    def desde_archivos(cls, rutas: Iterable[Path]) -> "Nomenclator":
+        """Lee las listas de lugares de los archivos JSON en orden"""
+        sitios: List[Sitio] = []
+        for ruta in rutas:
+            with open(ruta, encoding="utf-8") as archivo:
+                sitios.extend(Sitio.desde_dict(datos) for datos in json.load(archivo))
+        return cls(sitios)
+
+    @classmethod
+    def desde_entorno(cls) -> "Nomenclator":
+        """Lugares incluidos más los de INATURALIST_LUGARES_RUTA"""
+        rutas = [RUTA_LUGARES]
+        propia = os.getenv("INATURALIST_LUGARES_RUTA")
+        if propia:
+            rutas.append(Path(propia))
+        return cls.desde_archivos(rutas)
+
+    def __len__(self) -> int:
+        return len(self._sitios)
+
+    def __iter__(self) -> Iterator[Sitio]:
+        return iter(self._sitios)
+
+    def tipos(self) -> List[str]:
+        """Tipos de lugar presentes, en orden alfabético"""
+        return sorted({s.tipo for s in self._sitios})
+
+    def sugerir(self, texto: str, limite: int = 5, minimo: float = 0.3) -> List[Tuple[Sitio, float]]:
+        """Lugares cuyo nombre o alias se parece a `texto`, con su similitud (0 a 1)"""
+        buscados = trigramas(texto)
+        if not buscados:
+            return []
+        # Con similitud >= minimo un nombre comparte al menos `necesarios` trigramas con el
+        # texto, así que contiene alguno de los (len - necesarios + 1) más raros: sólo se
+        # recorren las listas de esos, no las de trigramas frecuentes como "hum" o " ri"
+        necesarios = max(1, math.ceil(minimo * len(buscados) - 1e-9))
+        raros = sorted(buscados, key=lambda t: len(self._indice.get(t, ())))[:len(buscados) - necesarios + 1]
+        mejores: Dict[int, float] = {}
+        for nombre in set(chain.from_iterable(self._indice.get(t, ()) for t in raros)):
+            sitio, grupo = self._nombres[nombre]
+            n = len(buscados & grupo)
+            similitud = n / (len(buscados) + len(grupo) - n)
+            if similitud >= minimo and similitud > mejores.get(sitio, 0.0):
+                mejores[sitio] = similitud
+        orden = heapq.nlargest(limite, mejores.items(), key=lambda par: (par[1], -par[0]))
+        return [(self._sitios[i], round(similitud, 3)) for i, similitud in orden]
+
+    def buscar(self, nombre: str, minimo: float = SIMILITUD_MINIMA) -> Optional[Sitio]:
+        """El lugar con ese nombre o alias o, si no hay, el de nombre más parecido"""
+        exacto = self._exactos.get(normalizar_nombre(nombre))
+        if exacto is not None:
+            return self._sitios[exacto]
+        sugerencias = self.sugerir(nombre, limite=1, minimo=minimo)
+        return sugerencias[0][0] if sugerencias else None
+
+    def cercanos(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 5,
+        radio_km: Optional[float] = None,
+        tipo: Optional[str] = None,
+    ) -> List[Tuple[Sitio, float]]:
+        """
+        Los `k` lugares más cercanos al punto, con su distancia en km.
+        Con `radio_km` sólo los que están a esa distancia o menos; con `tipo`
+        sólo los de ese tipo (sin distinguir mayúsculas ni tildes).
+        """
+        maximo = _cuerda(radio_km) if radio_km is not None else 2.0
+        if tipo is None:
+            encontrados = self._arbol.cercanos(_cartesianas(lat, lng), k, maximo)
+        else:
+            # Se piden todos los que caben en el radio y se filtran por tipo
+            encontrados = [
+                par for par in self._arbol.cercanos(_cartesianas(lat, lng), len(self._sitios), maximo)
+                if self._sitios[par[1]].es_de_tipo(tipo)
+            ][:k]
+        return [
+            (self._sitios[i], round(distancia_km(lat, lng, self._sitios[i].lat, self._sitios[i].lng), 3))
+            for _, i in encontrados
+        ]
+
+    def que_contienen(self, lat: float, lng: float) -> List[Sitio]:
+        """Lugares cuyo círculo (centro y `radio_km`) contiene el punto, del más cercano al más lejano"""
+        mayor = max((s.radio_km for s in self._sitios), default=0.0)
+        return [
+            sitio for sitio, distancia in self.cercanos(lat, lng, k=len(self._sitios), radio_km=mayor)
+            if distancia <= sitio.radio_km
+        ]
+
+
+_nomenclator: Optional[Nomenclator] = None
+
+
+def nomenclator() -> Nomenclator:
+    """Nomenclátor compartido del proceso, cargado la primera vez que se usa"""
+    global _nomenclator
+    if _nomenclator is None:
+        _nomenclator = Nomenclator.desde_entorno()
+    return _nomenclator
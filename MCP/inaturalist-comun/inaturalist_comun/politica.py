@@ -0,0 +1,361 @@
+"""
+Política de solicitudes a iNaturalist: plazos, reintentos y hedging
+
+Una respuesta lenta de iNaturalist no debería frenar el turno completo de un
+agente. Cada solicitud se hace dentro de un plazo total:
+
+- Plazo: el de la herramienta que la originó (`con_plazo`) o, si no hay, un
+  plazo por consulta. Reintentos, esperas y solicitudes duplicadas salen de
+  ese mismo presupuesto de tiempo. Las herramientas que reparten su trabajo
+  en muchas solicitudes declaran cuántas harán como máximo y su plazo crece
+  con el tiempo que el limitador de tasa tarda en dejarlas salir
+- Reintentos: los GET son idempotentes, así que ante errores de red o
+  respuestas 5xx se reintentan con espera exponencial con jitter completo.
+  Los 429 los maneja el limitador de tasa (Retry-After), no esta política
+- Hedging (opcional): si una solicitud tarda más que el percentil 95 de las
+  latencias recientes de su endpoint, se envía una copia y gana la primera
+  respuesta; la otra se cancela
+- Presupuesto de reintentos: cada solicitud deposita una fracción de ficha y
+  cada reintento o copia gasta una ficha entera, así que cuando iNaturalist
+  falla en masa los reintentos no multiplican la carga
+
+Configuración por variables de entorno (prefijo `INATURALIST_POLITICA`):
+
+- INATURALIST_POLITICA_PLAZO: Plazo en segundos de una consulta fuera de una herramienta (default: 20)
+- INATURALIST_POLITICA_PLAZO_HERRAMIENTA: Plazo en segundos de una herramienta (default: 45)
+- INATURALIST_POLITICA_PLAZOS: Plazos fijos por herramienta, "nombre=segundos,..." (opcional)
+- INATURALIST_POLITICA_TIMEOUT_INTENTO: Timeout en segundos de cada intento (default: 10)
+- INATURALIST_POLITICA_REINTENTOS: Reintentos como máximo por solicitud (default: 2)
+- INATURALIST_POLITICA_ESPERA_BASE / _ESPERA_MAX: Espera exponencial entre reintentos (default: 0.25 / 4)
+- INATURALIST_POLITICA_HEDGING: "1" habilita el hedging (default: 0)
+- INATURALIST_POLITICA_PERCENTIL: Percentil de latencia tras el que se envía la copia (default: 0.95)
+- INATURALIST_POLITICA_HEDGING_MIN: Espera mínima en segundos antes de la copia (default: 0.1)
+- INATURALIST_POLITICA_PRESUPUESTO: Fichas depositadas por solicitud (default: 0.1, ~10% de reintentos)
+- INATURALIST_POLITICA_PRESUPUESTO_MIN: Fichas máximas acumuladas, para ráfagas de fallos (default: 10)
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import math
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from .entorno import leer_bool
+from .metricas import etiqueta_endpoint
+
+# Códigos que justifican reintentar un GET
+STATUS_REINTENTABLES = {500, 502, 503, 504}
+
+_plazo_actual: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar("plazo_inaturalist", default=None)
+
+
+class PlazoAgotado(asyncio.TimeoutError):
+    """Se agotó el plazo antes de obtener una respuesta de iNaturalist"""
+
+
+@contextmanager
+def plazo(segundos: float) -> Iterator[None]:
+    """
+    Limita el tiempo total de las solicitudes hechas dentro del bloque,
+    incluidas las de tareas creadas dentro de él. Un plazo anidado sólo puede
+    acortar el que ya había.
+    """
+    limite = time.monotonic() + segundos
+    actual = _plazo_actual.get()
+    token = _plazo_actual.set(limite if actual is None else min(actual, limite))
+    try:
+        yield
+    finally:
+        _plazo_actual.reset(token)
+
+
+def contexto_sin_plazo() -> contextvars.Context:
+    """
+    Copia del contexto actual sin el plazo vigente. Las tareas que sobreviven
+    a quien las crea (refrescos en segundo plano, consultas compartidas) se
+    crean dentro de ella con `contexto.run(loop.create_task, coro)`; si no,
+    heredarían el plazo de la herramienta que las disparó.
+    """
+    contexto = contextvars.copy_context()
+    contexto.run(_plazo_actual.set, None)
+    return contexto
+
+
+def tiempo_restante() -> Optional[float]:
+    """Segundos que le quedan al plazo vigente (None si no hay plazo)"""
+    limite = _plazo_actual.get()
+    return None if limite is None else max(0.0, limite - time.monotonic())
+
+
+def _leer_plazos(valor: str) -> Dict[str, float]:
+    plazos = {}
+    for parte in valor.split(","):
+        nombre, _, segundos = parte.partition("=")
+        if nombre.strip() and segundos.strip():
+            plazos[nombre.strip()] = float(segundos)
+    return plazos
+
+
+@dataclass
+class ConfigPolitica:
+    """Parámetros de la política de solicitudes"""
+    plazo: float = 20.0
+    plazo_herramienta: float = 45.0
+    plazos: Dict[str, float] = field(default_factory=dict)
+    timeout_intento: float = 10.0
+    reintentos: int = 2
+    espera_base: float = 0.25
+    espera_max: float = 4.0
+    hedging: bool = False
+    percentil: float = 0.95
+    hedging_min: float = 0.1
+    muestras_min: int = 20
+    presupuesto: float = 0.1
+    presupuesto_min: float = 10.0
+
+    @classmethod
+    def desde_entorno(cls, prefijo: str = "INATURALIST_POLITICA") -> "ConfigPolitica":
+        """Lee la configuración de las variables de entorno descritas en el módulo"""
+        return cls(
+            plazo=float(os.getenv(f"{prefijo}_PLAZO", "20")),
+            plazo_herramienta=float(os.getenv(f"{prefijo}_PLAZO_HERRAMIENTA", "45")),
+            plazos=_leer_plazos(os.getenv(f"{prefijo}_PLAZOS", "")),
+            timeout_intento=float(os.getenv(f"{prefijo}_TIMEOUT_INTENTO", "10")),
+            reintentos=int(os.getenv(f"{prefijo}_REINTENTOS", "2")),
+            espera_base=float(os.getenv(f"{prefijo}_ESPERA_BASE", "0.25")),
+            espera_max=float(os.getenv(f"{prefijo}_ESPERA_MAX", "4")),
+            hedging=leer_bool(f"{prefijo}_HEDGING"),
+            percentil=float(os.getenv(f"{prefijo}_PERCENTIL", "0.95")),
+            hedging_min=float(os.getenv(f"{prefijo}_HEDGING_MIN", "0.1")),
+            presupuesto=float(os.getenv(f"{prefijo}_PRESUPUESTO", "0.1")),
+            presupuesto_min=float(os.getenv(f"{prefijo}_PRESUPUESTO_MIN", "10")),
+        )
+
+
+class PresupuestoReintentos:
+    """
+    Fichas para reintentos y copias: cada solicitud deposita `proporcion` y
+    cada reintento gasta una. A largo plazo los reintentos no superan esa
+    proporción de las solicitudes; `maximo` permite absorber ráfagas cortas.
+    """
+
+    def __init__(self, proporcion: float, maximo: float):
+        self.proporcion = proporcion
+        self.maximo = maximo
+        self._fichas = maximo
+
+    def depositar(self) -> None:
+        self._fichas = min(self.maximo, self._fichas + self.proporcion)
+
+    def retirar(self) -> bool:
+        if self._fichas < 1:
+            return False
+        self._fichas -= 1
+        return True
+
+    @property
+    def fichas(self) -> float:
+        return self._fichas
+
+
+class PoliticaSolicitudes:
+    """
+    Aplica plazo, reintentos, hedging y presupuesto a las solicitudes.
+
+    Args:
+        config: Parámetros de la política
+        reintentables: Excepciones de la solicitud que se pueden reintentar
+            (por ejemplo `httpx.TransportError`); las demás se propagan de inmediato
+        segundos_por_solicitud: Tiempo que se suma al plazo de una herramienta
+            por cada solicitud que declara (1 / tasa del limitador)
+    """
+
+    def __init__(
+        self,
+        config: Optional[ConfigPolitica] = None,
+        reintentables: Tuple[type, ...] = (OSError,),
+        segundos_por_solicitud: float = 1.0,
+    ):
+        self.config = config or ConfigPolitica()
+        self.reintentables = reintentables
+        self.segundos_por_solicitud = segundos_por_solicitud
+        self._presupuesto = PresupuestoReintentos(self.config.presupuesto, self.config.presupuesto_min)
+        self._latencias: Dict[str, Deque[float]] = {}
+        self._contadores = {
+            "solicitudes": 0,
+            "reintentos": 0,
+            "copias": 0,
+            "copias_ganadoras": 0,
+            "sin_presupuesto": 0,
+            "plazos_agotados": 0,
+        }
+
+    def con_plazo(
+        self,
+        funcion: Optional[Callable[..., Awaitable[Any]]] = None,
+        *,
+        solicitudes: Optional[Callable[[Dict[str, Any]], int]] = None,
+    ) -> Any:
+        """
+        Decorador para herramientas asíncronas: todas sus solicitudes
+        comparten el plazo de la herramienta. Conserva la firma de la función.
+
+        El plazo es `plazos[nombre]` si está configurado; si no,
+        `plazo_herramienta` más `segundos_por_solicitud` por cada solicitud
+        que `solicitudes` estima a partir de los argumentos de la llamada
+        (con sus valores por defecto), para herramientas que reparten el
+        trabajo en muchas solicitudes:
+
+            @politica.con_plazo(solicitudes=lambda a: 2 * len(a["areas"]))
+        """
+        if funcion is None:
+            return functools.partial(self.con_plazo, solicitudes=solicitudes)
+        fijo = self.config.plazos.get(funcion.__name__)
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        async def envoltura(*args: Any, **kwargs: Any) -> Any:
+            segundos = fijo
+            if segundos is None:
+                segundos = self.config.plazo_herramienta
+                if solicitudes is not None:
+                    enlazados = firma.bind(*args, **kwargs)
+                    enlazados.apply_defaults()
+                    segundos += max(0, solicitudes(enlazados.arguments)) * self.segundos_por_solicitud
+            with plazo(segundos):
+                return await funcion(*args, **kwargs)
+
+        return envoltura
+
+    async def ejecutar(self, endpoint: str, enviar: Callable[[float], Awaitable[Any]]) -> Any:
+        """
+        Hace la solicitud con reintentos y hedging dentro del plazo vigente.
+
+        Args:
+            endpoint: Endpoint de iNaturalist, para las latencias por endpoint
+            enviar: Función que hace un intento con el timeout dado (segundos)
+                y retorna la respuesta (un objeto con `status_code`, como httpx.Response)
+
+        Retorna la primera respuesta que no es 5xx o, agotados los reintentos,
+        la última respuesta. Lanza `PlazoAgotado` si el plazo vence antes.
+        """
+        self._contadores["solicitudes"] += 1
+        self._presupuesto.depositar()
+        limite = _plazo_actual.get()
+        if limite is None:
+            limite = time.monotonic() + self.config.plazo
+        etiqueta = etiqueta_endpoint(endpoint)
+
+        intento = 0
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                self._contadores["plazos_agotados"] += 1
+                raise PlazoAgotado(f"Se agotó el plazo consultando {endpoint}")
+            error: Optional[BaseException] = None
+            respuesta = None
+            try:
+                respuesta = await asyncio.wait_for(self._intento(etiqueta, enviar, limite), restante)
+            except asyncio.TimeoutError:
+                self._contadores["plazos_agotados"] += 1
+                raise PlazoAgotado(f"Se agotó el plazo consultando {endpoint}") from None
+            except self.reintentables as e:
+                error = e
+            else:
+                if respuesta.status_code not in STATUS_REINTENTABLES:
+                    return respuesta
+
+            intento += 1
+            espera = random.uniform(0, min(self.config.espera_max, self.config.espera_base * 2 ** (intento - 1)))
+            if intento > self.config.reintentos or time.monotonic() + espera >= limite:
+                return self._fallar(error, respuesta)
+            if not self._presupuesto.retirar():
+                self._contadores["sin_presupuesto"] += 1
+                return self._fallar(error, respuesta)
+            self._contadores["reintentos"] += 1
+            await asyncio.sleep(espera)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            **self._contadores,
+            "fichas": round(self._presupuesto.fichas, 2),
+            "hedging": self.config.hedging,
+            "espera_copia_s": {
+                etiqueta: round(demora, 3)
+                for etiqueta in self._latencias
+                if (demora := self._demora_copia(etiqueta)) is not None
+            } if self.config.hedging else {},
+        }
+
+    # --- Internos ------------------------------------------------------------
+
+    @staticmethod
+    def _fallar(error: Optional[BaseException], respuesta: Any) -> Any:
+        if error is not None:
+            raise error
+        return respuesta
+
+    def _demora_copia(self, etiqueta: str) -> Optional[float]:
+        """Percentil de las latencias recientes del endpoint (None si hay pocas)"""
+        latencias = self._latencias.get(etiqueta)
+        if not latencias or len(latencias) < self.config.muestras_min:
+            return None
+        ordenadas = sorted(latencias)
+        indice = min(len(ordenadas) - 1, math.ceil(self.config.percentil * len(ordenadas)) - 1)
+        return max(self.config.hedging_min, ordenadas[indice])
+
+    def _registrar_latencia(self, etiqueta: str, latencia: float) -> None:
+        self._latencias.setdefault(etiqueta, deque(maxlen=256)).append(latencia)
+
+    async def _intento(self, etiqueta: str, enviar: Callable[[float], Awaitable[Any]], limite: float) -> Any:
+        """Un intento: la solicitud y, si tarda más de lo habitual, una copia"""
+        def timeout() -> float:
+            return max(0.001, min(self.config.timeout_intento, limite - time.monotonic()))
+
+        demora = self._demora_copia(etiqueta) if self.config.hedging else None
+        if demora is None:
+            inicio = time.monotonic()
+            respuesta = await enviar(timeout())
+            self._registrar_latencia(etiqueta, time.monotonic() - inicio)
+            return respuesta
+
+        inicios: Dict[asyncio.Future, float] = {}
+
+        def lanzar() -> asyncio.Future:
+            tarea = asyncio.ensure_future(enviar(timeout()))
+            inicios[tarea] = time.monotonic()
+            return tarea
+
+        principal = lanzar()
+        pendientes = {principal}
+        try:
+            listas, _ = await asyncio.wait(pendientes, timeout=demora)
+            if not listas:
+                if self._presupuesto.retirar():
+                    self._contadores["copias"] += 1
+                    pendientes.add(lanzar())
+                else:
+                    self._contadores["sin_presupuesto"] += 1
+
+            ultima = principal
+            while pendientes:
+                listas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in listas:
+                    ultima = tarea
+                    if tarea.exception() is None and tarea.result().status_code not in STATUS_REINTENTABLES:
+                        self._registrar_latencia(etiqueta, time.monotonic() - inicios[tarea])
+                        if tarea is not principal:
+                            self._contadores["copias_ganadoras"] += 1
+                        return tarea.result()
+            # Ninguna respuesta sirvió: la última decide si se reintenta
+            return ultima.result()
+        finally:
+            for tarea in pendientes:
+                tarea.cancel()
@@ -0,0 +1,275 @@
+"""
+Precalentamiento periódico de las consultas más frecuentes
+
+La primera consulta después de un despliegue, o después de que una entrada
+de la caché vence, va en frío hasta iNaturalist. `Precalentador` repite en
+segundo plano las consultas calientes para que la caché las tenga listas.
+Cada ronda corre dentro de `recargar_antes`: las entradas que vencerían
+antes de la próxima ronda se recargan (con GET condicional), así que entre
+rondas se sirven frescas y no obsoletas.
+
+Las consultas calientes son:
+
+- Consultas fijas: las que el servicio declara (por ejemplo, las de la
+  Conejera con los valores por defecto) o las de INATURALIST_PRECALENTAR_CONSULTAS
+- Consultas aprendidas: las `aprendidas` más frecuentes del tráfico
+  reciente. Cada llamada suma 1 a su consulta y el peso acumulado cae a la
+  mitad cada `vida_media` segundos, así que una consulta que dejó de pedirse
+  sale del conjunto caliente
+
+Para no competir con el tráfico real, cada ronda:
+
+- Corre con PRIORIDAD_BAJA: en el limitador de tasa las solicitudes de los
+  usuarios pasan primero
+- Ejecuta como máximo `concurrencia` consultas a la vez
+- Antes de lanzar cada consulta espera mientras `ocupado()` indique que hay
+  solicitudes de usuarios esperando turno
+- Se separa de la anterior por el intervalo con un jitter de ±`jitter`,
+  para que varias réplicas no precalienten todas al mismo tiempo
+
+Las consultas que hace el precalentador no cuentan como tráfico.
+
+Configuración por variables de entorno (prefijo `INATURALIST_PRECALENTAR`):
+
+- INATURALIST_PRECALENTAR: "1" habilita el precalentamiento, "0" lo deshabilita
+  (default: el del servicio; apagado si no declara otro)
+- INATURALIST_PRECALENTAR_INTERVALO: Segundos entre rondas (default: 240, menos que el TTL de /observations)
+- INATURALIST_PRECALENTAR_JITTER: Variación aleatoria del intervalo, como fracción (default: 0.2)
+- INATURALIST_PRECALENTAR_CONCURRENCIA: Consultas simultáneas como máximo (default: 2)
+- INATURALIST_PRECALENTAR_APRENDIDAS: Consultas frecuentes que se suman a las fijas (default: 5, 0 no aprende)
+- INATURALIST_PRECALENTAR_VIDA_MEDIA: Segundos en que el peso de una llamada cae a la mitad (default: 1800)
+- INATURALIST_PRECALENTAR_CONSULTAS: Consultas fijas en JSON, reemplazan las del servicio:
+  [{"nombre": "buscar_observaciones", "argumentos": {"lugar": "Humedal Córdoba"}}]
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .cache import clave_consulta, recargar_antes
+from .entorno import leer_bool
+from .limitador import PRIORIDAD_BAJA, usar_prioridad
+
+logger = logging.getLogger(__name__)
+
+# Consultas distintas que se recuerdan como máximo para aprender las frecuentes
+MAX_CONSULTAS_RECORDADAS = 500
+
+# Espera entre comprobaciones mientras el servicio está ocupado
+PAUSA_OCUPADO = 0.5
+
+Consulta = Tuple[str, Dict[str, Any]]
+
+# Verdadero dentro de una consulta del precalentador (no se cuenta como tráfico)
+_precalentando: contextvars.ContextVar = contextvars.ContextVar("precalentando", default=False)
+
+
+def _leer_consultas(valor: str) -> Tuple[Consulta, ...]:
+    return tuple((c["nombre"], dict(c.get("argumentos") or {})) for c in json.loads(valor))
+
+
+@dataclass(frozen=True)
+class ConfigPrecalentamiento:
+    """Parámetros del precalentamiento"""
+    habilitado: bool = False
+    intervalo: float = 240.0
+    jitter: float = 0.2
+    concurrencia: int = 2
+    aprendidas: int = 5
+    vida_media: float = 1800.0
+    consultas: Tuple[Consulta, ...] = ()
+
+    @classmethod
+    def desde_entorno(
+        cls,
+        consultas: Sequence[Consulta] = (),
+        intervalo: float = 240.0,
+        habilitado: bool = False,
+        prefijo: str = "INATURALIST_PRECALENTAR",
+    ) -> "ConfigPrecalentamiento":
+        """
+        Construye la configuración a partir de las variables de entorno.
+        `consultas`, `intervalo` y `habilitado` son los valores por defecto del
+        servicio: sólo los servicios de larga vida deberían habilitarlo, porque
+        cada proceso que precalienta gasta cuota de iNaturalist al arrancar.
+        """
+        fijas = os.getenv(f"{prefijo}_CONSULTAS")
+        return cls(
+            habilitado=leer_bool(prefijo, habilitado),
+            intervalo=float(os.getenv(f"{prefijo}_INTERVALO", str(intervalo))),
+            jitter=min(1.0, max(0.0, float(os.getenv(f"{prefijo}_JITTER", "0.2")))),
+            concurrencia=max(1, int(os.getenv(f"{prefijo}_CONCURRENCIA", "2"))),
+            aprendidas=max(0, int(os.getenv(f"{prefijo}_APRENDIDAS", "5"))),
+            vida_media=float(os.getenv(f"{prefijo}_VIDA_MEDIA", "1800")),
+            consultas=_leer_consultas(fijas) if fijas else tuple((n, dict(a)) for n, a in consultas),
+        )
+
+
+class Precalentador:
+    """
+    Repite periódicamente las consultas fijas y las más frecuentes.
+
+    Args:
+        config: Intervalo, jitter, concurrencia y consultas fijas
+        ejecutar: Función asíncrona que ejecuta una consulta (nombre, argumentos).
+            Sin ella se llama directamente a las funciones decoradas con
+            `aprender`, con los argumentos como kwargs
+        ocupado: Indica si hay tráfico real esperando (por ejemplo, solicitudes
+            en espera en el limitador de tasa); el precalentador cede el turno
+        ignorar: Argumentos que no cambian la consulta a iNaturalist (como el
+            formato de la respuesta) y no se tienen en cuenta para agruparla
+    """
+
+    def __init__(
+        self,
+        config: ConfigPrecalentamiento,
+        ejecutar: Optional[Callable[[str, Dict[str, Any]], Awaitable[Any]]] = None,
+        ocupado: Optional[Callable[[], bool]] = None,
+        ignorar: Iterable[str] = (),
+    ):
+        self.config = config
+        self._ejecutar = ejecutar or self._llamar
+        self._funciones: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self._firmas: Dict[str, inspect.Signature] = {}
+        self._ocupado = ocupado or (lambda: False)
+        self._ignorar = frozenset(ignorar)
+        # clave -> (nombre, argumentos, peso, momento del peso)
+        self._trafico: Dict[str, Tuple[str, Dict[str, Any], float, float]] = {}
+        self._ultima_ronda: Optional[float] = None
+        self._contadores = {"rondas": 0, "consultas": 0, "errores": 0, "esperas_por_trafico": 0, "registradas": 0}
+
+    def registrar(self, nombre: str, argumentos: Dict[str, Any]) -> None:
+        """Cuenta una llamada real a la consulta (las del precalentador se ignoran)"""
+        if _precalentando.get() or self.config.aprendidas == 0:
+            return
+        argumentos = self._completar(nombre, argumentos)
+        try:
+            clave = clave_consulta(nombre, argumentos)
+            json.dumps(argumentos)
+        except (TypeError, ValueError):
+            return  # argumentos que no se pueden repetir tal cual (por ejemplo, modelos)
+        ahora = time.monotonic()
+        _, _, peso, desde = self._trafico.get(clave, (nombre, argumentos, 0.0, ahora))
+        self._trafico[clave] = (nombre, argumentos, self._decaer(peso, desde, ahora) + 1.0, ahora)
+        self._contadores["registradas"] += 1
+        if len(self._trafico) > MAX_CONSULTAS_RECORDADAS:
+            menos_pedida = min(self._trafico, key=lambda c: self._peso(c, ahora))
+            del self._trafico[menos_pedida]
+
+    def aprender(self, funcion: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """
+        Decorador para herramientas asíncronas: registra cada llamada con sus
+        argumentos. Conserva la firma de la función. Va debajo de los
+        decoradores de métricas, para que las llamadas del precalentador no
+        aparezcan como llamadas a la herramienta.
+        """
+        firma = inspect.signature(funcion)
+        self._funciones[funcion.__name__] = funcion
+        self._firmas[funcion.__name__] = firma
+
+        @functools.wraps(funcion)
+        async def envoltura(*args: Any, **kwargs: Any) -> Any:
+            try:
+                argumentos = firma.bind(*args, **kwargs).arguments
+            except TypeError:
+                argumentos = None
+            if argumentos is not None:
+                self.registrar(funcion.__name__, dict(argumentos))
+            return await funcion(*args, **kwargs)
+
+        return envoltura
+
+    def calientes(self) -> List[Consulta]:
+        """Consultas fijas más las `aprendidas` con mayor peso, sin repetir"""
+        consultas: Dict[str, Consulta] = {}
+        for nombre, argumentos in self.config.consultas:
+            consultas.setdefault(clave_consulta(nombre, self._completar(nombre, argumentos)), (nombre, argumentos))
+        ahora = time.monotonic()
+        frecuentes = sorted(self._trafico, key=lambda c: self._peso(c, ahora), reverse=True)
+        for clave in frecuentes[:self.config.aprendidas]:
+            nombre, argumentos, _, _ = self._trafico[clave]
+            consultas.setdefault(clave, (nombre, argumentos))
+        return list(consultas.values())
+
+    async def precalentar(self) -> None:
+        """Una ronda: ejecuta las consultas calientes, de a `concurrencia` a la vez"""
+        semaforo = asyncio.Semaphore(self.config.concurrencia)
+
+        async def una(nombre: str, argumentos: Dict[str, Any]) -> None:
+            async with semaforo:
+                while self._ocupado():
+                    self._contadores["esperas_por_trafico"] += 1
+                    await asyncio.sleep(PAUSA_OCUPADO)
+                self._contadores["consultas"] += 1
+                try:
+                    resultado = await self._ejecutar(nombre, dict(argumentos))
+                except Exception as e:
+                    resultado = {"error": str(e)}
+                if isinstance(resultado, dict) and "error" in resultado:
+                    self._contadores["errores"] += 1
+                    logger.warning("No se pudo precalentar %s %s: %s", nombre, argumentos, resultado["error"])
+
+        # Lo que vencería antes de la próxima ronda (intervalo + jitter) se recarga ahora
+        margen = self.config.intervalo * (1 + self.config.jitter)
+        token = _precalentando.set(True)
+        try:
+            with usar_prioridad(PRIORIDAD_BAJA), recargar_antes(margen):
+                await asyncio.gather(*(una(nombre, argumentos) for nombre, argumentos in self.calientes()))
+        finally:
+            _precalentando.reset(token)
+        self._contadores["rondas"] += 1
+        self._ultima_ronda = time.monotonic()
+
+    async def ejecutar(self) -> None:
+        """Precalienta al arrancar y luego cada `intervalo` ± jitter segundos (tarea de fondo)"""
+        if not self.config.habilitado:
+            return
+        while True:
+            await self.precalentar()
+            variacion = 1 + random.uniform(-self.config.jitter, self.config.jitter)
+            await asyncio.sleep(self.config.intervalo * variacion)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores, consultas calientes y segundos desde la última ronda"""
+        ahora = time.monotonic()
+        return {
+            **self._contadores,
+            "habilitado": self.config.habilitado,
+            "calientes": [{"nombre": n, "argumentos": a} for n, a in self.calientes()],
+            "recordadas": len(self._trafico),
+            "ultima_ronda_s": round(ahora - self._ultima_ronda, 1) if self._ultima_ronda is not None else None,
+        }
+
+    def _completar(self, nombre: str, argumentos: Dict[str, Any]) -> Dict[str, Any]:
+        """Argumentos con los valores por defecto de la función, sin los ignorados"""
+        firma = self._firmas.get(nombre)
+        if firma is not None:
+            try:
+                enlazados = firma.bind(**argumentos)
+                enlazados.apply_defaults()
+                argumentos = enlazados.arguments
+            except TypeError:
+                pass
+        return {k: v for k, v in argumentos.items() if k not in self._ignorar}
+
+    async def _llamar(self, nombre: str, argumentos: Dict[str, Any]) -> Any:
+        if nombre not in self._funciones:
+            raise KeyError(f"'{nombre}' no está decorada con aprender")
+        return await self._funciones[nombre](**argumentos)
+
+    def _decaer(self, peso: float, desde: float, ahora: float) -> float:
+        if self.config.vida_media <= 0:
+            return peso
+        return peso * 0.5 ** ((ahora - desde) / self.config.vida_media)
+
+    def _peso(self, clave: str, ahora: float) -> float:
+        _, _, peso, desde = self._trafico[clave]
+        return self._decaer(peso, desde, ahora)
@@ -0,0 +1,286 @@
+"""
+Consultas por teselas: búsquedas cercanas reutilizan los mismos resultados
+
+Los agentes consultan el mismo humedal con centros y radios apenas distintos
+(4.8155 vs. 4.7519), así que una caché por clave exacta casi nunca acierta.
+Aquí un círculo se descompone en teselas fijas del mapa (las de Web Mercator,
+identificadas por su quadkey); cada tesela se consulta a iNaturalist por su
+caja (`swlat`/`swlng`/`nelat`/`nelng`) y se guarda en caché por separado. La
+respuesta para el círculo se arma uniendo las teselas que lo cubren y
+filtrando por distancia haversine, de modo que dos búsquedas que se solapan
+sólo pagan las teselas que faltan.
+
+Cada tesela se pide ordenada por id descendente en páginas de 200. Para
+retornar las `limite` observaciones más recientes del círculo no hace falta
+descargar teselas completas: basta con que ninguna tesela incompleta pueda
+tener, en las páginas que faltan, una observación más reciente que la última
+del resultado. Si para eso una tesela necesita más de `max_paginas` páginas,
+o el círculo cubre más de `max_teselas`, la consulta va directo a iNaturalist.
+
+Configuración por variables de entorno:
+
+- INATURALIST_TESELAS: "1" habilita las consultas por teselas (default: 0).
+  Convienen para búsquedas grandes y repetidas sobre áreas que se solapan
+  (como el pool de la API, de 200 observaciones por lugar); para una página
+  de 10 observaciones descargan varias teselas de 200 y el total pasa a ser
+  una estimación
+- INATURALIST_TESELAS_ZOOM: Nivel de las teselas; 13 son ~4.9 km de lado en
+  el ecuador y cada nivel más divide el lado a la mitad (default: 13)
+- INATURALIST_TESELAS_MAX: Teselas como máximo por consulta (default: 12)
+- INATURALIST_TESELAS_MAX_PAGINAS: Páginas como máximo por tesela (default: 5)
+"""
+
+import asyncio
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .decodificacion import Observacion, Pagina
+from .entorno import leer_bool
+
+RADIO_TIERRA_KM = 6371.0088
+
+# Resultados por página al pedir una tesela (el máximo de iNaturalist)
+POR_PAGINA_TESELA = 200
+
+# Órdenes que se pueden resolver con las teselas: el id crece con la fecha de creación
+ORDEN_TESELAS = {"created_at", "id"}
+
+
+def distancia_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distancia haversine entre dos puntos en km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def caja_envolvente(lat: float, lng: float, radius: float) -> Tuple[float, float, float, float]:
+    """Rectángulo (min_lat, max_lat, min_lng, max_lng) que contiene el círculo"""
+    dlat = math.degrees(radius / RADIO_TIERRA_KM)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+@dataclass(frozen=True)
+class Tesela:
+    """Tesela de Web Mercator (x, y) en un nivel de zoom"""
+    zoom: int
+    x: int
+    y: int
+
+    @property
+    def quadkey(self) -> str:
+        digitos = []
+        for nivel in range(self.zoom, 0, -1):
+            mascara = 1 << (nivel - 1)
+            digitos.append(str((1 if self.x & mascara else 0) + (2 if self.y & mascara else 0)))
+        return "".join(digitos)
+
+    def caja(self) -> Tuple[float, float, float, float]:
+        """(swlat, swlng, nelat, nelng), redondeada para que la clave de caché sea estable"""
+        n = 2 ** self.zoom
+        oeste = self.x / n * 360.0 - 180.0
+        este = (self.x + 1) / n * 360.0 - 180.0
+        norte = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * self.y / n))))
+        sur = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (self.y + 1) / n))))
+        return round(sur, 7), round(oeste, 7), round(norte, 7), round(este, 7)
+
+
+def tesela_de(lat: float, lng: float, zoom: int) -> Tesela:
+    """Tesela que contiene el punto"""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return Tesela(zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1))
+
+
+def teselas_que_cubren(lat: float, lng: float, radius: float, zoom: int) -> List[Tesela]:
+    """Teselas que tocan el círculo (descarta las esquinas de la caja que quedan fuera)"""
+    min_lat, max_lat, min_lng, max_lng = caja_envolvente(lat, lng, radius)
+    noroeste, sureste = tesela_de(max_lat, min_lng, zoom), tesela_de(min_lat, max_lng, zoom)
+    teselas = []
+    for x in range(noroeste.x, sureste.x + 1):
+        for y in range(noroeste.y, sureste.y + 1):
+            tesela = Tesela(zoom, x, y)
+            swlat, swlng, nelat, nelng = tesela.caja()
+            # Punto de la tesela más cercano al centro
+            cerca_lat, cerca_lng = min(max(lat, swlat), nelat), min(max(lng, swlng), nelng)
+            if distancia_km(lat, lng, cerca_lat, cerca_lng) <= radius:
+                teselas.append(tesela)
+    return teselas
+
+
+@dataclass(frozen=True)
+class ConfigTeselas:
+    habilitadas: bool = False
+    zoom: int = 13
+    max_teselas: int = 12
+    max_paginas: int = 5
+
+    @classmethod
+    def desde_entorno(cls) -> "ConfigTeselas":
+        return cls(
+            habilitadas=leer_bool("INATURALIST_TESELAS"),
+            zoom=int(os.getenv("INATURALIST_TESELAS_ZOOM", "13")),
+            max_teselas=int(os.getenv("INATURALIST_TESELAS_MAX", "12")),
+            max_paginas=int(os.getenv("INATURALIST_TESELAS_MAX_PAGINAS", "5")),
+        )
+
+
+@dataclass
+class _EstadoTesela:
+    tesela: Tesela
+    observaciones: List[Observacion] = field(default_factory=list)
+    total: Optional[int] = None  # observaciones de la tesela según iNaturalist
+    paginas: int = 0
+    completa: bool = False
+
+    @property
+    def ultimo_id(self) -> float:
+        return self.observaciones[-1].id if self.observaciones else math.inf
+
+
+@dataclass
+class ResultadoTeselas:
+    """Observaciones del círculo armadas a partir de teselas"""
+    total: int
+    resultados: Tuple[Observacion, ...]
+    total_exacto: bool  # False si el total se estimó a partir de teselas incompletas
+    teselas: int
+
+
+class ConsultaTeselada:
+    """
+    Responde búsquedas de observaciones por círculo uniendo teselas.
+
+    Args:
+        config: Zoom y límites
+        cargar: Función que hace el GET a `/observations` con los parámetros
+            dados y retorna una `Pagina` de `Observacion`. Conviene que use la
+            caché y la agrupación de consultas en vuelo del servicio: así cada
+            página de cada tesela se descarga una sola vez.
+    """
+
+    def __init__(self, config: ConfigTeselas, cargar: Callable[[dict], Awaitable[Pagina]]):
+        self.config = config
+        self.cargar = cargar
+        self._contadores = {
+            "consultas": 0,
+            "resueltas": 0,
+            "paginas_tesela": 0,
+            "fallback_limite": 0,
+            "fallback_orden": 0,
+            "fallback_teselas": 0,
+            "fallback_paginas": 0,
+        }
+
+    async def buscar(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        limite: int,
+        filtros: Optional[Dict[str, Any]] = None,
+        order_by: str = "created_at",
+    ) -> Optional[ResultadoTeselas]:
+        """
+        Las `limite` observaciones más recientes dentro del círculo que
+        cumplen `filtros` (parámetros de iNaturalist como `taxon_name` o
+        `quality_grade`). Retorna None si la consulta no se puede resolver
+        con teselas y debe ir directo a iNaturalist.
+
+        El total es exacto si todas las teselas se descargaron completas; si
+        no, se estima con la fracción de cada tesela que cae en el círculo.
+        """
+        self._contadores["consultas"] += 1
+        if limite <= 0:
+            # Sólo el conteo (per_page=0): iNaturalist da el total exacto en una solicitud
+            self._contadores["fallback_limite"] += 1
+            return None
+        if order_by not in ORDEN_TESELAS:
+            self._contadores["fallback_orden"] += 1
+            return None
+        teselas = teselas_que_cubren(lat, lng, radius, self.config.zoom)
+        if not teselas or len(teselas) > self.config.max_teselas:
+            self._contadores["fallback_teselas"] += 1
+            return None
+
+        estados = [_EstadoTesela(t) for t in teselas]
+        pendientes = estados
+        while True:
+            await asyncio.gather(*(self._siguiente_pagina(e, filtros or {}) for e in pendientes))
+            dentro = self._dentro_del_circulo(estados, lat, lng, radius)
+            # Ninguna observación sin descargar puede superar a la última del resultado
+            umbral = dentro[limite - 1].id if len(dentro) >= limite else -math.inf
+            pendientes = [e for e in estados if not e.completa and e.ultimo_id > umbral]
+            if not pendientes:
+                break
+            if any(e.paginas >= self.config.max_paginas for e in pendientes):
+                self._contadores["fallback_paginas"] += 1
+                return None
+
+        self._contadores["resueltas"] += 1
+        return ResultadoTeselas(
+            total=self._total(estados, dentro, lat, lng, radius),
+            resultados=tuple(dentro[:limite]),
+            total_exacto=all(e.completa for e in estados),
+            teselas=len(estados),
+        )
+
+    async def _siguiente_pagina(self, estado: _EstadoTesela, filtros: Dict[str, Any]) -> None:
+        swlat, swlng, nelat, nelng = estado.tesela.caja()
+        params = {
+            **filtros,
+            "swlat": swlat,
+            "swlng": swlng,
+            "nelat": nelat,
+            "nelng": nelng,
+            "per_page": POR_PAGINA_TESELA,
+            "order_by": "id",
+            "order": "desc",
+        }
+        if estado.observaciones:
+            params["id_below"] = estado.observaciones[-1].id
+        pagina = await self.cargar(params)
+        self._contadores["paginas_tesela"] += 1
+        if estado.total is None:
+            estado.total = pagina.total
+        estado.observaciones.extend(pagina.resultados)
+        estado.paginas += 1
+        estado.completa = len(pagina.resultados) < POR_PAGINA_TESELA
+
+    @staticmethod
+    def _dentro_del_circulo(estados: List[_EstadoTesela], lat: float, lng: float, radius: float) -> List[Observacion]:
+        """Observaciones descargadas dentro del círculo, sin repetir y de la más reciente a la más antigua"""
+        por_id: Dict[int, Observacion] = {}
+        for estado in estados:
+            for obs in estado.observaciones:
+                if obs.latitud is None or obs.longitud is None or obs.id in por_id:
+                    continue
+                if distancia_km(lat, lng, obs.latitud, obs.longitud) <= radius:
+                    por_id[obs.id] = obs
+        return sorted(por_id.values(), key=lambda o: o.id, reverse=True)
+
+    @staticmethod
+    def _total(estados: List[_EstadoTesela], dentro: List[Observacion], lat: float, lng: float, radius: float) -> int:
+        if all(e.completa for e in estados):
+            return len(dentro)
+        total = 0.0
+        for estado in estados:
+            en_circulo = sum(
+                1 for o in estado.observaciones
+                if o.latitud is not None and o.longitud is not None
+                and distancia_km(lat, lng, o.latitud, o.longitud) <= radius
+            )
+            if estado.completa or not estado.observaciones:
+                total += en_circulo
+            else:
+                total += (estado.total or 0) * en_circulo / len(estado.observaciones)
+        return round(total)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {**self._contadores, "zoom": self.config.zoom}
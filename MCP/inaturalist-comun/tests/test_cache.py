@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+import pytest
+
+from inaturalist_comun import (
+    BackendSQLite,
+    CacheRespuestas,
+    ConfigCache,
+    NoModificada,
+    Validada,
+    clave_consulta,
+    encabezados_condicionales,
+    recargar_antes,
+)
+
+
+class Cargador:
+    """Función de carga que cuenta sus llamadas y retorna valores sucesivos"""
+
+    def __init__(self, *valores):
+        self.valores = list(valores)
+        self.llamadas = 0
+        self.encabezados = []
+
+    async def __call__(self):
+        self.llamadas += 1
+        self.encabezados.append(encabezados_condicionales())
+        valor = self.valores.pop(0)
+        if isinstance(valor, Exception):
+            raise valor
+        return valor
+
+
+def vencer(cache, endpoint, params, segundos):
+    """Mueve el vencimiento de la entrada `segundos` hacia el pasado"""
+    cache._entradas[clave_consulta(endpoint, params)].expira = time.time() - segundos
+
+
+def test_clave_consulta_ignora_orden_vacios_y_formato():
+    a = clave_consulta("/observations", {"lat": 4.8155, "lng": -74.075, "taxon_name": "", "page": None})
+    b = clave_consulta("/observations", {"lng": -74.07500, "lat": 4.81550})
+    assert a == b
+    assert clave_consulta("/taxa", {"ids": [3, 1, 2]}) == clave_consulta("/taxa", {"ids": (1, 2, 3)})
+    assert clave_consulta("/taxa", {"activo": True}) == "/taxa?activo=true"
+
+
+def test_ttl_por_endpoint():
+    cache = CacheRespuestas(ConfigCache(ttl_por_defecto=5.0))
+    assert cache.ttl("/taxa/123") == 3600.0
+    assert cache.ttl("/observations") == 300.0
+    assert cache.ttl("/otro") == 5.0
+
+
+async def test_acierto_sin_volver_a_cargar():
+    cache = CacheRespuestas()
+    cargar = Cargador({"total": 1})
+    assert await cache.obtener("/observations", {"lat": 1}, cargar) == {"total": 1}
+    assert await cache.obtener("/observations", {"lat": 1}, cargar) == {"total": 1}
+    assert cargar.llamadas == 1
+    assert cache.estadisticas()["aciertos"] == 1
+
+
+async def test_obsoleta_se_sirve_y_se_refresca_en_segundo_plano():
+    cache = CacheRespuestas(ConfigCache(max_obsoleto=60))
+    cargar = Cargador("viejo", "nuevo")
+    await cache.obtener("/observations", {}, cargar)
+    vencer(cache, "/observations", {}, 10)
+
+    assert await cache.obtener("/observations", {}, cargar) == "viejo"
+    await asyncio.gather(*cache._refrescando.values())
+    assert await cache.obtener("/observations", {}, cargar) == "nuevo"
+    assert cache.estadisticas()["refrescos"] == 1
+
+
+async def test_vencida_vuelve_a_cargar():
+    cache = CacheRespuestas(ConfigCache(max_obsoleto=60))
+    cargar = Cargador("viejo", "nuevo")
+    await cache.obtener("/observations", {}, cargar)
+    vencer(cache, "/observations", {}, 120)
+    assert await cache.obtener("/observations", {}, cargar) == "nuevo"
+    assert cache.estadisticas()["fallos"] == 2
+
+
+async def test_revalidacion_con_304_conserva_el_valor():
+    cache = CacheRespuestas(ConfigCache(max_obsoleto=0))
+    cargar = Cargador(Validada("valor", etag='"abc"', ultima_modificacion="Mon, 01 Jan 2024 00:00:00 GMT"), NoModificada())
+    await cache.obtener("/observations", {}, cargar)
+    vencer(cache, "/observations", {}, 1)
+
+    assert await cache.obtener("/observations", {}, cargar) == "valor"
+    assert cargar.encabezados == [
+        {},
+        {"If-None-Match": '"abc"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"},
+    ]
+    estadisticas = cache.estadisticas()
+    assert estadisticas["condicionales"] == 1
+    assert estadisticas["no_modificadas"] == 1
+    # El TTL se renovó
+    assert await cache.obtener("/observations", {}, cargar) == "valor"
+
+
+async def test_recargar_antes_de_vencer():
+    cache = CacheRespuestas()
+    cargar = Cargador(Validada("viejo", etag='"v1"'), "nuevo")
+    await cache.obtener("/observations", {}, cargar)
+    # Con un margen menor que lo que falta para vencer se sirve la entrada
+    with recargar_antes(1):
+        assert await cache.obtener("/observations", {}, cargar) == "viejo"
+
+    with recargar_antes(cache.ttl("/observations") + 1):
+        assert await cache.obtener("/observations", {}, cargar) == "nuevo"
+    assert cargar.encabezados == [{}, {"If-None-Match": '"v1"'}]
+    assert cache.estadisticas()["recargas_anticipadas"] == 1
+
+
+async def test_expulsion_lru():
+    cache = CacheRespuestas(ConfigCache(max_entradas=2))
+    for n in (1, 2):
+        await cache.obtener("/taxa", {"id": n}, Cargador(n))
+    await cache.obtener("/taxa", {"id": 1}, Cargador())  # 1 pasa a ser la más reciente
+    await cache.obtener("/taxa", {"id": 3}, Cargador(3))
+
+    cargar = Cargador(20)
+    assert await cache.obtener("/taxa", {"id": 2}, cargar) == 20
+    assert cargar.llamadas == 1
+    assert cache.estadisticas()["expulsiones"] >= 1
+
+
+async def test_deshabilitada_siempre_carga():
+    cache = CacheRespuestas(ConfigCache(habilitada=False))
+    cargar = Cargador(1, 2)
+    assert await cache.obtener("/taxa", {}, cargar) == 1
+    assert await cache.obtener("/taxa", {}, cargar) == 2
+
+
+async def test_persistencia_en_sqlite(tmp_path):
+    ruta = str(tmp_path / "cache.sqlite")
+    primera = CacheRespuestas(ConfigCache(ruta_sqlite=ruta))
+    await primera.obtener("/observations", {"lat": 4.75}, Cargador({"total_results": 1, "results": [{"id": 7}]}))
+    await primera.cerrar()
+
+    # Otro proceso con el mismo archivo arranca con la caché caliente
+    segunda = CacheRespuestas(ConfigCache(ruta_sqlite=ruta))
+    valor = await segunda.obtener("/observations", {"lat": 4.75}, Cargador())
+    await segunda.cerrar()
+    assert valor == {"total_results": 1, "results": [{"id": 7}]}
+    assert segunda.estadisticas()["aciertos_disco"] == 1
+
+
+def test_backend_sqlite_acotado(tmp_path):
+    from inaturalist_comun.cache import Entrada
+
+    backend = BackendSQLite(str(tmp_path / "cache.sqlite"), max_entradas=2)
+    for n in range(3):
+        backend.escribir(f"c{n}", Entrada(n, 0.0, time.time() + 60))
+    assert backend.leer("c0") is None
+    assert backend.leer("c2").valor == 2
+    assert backend.purgar(time.time() + 120) == 2
+    backend.cerrar()
+
+
+async def test_error_al_cargar_se_propaga():
+    cache = CacheRespuestas()
+    with pytest.raises(RuntimeError):
+        await cache.obtener("/taxa", {}, Cargador(RuntimeError("caída")))
+    assert cache.estadisticas()["entradas"] == 0
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from inaturalist_comun import ConsultasEnVuelo
+
+
+async def test_llamadas_concurrentes_comparten_una_consulta():
+    consultas = ConsultasEnVuelo()
+    llamadas = 0
+
+    async def cargar():
+        nonlocal llamadas
+        llamadas += 1
+        await asyncio.sleep(0.01)
+        return {"total": 3}
+
+    resultados = await asyncio.gather(*(consultas.ejecutar("a", cargar) for _ in range(5)))
+    assert resultados == [{"total": 3}] * 5
+    assert llamadas == 1
+    assert consultas.estadisticas() == {"originales": 1, "coalescidas": 4, "en_vuelo": 0}
+
+
+async def test_claves_distintas_no_se_agrupan():
+    consultas = ConsultasEnVuelo()
+
+    async def cargar(valor):
+        await asyncio.sleep(0)
+        return valor
+
+    assert await asyncio.gather(consultas.ejecutar("a", lambda: cargar(1)), consultas.ejecutar("b", lambda: cargar(2))) == [1, 2]
+    assert consultas.estadisticas()["originales"] == 2
+
+
+async def test_la_excepcion_llega_a_todos():
+    consultas = ConsultasEnVuelo()
+
+    async def cargar():
+        await asyncio.sleep(0.01)
+        raise ValueError("falló")
+
+    resultados = await asyncio.gather(*(consultas.ejecutar("a", cargar) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in resultados)
+    assert consultas.en_vuelo() == 0
+
+
+async def test_cancelar_a_uno_no_cancela_la_consulta():
+    consultas = ConsultasEnVuelo()
+    liberar = asyncio.Event()
+
+    async def cargar():
+        await liberar.wait()
+        return "listo"
+
+    primero = asyncio.ensure_future(consultas.ejecutar("a", cargar))
+    segundo = asyncio.ensure_future(consultas.ejecutar("a", cargar))
+    await asyncio.sleep(0)
+    primero.cancel()
+    liberar.set()
+
+    assert await segundo == "listo"
+    with pytest.raises(asyncio.CancelledError):
+        await primero
@@ -0,0 +1,76 @@
+import json
+
+from inaturalist_comun import Observacion, Pagina, Taxon, decodificar_pagina, leer_coordenadas
+from inaturalist_comun.decodificacion import a_json, desde_json
+
+OBSERVACION = {
+    "id": 10,
+    "species_guess": "Tingua bogotana",
+    "taxon": {
+        "id": 20,
+        "name": "Rallus semiplumbeus",
+        "preferred_common_name": "Tingua bogotana",
+        "rank": "species",
+        "min_species_taxon_id": 20,
+        "ancestors": [{"id": 1}],
+    },
+    "observed_on": "2024-05-01",
+    "observed_on_string": "1 de mayo de 2024",
+    "place_guess": "Humedal La Conejera",
+    "user": {"login": "ana", "name": "Ana", "icon": "x"},
+    "photos": [{"url": "https://static.inaturalist.org/photos/1/square.jpg"}, {"url": "otra"}],
+    "location": "4.7519,-74.0841",
+    "identifications": [{"id": 5}],
+}
+
+
+def test_leer_coordenadas():
+    assert leer_coordenadas("4.7519,-74.0841") == (4.7519, -74.0841)
+    assert leer_coordenadas(None) == (None, None)
+    assert leer_coordenadas("") == (None, None)
+    assert leer_coordenadas("4.75") == (None, None)
+    assert leer_coordenadas("a,b") == (None, None)
+
+
+def test_observacion_desde_inaturalist():
+    obs = Observacion.desde_inaturalist(OBSERVACION)
+    assert obs.id == 10
+    assert obs.taxon_nombre == "Rallus semiplumbeus"
+    assert obs.taxon_rango == "species"
+    assert obs.especie_id == 20
+    assert obs.usuario_login == "ana"
+    assert obs.foto_url == "https://static.inaturalist.org/photos/1/square.jpg"
+    assert (obs.latitud, obs.longitud) == (4.7519, -74.0841)
+
+
+def test_observacion_sin_taxon_ni_fotos():
+    obs = Observacion.desde_inaturalist({"id": 11})
+    assert obs.taxon_id is None
+    assert obs.foto_url is None
+    assert obs.latitud is None
+
+
+def test_decodificar_pagina():
+    contenido = json.dumps({"total_results": 57, "results": [OBSERVACION, {"id": 11}]}).encode()
+    pagina = decodificar_pagina(contenido, Observacion)
+    assert pagina.total == 57
+    assert [o.id for o in pagina.resultados] == [10, 11]
+    assert isinstance(pagina.resultados, tuple)
+
+
+def test_json_ida_y_vuelta():
+    pagina = Pagina(1, (Observacion.desde_inaturalist(OBSERVACION),))
+    texto = json.dumps({"pagina": pagina, "taxon": Taxon.desde_inaturalist(OBSERVACION["taxon"])}, default=a_json)
+    datos = json.loads(texto, object_hook=desde_json)
+    assert isinstance(datos["pagina"], Pagina)
+    assert datos["pagina"].resultados[0].taxon_nombre_comun == "Tingua bogotana"
+    assert datos["taxon"].rango == "species"
+
+
+def test_desde_json_con_campos_nuevos_ausentes():
+    # Registro guardado antes de agregar taxon_rango y especie_id
+    guardado = {"__tipo__": "Observacion", "id": 3, "especie": "x"}
+    obs = desde_json(dict(guardado))
+    assert obs.id == 3
+    assert obs.taxon_rango is None
+    assert obs.especie_id is None
@@ -0,0 +1,25 @@
+import pytest
+
+from inaturalist_comun import leer_bool
+
+
+@pytest.mark.parametrize("valor", ["1", "true", "TRUE", "si", "Sí", "yes", " on "])
+def test_valores_verdaderos(monkeypatch, valor):
+    monkeypatch.setenv("PRUEBA_BOOL", valor)
+    assert leer_bool("PRUEBA_BOOL") is True
+
+
+@pytest.mark.parametrize("valor", ["0", "false", "No", "OFF"])
+def test_valores_falsos(monkeypatch, valor):
+    monkeypatch.setenv("PRUEBA_BOOL", valor)
+    assert leer_bool("PRUEBA_BOOL", default=True) is False
+
+
+@pytest.mark.parametrize("valor", [None, "", "quizas"])
+def test_sin_definir_o_desconocido_toma_el_default(monkeypatch, valor):
+    if valor is None:
+        monkeypatch.delenv("PRUEBA_BOOL", raising=False)
+    else:
+        monkeypatch.setenv("PRUEBA_BOOL", valor)
+    assert leer_bool("PRUEBA_BOOL") is False
+    assert leer_bool("PRUEBA_BOOL", default=True) is True
@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+from inaturalist_comun import (
+    PRIORIDAD_ALTA,
+    PRIORIDAD_BAJA,
+    ConfigLimitador,
+    LimitadorTasa,
+    solicitar_con_limite,
+    usar_prioridad,
+)
+from inaturalist_comun.limitador import segundos_retry_after
+
+
+def test_segundos_retry_after():
+    assert segundos_retry_after("3") == 3.0
+    assert segundos_retry_after("-1") == 0.0
+    assert segundos_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert segundos_retry_after(None) is None
+    assert segundos_retry_after("pronto") is None
+
+
+async def test_rafaga_y_tasa():
+    limitador = LimitadorTasa(ConfigLimitador(tasa=20, rafaga=2, concurrencia_inicial=10))
+    inicio = asyncio.get_running_loop().time()
+    for _ in range(4):
+        async with limitador.permiso() as permiso:
+            permiso.registrar(200)
+    transcurrido = asyncio.get_running_loop().time() - inicio
+    # Dos salen de inmediato y las otras dos esperan un token cada una (50 ms)
+    assert transcurrido >= 0.08
+    assert limitador.estadisticas()["concedidos"] == 4
+    assert limitador.estadisticas()["esperaron"] >= 2
+
+
+async def test_prioridad_alta_sale_primero():
+    limitador = LimitadorTasa(ConfigLimitador(tasa=50, rafaga=1, concurrencia_inicial=10))
+    orden = []
+
+    async def pedir(nombre, prioridad):
+        with usar_prioridad(prioridad):
+            async with limitador.permiso() as permiso:
+                orden.append(nombre)
+                permiso.registrar(200)
+
+    async with limitador.permiso() as permiso:  # agota el único token
+        tareas = [asyncio.ensure_future(pedir("baja", PRIORIDAD_BAJA))]
+        await asyncio.sleep(0)
+        tareas.append(asyncio.ensure_future(pedir("alta", PRIORIDAD_ALTA)))
+        await asyncio.sleep(0)
+        assert limitador.ocupado(PRIORIDAD_ALTA)
+        permiso.registrar(200)
+    await asyncio.gather(*tareas)
+    assert orden == ["alta", "baja"]
+
+
+async def test_errores_reducen_la_concurrencia_y_los_exitos_la_aumentan():
+    limitador = LimitadorTasa(ConfigLimitador(tasa=1000, rafaga=1000, concurrencia_inicial=8, latencia_objetivo=0.5))
+    async with limitador.permiso() as permiso:
+        permiso.registrar(503)
+    assert limitador.estadisticas()["concurrencia_limite"] == 4
+    for _ in range(20):
+        async with limitador.permiso() as permiso:
+            permiso.registrar(200)
+    assert limitador.estadisticas()["concurrencia_limite"] > 4
+    assert limitador.estadisticas()["aumentos"] >= 1
+
+
+async def test_429_pausa_y_reintenta():
+    limitador = LimitadorTasa(ConfigLimitador(tasa=1000, rafaga=10))
+    respuestas = [
+        SimpleNamespace(status_code=429, headers={"Retry-After": "0.05"}),
+        SimpleNamespace(status_code=200, headers={}),
+    ]
+
+    async def enviar():
+        return respuestas.pop(0)
+
+    inicio = asyncio.get_running_loop().time()
+    respuesta = await solicitar_con_limite(limitador, enviar)
+    assert respuesta.status_code == 200
+    assert asyncio.get_running_loop().time() - inicio >= 0.04
+    assert limitador.estadisticas()["respuestas_429"] == 1
+
+
+async def test_cancelar_mientras_espera_libera_el_turno():
+    limitador = LimitadorTasa(ConfigLimitador(tasa=5, rafaga=1))
+
+    async def esperar():
+        async with limitador.permiso():
+            pass
+
+    async with limitador.permiso() as permiso:
+        espera = asyncio.ensure_future(esperar())
+        await asyncio.sleep(0)
+        espera.cancel()
+        permiso.registrar(200)
+    await asyncio.sleep(0)
+    estadisticas = limitador.estadisticas()
+    assert estadisticas["en_curso"] == 0
+    assert estadisticas["en_espera"] == 0
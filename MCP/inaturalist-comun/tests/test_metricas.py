@@ -0,0 +1,107 @@
+import inspect
+import math
+from typing import Optional
+
+from inaturalist_comun import instrumentar_herramienta, registro
+from inaturalist_comun.metricas import (
+    HERRAMIENTA_DURACION,
+    HERRAMIENTA_EN_CURSO,
+    HERRAMIENTA_ERRORES,
+    RegistroMetricas,
+    etiqueta_endpoint,
+)
+
+
+def test_contador_y_medidor_en_formato_prometheus():
+    metricas = RegistroMetricas()
+    respuestas = metricas.contador("respuestas_total", "Respuestas por código", ["endpoint", "status"])
+    en_curso = metricas.medidor("en_curso", "Solicitudes en curso")
+    respuestas.inc(endpoint="/observations", status=200)
+    respuestas.inc(2, endpoint="/observations", status=200)
+    respuestas.inc(endpoint="/taxa", status=429)
+    with en_curso.en_curso():
+        en_curso.inc()
+    en_curso.fijar(0.5)
+
+    assert metricas.exponer().splitlines() == [
+        "# HELP respuestas_total Respuestas por código",
+        "# TYPE respuestas_total counter",
+        'respuestas_total{endpoint="/observations",status="200"} 3',
+        'respuestas_total{endpoint="/taxa",status="429"} 1',
+        "# HELP en_curso Solicitudes en curso",
+        "# TYPE en_curso gauge",
+        "en_curso 0.5",
+    ]
+
+
+def test_etiquetas_escapadas():
+    metricas = RegistroMetricas()
+    metricas.contador("errores_total", "Errores", ["mensaje"]).inc(mensaje='dijo "no"\nC:\\')
+    assert 'errores_total{mensaje="dijo \\"no\\"\\nC:\\\\"} 1' in metricas.exponer()
+
+
+def test_histograma_acumula_cubetas_suma_y_cantidad():
+    metricas = RegistroMetricas()
+    duracion = metricas.histograma("duracion_segundos", "Duración", ["fase"], limites=(0.1, 1.0, 0.5))
+    for valor in (0.05, 0.1, 0.3, 0.7, 2.0):
+        duracion.observar(valor, fase="upstream")
+
+    assert metricas.exponer().splitlines() == [
+        "# HELP duracion_segundos Duración",
+        "# TYPE duracion_segundos histogram",
+        'duracion_segundos_bucket{fase="upstream",le="0.1"} 2',
+        'duracion_segundos_bucket{fase="upstream",le="0.5"} 3',
+        'duracion_segundos_bucket{fase="upstream",le="1"} 4',
+        'duracion_segundos_bucket{fase="upstream",le="+Inf"} 5',
+        'duracion_segundos_sum{fase="upstream"} 3.15',
+        'duracion_segundos_count{fase="upstream"} 5',
+    ]
+    assert duracion.percentil(50, fase="upstream") == 0.5
+    assert duracion.percentil(100, fase="upstream") == math.inf
+    assert duracion.percentil(50, fase="json") is None
+    assert duracion.resumen() == {
+        "upstream": {"cantidad": 5, "media": 0.63, "p50": 0.5, "p95": math.inf, "p99": math.inf},
+    }
+
+
+def test_registrar_dos_veces_retorna_la_misma_metrica():
+    metricas = RegistroMetricas()
+    primero = metricas.contador("solicitudes_total", "Solicitudes")
+    assert metricas.contador("solicitudes_total", "Otra descripción") is primero
+    primero.inc()
+    assert metricas.resumen() == {"solicitudes_total": {"total": 1}}
+
+
+def test_etiqueta_endpoint_agrupa_ids():
+    assert etiqueta_endpoint("/taxa/1,2,3") == "/taxa/{ids}"
+    assert etiqueta_endpoint("/observations/42") == "/observations/{ids}"
+    assert etiqueta_endpoint("/observations") == "/observations"
+
+
+async def buscar_en_humedal(lat: float, lng: float = -74.0841, taxon_name: Optional[str] = None) -> dict:
+    """Busca observaciones alrededor de un punto"""
+    if taxon_name == "desconocido":
+        return {"error": "No se encontró el taxón"}
+    return {"lat": lat, "lng": lng}
+
+
+def test_instrumentar_conserva_la_firma_que_inspecciona_fastmcp():
+    instrumentada = instrumentar_herramienta(buscar_en_humedal)
+    assert instrumentada.__name__ == "buscar_en_humedal"
+    assert instrumentada.__doc__ == buscar_en_humedal.__doc__
+    assert inspect.signature(instrumentada) == inspect.signature(buscar_en_humedal)
+    assert inspect.iscoroutinefunction(instrumentada)
+
+
+async def test_instrumentar_mide_llamadas_y_errores():
+    instrumentada = instrumentar_herramienta(buscar_en_humedal)
+    llamadas = HERRAMIENTA_DURACION.resumen().get("buscar_en_humedal", {}).get("cantidad", 0)
+    errores = HERRAMIENTA_ERRORES.valores().get(("buscar_en_humedal",), 0)
+
+    assert await instrumentada(4.7519) == {"lat": 4.7519, "lng": -74.0841}
+    assert await instrumentada(4.7519, taxon_name="desconocido") == {"error": "No se encontró el taxón"}
+
+    assert HERRAMIENTA_DURACION.resumen()["buscar_en_humedal"]["cantidad"] == llamadas + 2
+    assert HERRAMIENTA_ERRORES.valores()[("buscar_en_humedal",)] == errores + 1
+    assert HERRAMIENTA_EN_CURSO.valores()[("buscar_en_humedal",)] == 0
+    assert 'inaturalist_herramienta_errores_total{herramienta="buscar_en_humedal"}' in registro.exponer()
@@ -0,0 +1,77 @@
+import pytest
+
+from inaturalist_comun import Nomenclator, Sitio, distancia_km, nomenclator, normalizar_nombre
+
+SITIOS = [
+    Sitio(1, "Humedal La Conejera", "Humedal", 4.7519, -74.0841, 1.0, alias=("La Conejera",)),
+    Sitio(2, "Cerro La Conejera", "Cerro", 4.768, -74.087, 1.0),
+    Sitio(3, "Quebrada La Salitrosa", "Quebrada", 4.759, -74.079, 0.5),
+    Sitio(4, "Páramo de Sumapaz", "Páramo", 4.0, -74.2, 30.0, alias=("Sumapaz",)),
+    Sitio(5, "Humedal Torca", "Humedal", 4.79, -74.03, 1.5),
+]
+
+
+@pytest.fixture
+def lugares():
+    return Nomenclator(SITIOS)
+
+
+def test_normalizar_nombre():
+    assert normalizar_nombre("  Páramo de SUMAPAZ!! ") == "paramo de sumapaz"
+    assert normalizar_nombre("Río Bogotá (tramo norte)") == "rio bogota tramo norte"
+
+
+def test_buscar_por_nombre_o_alias_exacto(lugares):
+    assert lugares.buscar("humedal la conejera").id == 1
+    assert lugares.buscar("LA CONEJERA").id == 1
+    assert lugares.buscar("paramo de sumapaz").id == 4
+
+
+def test_buscar_nombre_aproximado(lugares):
+    assert lugares.buscar("humedal conejera").id == 1
+    assert lugares.buscar("sumapas").id == 4
+    assert lugares.buscar("desierto de la tatacoa") is None
+
+
+def test_sugerir_ordena_por_similitud(lugares):
+    sugerencias = lugares.sugerir("conejera", limite=2)
+    assert {s.id for s, _ in sugerencias} == {1, 2}
+    assert sugerencias[0][1] >= sugerencias[1][1]
+
+
+def test_cercanos_igual_a_fuerza_bruta(lugares):
+    lat, lng = 4.76, -74.08
+    esperados = sorted(SITIOS, key=lambda s: distancia_km(lat, lng, s.lat, s.lng))[:3]
+    assert [s.id for s, _ in lugares.cercanos(lat, lng, k=3)] == [s.id for s in esperados]
+
+
+def test_cercanos_con_radio_y_tipo(lugares):
+    assert [s.id for s, _ in lugares.cercanos(4.76, -74.08, k=5, radio_km=2.0)] == [3, 1, 2]
+    # El tipo no distingue mayúsculas ni tildes
+    assert [s.id for s, _ in lugares.cercanos(4.76, -74.08, k=5, tipo="HUMEDAL")] == [1, 5]
+    assert [s.id for s, _ in lugares.cercanos(4.76, -74.08, k=5, tipo="paramo")] == [4]
+
+
+def test_es_de_tipo():
+    assert SITIOS[3].es_de_tipo("páramo")
+    assert SITIOS[3].es_de_tipo(None)
+    assert not SITIOS[3].es_de_tipo("humedal")
+
+
+def test_que_contienen(lugares):
+    # A 0.97 km del Humedal La Conejera (radio 1) y a 1.34 km del cerro (radio 1)
+    assert [s.id for s in lugares.que_contienen(4.759, -74.079)] == [3, 1]
+    assert lugares.que_contienen(4.2, -74.2) == [SITIOS[3]]
+
+
+def test_nombre_repetido_reemplaza_al_anterior():
+    lugares = Nomenclator([SITIOS[0], Sitio(9, "humedal la conejera", "Humedal", 4.75, -74.08)])
+    assert len(lugares) == 1
+    assert lugares.buscar("Humedal La Conejera").id == 9
+
+
+def test_lugares_incluidos():
+    lugares = nomenclator()
+    assert len(lugares) > 0
+    assert lugares.buscar("La Conejera") is not None
+    assert lugares.tipos() == sorted(lugares.tipos())
@@ -0,0 +1,284 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import inaturalist_comun.politica as modulo_politica
+from inaturalist_comun import (
+    CacheRespuestas,
+    ConfigCache,
+    ConfigLimitador,
+    ConfigPolitica,
+    ConsultasEnVuelo,
+    LimitadorTasa,
+    PlazoAgotado,
+    PoliticaSolicitudes,
+    clave_consulta,
+    plazo,
+    solicitar_con_limite,
+    tiempo_restante,
+)
+from inaturalist_comun.limitador import PRIORIDAD_BAJA, PRIORIDAD_NORMAL, _prioridad_actual
+from inaturalist_comun.politica import PresupuestoReintentos
+
+
+def respuesta(status, **encabezados):
+    return SimpleNamespace(status_code=status, headers=encabezados)
+
+
+class Servidor:
+    """`enviar` simulado: responde en orden los estados (o excepciones) dados, con una demora opcional"""
+
+    def __init__(self, *respuestas, demoras=()):
+        self.respuestas = list(respuestas)
+        self.demoras = list(demoras)
+        self.timeouts = []
+
+    async def __call__(self, timeout=None):
+        self.timeouts.append(timeout)
+        demora = self.demoras.pop(0) if self.demoras else 0
+        resultado = self.respuestas.pop(0)
+        await asyncio.sleep(demora)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return respuesta(resultado) if isinstance(resultado, int) else resultado
+
+
+def politica(**config):
+    return PoliticaSolicitudes(ConfigPolitica(**{"espera_base": 0.001, "espera_max": 0.01, **config}))
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Registra los límites del jitter y espera siempre el máximo"""
+    limites = []
+
+    def uniforme(minimo, maximo):
+        limites.append((minimo, maximo))
+        return maximo
+
+    monkeypatch.setattr(modulo_politica.random, "uniform", uniforme)
+    return limites
+
+
+# --- Reintentos con jitter ---------------------------------------------------
+
+async def test_reintenta_5xx_con_espera_exponencial_con_jitter(esperas):
+    p = politica(espera_base=0.002, espera_max=0.005, reintentos=3)
+    servidor = Servidor(503, 502, 500, 200)
+    assert (await p.ejecutar("/observations", servidor)).status_code == 200
+    # Jitter completo: uniforme entre 0 y base * 2^intento, acotado por espera_max
+    assert esperas == [(0, 0.002), (0, 0.004), (0, 0.005)]
+    assert p.estadisticas()["reintentos"] == 3
+
+
+async def test_agotados_los_reintentos_retorna_la_ultima_respuesta(esperas):
+    p = politica(reintentos=2)
+    servidor = Servidor(503, 503, 504)
+    assert (await p.ejecutar("/observations", servidor)).status_code == 504
+    assert servidor.respuestas == []
+
+
+async def test_errores_reintentables_y_no_reintentables():
+    p = PoliticaSolicitudes(ConfigPolitica(espera_base=0.001), reintentables=(ConnectionError,))
+    assert (await p.ejecutar("/taxa", Servidor(ConnectionError("reset"), 200))).status_code == 200
+
+    servidor = Servidor(ValueError("respuesta rota"), 200)
+    with pytest.raises(ValueError):
+        await p.ejecutar("/taxa", servidor)
+    assert servidor.respuestas == [200]
+
+    with pytest.raises(ConnectionError):
+        await p.ejecutar("/taxa", Servidor(*(ConnectionError("caído") for _ in range(3))))
+
+
+async def test_4xx_no_se_reintenta():
+    p = politica()
+    servidor = Servidor(404, 200)
+    assert (await p.ejecutar("/observations", servidor)).status_code == 404
+    assert servidor.respuestas == [200]
+
+
+# --- Retry-After ---------------------------------------------------------------
+
+async def test_429_respeta_retry_after_dentro_del_plazo():
+    p = politica()
+    limitador = LimitadorTasa(ConfigLimitador(tasa=1000, rafaga=10))
+    servidor = Servidor(respuesta(429, **{"Retry-After": "0.05"}), 200)
+    inicio = time.monotonic()
+    resultado = await p.ejecutar("/observations", lambda timeout: solicitar_con_limite(limitador, servidor))
+    assert resultado.status_code == 200
+    assert time.monotonic() - inicio >= 0.045
+    # El 429 lo maneja el limitador: la política no lo cuenta como reintento
+    assert p.estadisticas()["reintentos"] == 0
+
+
+async def test_retry_after_mas_largo_que_el_plazo_agota_el_plazo():
+    p = politica()
+    limitador = LimitadorTasa(ConfigLimitador(tasa=1000, rafaga=10))
+    servidor = Servidor(respuesta(429, **{"Retry-After": "5"}), 200)
+    inicio = time.monotonic()
+    with plazo(0.1), pytest.raises(PlazoAgotado):
+        await p.ejecutar("/observations", lambda timeout: solicitar_con_limite(limitador, servidor))
+    assert time.monotonic() - inicio < 1
+
+
+# --- Plazos ------------------------------------------------------------------
+
+async def test_plazo_vencido_lanza_plazo_agotado():
+    p = politica(timeout_intento=10)
+    with plazo(0.05):
+        with pytest.raises(PlazoAgotado):
+            await p.ejecutar("/observations", Servidor(200, demoras=[1]))
+    assert p.estadisticas()["plazos_agotados"] == 1
+
+
+async def test_timeout_de_cada_intento_acotado_por_el_plazo():
+    p = politica(timeout_intento=10)
+    servidor = Servidor(200)
+    with plazo(2):
+        await p.ejecutar("/observations", servidor)
+    assert 1.5 < servidor.timeouts[0] <= 2
+
+
+async def test_no_reintenta_si_la_espera_pasa_el_plazo(esperas):
+    p = politica(espera_base=1, espera_max=1)
+    servidor = Servidor(503, 200)
+    with plazo(0.5):
+        assert (await p.ejecutar("/observations", servidor)).status_code == 503
+    assert servidor.respuestas == [200]
+
+
+def test_plazo_anidado_solo_acorta():
+    assert tiempo_restante() is None
+    with plazo(10):
+        with plazo(60):
+            assert tiempo_restante() <= 10
+        with plazo(1):
+            assert tiempo_restante() <= 1
+        assert 1 < tiempo_restante() <= 10
+    assert tiempo_restante() is None
+
+
+async def test_con_plazo_suma_tiempo_por_solicitud_declarada():
+    p = PoliticaSolicitudes(ConfigPolitica(plazo_herramienta=10), segundos_por_solicitud=2)
+
+    @p.con_plazo(solicitudes=lambda argumentos: len(argumentos["areas"]))
+    async def herramienta(areas, radio=3):
+        return tiempo_restante()
+
+    assert 15 < await herramienta(["a", "b", "c"]) <= 16
+    assert herramienta.__name__ == "herramienta"
+
+
+# --- Hedging -------------------------------------------------------------------
+
+async def test_hedging_envia_una_copia_cuando_la_solicitud_tarda():
+    p = politica(hedging=True, muestras_min=3, hedging_min=0.02, percentil=0.95)
+    for _ in range(3):
+        await p.ejecutar("/observations", Servidor(200))
+    cancelada = asyncio.Event()
+
+    async def enviar(timeout):
+        if not enviar.llamadas:
+            enviar.llamadas.append("principal")
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelada.set()
+                raise
+            return respuesta(200)
+        enviar.llamadas.append("copia")
+        return respuesta(201)
+
+    enviar.llamadas = []
+    inicio = time.monotonic()
+    assert (await p.ejecutar("/observations", enviar)).status_code == 201
+    assert time.monotonic() - inicio < 1
+    assert enviar.llamadas == ["principal", "copia"]
+    await asyncio.sleep(0)
+    assert cancelada.is_set()
+    estadisticas = p.estadisticas()
+    assert (estadisticas["copias"], estadisticas["copias_ganadoras"]) == (1, 1)
+
+
+async def test_sin_hedging_no_hay_copias():
+    p = politica(muestras_min=1)
+    for _ in range(3):
+        await p.ejecutar("/observations", Servidor(200))
+    await p.ejecutar("/observations", Servidor(200, demoras=[0.05]))
+    assert p.estadisticas()["copias"] == 0
+
+
+# --- Presupuesto ---------------------------------------------------------------
+
+def test_presupuesto_acotado_por_su_maximo():
+    presupuesto = PresupuestoReintentos(proporcion=0.5, maximo=2)
+    assert presupuesto.retirar() and presupuesto.retirar()
+    assert not presupuesto.retirar()
+    presupuesto.depositar()
+    assert not presupuesto.retirar()
+    presupuesto.depositar()
+    assert presupuesto.retirar()
+    for _ in range(10):
+        presupuesto.depositar()
+    assert presupuesto.fichas == 2
+
+
+async def test_sin_presupuesto_no_se_reintenta():
+    p = politica(presupuesto=0.0, presupuesto_min=1, reintentos=5)
+    servidor = Servidor(503, 503, 503, 200)
+    # Una sola ficha: un reintento y después se entrega el error
+    assert (await p.ejecutar("/observations", servidor)).status_code == 503
+    assert servidor.respuestas == [503, 200]
+    estadisticas = p.estadisticas()
+    assert (estadisticas["reintentos"], estadisticas["sin_presupuesto"]) == (1, 1)
+
+
+# --- Tareas que sobreviven a quien las crea -------------------------------------
+
+async def test_la_consulta_compartida_no_hereda_el_plazo():
+    en_vuelo = ConsultasEnVuelo()
+    liberar = asyncio.Event()
+    vistos = []
+
+    async def cargar():
+        vistos.append(tiempo_restante())
+        await liberar.wait()
+        return "datos"
+
+    async def con_plazo_corto():
+        with plazo(0.05):
+            return await en_vuelo.ejecutar("/observations?lat=4.75", cargar)
+
+    corto = asyncio.ensure_future(con_plazo_corto())
+    await asyncio.sleep(0)
+    largo = asyncio.ensure_future(en_vuelo.ejecutar("/observations?lat=4.75", cargar))
+
+    # Quien tenía el plazo corto deja de esperar; la consulta sigue para el otro
+    with pytest.raises(PlazoAgotado):
+        await asyncio.wait_for(corto, 1)
+    liberar.set()
+    assert await largo == "datos"
+    assert vistos == [None]
+
+
+async def test_el_refresco_en_segundo_plano_no_hereda_plazo_ni_prioridad():
+    cache = CacheRespuestas(ConfigCache(max_obsoleto=60))
+    vistos = []
+
+    async def cargar():
+        vistos.append((tiempo_restante(), _prioridad_actual.get()))
+        return len(vistos)
+
+    await cache.obtener("/observations", {}, cargar)
+    cache._entradas[clave_consulta("/observations", {})].expira = time.time() - 1
+    with plazo(0.05):
+        assert await cache.obtener("/observations", {}, cargar) == 1
+    await asyncio.sleep(0.1)
+
+    assert vistos[1] == (None, PRIORIDAD_BAJA)
+    assert _prioridad_actual.get() == PRIORIDAD_NORMAL
+    assert cache.estadisticas()["refrescos"] == 1
+    assert await cache.obtener("/observations", {}, cargar) == 2
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+import inaturalist_comun.precalentamiento as modulo_precalentamiento
+from inaturalist_comun import CacheRespuestas, ConfigPrecalentamiento, Precalentador
+from inaturalist_comun.limitador import PRIORIDAD_BAJA, _prioridad_actual
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000.0
+
+    def monotonic(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo_precalentamiento, "time", reloj)
+    return reloj
+
+
+def precalentador(ejecutar=None, ocupado=None, **config):
+    return Precalentador(ConfigPrecalentamiento(**config), ejecutar=ejecutar, ocupado=ocupado, ignorar=("formato",))
+
+
+def nombres(consultas):
+    return [(nombre, argumentos.get("lugar")) for nombre, argumentos in consultas]
+
+
+# --- Consultas aprendidas -------------------------------------------------------
+
+def test_el_peso_cae_a_la_mitad_cada_vida_media(reloj):
+    p = precalentador(aprendidas=1, vida_media=100)
+    for _ in range(3):
+        p.registrar("buscar", {"lugar": "Conejera"})
+    reloj.ahora += 100
+    # Peso 1.5 contra 1: la Conejera sigue adelante
+    p.registrar("buscar", {"lugar": "Córdoba"})
+    assert nombres(p.calientes()) == [("buscar", "Conejera")]
+    reloj.ahora += 100
+    # Conejera 0.75, Córdoba 0.5 más una llamada nueva
+    p.registrar("buscar", {"lugar": "Córdoba"})
+    assert nombres(p.calientes()) == [("buscar", "Córdoba")]
+
+
+def test_sin_vida_media_el_peso_no_cae(reloj):
+    p = precalentador(aprendidas=1, vida_media=0)
+    p.registrar("buscar", {"lugar": "Conejera"})
+    p.registrar("buscar", {"lugar": "Conejera"})
+    reloj.ahora += 10_000
+    p.registrar("buscar", {"lugar": "Córdoba"})
+    assert nombres(p.calientes()) == [("buscar", "Conejera")]
+
+
+async def test_calientes_une_fijas_y_aprendidas_sin_repetir(reloj):
+    p = precalentador(aprendidas=2, consultas=(("buscar", {}), ("estadisticas", {"lugar": "Conejera"})))
+
+    @p.aprender
+    async def buscar(lugar=None, radio=3, formato="completo"):
+        return {}
+
+    # Igual a la fija una vez completados los valores por defecto y sin el formato
+    await buscar(radio=3, formato="compacto")
+    for _ in range(2):
+        await buscar("Córdoba")
+    for _ in range(3):
+        await buscar("Torca")
+    await buscar("Juan Amarillo")
+    assert nombres(p.calientes()) == [("buscar", None), ("estadisticas", "Conejera"), ("buscar", "Torca"), ("buscar", "Córdoba")]
+    assert p.estadisticas()["registradas"] == 7
+
+
+def test_argumentos_que_no_se_pueden_repetir_no_se_aprenden():
+    p = precalentador()
+    p.registrar("buscar", {"lugar": object()})
+    assert p.calientes() == []
+    p = precalentador(aprendidas=0)
+    p.registrar("buscar", {"lugar": "Conejera"})
+    assert p.calientes() == []
+
+
+# --- Rondas ----------------------------------------------------------------------
+
+async def test_las_llamadas_del_precalentador_no_se_aprenden():
+    p = precalentador(consultas=(("buscar", {"lugar": "Conejera"}),))
+    vistas = []
+
+    @p.aprender
+    async def buscar(lugar=None):
+        vistas.append((lugar, _prioridad_actual.get()))
+        return {}
+
+    await p.precalentar()
+    await p.precalentar()
+    assert vistas == [("Conejera", PRIORIDAD_BAJA)] * 2
+    estadisticas = p.estadisticas()
+    assert (estadisticas["registradas"], estadisticas["recordadas"]) == (0, 0)
+    assert (estadisticas["rondas"], estadisticas["consultas"]) == (2, 2)
+    # Fuera de la ronda las llamadas vuelven a contar
+    await buscar("Torca")
+    assert p.estadisticas()["registradas"] == 1
+
+
+async def test_cede_el_turno_mientras_el_servicio_esta_ocupado(monkeypatch):
+    monkeypatch.setattr(modulo_precalentamiento, "PAUSA_OCUPADO", 0)
+    ocupado = [True, True, True]
+    ejecutadas = []
+
+    async def ejecutar(nombre, argumentos):
+        ejecutadas.append((nombre, len(ocupado)))
+        return {}
+
+    p = precalentador(ejecutar, ocupado=lambda: bool(ocupado) and ocupado.pop(), consultas=(("buscar", {}),))
+    await p.precalentar()
+    assert ejecutadas == [("buscar", 0)]
+    assert p.estadisticas()["esperas_por_trafico"] == 3
+
+
+async def test_respeta_la_concurrencia_y_cuenta_los_errores():
+    activas = []
+    maximo = []
+
+    async def ejecutar(nombre, argumentos):
+        activas.append(nombre)
+        maximo.append(len(activas))
+        await asyncio.sleep(0.01)
+        activas.remove(nombre)
+        if argumentos.get("lugar") == "Atlántida":
+            return {"error": "Lugar 'Atlántida' no encontrado"}
+        if argumentos.get("lugar") == "Mordor":
+            raise RuntimeError("sin conexión")
+        return {}
+
+    lugares = ("Conejera", "Córdoba", "Torca", "Atlántida", "Mordor")
+    p = precalentador(ejecutar, concurrencia=2, consultas=tuple(("buscar", {"lugar": l}) for l in lugares))
+    await p.precalentar()
+    assert max(maximo) == 2
+    estadisticas = p.estadisticas()
+    assert (estadisticas["consultas"], estadisticas["errores"]) == (5, 2)
+
+
+async def test_la_ronda_recarga_lo_que_venceria_antes_de_la_siguiente():
+    cache = CacheRespuestas()
+    cargas = []
+
+    async def cargar():
+        cargas.append(len(cargas))
+        return len(cargas)
+
+    async def ejecutar(nombre, argumentos):
+        return {"valor": await cache.obtener("/observations", argumentos, cargar)}
+
+    # Intervalo más jitter pasa el TTL: cada ronda recarga aunque la entrada esté fresca
+    p = precalentador(ejecutar, intervalo=cache.ttl("/observations"), consultas=(("buscar", {}),))
+    await p.precalentar()
+    await p.precalentar()
+    assert len(cargas) == 2
+    assert await cache.obtener("/observations", {}, cargar) == 2
+    assert cache.estadisticas()["recargas_anticipadas"] == 1
+
+
+async def test_deshabilitado_no_precalienta():
+    p = precalentador(habilitado=False, consultas=(("buscar", {}),))
+    await asyncio.wait_for(p.ejecutar(), 1)
+    assert p.estadisticas()["rondas"] == 0
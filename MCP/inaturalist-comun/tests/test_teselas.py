@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from inaturalist_comun import (
+    ConfigTeselas,
+    ConsultaTeselada,
+    Observacion,
+    Pagina,
+    Tesela,
+    caja_envolvente,
+    distancia_km,
+    teselas_que_cubren,
+)
+from inaturalist_comun.teselas import POR_PAGINA_TESELA, tesela_de
+
+CENTRO = (4.8155, -74.075)
+
+
+def observacion(id, lat, lng):
+    return Observacion.desde_inaturalist({"id": id, "location": f"{lat},{lng}"})
+
+
+class INaturalistSimulado:
+    """Responde las consultas por caja de `ConsultaTeselada` sobre un conjunto fijo de observaciones"""
+
+    def __init__(self, observaciones):
+        self.observaciones = sorted(observaciones, key=lambda o: o.id, reverse=True)
+        self.solicitudes = []
+
+    async def __call__(self, params):
+        self.solicitudes.append(params)
+        assert params["order_by"] == "id" and params["order"] == "desc"
+        dentro = [
+            o for o in self.observaciones
+            if params["swlat"] <= o.latitud <= params["nelat"]
+            and params["swlng"] <= o.longitud <= params["nelng"]
+            and o.id < params.get("id_below", float("inf"))
+        ]
+        return Pagina(len(dentro), tuple(dentro[:params["per_page"]]))
+
+
+def datos_alrededor(n, dispersion=0.05, semilla=1):
+    azar = random.Random(semilla)
+    return [
+        observacion(i, CENTRO[0] + azar.uniform(-dispersion, dispersion), CENTRO[1] + azar.uniform(-dispersion, dispersion))
+        for i in range(1, n + 1)
+    ]
+
+
+def en_el_circulo(observaciones, radius):
+    return sorted(
+        (o for o in observaciones if distancia_km(CENTRO[0], CENTRO[1], o.latitud, o.longitud) <= radius),
+        key=lambda o: o.id,
+        reverse=True,
+    )
+
+
+def test_distancia_km():
+    assert distancia_km(0, 0, 1, 0) == pytest.approx(111.2, abs=0.1)
+    assert distancia_km(*CENTRO, *CENTRO) == 0
+
+
+def test_caja_envolvente_contiene_el_circulo():
+    min_lat, max_lat, min_lng, max_lng = caja_envolvente(*CENTRO, 3.0)
+    assert distancia_km(CENTRO[0], CENTRO[1], max_lat, CENTRO[1]) == pytest.approx(3.0, rel=1e-3)
+    assert distancia_km(CENTRO[0], CENTRO[1], CENTRO[0], max_lng) == pytest.approx(3.0, rel=1e-2)
+    assert min_lat < CENTRO[0] < max_lat and min_lng < CENTRO[1] < max_lng
+
+
+def test_quadkey_y_caja():
+    assert Tesela(3, 3, 5).quadkey == "213"
+    tesela = tesela_de(*CENTRO, 13)
+    swlat, swlng, nelat, nelng = tesela.caja()
+    assert swlat <= CENTRO[0] <= nelat and swlng <= CENTRO[1] <= nelng
+
+
+def test_teselas_que_cubren():
+    teselas = teselas_que_cubren(*CENTRO, 3.0, 13)
+    assert tesela_de(*CENTRO, 13) in teselas
+    assert len(teselas) == len(set(teselas))
+    # Un radio mayor nunca cubre menos teselas
+    assert set(teselas) <= set(teselas_que_cubren(*CENTRO, 6.0, 13))
+
+
+async def test_resultado_igual_al_filtro_directo():
+    datos = datos_alrededor(600)
+    consulta = ConsultaTeselada(ConfigTeselas(habilitadas=True, zoom=13, max_paginas=10), INaturalistSimulado(datos))
+    resultado = await consulta.buscar(*CENTRO, 3.0, limite=50)
+
+    esperados = en_el_circulo(datos, 3.0)
+    assert [o.id for o in resultado.resultados] == [o.id for o in esperados[:50]]
+    assert resultado.total_exacto
+    assert resultado.total == len(esperados)
+
+
+async def test_descarga_solo_las_paginas_necesarias():
+    datos = datos_alrededor(3000, dispersion=0.01)
+    simulado = INaturalistSimulado(datos)
+    consulta = ConsultaTeselada(ConfigTeselas(habilitadas=True, zoom=13, max_paginas=20), simulado)
+    resultado = await consulta.buscar(*CENTRO, 1.0, limite=10)
+
+    esperados = en_el_circulo(datos, 1.0)
+    assert [o.id for o in resultado.resultados] == [o.id for o in esperados[:10]]
+    assert not resultado.total_exacto
+    assert all(p["per_page"] == POR_PAGINA_TESELA for p in simulado.solicitudes)
+    assert len(simulado.solicitudes) < 3000 // POR_PAGINA_TESELA
+
+
+async def test_casos_que_van_directo_a_inaturalist():
+    simulado = INaturalistSimulado(datos_alrededor(50))
+    consulta = ConsultaTeselada(ConfigTeselas(habilitadas=True, zoom=13, max_teselas=2), simulado)
+    assert await consulta.buscar(*CENTRO, 1.0, limite=0) is None
+    assert await consulta.buscar(*CENTRO, 1.0, limite=10, order_by="votes") is None
+    assert await consulta.buscar(*CENTRO, 20.0, limite=10) is None
+    assert simulado.solicitudes == []
+    estadisticas = consulta.estadisticas()
+    assert estadisticas["fallback_limite"] == 1
+    assert estadisticas["fallback_orden"] == 1
+    assert estadisticas["fallback_teselas"] == 1
+
+
+async def test_demasiadas_paginas_va_directo():
+    # Para 1000 resultados de una sola tesela hacen falta 5 páginas de 200
+    datos = datos_alrededor(3000, dispersion=0.001)
+    consulta = ConsultaTeselada(ConfigTeselas(habilitadas=True, zoom=13, max_paginas=2), INaturalistSimulado(datos))
+    assert await consulta.buscar(*CENTRO, 0.5, limite=1000) is None
+    assert consulta.estadisticas()["fallback_paginas"] == 1
@@ -2,35 +2,58 @@
 FastMCP DATAR: Prueba de MCP
 """
 
+from typing import Optional
+
 from mcp.server.fastmcp import FastMCP
 
+from inaturalist_comun import nomenclator
+
 # Create server
 mcp = FastMCP("DATAR: Prueba de MCP")
 
+# Lugares ambientales conocidos, cargados una vez al arrancar
+lugares = nomenclator()
+
+
 @mcp.tool()
-def obtener_lugares() -> dict:
-    """Obtiene una lista de tres lugares ambientales disponibles"""
-    lugares = [
-        {
-            "id": 1,
-            "nombre": "Humedal La Conejera",
-            "tipo": "Humedal",
-            "descripcion": "Área protegida de importancia ecológica"
-        },
-        {
-            "id": 2,
-            "nombre": "Cerro La Conejera",
-            "tipo": "Cerro",
-            "descripcion": "Formación geológica con vegetación nativa"
-        },
+def obtener_lugares(tipo: Optional[str] = None) -> dict:
+    """
+    Obtiene los lugares ambientales disponibles (humedales, áreas protegidas,
+    parques, cerros, quebradas y ríos)
+
+    Args:
+        tipo: Sólo los lugares de este tipo (Humedal, Área protegida, Parque, Cerro,
+            Quebrada o Río; sin distinguir mayúsculas ni tildes)
+    """
+    encontrados = [
         {
-            "id": 3,
-            "nombre": "Quebrada La Salitrosa",
-            "tipo": "Quebrada",
-            "descripcion": "Recurso hídrico con ecosistema acuático"
+            "id": sitio.id,
+            "nombre": sitio.nombre,
+            "tipo": sitio.tipo,
+            "descripcion": sitio.descripcion
         }
+        for sitio in lugares
+        if sitio.es_de_tipo(tipo)
     ]
     return {
-        "total": len(lugares),
-        "lugares": lugares
-    }
\ No newline at end of file
+        "total": len(encontrados),
+        "lugares": encontrados
+    }
+
+
+@mcp.tool()
+def ubicar_lugar(nombre: str) -> dict:
+    """
+    Coordenadas y radio de un lugar ambiental a partir de su nombre, aunque
+    esté incompleto o mal escrito (por ejemplo "conejera" o "sumapas")
+
+    Args:
+        nombre: Nombre o alias del lugar
+    """
+    sitio = lugares.buscar(nombre)
+    if sitio is None:
+        return {
+            "error": f"No se encontró el lugar '{nombre}'",
+            "sugerencias": [s.nombre for s, _ in lugares.sugerir(nombre, limite=3, minimo=0.2)]
+        }
+    return sitio.como_dict()
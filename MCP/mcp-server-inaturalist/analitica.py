@@ -0,0 +1,168 @@
+"""
+Métricas de biodiversidad sobre observaciones de iNaturalist
+
+Las observaciones de un área se reducen a columnas NumPy (id de especie y mes
+de observación) y todas las métricas se calculan de forma vectorizada sobre
+esas columnas:
+
+- Riqueza de especies, índices de Shannon y Simpson y equitatividad de Pielou
+- Riqueza estimada de Chao1 a partir de singletons y doubletons
+- Curva de rarefacción (especies esperadas en submuestras de n observaciones)
+- Histograma de actividad por mes
+- Taxones más observados
+
+Sólo se retorna el resumen, nunca las observaciones.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from inaturalist_comun import Observacion
+
+# Rangos que cuentan como especie (las subespecies se agrupan en su especie)
+RANGOS_ESPECIE = {"species", "hybrid", "subspecies", "variety", "form"}
+
+MESES = ["ene", "feb", "mar", "abr", "may", "jun", "jul", "ago", "sep", "oct", "nov", "dic"]
+
+
+@dataclass
+class Columnas:
+    """Observaciones de un área en forma columnar"""
+    especies: np.ndarray  # id de la especie de cada observación identificada a especie
+    meses: np.ndarray  # mes (1-12) de cada observación con fecha, 0 si no tiene
+    observaciones: int = 0
+    nombres: Dict[int, str] = field(default_factory=dict)
+
+
+class AcumuladorColumnas:
+    """Acumula páginas de observaciones sin guardar los registros originales"""
+
+    def __init__(self):
+        self._especies: List[np.ndarray] = []
+        self._meses: List[np.ndarray] = []
+        self._nombres: Dict[int, str] = {}
+        self._total = 0
+
+    def agregar(self, observaciones: Iterable[Observacion]) -> None:
+        especies, meses = [], []
+        for obs in observaciones:
+            self._total += 1
+            fecha = obs.observada or ""
+            meses.append(int(fecha[5:7]) if len(fecha) >= 7 and fecha[5:7].isdigit() else 0)
+            if obs.taxon_rango not in RANGOS_ESPECIE:
+                continue
+            id_especie = obs.especie_id or obs.taxon_id
+            if id_especie is None:
+                continue
+            especies.append(id_especie)
+            if id_especie not in self._nombres or obs.taxon_rango == "species":
+                self._nombres[id_especie] = obs.taxon_nombre_comun or obs.taxon_nombre or str(id_especie)
+        self._especies.append(np.asarray(especies, dtype=np.int64))
+        self._meses.append(np.asarray(meses, dtype=np.int8))
+
+    def columnas(self) -> Columnas:
+        return Columnas(
+            especies=np.concatenate(self._especies) if self._especies else np.empty(0, dtype=np.int64),
+            meses=np.concatenate(self._meses) if self._meses else np.empty(0, dtype=np.int8),
+            observaciones=self._total,
+            nombres=self._nombres,
+        )
+
+
+def indices_diversidad(conteos: np.ndarray) -> Dict[str, Optional[float]]:
+    """Riqueza, Shannon (ln), Gini-Simpson, Simpson inverso y equitatividad de Pielou"""
+    riqueza = int(conteos.size)
+    if riqueza == 0:
+        return {"riqueza": 0, "shannon": None, "simpson": None, "simpson_inverso": None, "pielou": None}
+    p = conteos / conteos.sum()
+    shannon = float(-(p * np.log(p)).sum()) + 0.0  # evita -0.0 con una sola especie
+    suma_p2 = float((p * p).sum())
+    return {
+        "riqueza": riqueza,
+        "shannon": round(shannon, 4),
+        "simpson": round(1.0 - suma_p2, 4),
+        "simpson_inverso": round(1.0 / suma_p2, 4),
+        "pielou": round(shannon / float(np.log(riqueza)), 4) if riqueza > 1 else None,
+    }
+
+
+def chao1(conteos: np.ndarray) -> Optional[float]:
+    """
+    Riqueza estimada de Chao1 en su forma corregida por sesgo, que sigue
+    definida sin doubletons: S + F1 (F1 - 1) / (2 (F2 + 1))
+    """
+    if conteos.size == 0:
+        return None
+    f1 = int((conteos == 1).sum())
+    f2 = int((conteos == 2).sum())
+    return round(conteos.size + f1 * (f1 - 1) / (2 * (f2 + 1)), 2)
+
+
+def rarefaccion(conteos: np.ndarray, puntos: int = 10) -> List[Dict[str, float]]:
+    """
+    Curva de rarefacción de Hurlbert: especies esperadas E[S_n] en una
+    submuestra aleatoria de n observaciones, para `puntos` valores de n entre
+    1 y el total. Se calcula con logaritmos de factoriales para evitar
+    desbordes: E[S_n] = sum_i 1 - C(N - N_i, n) / C(N, n)
+    """
+    total = int(conteos.sum())
+    if total == 0:
+        return []
+    tamanos = np.unique(np.linspace(1, total, num=max(2, puntos)).round().astype(np.int64))
+    log_fact = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, total + 1)))))
+
+    def log_comb(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return log_fact[a] - log_fact[b] - log_fact[a - b]
+
+    restantes = (total - conteos)[:, None]  # N - N_i por especie
+    n = tamanos[None, :]
+    posible = restantes >= n
+    # Probabilidad de que la especie i no aparezca en la submuestra (0 si no cabe)
+    ausente = np.where(
+        posible,
+        np.exp(log_comb(np.maximum(restantes, n), n) - log_comb(np.full_like(n, total), n)),
+        0.0,
+    )
+    esperadas = (1.0 - ausente).sum(axis=0)
+    return [{"n": int(t), "especies": round(float(e), 2)} for t, e in zip(tamanos, esperadas)]
+
+
+def histograma_mensual(meses: np.ndarray) -> Dict[str, int]:
+    """Observaciones por mes del año (todas las fechas de todos los años)"""
+    conteo = np.bincount(meses.astype(np.int64), minlength=13)
+    return {mes: int(c) for mes, c in zip(MESES, conteo[1:13])}
+
+
+def top_taxones(ids: np.ndarray, conteos: np.ndarray, nombres: Dict[int, str], n: int) -> List[dict]:
+    """Las `n` especies con más observaciones"""
+    total = conteos.sum()
+    orden = np.argsort(-conteos, kind="stable")[:n]
+    return [
+        {
+            "taxon_id": int(ids[i]),
+            "nombre": nombres.get(int(ids[i])),
+            "observaciones": int(conteos[i]),
+            "proporcion": round(float(conteos[i] / total), 4),
+        }
+        for i in orden
+    ]
+
+
+def resumir(columnas: Columnas, top: int = 10, puntos_rarefaccion: int = 10) -> dict:
+    """Resumen compacto de las métricas de un área"""
+    ids, conteos = np.unique(columnas.especies, return_counts=True)
+    conteos = conteos.astype(np.int64)
+    return {
+        "observaciones_analizadas": columnas.observaciones,
+        "observaciones_a_especie": int(columnas.especies.size),
+        **indices_diversidad(conteos),
+        "singletons": int((conteos == 1).sum()),
+        "doubletons": int((conteos == 2).sum()),
+        "chao1": chao1(conteos),
+        "rarefaccion": rarefaccion(conteos, puntos_rarefaccion),
+        "actividad_mensual": histograma_mensual(columnas.meses),
+        "sin_fecha": int((columnas.meses == 0).sum()),
+        "top_taxones": top_taxones(ids, conteos, columnas.nombres, top),
+    }
@@ -0,0 +1,139 @@
+"""
+Cliente HTTP compartido para consultar la API de iNaturalist
+
+Todas las herramientas del servidor usan un único httpx.AsyncClient de larga
+duración, de modo que las conexiones TCP/TLS con api.inaturalist.org se
+reutilizan entre llamadas en lugar de abrirse y cerrarse en cada consulta.
+
+La configuración se toma de variables de entorno:
+
+- INATURALIST_BASE_URL: URL base de la API (default: https://api.inaturalist.org/v1)
+- INATURALIST_TIMEOUT: Timeout por solicitud en segundos (default: 30)
+- INATURALIST_MAX_CONEXIONES: Máximo de conexiones simultáneas (default: 20)
+- INATURALIST_MAX_KEEPALIVE: Máximo de conexiones ociosas reutilizables (default: 10)
+- INATURALIST_KEEPALIVE_EXPIRY: Segundos que una conexión ociosa sigue abierta (default: 30)
+- INATURALIST_HTTP2: "1" para habilitar HTTP/2 (requiere el extra `http2`)
+"""
+
+import importlib.util
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from inaturalist_comun import leer_bool
+
+logger = logging.getLogger(__name__)
+
+BASE_URL_POR_DEFECTO = "https://api.inaturalist.org/v1"
+
+
+@dataclass(frozen=True)
+class ConfigCliente:
+    """Parámetros del pool de conexiones hacia iNaturalist"""
+    base_url: str = BASE_URL_POR_DEFECTO
+    timeout: float = 30.0
+    max_conexiones: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
+    @classmethod
+    def desde_entorno(cls) -> "ConfigCliente":
+        """Construye la configuración a partir de las variables de entorno"""
+        return cls(
+            base_url=os.getenv("INATURALIST_BASE_URL", BASE_URL_POR_DEFECTO).rstrip("/"),
+            timeout=float(os.getenv("INATURALIST_TIMEOUT", "30")),
+            max_conexiones=int(os.getenv("INATURALIST_MAX_CONEXIONES", "20")),
+            max_keepalive=int(os.getenv("INATURALIST_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("INATURALIST_KEEPALIVE_EXPIRY", "30")),
+            http2=leer_bool("INATURALIST_HTTP2"),
+        )
+
+
+def crear_cliente(config: ConfigCliente) -> httpx.AsyncClient:
+    """Crea un httpx.AsyncClient con el pool de conexiones configurado"""
+    http2 = config.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning(
+            "INATURALIST_HTTP2 está habilitado pero el paquete 'h2' no está instalado; "
+            "se usará HTTP/1.1. Instala el extra: uv sync --extra http2"
+        )
+        http2 = False
+
+    return httpx.AsyncClient(
+        base_url=config.base_url,
+        timeout=config.timeout,
+        limits=httpx.Limits(
+            max_connections=config.max_conexiones,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        http2=http2,
+    )
+
+
+# Estado del cliente compartido. Se cuentan los ciclos de vida activos para que
+# el cliente sólo se cierre cuando el último que lo usa termina.
+_cliente: Optional[httpx.AsyncClient] = None
+_config: Optional[ConfigCliente] = None
+_usuarios = 0
+
+
+def configurar(config: ConfigCliente) -> None:
+    """
+    Reemplaza la configuración usada para crear el cliente.
+    Debe llamarse antes de la primera consulta (por ejemplo, para apuntar a un
+    servidor local de pruebas).
+    """
+    global _config
+    if _cliente is not None:
+        raise RuntimeError("El cliente HTTP ya fue creado; configura antes de usarlo")
+    _config = config
+
+
+def obtener_config() -> ConfigCliente:
+    """Configuración activa del cliente"""
+    global _config
+    if _config is None:
+        _config = ConfigCliente.desde_entorno()
+    return _config
+
+
+def obtener_cliente() -> httpx.AsyncClient:
+    """
+    Retorna el cliente compartido, creándolo si aún no existe.
+    Fuera del ciclo de vida del servidor (scripts, pruebas) el cliente se crea
+    bajo demanda y debe cerrarse con `cerrar_cliente()`.
+    """
+    global _cliente
+    if _cliente is None or _cliente.is_closed:
+        _cliente = crear_cliente(obtener_config())
+    return _cliente
+
+
+async def cerrar_cliente() -> None:
+    """Cierra el cliente compartido y libera las conexiones del pool"""
+    global _cliente
+    if _cliente is not None:
+        cliente, _cliente = _cliente, None
+        await cliente.aclose()
+
+
+@asynccontextmanager
+async def cliente_abierto() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Mantiene el cliente compartido abierto mientras dure el bloque.
+    Los bloques pueden anidarse; el cliente se cierra al salir del último.
+    """
+    global _usuarios
+    _usuarios += 1
+    try:
+        yield obtener_cliente()
+    finally:
+        _usuarios -= 1
+        if _usuarios == 0:
+            await cerrar_cliente()
@@ -0,0 +1,107 @@
+"""
+Herramientas del servidor en el mismo proceso del agente
+
+Un agente que corre en la misma máquina puede llamar a las herramientas sin
+pasar por MCP: no se serializa la llamada a JSON-RPC ni hay proceso hijo por
+stdio. Las herramientas corren en el event loop del agente y comparten con él
+el cliente HTTP, la caché, el limitador y el espejo de `server`.
+
+Las llamadas pasan por la API pública de FastMCP (`list_tools` y
+`call_tool`), así que los argumentos se validan con el mismo modelo que por
+stdio (por ejemplo, `areas` pasa de dicts a `Area`) y las herramientas se
+publican con el mismo esquema. `call_tool` retorna el contenido MCP (el JSON
+como texto); `ejecutar` lo decodifica de vuelta al dict de la herramienta. Los
+errores de validación o de ejecución se retornan como {"error": ...}, igual
+que los de las herramientas.
+
+El ciclo de vida del servidor (cliente HTTP y tareas de fondo) se abre en la
+primera llamada y queda abierto hasta `cerrar()`. Como el cliente HTTP queda
+atado al event loop en que se abrió, todas las llamadas deben hacerse desde
+ese mismo loop.
+
+Uso:
+    from en_proceso import abierto, ejecutar
+
+    async with abierto():
+        resultado = await ejecutar("buscar_observaciones", {"per_page": 20})
+"""
+
+import asyncio
+import json
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.types import TextContent, Tool
+
+from server import ciclo_de_vida, mcp
+
+_pila: Optional[AsyncExitStack] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_candado: Optional[asyncio.Lock] = None
+
+
+async def herramientas() -> List[Tool]:
+    """Herramientas registradas en el servidor, tal como se publican por MCP (nombre, descripción e inputSchema)"""
+    return await mcp.list_tools()
+
+
+async def abrir() -> None:
+    """Abre el ciclo de vida del servidor en el event loop actual, si aún no está abierto"""
+    global _pila, _loop, _candado
+    loop = asyncio.get_running_loop()
+    if _pila is not None:
+        if _loop is not loop:
+            raise RuntimeError("Las herramientas en proceso ya están abiertas en otro event loop; llama a cerrar() antes")
+        return
+    if _candado is None:
+        _candado = asyncio.Lock()
+    async with _candado:
+        if _pila is None:
+            pila = AsyncExitStack()
+            await pila.enter_async_context(ciclo_de_vida(mcp))
+            _pila, _loop = pila, loop
+
+
+async def cerrar() -> None:
+    """Detiene las tareas de fondo y cierra el cliente HTTP compartido"""
+    global _pila, _loop, _candado
+    if _pila is not None:
+        pila, _pila, _loop, _candado = _pila, None, None, None
+        await pila.aclose()
+
+
+@asynccontextmanager
+async def abierto() -> AsyncIterator[None]:
+    """Mantiene abierto el ciclo de vida del servidor mientras dure el bloque"""
+    await abrir()
+    try:
+        yield
+    finally:
+        await cerrar()
+
+
+async def ejecutar(nombre: str, argumentos: Optional[Dict[str, Any]] = None) -> Any:
+    """Valida los argumentos y ejecuta la herramienta `nombre` en este proceso"""
+    await abrir()
+    try:
+        resultado = await mcp.call_tool(nombre, argumentos or {})
+    except ToolError as e:
+        return {"error": str(e)}
+    return _decodificar(resultado)
+
+
+def _decodificar(resultado: Any) -> Any:
+    """Recupera el valor de la herramienta a partir de lo que retorna `FastMCP.call_tool`"""
+    if isinstance(resultado, tuple):
+        return resultado[1]  # herramienta con esquema de salida: (contenido, estructurado)
+    if isinstance(resultado, dict):
+        return resultado
+    textos = [bloque.text for bloque in resultado if isinstance(bloque, TextContent)]
+    valores = []
+    for texto in textos:
+        try:
+            valores.append(json.loads(texto))
+        except ValueError:
+            valores.append(texto)
+    return valores[0] if len(valores) == 1 else valores
@@ -0,0 +1,321 @@
+"""
+Espejo local de observaciones de iNaturalist en SQLite
+
+Guarda las observaciones de las áreas que se consultan con frecuencia para
+responder búsquedas por radio y taxón sin salir a la red:
+
+- Índice espacial R-tree sobre las coordenadas de cada observación
+- Índices por taxón (incluyendo todos sus ancestros, así una búsqueda por
+  género o familia encuentra las observaciones de sus especies), usuario y fechas
+- Sincronización incremental con `updated_since`: sólo se descargan las
+  observaciones creadas o modificadas desde la última sincronización
+
+Limitación: `updated_since` no informa observaciones eliminadas en
+iNaturalist; esas permanecen en el espejo hasta que se borre el archivo.
+
+Configuración por variables de entorno:
+
+- INATURALIST_ESPEJO_RUTA: Archivo SQLite del espejo (sin esta variable el espejo está deshabilitado)
+- INATURALIST_ESPEJO_MAX_ANTIGUEDAD: Segundos desde la última sincronización
+  en que el modo `auto` todavía usa el espejo (default: 3600)
+- INATURALIST_ESPEJO_INTERVALO: Segundos entre sincronizaciones automáticas de
+  las áreas registradas (default: 0, sin sincronización automática)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from inaturalist_comun import caja_envolvente, distancia_km, leer_coordenadas
+
+from paginacion import Cursor, recorrer_paginas
+
+# Campos de orden que el espejo puede resolver localmente
+ORDEN_LOCAL = {
+    "created_at": "o.created_at DESC",
+    "observed_on": "o.observed_on DESC",
+    "id": "o.id DESC",
+}
+
+
+@dataclass(frozen=True)
+class AreaSincronizada:
+    """Área registrada en el espejo y su última sincronización"""
+    lat: float
+    lng: float
+    radius: float
+    ultima_sincronizacion: Optional[float]
+
+    def contiene(self, lat: float, lng: float, radius: float) -> bool:
+        """Indica si el círculo consultado queda completamente dentro del área"""
+        return distancia_km(self.lat, self.lng, lat, lng) + radius <= self.radius + 1e-9
+
+    def antiguedad(self) -> Optional[float]:
+        if self.ultima_sincronizacion is None:
+            return None
+        return time.time() - self.ultima_sincronizacion
+
+
+class EspejoObservaciones:
+    """
+    Almacén SQLite de observaciones con índice espacial.
+
+    Args:
+        ruta: Archivo SQLite
+        resumir: Función que convierte una observación de iNaturalist en el
+            diccionario que retornan las herramientas (se guarda tal cual)
+    """
+
+    def __init__(self, ruta: str, resumir: Callable[[dict], dict]):
+        self.ruta = ruta
+        self.resumir = resumir
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        # Para filtrar por distancia real dentro de la consulta, no en Python
+        self._conexion.create_function("distancia_km", 4, distancia_km, deterministic=True)
+        self._conexion.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS observaciones (
+                id INTEGER PRIMARY KEY,
+                taxon_id INTEGER,
+                taxon_name TEXT COLLATE NOCASE,
+                usuario TEXT COLLATE NOCASE,
+                observed_on TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                lat REAL NOT NULL,
+                lng REAL NOT NULL,
+                datos TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_obs_taxon ON observaciones (taxon_id);
+            CREATE INDEX IF NOT EXISTS idx_obs_usuario ON observaciones (usuario);
+            CREATE INDEX IF NOT EXISTS idx_obs_observed_on ON observaciones (observed_on);
+            CREATE INDEX IF NOT EXISTS idx_obs_created_at ON observaciones (created_at);
+            CREATE TABLE IF NOT EXISTS observacion_taxones (
+                taxon_id INTEGER NOT NULL,
+                obs_id INTEGER NOT NULL,
+                PRIMARY KEY (taxon_id, obs_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_obs_taxones_obs ON observacion_taxones (obs_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS observaciones_rtree USING rtree (
+                id, min_lat, max_lat, min_lng, max_lng
+            );
+            CREATE TABLE IF NOT EXISTS areas (
+                lat REAL NOT NULL,
+                lng REAL NOT NULL,
+                radius REAL NOT NULL,
+                ultima_sincronizacion REAL,
+                updated_since TEXT,
+                PRIMARY KEY (lat, lng, radius)
+            );
+            """
+        )
+        self._conexion.commit()
+
+    # --- Áreas ---------------------------------------------------------------
+
+    def areas(self) -> List[AreaSincronizada]:
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT lat, lng, radius, ultima_sincronizacion FROM areas"
+            ).fetchall()
+        return [AreaSincronizada(*fila) for fila in filas]
+
+    def area_que_cubre(self, lat: float, lng: float, radius: float) -> Optional[AreaSincronizada]:
+        """Área sincronizada más reciente que contiene el círculo consultado"""
+        candidatas = [
+            area for area in self.areas()
+            if area.ultima_sincronizacion is not None and area.contiene(lat, lng, radius)
+        ]
+        return max(candidatas, key=lambda a: a.ultima_sincronizacion, default=None)
+
+    # --- Sincronización ------------------------------------------------------
+
+    async def sincronizar(
+        self,
+        solicitar: Callable[[str, dict], Awaitable[dict]],
+        lat: float,
+        lng: float,
+        radius: float,
+    ) -> Dict[str, Any]:
+        """
+        Descarga las observaciones del área creadas o modificadas desde la
+        última sincronización y las guarda en el espejo.
+        """
+        inicio = time.time()
+        desde = await asyncio.to_thread(self._updated_since, lat, lng, radius)
+        # Marca de tiempo tomada antes de consultar: lo que cambie durante la
+        # descarga se vuelve a pedir en la siguiente sincronización
+        marca = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+        params: Dict[str, Any] = {"lat": lat, "lng": lng, "radius": radius}
+        if desde:
+            params["updated_since"] = desde
+
+        guardadas = 0
+        async for pagina in recorrer_paginas(solicitar, Cursor(params=params), precarga=2):
+            guardadas += await asyncio.to_thread(self._guardar, pagina.observaciones)
+
+        await asyncio.to_thread(self._registrar_area, lat, lng, radius, time.time(), marca)
+        return {
+            "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
+            "incremental": desde is not None,
+            "desde": desde,
+            "guardadas": guardadas,
+            "duracion_s": round(time.time() - inicio, 3),
+        }
+
+    def _updated_since(self, lat: float, lng: float, radius: float) -> Optional[str]:
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT updated_since FROM areas WHERE lat = ? AND lng = ? AND radius = ?",
+                (lat, lng, radius),
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def _registrar_area(self, lat: float, lng: float, radius: float, momento: float, marca: str) -> None:
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO areas (lat, lng, radius, ultima_sincronizacion, updated_since) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (lat, lng, radius, momento, marca),
+            )
+            self._conexion.commit()
+
+    def _guardar(self, observaciones: List[dict]) -> int:
+        filas = []
+        taxones = []
+        for obs in observaciones:
+            lat, lng = leer_coordenadas(obs.get("location"))
+            if lat is None:
+                continue
+            taxon = obs.get("taxon") or {}
+            linaje = set(taxon.get("ancestor_ids") or [])
+            if taxon.get("id") is not None:
+                linaje.add(taxon["id"])
+            taxones.extend((taxon_id, obs["id"]) for taxon_id in linaje)
+            filas.append((
+                obs["id"],
+                taxon.get("id"),
+                taxon.get("name"),
+                (obs.get("user") or {}).get("login"),
+                obs.get("observed_on"),
+                obs.get("created_at"),
+                obs.get("updated_at"),
+                lat,
+                lng,
+                json.dumps(self.resumir(obs), ensure_ascii=False),
+            ))
+
+        with self._lock:
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO observaciones (id, taxon_id, taxon_name, "
+                "usuario, observed_on, created_at, updated_at, lat, lng, datos) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO observaciones_rtree (id, min_lat, max_lat, min_lng, max_lng) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(f[0], f[7], f[7], f[8], f[8]) for f in filas],
+            )
+            # La identificación puede haber cambiado: se reemplaza el linaje completo
+            self._conexion.executemany(
+                "DELETE FROM observacion_taxones WHERE obs_id = ?", [(f[0],) for f in filas]
+            )
+            self._conexion.executemany(
+                "INSERT OR IGNORE INTO observacion_taxones (taxon_id, obs_id) VALUES (?, ?)", taxones
+            )
+            self._conexion.commit()
+        return len(filas)
+
+    # --- Consultas -----------------------------------------------------------
+
+    def buscar(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        taxon_id: Optional[int] = None,
+        usuario: Optional[str] = None,
+        limite: int = 10,
+        order_by: str = "created_at",
+    ) -> Dict[str, Any]:
+        """
+        Observaciones dentro del círculo, filtradas por taxón y usuario.
+        El filtro por taxón incluye a todos sus descendientes. Los filtros, el
+        orden y el límite se resuelven en SQLite: sólo se leen los `datos` de
+        las observaciones que se retornan.
+        """
+        min_lat, max_lat, min_lng, max_lng = caja_envolvente(lat, lng, radius)
+        # El índice R descarta lo que está fuera de la caja envolvente y
+        # distancia_km lo que está en sus esquinas, fuera del círculo
+        condiciones = [
+            "r.min_lat <= ?", "r.max_lat >= ?", "r.min_lng <= ?", "r.max_lng >= ?",
+            "distancia_km(?, ?, o.lat, o.lng) <= ?",
+        ]
+        argumentos: List[Any] = [max_lat, min_lat, max_lng, min_lng, lat, lng, radius]
+        if taxon_id is not None:
+            condiciones.append("o.id IN (SELECT obs_id FROM observacion_taxones WHERE taxon_id = ?)")
+            argumentos.append(taxon_id)
+        if usuario:
+            condiciones.append("o.usuario = ?")
+            argumentos.append(usuario)
+
+        desde = (
+            "FROM observaciones_rtree r JOIN observaciones o ON o.id = r.id "
+            f"WHERE {' AND '.join(condiciones)}"
+        )
+        orden = ORDEN_LOCAL.get(order_by, ORDEN_LOCAL["created_at"])
+        with self._lock:
+            total = self._conexion.execute(f"SELECT COUNT(*) {desde}", argumentos).fetchone()[0]
+            filas = self._conexion.execute(
+                f"SELECT o.datos {desde} ORDER BY {orden} LIMIT ?", [*argumentos, max(0, limite)]
+            ).fetchall()
+        return {
+            "total": total,
+            "observaciones": [json.loads(datos) for (datos,) in filas],
+        }
+
+    def estado(self) -> Dict[str, Any]:
+        """Resumen del contenido del espejo y la antigüedad de cada área"""
+        with self._lock:
+            total = self._conexion.execute("SELECT COUNT(*) FROM observaciones").fetchone()[0]
+        return {
+            "ruta": self.ruta,
+            "observaciones": total,
+            "areas": [
+                {
+                    "coordenadas": {"lat": a.lat, "lng": a.lng, "radius_km": a.radius},
+                    "antiguedad_s": round(a.antiguedad(), 1) if a.antiguedad() is not None else None,
+                }
+                for a in self.areas()
+            ],
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conexion.close()
+
+
+@dataclass(frozen=True)
+class ConfigEspejo:
+    """Parámetros del espejo local"""
+    ruta: Optional[str] = None
+    max_antiguedad: float = 3600.0
+    intervalo: float = 0.0
+
+    @classmethod
+    def desde_entorno(cls) -> "ConfigEspejo":
+        return cls(
+            ruta=os.getenv("INATURALIST_ESPEJO_RUTA") or None,
+            max_antiguedad=float(os.getenv("INATURALIST_ESPEJO_MAX_ANTIGUEDAD", "3600")),
+            intervalo=float(os.getenv("INATURALIST_ESPEJO_INTERVALO", "0")),
+        )
@@ -0,0 +1,263 @@
+"""
+Formato de las respuestas de las herramientas
+
+Las herramientas aceptan `formato` para controlar cuántos tokens ocupa su
+resultado en el contexto del agente:
+
+- completo: las listas como objetos, una clave por campo y por fila (default)
+- compacto: cada lista de objetos pasa a una tabla por columnas. Los nombres
+  de campo aparecen una vez, las columnas con el mismo valor en todas las
+  filas se sacan a `constantes`, las columnas con valores muy repetidos se
+  codifican contra un diccionario de valores únicos y las URLs se reemplazan
+  por una plantilla (`plantillas`) más la parte que cambia
+- resumen: las listas se reemplazan por conteos (cuántas filas, valores más
+  frecuentes y rangos) y se omite el eco de las coordenadas de la consulta
+
+Una tabla compacta se vuelve a expandir a filas con `expandir_tabla`.
+
+Este módulo sólo depende de `inaturalist_comun` para poder usarlo desde los
+benchmarks sin cargar el servidor MCP.
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from inaturalist_comun import Observacion, Taxon
+
+FORMATOS = ("completo", "compacto", "resumen")
+
+URL_OBSERVACION = "https://www.inaturalist.org/observations/{id}"
+
+# Una plantilla por prefijo/sufijo común de URLs sólo vale la pena si ahorra esto por fila
+MIN_AHORRO_PLANTILLA = 12
+
+# El prefijo y el sufijo de una plantilla de URL se cortan en estos caracteres
+SEPARADORES_URL = "/?=."
+
+_HASHEABLES = (str, int, float, bool, type(None))
+
+
+def resumir_observacion(obs: Observacion) -> dict:
+    """Campos de una observación que retornan las herramientas"""
+    return {
+        "id": obs.id,
+        "especie": obs.especie or "No identificado",
+        "nombre_cientifico": obs.taxon_nombre,
+        "fecha_observacion": obs.observada_texto,
+        "lugar": obs.lugar,
+        "usuario": obs.usuario_login,
+        "foto_url": obs.foto_url,
+        "url": URL_OBSERVACION.format(id=obs.id)
+    }
+
+
+def resumir_taxon(taxon: Taxon) -> dict:
+    """Campos de un taxón que retornan las herramientas"""
+    return {
+        "id": taxon.id,
+        "nombre_cientifico": taxon.nombre,
+        "nombre_comun": taxon.nombre_comun,
+        "rango": taxon.rango,
+        "wikipedia_url": taxon.wikipedia_url,
+        "observaciones_totales": taxon.observaciones,
+        "foto_url": taxon.foto_url,
+        "estado_conservacion": taxon.estado_conservacion
+    }
+
+
+def validar_formato(formato: str) -> Optional[str]:
+    """Mensaje de error si el formato no existe"""
+    if formato not in FORMATOS:
+        return f"formato debe ser uno de: {', '.join(FORMATOS)}"
+    return None
+
+
+def _aplanar(fila: Dict[str, Any], prefijo: str = "") -> Dict[str, Any]:
+    """{"a": {"b": 1}} -> {"a.b": 1}"""
+    plana = {}
+    for clave, valor in fila.items():
+        if isinstance(valor, dict) and valor:
+            plana.update(_aplanar(valor, f"{prefijo}{clave}."))
+        else:
+            plana[f"{prefijo}{clave}"] = valor
+    return plana
+
+
+def _desaplanar(plana: Dict[str, Any]) -> Dict[str, Any]:
+    fila: Dict[str, Any] = {}
+    for clave, valor in plana.items():
+        destino = fila
+        *padres, hoja = clave.split(".")
+        for padre in padres:
+            destino = destino.setdefault(padre, {})
+        destino[hoja] = valor
+    return fila
+
+
+def _prefijo_sufijo(textos: List[str]) -> tuple:
+    """
+    Prefijo y sufijo comunes, cortados en un separador para no partir un id:
+    ".../photos/4991/square.jpg" y ".../photos/4992/square.jpg" comparten
+    ".../photos/" y "/square.jpg", no ".../photos/499"
+    """
+    prefijo = os.path.commonprefix(textos)
+    prefijo = prefijo[:max(prefijo.rfind(s) for s in SEPARADORES_URL) + 1]
+    restos = [t[len(prefijo):] for t in textos]
+    sufijo = os.path.commonprefix([r[::-1] for r in restos])[::-1]
+    cortes = [i for i in (sufijo.find(s) for s in SEPARADORES_URL) if i >= 0]
+    sufijo = sufijo[min(cortes):] if cortes else ""
+    return prefijo, sufijo
+
+
+def compactar_filas(filas: List[Dict[str, Any]], plantillas: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Convierte una lista de objetos en una tabla por columnas.
+
+    Args:
+        filas: Objetos (los anidados se aplanan como "padre.hijo")
+        plantillas: Columnas que se derivan de otras, como
+            {"url": "https://www.inaturalist.org/observations/{id}"}; se
+            omiten si la plantilla reproduce todos sus valores
+
+    En `plantillas` del resultado, "{}" es el valor de la columna en la fila y
+    "{columna}" el de otra columna; `diccionarios[columna]` son los valores
+    únicos a los que apuntan los índices de esa columna.
+    """
+    planas = [_aplanar(f) for f in filas]
+    columnas = list(dict.fromkeys(c for f in planas for c in f))
+    valores = {c: [f.get(c) for f in planas] for c in columnas}
+    tabla: Dict[str, Any] = {"n": len(planas)}
+    constantes: Dict[str, Any] = {}
+    diccionarios: Dict[str, List[Any]] = {}
+    plantillas_usadas: Dict[str, str] = {}
+
+    for columna in list(columnas):
+        plantilla = (plantillas or {}).get(columna)
+        if plantilla is not None:
+            try:
+                derivable = all(v == plantilla.format(**f) for v, f in zip(valores[columna], planas))
+            except (KeyError, IndexError, ValueError):
+                derivable = False
+            if derivable:
+                plantillas_usadas[columna] = plantilla
+                columnas.remove(columna)
+                continue
+
+        columna_valores = valores[columna]
+        if len(planas) > 1 and all(
+            isinstance(v, _HASHEABLES) and v == columna_valores[0] for v in columna_valores
+        ):
+            constantes[columna] = columna_valores[0]
+            columnas.remove(columna)
+            continue
+
+        textos = [v for v in columna_valores if isinstance(v, str)]
+        es_url = bool(textos) and all(t.startswith(("http://", "https://")) for t in textos)
+        if es_url and len(set(textos)) > 1 and all(isinstance(v, (str, type(None))) for v in columna_valores):
+            prefijo, sufijo = _prefijo_sufijo(textos)
+            if len(prefijo) + len(sufijo) >= MIN_AHORRO_PLANTILLA and "{" not in prefijo + sufijo:
+                plantillas_usadas[columna] = f"{prefijo}{{}}{sufijo}"
+                columna_valores = [
+                    v[len(prefijo):len(v) - len(sufijo)] if isinstance(v, str) else None for v in columna_valores
+                ]
+
+        if all(isinstance(v, _HASHEABLES) for v in columna_valores):
+            unicos = list(dict.fromkeys(columna_valores))
+            largo = sum(len(json.dumps(v, ensure_ascii=False)) for v in columna_valores)
+            largo_unicos = sum(len(json.dumps(v, ensure_ascii=False)) for v in unicos)
+            # Sólo si los índices y el diccionario ocupan menos que los valores repetidos
+            if len(unicos) <= len(columna_valores) // 2 and largo_unicos + 2 * len(columna_valores) < largo:
+                posicion = {v: i for i, v in enumerate(unicos)}
+                diccionarios[columna] = unicos
+                columna_valores = [posicion[v] for v in columna_valores]
+        valores[columna] = columna_valores
+
+    tabla["columnas"] = columnas
+    tabla["filas"] = [list(fila) for fila in zip(*(valores[c] for c in columnas))]
+    if constantes:
+        tabla["constantes"] = constantes
+    if diccionarios:
+        tabla["diccionarios"] = diccionarios
+    if plantillas_usadas:
+        tabla["plantillas"] = plantillas_usadas
+    return tabla
+
+
+def expandir_tabla(tabla: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inversa de `compactar_filas` (los campos faltantes vuelven como None)"""
+    columnas = tabla["columnas"]
+    diccionarios = tabla.get("diccionarios", {})
+    plantillas = tabla.get("plantillas", {})
+    filas = tabla["filas"] if columnas else [[] for _ in range(tabla["n"])]
+    resultado = []
+    for fila in filas:
+        plana = dict(tabla.get("constantes", {}))
+        for columna, valor in zip(columnas, fila):
+            if columna in diccionarios:
+                valor = diccionarios[columna][valor]
+            plana[columna] = valor
+        for columna, plantilla in plantillas.items():
+            if columna in plana:
+                if plana[columna] is not None:
+                    plana[columna] = plantilla.replace("{}", str(plana[columna]))
+            else:
+                plana[columna] = plantilla.format(**plana)
+        resultado.append(_desaplanar(plana))
+    return resultado
+
+
+def resumir_filas(filas: List[Dict[str, Any]], contar: Sequence[str] = (), rangos: Sequence[str] = (), top: int = 5) -> Dict[str, Any]:
+    """Cantidad de filas, valores más frecuentes de `contar` y mínimo/máximo de `rangos`"""
+    planas = [_aplanar(f) for f in filas]
+    resumen: Dict[str, Any] = {"n": len(planas)}
+    for columna in contar:
+        conteo = Counter(f.get(columna) for f in planas if isinstance(f.get(columna), _HASHEABLES[:-1]))
+        if conteo:
+            resumen[columna] = {"distintos": len(conteo), "frecuentes": [[v, n] for v, n in conteo.most_common(top)]}
+    for columna in rangos:
+        presentes = [f[columna] for f in planas if f.get(columna) is not None]
+        if presentes:
+            resumen[columna] = {"min": min(presentes), "max": max(presentes)}
+    return resumen
+
+
+def aplicar_formato(
+    respuesta: Dict[str, Any],
+    formato: str,
+    plantillas: Optional[Dict[str, str]] = None,
+    contar: Sequence[str] = (),
+    rangos: Sequence[str] = (),
+) -> Dict[str, Any]:
+    """
+    Aplica el formato a la respuesta de una herramienta: cada lista de
+    objetos del primer nivel se compacta o se resume. Las respuestas con
+    "error" se retornan sin cambios.
+    """
+    if formato == "completo" or "error" in respuesta:
+        return respuesta
+    formateada = {}
+    for clave, valor in respuesta.items():
+        if formato == "resumen" and clave == "coordenadas":
+            continue
+        if isinstance(valor, list) and valor and all(isinstance(v, dict) for v in valor):
+            if formato == "compacto":
+                valor = compactar_filas(valor, plantillas)
+            else:
+                valor = resumir_filas(valor, contar, rangos)
+        formateada[clave] = valor
+    return formateada
+
+
+def contar_tokens(texto: str) -> int:
+    """
+    Tokens del texto con el tokenizador cl100k de `tiktoken` si está
+    instalado; si no, una aproximación por palabras, números y signos.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return len(re.findall(r"[A-Za-zÀ-ÿ]{1,6}|\d{1,3}|[^\sA-Za-zÀ-ÿ\d]", texto))
+    return len(tiktoken.get_encoding("cl100k_base").encode(texto))
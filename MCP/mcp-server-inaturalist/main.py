@@ -1,13 +1,93 @@
 """
 MCP Server iNaturalist: Servidor para consultar datos de biodiversidad
+
+Por defecto se comunica por stdio (un proceso por sesión). Con
+`--transporte streamable-http` (o `sse`) queda corriendo como servicio HTTP
+que comparten varios agentes: el cliente HTTP, la caché, el limitador y el
+espejo se mantienen calientes entre sesiones.
+
+Configuración (los argumentos tienen prioridad sobre las variables de entorno):
+
+- INATURALIST_MCP_TRANSPORTE: stdio, streamable-http o sse (default: stdio)
+- INATURALIST_MCP_HOST: Interfaz en modo HTTP (default: 127.0.0.1)
+- INATURALIST_MCP_PUERTO: Puerto en modo HTTP (default: 8001)
+- INATURALIST_MCP_SIN_ESTADO: "1" para streamable-http sin estado de sesión
+  (cada solicitud es independiente; permite varias réplicas detrás de un balanceador)
+- INATURALIST_PRECALENTAR: En modo HTTP el precalentamiento de la caché está
+  activo salvo que valga "0"; en stdio está apagado salvo que valga "1"
+
+`--perfil-arranque` no inicia el servidor: reporta cuánto tarda en importarse
+cada módulo de `server` en un proceso nuevo (ver inaturalist_comun/arranque.py).
+
+Uso:
+    python main.py
+    python main.py --transporte streamable-http --puerto 8001
+    python main.py --perfil-arranque
 """
 
-from server import mcp
+import argparse
+import asyncio
+import os
+
+TRANSPORTES = ("stdio", "streamable-http", "sse")
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+async def servir_http(transporte: str) -> None:
+    """
+    Sirve por HTTP manteniendo abiertos el cliente y las tareas de fondo
+    durante toda la vida del proceso, no sólo mientras haya sesiones activas.
+    """
+    from server import ciclo_de_vida, mcp
+
+    async with ciclo_de_vida(mcp):
+        if transporte == "sse":
+            await mcp.run_sse_async()
+        else:
+            await mcp.run_streamable_http_async()
 
 
 def main():
-    """Ejecuta el servidor MCP usando stdio"""
-    mcp.run()
+    """Ejecuta el servidor MCP con el transporte configurado"""
+    from inaturalist_comun import leer_bool
+
+    parser = argparse.ArgumentParser(description="Servidor MCP de iNaturalist")
+    parser.add_argument("--transporte", choices=TRANSPORTES,
+                        default=os.getenv("INATURALIST_MCP_TRANSPORTE", "stdio"))
+    parser.add_argument("--host", default=os.getenv("INATURALIST_MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--puerto", type=int, default=int(os.getenv("INATURALIST_MCP_PUERTO", "8001")))
+    parser.add_argument("--sin-estado", action="store_true",
+                        default=leer_bool("INATURALIST_MCP_SIN_ESTADO"))
+    parser.add_argument("--perfil-arranque", action="store_true",
+                        help="Reporta el tiempo de importación por módulo y termina")
+    args = parser.parse_args()
+
+    if args.perfil_arranque:
+        from inaturalist_comun import perfilar_importacion, reporte_importaciones, resumir_importaciones
+
+        try:
+            importaciones = perfilar_importacion("server", directorio=DIRECTORIO)
+        except RuntimeError as e:
+            parser.exit(1, f"{e}\n")
+        print(reporte_importaciones("server", resumir_importaciones(importaciones)))
+        return
+
+    if args.transporte != "stdio":
+        # Como servicio compartido el precalentamiento se paga una vez para todas
+        # las sesiones; en stdio cada proceso gastaría cuota de iNaturalist al arrancar
+        os.environ.setdefault("INATURALIST_PRECALENTAR", "1")
+
+    # El servidor (mcp, pydantic, httpx...) se importa sólo cuando se va a servir
+    from server import mcp
+
+    if args.transporte == "stdio":
+        mcp.run()
+        return
+
+    mcp.settings.host = args.host
+    mcp.settings.port = args.puerto
+    mcp.settings.stateless_http = args.sin_estado
+    asyncio.run(servir_http(args.transporte))
 
 
 if __name__ == "__main__":
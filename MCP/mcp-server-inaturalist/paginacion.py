@@ -0,0 +1,166 @@
+"""
+Recorrido paginado de observaciones de iNaturalist con cursor `id_above`
+
+iNaturalist limita la paginación por número de página (page * per_page no
+puede pasar de 10.000). Para recorrer la historia completa de un área se
+ordena por id ascendente y se pide cada página con `id_above` igual al último
+id recibido. El cursor que se entrega al llamador codifica los parámetros de
+la consulta y ese último id, de modo que un recorrido interrumpido se puede
+retomar sólo con el cursor.
+
+Con `descendente=True` el recorrido va de las observaciones más recientes a
+las más antiguas (orden descendente e `id_below`), para quien sólo necesita
+una muestra de las últimas N.
+
+Como cada página depende del último id de la anterior, las páginas no se
+pueden pedir en paralelo; en su lugar se precargan: mientras se procesa una
+página ya se está descargando la siguiente. La memoria usada queda acotada por
+`precarga` páginas sin importar cuántas observaciones tenga el área. Con
+`limite` la precarga se detiene en cuanto las páginas descargadas cubren esa
+cantidad de observaciones, y al cerrar el generador se cancela la página que
+se esté descargando.
+"""
+
+import asyncio
+import base64
+import json
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+MAX_POR_PAGINA = 200
+
+# Retorna el JSON de iNaturalist o una página ya proyectada (`inaturalist_comun.Pagina`)
+Solicitar = Callable[[str, dict], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Posición de un recorrido: parámetros de la consulta y último id entregado"""
+    params: Dict[str, Any]
+    id_above: int = 0
+    id_below: int = 0  # sólo en recorridos descendentes; 0 empieza por la más reciente
+    descendente: bool = False
+
+    def codificar(self) -> str:
+        """Token opaco para retomar el recorrido"""
+        if self.descendente:
+            contenido = {"p": self.params, "id": self.id_below, "d": 1}
+        else:
+            contenido = {"p": self.params, "id": self.id_above}
+        texto = json.dumps(contenido, sort_keys=True, separators=(",", ":"))
+        return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decodificar(cls, token: str) -> "Cursor":
+        """Reconstruye un cursor a partir de su token"""
+        try:
+            relleno = "=" * (-len(token) % 4)
+            contenido = json.loads(base64.urlsafe_b64decode(token + relleno))
+            if contenido.get("d"):
+                return cls(params=dict(contenido["p"]), id_below=int(contenido["id"]), descendente=True)
+            return cls(params=dict(contenido["p"]), id_above=int(contenido["id"]))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Cursor inválido: {e}") from e
+
+
+def _resultados(data: Any) -> Tuple[Sequence[Any], Optional[int]]:
+    """Resultados y total de una respuesta JSON o de una página proyectada"""
+    if isinstance(data, dict):
+        return data.get("results", []), data.get("total_results")
+    return data.resultados, data.total
+
+
+def _id(obs: Any) -> int:
+    return obs["id"] if isinstance(obs, dict) else obs.id
+
+
+def _siguiente(cursor: Cursor, ultimo_id: int) -> Cursor:
+    if cursor.descendente:
+        return replace(cursor, id_below=ultimo_id)
+    return replace(cursor, id_above=ultimo_id)
+
+
+@dataclass
+class Pagina:
+    """Una página de resultados y el cursor que apunta justo después de ella"""
+    observaciones: Sequence[Any]  # diccionarios o registros `Observacion`, según `solicitar`
+    cursor: Cursor
+    total: Optional[int]
+
+
+async def recorrer_paginas(
+    solicitar: Solicitar,
+    cursor: Cursor,
+    por_pagina: int = MAX_POR_PAGINA,
+    precarga: int = 1,
+    limite: Optional[int] = None,
+) -> AsyncIterator[Pagina]:
+    """
+    Genera las páginas de observaciones a partir del cursor dado.
+
+    Args:
+        solicitar: Función que hace el GET a iNaturalist y retorna el JSON o
+            una página proyectada
+        cursor: Punto de partida (id_above=0 para empezar desde el principio;
+            con `descendente`, id_below=0 para empezar por la más reciente)
+        por_pagina: Observaciones por página (máx 200)
+        precarga: Páginas que se descargan por adelantado mientras se procesa la actual
+        limite: Observaciones que necesita el llamador; no se piden más
+            páginas una vez descargadas (default: todas)
+    """
+    por_pagina = max(1, min(por_pagina, MAX_POR_PAGINA))
+    cola: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=max(1, precarga))
+    fin = object()
+
+    async def productor():
+        actual = cursor
+        descargadas = 0
+        try:
+            while limite is None or descargadas < limite:
+                params = {**actual.params, "order_by": "id", "per_page": por_pagina}
+                if actual.descendente:
+                    params["order"] = "desc"
+                    if actual.id_below:
+                        params["id_below"] = actual.id_below
+                else:
+                    params["order"] = "asc"
+                    params["id_above"] = actual.id_above
+                resultados, total = _resultados(await solicitar("/observations", params))
+                if not resultados:
+                    break
+                actual = _siguiente(actual, _id(resultados[-1]))
+                descargadas += len(resultados)
+                await cola.put(Pagina(resultados, actual, total))
+                if len(resultados) < por_pagina:
+                    break
+            await cola.put(fin)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await cola.put(e)
+
+    tarea = asyncio.get_running_loop().create_task(productor())
+    try:
+        while True:
+            elemento = await cola.get()
+            if elemento is fin:
+                return
+            if isinstance(elemento, Exception):
+                raise elemento
+            yield elemento
+    finally:
+        # Cancela la página en descarga y espera a que termine antes de cerrar
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+
+
+async def recorrer_observaciones(
+    solicitar: Solicitar,
+    cursor: Cursor,
+    por_pagina: int = MAX_POR_PAGINA,
+    precarga: int = 1,
+) -> AsyncIterator[dict]:
+    """Genera las observaciones una a una, recorriendo todas las páginas"""
+    async for pagina in recorrer_paginas(solicitar, cursor, por_pagina, precarga):
+        for obs in pagina.observaciones:
+            yield obs
@@ -1,19 +1,382 @@
 from mcp.server.fastmcp import FastMCP
+from pydantic import BaseModel, Field
+import asyncio
 import httpx
-from typing import Optional, List, Dict
+import json
+import logging
+from contextlib import asynccontextmanager
+import os
+from pathlib import Path
+from typing import Any, Optional, List, Dict, Tuple, Union
 
-mcp = FastMCP("iNaturalist")
+from inaturalist_comun import (
+    PRIORIDAD_BAJA,
+    CacheRespuestas,
+    ConfigCache,
+    ConfigLimitador,
+    ConfigPolitica,
+    ConfigPrecalentamiento,
+    ConfigTeselas,
+    ConsultaTeselada,
+    ConsultasEnVuelo,
+    LimitadorTasa,
+    Lugar,
+    NoModificada,
+    Observacion,
+    PlazoAgotado,
+    PoliticaSolicitudes,
+    Precalentador,
+    Sitio,
+    Taxon,
+    Validada,
+    cargar_json,
+    clave_consulta,
+    decodificar_pagina,
+    encabezados_condicionales,
+    enviar_medido,
+    fase,
+    instrumentar_herramienta,
+    nomenclator,
+    registro,
+    solicitar_con_limite,
+    trazas_recientes,
+    usar_prioridad,
+)
+
+from cliente import cliente_abierto, obtener_cliente
+from espejo import ORDEN_LOCAL, ConfigEspejo, EspejoObservaciones
+from formato import URL_OBSERVACION, aplicar_formato, resumir_observacion, resumir_taxon, validar_formato
+from paginacion import MAX_POR_PAGINA, Cursor, recorrer_paginas
+
+logger = logging.getLogger(__name__)
+
+# Tareas periódicas que corren mientras haya al menos una sesión activa
+_sesiones = 0
+_tareas_fondo: List[asyncio.Task] = []
+
+
+@asynccontextmanager
+async def ciclo_de_vida(server: FastMCP):
+    """
+    Mantiene abierto el cliente HTTP compartido mientras el servidor corre y
+    arranca las tareas de fondo con la primera sesión.
+    """
+    global _sesiones
+    async with cliente_abierto():
+        _sesiones += 1
+        if _sesiones == 1:
+            _iniciar_tareas_fondo()
+        try:
+            yield {}
+        finally:
+            _sesiones -= 1
+            if _sesiones == 0:
+                await _detener_tareas_fondo()
+
+
+def _iniciar_tareas_fondo() -> None:
+    if espejo is not None and config_espejo.intervalo > 0:
+        with usar_prioridad(PRIORIDAD_BAJA):
+            _tareas_fondo.append(asyncio.create_task(_sincronizar_periodicamente()))
+    if precalentador.config.habilitado:
+        _tareas_fondo.append(asyncio.create_task(precalentador.ejecutar()))
+
+
+async def _detener_tareas_fondo() -> None:
+    for tarea in _tareas_fondo:
+        tarea.cancel()
+    await asyncio.gather(*_tareas_fondo, return_exceptions=True)
+    _tareas_fondo.clear()
+
+
+mcp = FastMCP("iNaturalist", lifespan=ciclo_de_vida)
+
+# Caché de respuestas compartida por todas las herramientas
+cache = CacheRespuestas(ConfigCache.desde_entorno())
+
+# Consultas idénticas en curso: las llamadas concurrentes comparten una sola solicitud
+en_vuelo = ConsultasEnVuelo()
+
+# Espejo local de observaciones (opcional, ver espejo.py)
+config_espejo = ConfigEspejo.desde_entorno()
+espejo: Optional[EspejoObservaciones] = None
+
+
+# Lugares conocidos para el parámetro `lugar` de las herramientas, cargados al arrancar
+lugares = nomenclator()
+
+# Ubicación por defecto: Humedal la Conejera - Bogotá, con las coordenadas del nomenclátor
+CONEJERA = lugares.buscar("Humedal La Conejera")
+CONEJERA_LAT = CONEJERA.lat
+CONEJERA_LNG = CONEJERA.lng
+RADIO_DEFECTO_KM = 3.0  # sin `lugar`; con `lugar` se usa el radio que lo cubre
+
+# Limitador de tasa y concurrencia para todas las solicitudes a iNaturalist
+limitador = LimitadorTasa(ConfigLimitador.desde_entorno())
+
+# Plazo por herramienta, reintentos con jitter y hedging opcional de las solicitudes.
+# Las herramientas con muchas solicitudes suman al plazo lo que el limitador
+# tarda en dejarlas salir
+politica = PoliticaSolicitudes(
+    ConfigPolitica.desde_entorno(),
+    reintentables=(httpx.TransportError,),
+    segundos_por_solicitud=1 / limitador.config.tasa,
+)
+
+# Precalentamiento de las consultas por defecto de la Conejera y de las más
+# pedidas: se repiten en segundo plano, con prioridad baja, antes de que venzan.
+# Apagado salvo en modo HTTP (main.py) o con INATURALIST_PRECALENTAR=1. No aprende
+# de `analizar_biodiversidad`: cada repetición pediría decenas de páginas
+precalentador = Precalentador(
+    ConfigPrecalentamiento.desde_entorno(
+        consultas=[
+            ("buscar_observaciones", {}),
+            ("estadisticas_biodiversidad", {}),
+        ]
+    ),
+    ocupado=limitador.ocupado,
+    ignorar=("formato",),
+)
+
+
+async def _solicitar(endpoint: str, params: dict, tipo: Optional[type] = None) -> Any:
+    """
+    Hace un GET a la API de iNaturalist con el cliente compartido y retorna el JSON.
+    La solicitud espera su turno en el limitador de tasa, queda registrada
+    en las métricas (latencia, código, tamaño, decodificación) y se reintenta
+    o duplica según la política dentro del plazo de la herramienta.
+
+    Con `tipo` (Observacion, Taxon o Lugar) retorna una `Pagina` con los
+    resultados ya proyectados a ese registro en lugar del JSON completo.
+    """
+    return (await _solicitar_validada(endpoint, params, tipo)).valor
+
+
+async def _solicitar_validada(endpoint: str, params: dict, tipo: Optional[type] = None) -> Validada:
+    """
+    Igual que `_solicitar`, pero retorna también el ETag y Last-Modified de la
+    respuesta. Si la caché está revalidando una entrada, el GET es condicional
+    y un 304 se señala con `NoModificada`.
+    """
+    encabezados = encabezados_condicionales()
+    response = await politica.ejecutar(
+        endpoint,
+        lambda timeout: solicitar_con_limite(
+            limitador,
+            lambda: enviar_medido(
+                endpoint, lambda: obtener_cliente().get(endpoint, params=params, headers=encabezados, timeout=timeout)
+            ),
+        ),
+    )
+    if response.status_code == 304:
+        raise NoModificada(endpoint)
+    response.raise_for_status()
+    with fase("json"):
+        if tipo is None:
+            valor = cargar_json(response.content)
+        else:
+            valor = decodificar_pagina(response.content, tipo)
+    return Validada(valor, response.headers.get("etag"), response.headers.get("last-modified"))
+
+
+async def _consultar(endpoint: str, params: dict, tipo: Optional[type] = None) -> Any:
+    """
+    Igual que `_solicitar`, pero las respuestas se guardan en caché según los
+    parámetros normalizados y las consultas idénticas simultáneas se agrupan
+    en una sola solicitud. Las entradas vencidas se revalidan con un GET
+    condicional.
+    """
+    # La misma consulta proyectada y sin proyectar son entradas distintas
+    clave_params = params if tipo is None else {**params, "_proyeccion": tipo.__name__}
+    clave = clave_consulta(endpoint, clave_params)
+    return await cache.obtener(
+        endpoint, clave_params, lambda: en_vuelo.ejecutar(clave, lambda: _solicitar_validada(endpoint, params, tipo))
+    )
+
+
+# Búsquedas por círculo armadas con teselas que se guardan en caché por separado,
+# para que áreas cercanas o solapadas reutilicen lo ya descargado
+config_teselas = ConfigTeselas.desde_entorno()
+teselas = ConsultaTeselada(config_teselas, lambda params: _consultar("/observations", params, Observacion))
+
+
+def _resumir_json(obs: dict) -> dict:
+    """`resumir_observacion` para observaciones sin proyectar (espejo, exportación)"""
+    return resumir_observacion(Observacion.desde_inaturalist(obs))
+
+
+if config_espejo.ruta:
+    espejo = EspejoObservaciones(config_espejo.ruta, _resumir_json)
+
+
+async def _sincronizar_periodicamente() -> None:
+    """Sincroniza todas las áreas registradas en el espejo cada `intervalo` segundos"""
+    while True:
+        await asyncio.sleep(config_espejo.intervalo)
+        for area in await asyncio.to_thread(espejo.areas):
+            try:
+                await espejo.sincronizar(_solicitar, area.lat, area.lng, area.radius)
+            except Exception as e:
+                logger.warning("Error al sincronizar el espejo (%s, %s): %s", area.lat, area.lng, e)
+
+
+async def _resolver_taxon(nombre: str) -> Optional[int]:
+    """
+    Id del taxón con ese nombre científico o común. La respuesta de /taxa queda
+    en caché, así que sólo la primera búsqueda de cada nombre sale a la red.
+    """
+    taxon = await _buscar_taxon_por_nombre(nombre)
+    return taxon.id if taxon is not None else None
+
+
+async def _buscar_taxon_por_nombre(nombre: str) -> Optional[Taxon]:
+    """Taxón cuyo nombre científico o común coincide; si ninguno coincide, el primero"""
+    pagina = await _consultar("/taxa", {"q": nombre, "is_active": True, "per_page": 10}, Taxon)
+    buscado = nombre.strip().lower()
+    for taxon in pagina.resultados:
+        if buscado in {(taxon.nombre or "").lower(), (taxon.nombre_comun or "").lower()}:
+            return taxon
+    return pagina.resultados[0] if pagina.resultados else None
+
+
+async def _buscar_en_espejo(
+    source: str,
+    lat: float,
+    lng: float,
+    radius: float,
+    taxon_name: Optional[str],
+    per_page: int,
+    order_by: str
+) -> Optional[dict]:
+    """
+    Responde la búsqueda desde el espejo local si `source` lo permite.
+    Retorna None cuando la consulta debe ir a iNaturalist.
+    """
+    if source == "live":
+        return None
+    if espejo is None:
+        if source == "local":
+            raise ValueError("El espejo local no está configurado (INATURALIST_ESPEJO_RUTA)")
+        return None
+    if order_by not in ORDEN_LOCAL:
+        if source == "local":
+            raise ValueError(f"El espejo local no puede ordenar por '{order_by}'")
+        return None
+
+    area = await asyncio.to_thread(espejo.area_que_cubre, lat, lng, radius)
+    if area is None:
+        if source == "local":
+            raise ValueError("El espejo local no cubre esta área; usa sincronizar_espejo primero")
+        return None
+    if source == "auto" and area.antiguedad() > config_espejo.max_antiguedad:
+        return None
+
+    taxon_id = None
+    if taxon_name:
+        taxon_id = await _resolver_taxon(taxon_name)
+        if taxon_id is None:
+            if source == "local":
+                raise ValueError(f"No se encontró el taxón '{taxon_name}'")
+            return None
+
+    resultado = await asyncio.to_thread(
+        espejo.buscar, lat, lng, radius, taxon_id=taxon_id, limite=per_page, order_by=order_by
+    )
+    return {
+        "total": resultado["total"],
+        "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
+        "observaciones": resultado["observaciones"],
+        "fuente": "local",
+        "antiguedad_s": round(area.antiguedad(), 1)
+    }
+
+
+@mcp.resource("inaturalist://limitador/estado")
+def estado_limitador() -> dict:
+    """Concurrencia actual, solicitudes en espera, tokens disponibles y respuestas 429"""
+    return limitador.estadisticas()
+
+
+@mcp.resource("inaturalist://politica/estado")
+def estado_politica() -> dict:
+    """Reintentos, copias (hedging), presupuesto de reintentos y plazos agotados"""
+    return politica.estadisticas()
+
+
+@mcp.resource("inaturalist://precalentamiento/estado")
+def estado_precalentamiento() -> dict:
+    """Consultas calientes (fijas y aprendidas del tráfico), rondas y errores del precalentamiento"""
+    return precalentador.estadisticas()
+
+
+@mcp.resource("inaturalist://metricas", mime_type="text/plain")
+def metricas() -> str:
+    """Métricas del servidor en formato de texto de Prometheus"""
+    return registro.exponer()
+
+
+@mcp.resource("inaturalist://metricas/resumen")
+def resumen_metricas() -> dict:
+    """Métricas del servidor en JSON, con percentiles estimados por herramienta y endpoint"""
+    return registro.resumen()
+
+
+@mcp.resource("inaturalist://metricas/trazas")
+def trazas() -> list:
+    """Últimas trazas por llamada a herramienta (requiere INATURALIST_TRAZAS=1)"""
+    return trazas_recientes()
+
+
+@mcp.resource("inaturalist://cache/estadisticas")
+def estadisticas_cache() -> dict:
+    """Contadores de la caché de respuestas y de las consultas agrupadas en vuelo"""
+    return {**cache.estadisticas(), "en_vuelo": en_vuelo.estadisticas(), "teselas": teselas.estadisticas()}
+
+
+def _resolver_lugar(
+    lugar: Optional[str], lat: float, lng: float, radius: Optional[float]
+) -> Union[dict, Tuple[float, float, float, Optional[Sitio]]]:
+    """
+    Centro, radio y sitio de una búsqueda. `lugar` reemplaza lat/lng y, sin
+    `radius`, aporta el radio que lo cubre; sin `lugar` el sitio es None. Si
+    el lugar no está en el nomenclátor retorna el error con sugerencias.
+    """
+    if lugar is None:
+        return lat, lng, RADIO_DEFECTO_KM if radius is None else radius, None
+    if (sitio := lugares.buscar(lugar)) is None:
+        return {
+            "error": f"Lugar '{lugar}' no encontrado",
+            "sugerencias": [s.nombre for s, _ in lugares.sugerir(lugar, limite=3, minimo=0.2)]
+        }
+    return sitio.lat, sitio.lng, sitio.radio_km if radius is None else radius, sitio
+
+
+def _formatear_observaciones(respuesta: dict, formato: str) -> dict:
+    """`aplicar_formato` para respuestas con observaciones"""
+    with fase("formato"):
+        return aplicar_formato(
+            respuesta,
+            formato,
+            plantillas={"url": URL_OBSERVACION},
+            contar=("especie", "nombre_cientifico", "usuario", "lugar"),
+            rangos=("fecha_observacion", "fecha"),
+        )
 
-BASE_URL = "https://api.inaturalist.org/v1"
 
 @mcp.tool()
+@instrumentar_herramienta
+@precalentador.aprender
+@politica.con_plazo
 async def buscar_observaciones(
     taxon_name: Optional[str] = None,
-    lat: float = 4.8155,  # Humedal la Conejera - Bogotá
-    lng: float = -74.0750,
-    radius: float = 3.0,  # Radio en km
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: Optional[float] = None,  # Radio en km
     per_page: int = 10,
-    order_by: str = "created_at"
+    order_by: str = "created_at",
+    source: str = "auto",
+    lugar: Optional[str] = None,
+    formato: str = "completo"
 ) -> dict:
     """
     Busca observaciones en iNaturalist usando coordenadas geográficas.
@@ -21,13 +384,31 @@ async def buscar_observaciones(
     
     Args:
         taxon_name: Nombre del taxón (especie, género, familia, etc.)
-        lat: Latitud (default: 4.8155 - Humedal la Conejera)
-        lng: Longitud (default: -74.0750 - Humedal la Conejera)
-        radius: Radio de búsqueda en km (default: 3)
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
+        radius: Radio de búsqueda en km (default: 3, o el radio del lugar)
         per_page: Número de resultados (máx 200)
         order_by: Ordenar por 'created_at', 'observed_on', 'species_guess', 'votes'
+        source: 'live' consulta iNaturalist, 'local' usa el espejo local y 'auto'
+            usa el espejo si cubre el área y está actualizado (default: 'auto')
+        lugar: Nombre de un lugar conocido (humedal, área protegida, quebrada...)
+            en vez de lat/lng; acepta alias y nombres aproximados
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
     """
+    if source not in ("auto", "local", "live"):
+        return {"error": "source debe ser 'auto', 'local' o 'live'"}
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
+    if isinstance(area := _resolver_lugar(lugar, lat, lng, radius), dict):
+        return area
+    lat, lng, radius, _ = area
+
     try:
+        local = await _buscar_en_espejo(source, lat, lng, radius, taxon_name, min(per_page, 200), order_by)
+        if local is not None:
+            return _formatear_observaciones(local, formato)
+
         params = {
             "lat": lat,
             "lng": lng,
@@ -38,35 +419,34 @@ async def buscar_observaciones(
         
         if taxon_name:
             params["taxon_name"] = taxon_name
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{BASE_URL}/observations",
-                params=params
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            observaciones = []
-            for obs in data.get("results", []):
-                observaciones.append({
-                    "id": obs.get("id"),
-                    "especie": obs.get("species_guess", "No identificado"),
-                    "nombre_cientifico": obs.get("taxon", {}).get("name"),
-                    "fecha_observacion": obs.get("observed_on_string"),
-                    "lugar": obs.get("place_guess"),
-                    "usuario": obs.get("user", {}).get("login"),
-                    "foto_url": obs.get("photos", [{}])[0].get("url") if obs.get("photos") else None,
-                    "url": f"https://www.inaturalist.org/observations/{obs.get('id')}"
-                })
-            
-            return {
-                "total": data.get("total_results"),
-                "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
-                "observaciones": observaciones
-            }
+
+        teselado = None
+        if config_teselas.habilitadas:
+            filtros = {"taxon_name": taxon_name} if taxon_name else {}
+            teselado = await teselas.buscar(lat, lng, radius, params["per_page"], filtros, order_by)
+        if teselado is not None:
+            total, resultados = teselado.total, teselado.resultados
+        else:
+            pagina = await _consultar("/observations", params, Observacion)
+            total, resultados = pagina.total, pagina.resultados
+
+        with fase("formato"):
+            observaciones = [resumir_observacion(obs) for obs in resultados]
+
+        respuesta = {
+            "total": total,
+            "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
+            "observaciones": observaciones,
+            "fuente": "live"
+        }
+        if teselado is not None:
+            respuesta["teselas"] = teselado.teselas
+            respuesta["total_exacto"] = teselado.total_exacto
+        return _formatear_observaciones(respuesta, formato)
             
-    except httpx.TimeoutException:
+    except ValueError as e:
+        return {"error": str(e)}
+    except (httpx.TimeoutException, PlazoAgotado):
         return {"error": "Tiempo de espera agotado al consultar iNaturalist"}
     except httpx.HTTPStatusError as e:
         return {"error": f"Error HTTP {e.response.status_code}: {e.response.text}"}
@@ -75,13 +455,158 @@ async def buscar_observaciones(
 
 
 @mcp.tool()
+@instrumentar_herramienta
+async def sincronizar_espejo(
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: float = 3.0
+) -> dict:
+    """
+    Registra un área en el espejo local y descarga sus observaciones. La
+    primera vez descarga todo el historial; las siguientes sólo lo creado o
+    modificado desde la última sincronización. Después de sincronizar,
+    `buscar_observaciones` responde consultas dentro del área sin ir a iNaturalist.
+    
+    Args:
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
+        radius: Radio del área en km (default: 3)
+    """
+    if espejo is None:
+        return {"error": "El espejo local no está configurado (INATURALIST_ESPEJO_RUTA)"}
+    try:
+        # Descarga masiva: cede el turno a las consultas interactivas
+        with usar_prioridad(PRIORIDAD_BAJA):
+            return await espejo.sincronizar(_solicitar, lat, lng, radius)
+    except Exception as e:
+        return {"error": f"Error al sincronizar el espejo: {str(e)}"}
+
+
+@mcp.resource("inaturalist://espejo/estado")
+def estado_espejo() -> dict:
+    """Observaciones guardadas en el espejo local y antigüedad de cada área"""
+    if espejo is None:
+        return {"habilitado": False}
+    return {"habilitado": True, **espejo.estado()}
+
+
+# Directorio donde `exportar_observaciones` escribe los archivos NDJSON
+DIR_EXPORTACION = Path(os.getenv("INATURALIST_DIR_EXPORTACION", "exportaciones"))
+
+
+def _ruta_exportacion(archivo: str) -> Path:
+    """Resuelve el archivo dentro del directorio de exportación (sin permitir salir de él)"""
+    base = DIR_EXPORTACION.resolve()
+    ruta = (base / archivo).resolve()
+    if base != ruta.parent and base not in ruta.parents:
+        raise ValueError(f"El archivo debe quedar dentro de {base}")
+    return ruta
+
+
+@mcp.tool()
+@instrumentar_herramienta
+async def exportar_observaciones(
+    archivo: str,
+    taxon_name: Optional[str] = None,
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: float = 3.0,
+    cursor: Optional[str] = None,
+    max_observaciones: Optional[int] = None,
+    precarga: int = 2
+) -> dict:
+    """
+    Exporta todas las observaciones de un área a un archivo NDJSON (una
+    observación JSON por línea), recorriendo todas las páginas de iNaturalist.
+    Para retomar una exportación interrumpida o limitada, vuelve a llamar con
+    el mismo archivo y el `cursor` retornado: se continúa agregando al archivo.
+    
+    Args:
+        archivo: Nombre del archivo dentro del directorio de exportación (ej: "conejera.ndjson")
+        taxon_name: Nombre del taxón (opcional)
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
+        radius: Radio de búsqueda en km (default: 3)
+        cursor: Cursor de una exportación anterior; si se da, se ignoran los demás filtros
+        max_observaciones: Detenerse después de escribir esta cantidad (opcional)
+        precarga: Páginas que se descargan por adelantado (1 a 5, default: 2)
+    """
+    try:
+        ruta = _ruta_exportacion(archivo)
+        if cursor:
+            inicio = Cursor.decodificar(cursor)
+        else:
+            params = {"lat": lat, "lng": lng, "radius": radius}
+            if taxon_name:
+                params["taxon_name"] = taxon_name
+            inicio = Cursor(params=params)
+
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        escritas = 0
+        total = None
+        actual = inicio
+        completo = True
+
+        try:
+            # Descarga masiva: cede el turno a las consultas interactivas
+            with open(ruta, "a" if cursor else "w", encoding="utf-8") as f, usar_prioridad(PRIORIDAD_BAJA):
+                paginas = recorrer_paginas(_solicitar, inicio, precarga=max(1, min(precarga, 5)))
+                try:
+                    async for pagina in paginas:
+                        total = pagina.total if total is None else total
+                        if max_observaciones is not None and escritas >= max_observaciones:
+                            # El máximo se alcanzó justo al final de la página anterior y hay más
+                            completo = False
+                            break
+                        observaciones = pagina.observaciones
+                        if max_observaciones is not None and escritas + len(observaciones) > max_observaciones:
+                            observaciones = observaciones[:max_observaciones - escritas]
+                            completo = False
+                        lineas = [json.dumps(_resumir_json(obs), ensure_ascii=False) + "\n" for obs in observaciones]
+                        await asyncio.to_thread(f.writelines, lineas)
+                        escritas += len(observaciones)
+                        if observaciones:
+                            actual = Cursor(params=actual.params, id_above=observaciones[-1]["id"])
+                        if not completo:
+                            break
+                finally:
+                    await paginas.aclose()
+        except Exception as e:
+            # Lo escrito hasta aquí es válido: se retorna el cursor para retomar
+            return {
+                "error": f"Error al exportar observaciones: {str(e)}",
+                "archivo": str(ruta),
+                "escritas": escritas,
+                "cursor": actual.codificar()
+            }
+
+        return {
+            "archivo": str(ruta),
+            "escritas": escritas,
+            "total_pendiente": total,
+            "completo": completo,
+            "cursor": None if completo else actual.codificar()
+        }
+
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Error al exportar observaciones: {str(e)}"}
+
+
+@mcp.tool()
+@instrumentar_herramienta
+@precalentador.aprender
+@politica.con_plazo
 async def buscar_especies(
     nombre: str,
     rank: Optional[str] = None,
     is_active: bool = True,
-    lat: float = 4.8155,  # Humedal la Conejera - Bogotá
-    lng: float = -74.0750,
-    radius: float = 3.0
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: Optional[float] = None,
+    lugar: Optional[str] = None,
+    formato: str = "completo"
 ) -> dict:
     """
     Busca información sobre especies/taxones en el área especificada.
@@ -91,10 +616,19 @@ async def buscar_especies(
         nombre: Nombre común o científico de la especie
         rank: Rango taxonómico (species, genus, family, order, class, phylum, kingdom)
         is_active: Solo taxones activos (no sinónimos)
-        lat: Latitud (default: 4.8155 - Humedal la Conejera)
-        lng: Longitud (default: -74.0750 - Humedal la Conejera)
-        radius: Radio de búsqueda en km (default: 3)
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
+        radius: Radio de búsqueda en km (default: 3, o el radio del lugar)
+        lugar: Nombre de un lugar conocido (humedal, área protegida, quebrada...)
+            en vez de lat/lng; acepta alias y nombres aproximados
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
     """
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
+    if isinstance(area := _resolver_lugar(lugar, lat, lng, radius), dict):
+        return area
+    lat, lng, radius, _ = area
     try:
         params = {
             "q": nombre,
@@ -108,46 +642,30 @@ async def buscar_especies(
         if rank:
             params["rank"] = rank
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{BASE_URL}/taxa",
-                params=params
-            )
-            response.raise_for_status()
-            data = response.json()
+        pagina = await _consultar("/taxa", params, Taxon)
             
-            especies = []
-            for taxon in data.get("results", []):
-                default_photo = taxon.get("default_photo")
-                conservation_status = taxon.get("conservation_status")
-                
-                especies.append({
-                    "id": taxon.get("id"),
-                    "nombre_cientifico": taxon.get("name"),
-                    "nombre_comun": taxon.get("preferred_common_name"),
-                    "rango": taxon.get("rank"),
-                    "wikipedia_url": taxon.get("wikipedia_url"),
-                    "observaciones_totales": taxon.get("observations_count"),
-                    "foto_url": default_photo.get("medium_url") if default_photo else None,
-                    "estado_conservacion": conservation_status.get("status") if conservation_status else None
-                })
-            
-            return {
-                "total": data.get("total_results"),
+        with fase("formato"):
+            especies = [resumir_taxon(taxon) for taxon in pagina.resultados]
+            return aplicar_formato({
+                "total": pagina.total,
                 "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
                 "especies": especies
-            }
+            }, formato, contar=("rango", "estado_conservacion"), rangos=("observaciones_totales",))
             
     except Exception as e:
         return {"error": f"Error al buscar especies: {str(e)}"}
 
 
 @mcp.tool()
+@instrumentar_herramienta
+@precalentador.aprender
+@politica.con_plazo
 async def obtener_lugares(
     nombre_lugar: Optional[str] = None,
-    lat: float = 4.8155,  # Humedal la Conejera - Bogotá
-    lng: float = -74.0750,
-    radius: float = 5.0
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: float = 5.0,
+    formato: str = "completo"
 ) -> dict:
     """
     Obtiene información sobre lugares cercanos a las coordenadas especificadas.
@@ -155,10 +673,14 @@ async def obtener_lugares(
     
     Args:
         nombre_lugar: Nombre del departamento o lugar a buscar
-        lat: Latitud (default: 4.8155 - Humedal la Conejera)
-        lng: Longitud (default: -74.0750 - Humedal la Conejera)
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
         radius: Radio de búsqueda en km (default: 5)
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
     """
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
     try:
         params = {
             "lat": lat,
@@ -169,80 +691,374 @@ async def obtener_lugares(
         if nombre_lugar:
             params["q"] = nombre_lugar
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{BASE_URL}/places",
-                params=params
-            )
-            response.raise_for_status()
-            data = response.json()
+        pagina = await _consultar("/places", params, Lugar)
             
-            lugares = []
-            for place in data.get("results", []):
-                lugares.append({
-                    "id": place.get("id"),
-                    "nombre": place.get("display_name"),
-                    "tipo": place.get("place_type_name"),
-                    "bbox": place.get("bounding_box_geojson"),
-                    "observaciones": place.get("observations_count")
-                })
-            
-            return {
-                "total": data.get("total_results"),
+        with fase("formato"):
+            encontrados = [
+                {
+                    "id": lugar.id,
+                    "nombre": lugar.nombre,
+                    "tipo": lugar.tipo,
+                    "bbox": lugar.bbox,
+                    "observaciones": lugar.observaciones
+                }
+                for lugar in pagina.resultados
+            ]
+            return aplicar_formato({
+                "total": pagina.total,
                 "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
-                "lugares": lugares
-            }
+                "lugares": encontrados
+            }, formato, contar=("tipo",), rangos=("observaciones",))
             
     except Exception as e:
         return {"error": f"Error al obtener lugares: {str(e)}"}
 
 
+async def _estadisticas_area(lat: float, lng: float, radius: float) -> dict:
+    """Consulta en paralelo los conteos de observaciones y especies de un área"""
+    area = {"lat": lat, "lng": lng, "radius": radius, "per_page": 0}
+    data, data_especies = await asyncio.gather(
+        _consultar("/observations", area),
+        _consultar("/taxa", area)
+    )
+    return {
+        "total_observaciones": data.get("total_results"),
+        "total_especies": data_especies.get("total_results")
+    }
+
+
+def _nombre_ubicacion(nombre: Optional[str], lat: float, lng: float) -> str:
+    """Nombre a mostrar para un área; si no se da, se usa el de Conejera o las coordenadas"""
+    if nombre:
+        return nombre
+    if (lat, lng) == (CONEJERA_LAT, CONEJERA_LNG):
+        return "Humedal la Conejera, Bogotá"
+    return f"{lat}, {lng}"
+
+
 @mcp.tool()
+@instrumentar_herramienta
+@precalentador.aprender
+@politica.con_plazo
 async def estadisticas_biodiversidad(
-    lat: float = 4.8155,  # Humedal la Conejera - Bogotá
-    lng: float = -74.0750,
-    radius: float = 3.0
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: Optional[float] = None,
+    nombre: Optional[str] = None,
+    lugar: Optional[str] = None,
+    formato: str = "completo"
 ) -> dict:
     """
     Obtiene estadísticas de biodiversidad en el área especificada.
     Por defecto usa Humedal la Conejera.
+    
+    Args:
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
+        radius: Radio de búsqueda en km (default: 3, o el radio del lugar)
+        nombre: Nombre del área para mostrar en la respuesta (opcional)
+        lugar: Nombre de un lugar conocido (humedal, área protegida, quebrada...)
+            en vez de lat/lng; acepta alias y nombres aproximados
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
     """
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
+    if isinstance(area := _resolver_lugar(lugar, lat, lng, radius), dict):
+        return area
+    lat, lng, radius, sitio = area
+    if sitio is not None:
+        nombre = nombre or sitio.nombre
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Obtener observaciones en el área
-            response = await client.get(
-                f"{BASE_URL}/observations",
-                params={"lat": lat, "lng": lng, "radius": radius, "per_page": 0}
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Obtener especies en el área
-            response_especies = await client.get(
-                f"{BASE_URL}/taxa",
-                params={"lat": lat, "lng": lng, "radius": radius, "per_page": 0}
-            )
-            response_especies.raise_for_status()
-            data_especies = response_especies.json()
-            
-            return {
-                "total_observaciones": data.get("total_results"),
-                "total_especies": data_especies.get("total_results"),
-                "ubicacion": "Humedal la Conejera, Bogotá",
-                "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius}
-            }
+        estadisticas = await _estadisticas_area(lat, lng, radius)
+        return aplicar_formato({
+            **estadisticas,
+            "ubicacion": _nombre_ubicacion(nombre, lat, lng),
+            "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius}
+        }, formato)
             
     except Exception as e:
         return {"error": f"Error al obtener estadísticas: {str(e)}"}
 
 
+class Area(BaseModel):
+    """Área circular para estadísticas por lotes"""
+    lat: float = Field(description="Latitud del centro")
+    lng: float = Field(description="Longitud del centro")
+    radius: float = Field(default=3.0, description="Radio en km")
+    nombre: Optional[str] = Field(default=None, description="Nombre del área (opcional)")
+
+
+MAX_AREAS = 50
+
+
+def _solicitudes_areas(argumentos: Dict[str, Any]) -> int:
+    """/observations y /taxa por área"""
+    return 2 * min(len(argumentos["areas"] or []), MAX_AREAS)
+
+
+@mcp.tool()
+@instrumentar_herramienta
+@precalentador.aprender
+@politica.con_plazo(solicitudes=_solicitudes_areas)
+async def estadisticas_biodiversidad_areas(
+    areas: List[Area],
+    max_concurrencia: int = 4,
+    formato: str = "completo"
+) -> dict:
+    """
+    Obtiene estadísticas de biodiversidad de varias áreas en una sola llamada,
+    por ejemplo todos los humedales de Bogotá. Las áreas se consultan en
+    paralelo con concurrencia limitada; si alguna falla, las demás se reportan
+    igual y el error queda en su resultado.
+    
+    Args:
+        areas: Lista de áreas con lat, lng, radius (km) y nombre opcional (máx 50)
+        max_concurrencia: Áreas consultadas simultáneamente (1 a 10, default: 4)
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
+    """
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
+    if not areas:
+        return {"error": "Debes indicar al menos un área"}
+    if len(areas) > MAX_AREAS:
+        return {"error": f"Máximo {MAX_AREAS} áreas por llamada (recibidas: {len(areas)})"}
+
+    semaforo = asyncio.Semaphore(max(1, min(max_concurrencia, 10)))
+
+    async def consultar_area(area: Area) -> dict:
+        resultado = {
+            "ubicacion": _nombre_ubicacion(area.nombre, area.lat, area.lng),
+            "coordenadas": {"lat": area.lat, "lng": area.lng, "radius_km": area.radius}
+        }
+        try:
+            async with semaforo:
+                resultado.update(await _estadisticas_area(area.lat, area.lng, area.radius))
+        except Exception as e:
+            resultado["error"] = f"Error al obtener estadísticas: {str(e)}"
+        return resultado
+
+    resultados = await asyncio.gather(*(consultar_area(area) for area in areas))
+    exitosas = [r for r in resultados if "error" not in r]
+
+    return aplicar_formato({
+        "areas": resultados,
+        "exitosas": len(exitosas),
+        "fallidas": len(resultados) - len(exitosas),
+        # Las áreas pueden solaparse: las sumas cuentan dos veces lo que está en varias
+        "suma_observaciones": sum(r["total_observaciones"] or 0 for r in exitosas),
+        "suma_especies": sum(r["total_especies"] or 0 for r in exitosas)
+    }, formato, contar=("error",), rangos=("total_observaciones", "total_especies"))
+
+
+MAX_TAXONES_LOTE = 100
+# iNaturalist acepta hasta 30 ids separados por coma en /taxa/{ids}
+IDS_POR_SOLICITUD = 30
+
+
+def _solicitudes_lote(argumentos: Dict[str, Any]) -> int:
+    """Una búsqueda por nombre y una solicitud por cada grupo de ids"""
+    nombres = min(len(argumentos["nombres"] or []), MAX_TAXONES_LOTE)
+    ids = min(len(argumentos["ids"] or []), MAX_TAXONES_LOTE)
+    return nombres + -(-ids // IDS_POR_SOLICITUD)
+
+
+@mcp.tool()
+@instrumentar_herramienta
+@precalentador.aprender
+@politica.con_plazo(solicitudes=_solicitudes_lote)
+async def buscar_especies_lote(
+    nombres: Optional[List[str]] = None,
+    ids: Optional[List[int]] = None,
+    max_concurrencia: int = 4,
+    formato: str = "completo"
+) -> dict:
+    """
+    Busca varias especies/taxones en una sola llamada, por nombre (común o
+    científico) o por id. Los ids se piden de a 30 por solicitud; los nombres
+    se buscan en paralelo con concurrencia limitada. Las entradas repetidas se
+    consultan una sola vez y cada entrada trae su resultado o su error.
+    
+    Args:
+        nombres: Nombres comunes o científicos (por ejemplo ['Tingua bogotana', 'Turdus fuscater'])
+        ids: Ids de taxones de iNaturalist
+        max_concurrencia: Búsquedas por nombre simultáneas (1 a 10, default: 4)
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
+    """
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
+    # Deduplicar (sin distinguir mayúsculas) conservando el orden de la primera aparición
+    entradas = [n.strip() for n in nombres or [] if n and n.strip()]
+    por_clave: Dict[str, str] = {}
+    for nombre in entradas:
+        por_clave.setdefault(nombre.lower(), nombre)
+    nombres_unicos = list(por_clave.values())
+    ids_unicos = list(dict.fromkeys(ids or []))
+    cantidad = len(nombres_unicos) + len(ids_unicos)
+    if cantidad == 0:
+        return {"error": "Debes indicar al menos un nombre o un id"}
+    if cantidad > MAX_TAXONES_LOTE:
+        return {"error": f"Máximo {MAX_TAXONES_LOTE} taxones por llamada (recibidos: {cantidad})"}
+
+    semaforo = asyncio.Semaphore(max(1, min(max_concurrencia, 10)))
+
+    async def buscar_nombre(nombre: str) -> dict:
+        resultado = {"entrada": nombre}
+        try:
+            async with semaforo:
+                taxon = await _buscar_taxon_por_nombre(nombre)
+            if taxon is None:
+                resultado["error"] = "No encontrado"
+            else:
+                resultado["taxon"] = resumir_taxon(taxon)
+        except Exception as e:
+            resultado["error"] = f"Error al buscar especie: {str(e)}"
+        return resultado
+
+    async def buscar_ids(grupo: List[int]) -> List[dict]:
+        try:
+            async with semaforo:
+                pagina = await _consultar(f"/taxa/{','.join(map(str, grupo))}", {"locale": "es"}, Taxon)
+        except Exception as e:
+            return [{"entrada": i, "error": f"Error al buscar taxón: {str(e)}"} for i in grupo]
+        encontrados = {taxon.id: taxon for taxon in pagina.resultados}
+        return [
+            {"entrada": i, "taxon": resumir_taxon(encontrados[i])} if i in encontrados
+            else {"entrada": i, "error": "No encontrado"}
+            for i in grupo
+        ]
+
+    grupos = [ids_unicos[i:i + IDS_POR_SOLICITUD] for i in range(0, len(ids_unicos), IDS_POR_SOLICITUD)]
+    por_nombre, por_ids = await asyncio.gather(
+        asyncio.gather(*(buscar_nombre(n) for n in nombres_unicos)),
+        asyncio.gather(*(buscar_ids(g) for g in grupos))
+    )
+    resultados = list(por_nombre) + [r for grupo in por_ids for r in grupo]
+    encontrados = sum(1 for r in resultados if "taxon" in r)
+
+    return aplicar_formato({
+        "resultados": resultados,
+        "encontrados": encontrados,
+        "fallidos": len(resultados) - encontrados,
+        "duplicados_omitidos": len(entradas) + len(ids or []) - cantidad
+    }, formato, contar=("taxon.rango", "error"))
+
+
+MAX_OBSERVACIONES_ANALISIS = 10000
+
+
+def _solicitudes_analisis(argumentos: Dict[str, Any]) -> int:
+    """Páginas de observaciones que puede recorrer el análisis"""
+    limite = max(1, min(argumentos["max_observaciones"], MAX_OBSERVACIONES_ANALISIS))
+    return -(-limite // MAX_POR_PAGINA)
+
+
+@mcp.tool()
+@instrumentar_herramienta
+@politica.con_plazo(solicitudes=_solicitudes_analisis)
+async def analizar_biodiversidad(
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: Optional[float] = None,
+    taxon_name: Optional[str] = None,
+    quality_grade: Optional[str] = None,
+    max_observaciones: int = 2000,
+    top: int = 10,
+    puntos_rarefaccion: int = 10,
+    nombre: Optional[str] = None,
+    lugar: Optional[str] = None,
+    formato: str = "completo"
+) -> dict:
+    """
+    Calcula métricas de biodiversidad de un área a partir de sus observaciones:
+    riqueza de especies (observada y estimada con Chao1), índices de Shannon
+    y Simpson, curva de rarefacción, actividad por mes y especies más observadas. Si el área tiene más
+    observaciones que `max_observaciones`, se analizan las más recientes.
+    Retorna sólo el resumen, no las observaciones. Por defecto analiza
+    Humedal la Conejera.
+    
+    Args:
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
+        radius: Radio de búsqueda en km (default: 3, o el radio del lugar)
+        taxon_name: Limitar el análisis a un grupo (por ejemplo 'Aves')
+        quality_grade: 'research', 'needs_id' o 'casual' (default: todas)
+        max_observaciones: Máximo de observaciones a analizar (default: 2000, máx 10000)
+        top: Número de especies más observadas a retornar (default: 10)
+        puntos_rarefaccion: Puntos de la curva de rarefacción (default: 10)
+        nombre: Nombre del área para mostrar en la respuesta (opcional)
+        lugar: Nombre de un lugar conocido (humedal, área protegida, quebrada...)
+            en vez de lat/lng; acepta alias y nombres aproximados
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
+    """
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
+    if isinstance(area := _resolver_lugar(lugar, lat, lng, radius), dict):
+        return area
+    lat, lng, radius, sitio = area
+    if sitio is not None:
+        nombre = nombre or sitio.nombre
+    # NumPy se importa con el primer análisis, no al arrancar el servidor
+    import analitica
+
+    try:
+        limite = max(1, min(max_observaciones, MAX_OBSERVACIONES_ANALISIS))
+        params = {"lat": lat, "lng": lng, "radius": radius}
+        if taxon_name:
+            params["taxon_name"] = taxon_name
+        if quality_grade:
+            params["quality_grade"] = quality_grade
+
+        acumulador = analitica.AcumuladorColumnas()
+        total = None
+        leidas = 0
+        # Las más recientes primero, con las páginas proyectadas y en caché
+        paginas = recorrer_paginas(
+            lambda endpoint, p: _consultar(endpoint, p, Observacion),
+            Cursor(params=params, descendente=True),
+            precarga=2,
+            limite=limite,
+        )
+        try:
+            async for pagina in paginas:
+                total = pagina.total if total is None else total
+                observaciones = pagina.observaciones[:limite - leidas]
+                acumulador.agregar(observaciones)
+                leidas += len(observaciones)
+                if leidas >= limite:
+                    break
+        finally:
+            await paginas.aclose()
+
+        with fase("formato"):
+            resumen = analitica.resumir(acumulador.columnas(), max(0, top), max(2, min(puntos_rarefaccion, 50)))
+            return aplicar_formato({
+                "ubicacion": _nombre_ubicacion(nombre, lat, lng),
+                "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
+                "total_observaciones": total,
+                "muestra_completa": total is not None and leidas >= total,
+                **resumen
+            }, formato, contar=("nombre",), rangos=("observaciones", "especies"))
+
+    except Exception as e:
+        return {"error": f"Error al analizar biodiversidad: {str(e)}"}
+
+
 @mcp.tool()
+@instrumentar_herramienta
+@precalentador.aprender
+@politica.con_plazo
 async def observaciones_por_usuario(
     username: str,
-    lat: float = 4.8155,  # Humedal la Conejera - Bogotá
-    lng: float = -74.0750,
-    radius: float = 3.0,
-    per_page: int = 10
+    lat: float = CONEJERA_LAT,  # Humedal la Conejera - Bogotá
+    lng: float = CONEJERA_LNG,
+    radius: Optional[float] = None,
+    per_page: int = 10,
+    lugar: Optional[str] = None,
+    formato: str = "completo"
 ) -> dict:
     """
     Busca observaciones de un usuario específico en el área especificada.
@@ -250,42 +1066,47 @@ async def observaciones_por_usuario(
     
     Args:
         username: Nombre de usuario en iNaturalist
-        lat: Latitud (default: 4.8155 - Humedal la Conejera)
-        lng: Longitud (default: -74.0750 - Humedal la Conejera)
-        radius: Radio de búsqueda en km (default: 3)
+        lat: Latitud (default: la del Humedal la Conejera)
+        lng: Longitud (default: la del Humedal la Conejera)
+        radius: Radio de búsqueda en km (default: 3, o el radio del lugar)
         per_page: Número de resultados
+        lugar: Nombre de un lugar conocido (humedal, área protegida, quebrada...)
+            en vez de lat/lng; acepta alias y nombres aproximados
+        formato: 'completo', 'compacto' (tabla por columnas, menos tokens) o
+            'resumen' (sólo conteos y rangos) (default: 'completo')
     """
+    if (error := validar_formato(formato)) is not None:
+        return {"error": error}
+    if isinstance(area := _resolver_lugar(lugar, lat, lng, radius), dict):
+        return area
+    lat, lng, radius, _ = area
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{BASE_URL}/observations",
-                params={
-                    "user_login": username,
-                    "lat": lat,
-                    "lng": lng,
-                    "radius": radius,
-                    "per_page": per_page
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
+        pagina = await _consultar("/observations", {
+            "user_login": username,
+            "lat": lat,
+            "lng": lng,
+            "radius": radius,
+            "per_page": per_page
+        }, Observacion)
             
-            observaciones = []
-            for obs in data.get("results", []):
-                observaciones.append({
-                    "id": obs.get("id"),
-                    "especie": obs.get("species_guess"),
-                    "fecha": obs.get("observed_on_string"),
-                    "lugar": obs.get("place_guess"),
-                    "url": f"https://www.inaturalist.org/observations/{obs.get('id')}"
-                })
+        with fase("formato"):
+            observaciones = [
+                {
+                    "id": obs.id,
+                    "especie": obs.especie,
+                    "fecha": obs.observada_texto,
+                    "lugar": obs.lugar,
+                    "url": URL_OBSERVACION.format(id=obs.id)
+                }
+                for obs in pagina.resultados
+            ]
             
-            return {
-                "usuario": username,
-                "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
-                "total_observaciones": data.get("total_results"),
-                "observaciones": observaciones
-            }
+        return _formatear_observaciones({
+            "usuario": username,
+            "coordenadas": {"lat": lat, "lng": lng, "radius_km": radius},
+            "total_observaciones": pagina.total,
+            "observaciones": observaciones
+        }, formato)
             
     except Exception as e:
         return {"error": f"Error al obtener observaciones del usuario: {str(e)}"}
@@ -0,0 +1,80 @@
+import os
+
+# El servidor lee su configuración al importarse: sin espejo, sin precalentamiento
+# y sin límite de tasa efectivo contra el iNaturalist simulado
+os.environ.update({
+    "INATURALIST_BASE_URL": "http://inaturalist.prueba/v1",
+    "INATURALIST_LIMITE_TASA": "1000",
+    "INATURALIST_LIMITE_RAFAGA": "1000",
+    "INATURALIST_PRECALENTAR": "0",
+    "INATURALIST_TESELAS": "0",
+})
+for variable in ("INATURALIST_ESPEJO_RUTA", "INATURALIST_CACHE_RUTA"):
+    os.environ.pop(variable, None)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+import cliente  # noqa: E402
+
+
+class INaturalistFalso:
+    """Responde /observations, /taxa y /places con datos fijos y registra las solicitudes"""
+
+    def __init__(self):
+        self.observaciones = []
+        self.solicitudes = []
+        self.fallar_en = set()  # números de solicitud (desde 1) que responden 503
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.solicitudes.append(request)
+        if len(self.solicitudes) in self.fallar_en:
+            return httpx.Response(503, json={"error": "no disponible"})
+        params = request.url.params
+        ruta = request.url.path.removeprefix("/v1")
+        if ruta == "/observations":
+            return httpx.Response(200, json=self._observaciones(params))
+        if ruta.startswith("/taxa"):
+            return httpx.Response(200, json={"total_results": 0, "results": []})
+        if ruta == "/places":
+            return httpx.Response(200, json={"total_results": 0, "results": []})
+        return httpx.Response(404, json={"error": "no existe"})
+
+    def _observaciones(self, params) -> dict:
+        descendente = params.get("order") == "desc"
+        filas = sorted(self.observaciones, key=lambda o: o["id"], reverse=descendente)
+        if "id_above" in params:
+            filas = [o for o in filas if o["id"] > int(params["id_above"])]
+        if "id_below" in params:
+            filas = [o for o in filas if o["id"] < int(params["id_below"])]
+        por_pagina = int(params.get("per_page", 30))
+        return {"total_results": len(filas), "results": filas[:por_pagina]}
+
+    def rutas(self):
+        return [s.url.path.removeprefix("/v1") for s in self.solicitudes]
+
+
+@pytest.fixture
+def inaturalist(monkeypatch):
+    """iNaturalist simulado detrás del cliente compartido; cuenta los clientes creados"""
+    falso = INaturalistFalso()
+    falso.clientes = []
+
+    def crear(config):
+        creado = httpx.AsyncClient(base_url=config.base_url, transport=httpx.MockTransport(falso))
+        falso.clientes.append(creado)
+        return creado
+
+    monkeypatch.setattr(cliente, "crear_cliente", crear)
+    yield falso
+
+
+@pytest.fixture(autouse=True)
+async def estado_limpio():
+    """Cada prueba empieza sin cliente abierto y con la caché vacía"""
+    import server
+
+    server.cache.invalidar()
+    yield
+    await cliente.cerrar_cliente()
+    server.cache.invalidar()
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import analitica
+import server
+from inaturalist_comun import Observacion
+
+# 8 observaciones de 4 especies: 4, 2, 1 y 1
+CONTEOS = np.array([4, 2, 1, 1], dtype=np.int64)
+
+
+def test_indices_diversidad_calculados_a_mano():
+    indices = analitica.indices_diversidad(CONTEOS)
+    # p = 1/2, 1/4, 1/8, 1/8
+    shannon = 0.5 * np.log(2) + 0.25 * np.log(4) + 2 * 0.125 * np.log(8)
+    assert indices["riqueza"] == 4
+    assert indices["shannon"] == pytest.approx(shannon, abs=1e-4)
+    assert indices["shannon"] == pytest.approx(1.2130, abs=1e-4)
+    # sum p^2 = 1/4 + 1/16 + 2/64 = 11/32
+    assert indices["simpson"] == pytest.approx(21 / 32, abs=1e-4)
+    assert indices["simpson_inverso"] == pytest.approx(32 / 11, abs=1e-4)
+    assert indices["pielou"] == pytest.approx(shannon / np.log(4), abs=1e-4)
+
+
+def test_indices_con_una_especie_y_sin_especies():
+    una = analitica.indices_diversidad(np.array([5]))
+    assert (una["shannon"], una["simpson"], una["simpson_inverso"], una["pielou"]) == (0.0, 0.0, 1.0, None)
+    assert analitica.indices_diversidad(np.array([], dtype=np.int64))["shannon"] is None
+
+
+@pytest.mark.parametrize("conteos, esperado", [
+    ([4, 2, 1, 1], 4 + 2 * 1 / (2 * 2)),  # F1=2, F2=1
+    ([1, 1, 1], 3 + 3 * 2 / 2),  # sin doubletons
+    ([3, 5, 2], 3.0),  # sin singletons: no faltan especies
+    ([], None),
+])
+def test_chao1_calculado_a_mano(conteos, esperado):
+    assert analitica.chao1(np.array(conteos, dtype=np.int64)) == esperado
+
+
+def test_curva_de_acumulacion_calculada_a_mano():
+    curva = {punto["n"]: punto["especies"] for punto in analitica.rarefaccion(CONTEOS, puntos=8)}
+    assert list(curva) == [1, 2, 3, 4, 5, 6, 7, 8]
+    # E[S_n] = sum_i 1 - C(N - N_i, n) / C(N, n), con N = 8
+    assert curva[1] == 1.0
+    assert curva[2] == pytest.approx(4 - (6 + 15 + 21 + 21) / 28, abs=0.01)  # 1.75
+    assert curva[4] == pytest.approx(4 - (1 + 15 + 35 + 35) / 70, abs=0.01)  # 2.77
+    assert curva[8] == 4.0
+    assert all(a <= b for a, b in zip(list(curva.values()), list(curva.values())[1:]))
+
+
+def _obs(id, taxon_id, rango="species", especie_id=None, fecha="2024-03-10", nombre=None):
+    return Observacion.desde_inaturalist({
+        "id": id,
+        "observed_on": fecha,
+        "taxon": {
+            "id": taxon_id, "rank": rango, "name": nombre or f"Taxon {taxon_id}",
+            "min_species_taxon_id": especie_id or taxon_id,
+        },
+    })
+
+
+def test_acumulador_agrupa_subespecies_y_cuenta_meses():
+    acumulador = analitica.AcumuladorColumnas()
+    acumulador.agregar([
+        _obs(1, 10, nombre="Rallus semiplumbeus"),
+        _obs(2, 11, rango="subspecies", especie_id=10, fecha="2024-04-01"),
+        _obs(3, 20, rango="genus", fecha=None),
+    ])
+    acumulador.agregar([_obs(4, 30, fecha="2023-12-24")])
+    resumen = analitica.resumir(acumulador.columnas(), top=1)
+
+    assert resumen["observaciones_analizadas"] == 4
+    assert resumen["observaciones_a_especie"] == 3
+    assert resumen["riqueza"] == 2
+    assert (resumen["singletons"], resumen["doubletons"], resumen["chao1"]) == (1, 1, 2.0)
+    assert resumen["sin_fecha"] == 1
+    assert (resumen["actividad_mensual"]["mar"], resumen["actividad_mensual"]["abr"]) == (1, 1)
+    assert resumen["actividad_mensual"]["dic"] == 1
+    assert resumen["top_taxones"] == [
+        {"taxon_id": 10, "nombre": "Rallus semiplumbeus", "observaciones": 2, "proporcion": 0.6667},
+    ]
+
+
+async def test_analizar_no_pide_paginas_despues_del_maximo(inaturalist):
+    inaturalist.observaciones = [
+        {"id": i, "taxon": {"id": i % 7, "rank": "species", "name": f"Especie {i % 7}"}} for i in range(1, 2001)
+    ]
+    async with server.ciclo_de_vida(server.mcp):
+        resultado = await server.analizar_biodiversidad(lat=4.7, lng=-74.1, max_observaciones=250)
+
+    assert resultado["observaciones_analizadas"] == 250
+    assert resultado["muestra_completa"] is False
+    assert inaturalist.rutas().count("/observations") == 2
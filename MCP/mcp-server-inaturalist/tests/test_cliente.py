@@ -0,0 +1,78 @@
+import httpx
+import pytest
+
+import cliente
+import server
+from cliente import ConfigCliente
+
+
+async def test_se_crea_una_vez_y_se_reutiliza_entre_herramientas(inaturalist):
+    async with server.ciclo_de_vida(server.mcp):
+        compartido = cliente.obtener_cliente()
+        respuestas = [
+            await server.buscar_observaciones(lat=4.7, lng=-74.1),
+            await server.estadisticas_biodiversidad(lat=4.6, lng=-74.0),
+            await server.buscar_especies("Tingua bogotana"),
+        ]
+        assert not any("error" in r for r in respuestas)
+        assert cliente.obtener_cliente() is compartido
+
+    assert len(inaturalist.clientes) == 1
+    assert sorted(set(inaturalist.rutas())) == ["/observations", "/taxa"]
+
+
+async def test_se_cierra_al_terminar_el_ciclo_de_vida(inaturalist):
+    async with server.ciclo_de_vida(server.mcp):
+        await server.buscar_observaciones(lat=4.7, lng=-74.1)
+        compartido = cliente.obtener_cliente()
+        assert not compartido.is_closed
+
+    assert compartido.is_closed
+    assert cliente._cliente is None
+
+
+async def test_ciclos_anidados_cierran_con_el_ultimo(inaturalist):
+    async with server.ciclo_de_vida(server.mcp):
+        async with server.ciclo_de_vida(server.mcp):
+            compartido = cliente.obtener_cliente()
+        # Otra sesión sigue abierta: el cliente no se cierra
+        assert not compartido.is_closed
+        await server.buscar_observaciones(lat=4.7, lng=-74.1)
+        assert cliente.obtener_cliente() is compartido
+    assert compartido.is_closed
+    assert len(inaturalist.clientes) == 1
+
+
+async def test_se_vuelve_a_crear_en_un_ciclo_nuevo(inaturalist):
+    async with server.ciclo_de_vida(server.mcp):
+        primero = cliente.obtener_cliente()
+    async with server.ciclo_de_vida(server.mcp):
+        segundo = cliente.obtener_cliente()
+    assert primero is not segundo
+    assert len(inaturalist.clientes) == 2
+
+
+async def test_configurar_despues_de_crear_falla(inaturalist):
+    async with cliente.cliente_abierto():
+        with pytest.raises(RuntimeError):
+            cliente.configurar(ConfigCliente())
+
+
+def test_config_desde_entorno(monkeypatch):
+    monkeypatch.setenv("INATURALIST_BASE_URL", "http://localhost:9100/v1/")
+    monkeypatch.setenv("INATURALIST_MAX_CONEXIONES", "7")
+    monkeypatch.setenv("INATURALIST_HTTP2", "si")
+    config = ConfigCliente.desde_entorno()
+    assert config.base_url == "http://localhost:9100/v1"
+    assert config.max_conexiones == 7
+    assert config.http2 is True
+
+
+async def test_crear_cliente_usa_el_pool_configurado():
+    creado = cliente.crear_cliente(ConfigCliente(base_url="http://localhost:9100/v1", timeout=5.0))
+    try:
+        assert isinstance(creado, httpx.AsyncClient)
+        assert str(creado.base_url) == "http://localhost:9100/v1/"
+        assert creado.timeout.read == 5.0
+    finally:
+        await creado.aclose()
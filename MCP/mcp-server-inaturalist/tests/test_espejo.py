@@ -0,0 +1,148 @@
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from espejo import EspejoObservaciones
+from inaturalist_comun import distancia_km
+
+CENTRO = (4.7519, -74.0841)
+
+# Linajes simplificados: especie -> ancestros (género, familia, clase)
+LINAJES = {
+    101: [10, 1, 3],
+    102: [10, 1, 3],
+    201: [20, 2, 3],
+    301: [30, 4],
+}
+USUARIOS = ["ana", "Bruno", "carla"]
+
+
+def generar_observaciones(n=300, semilla=7):
+    """Observaciones sintéticas alrededor del centro, con fechas distintas para un orden sin empates"""
+    azar = random.Random(semilla)
+    inicio = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    dias = azar.sample(range(5000), n)
+    minutos = azar.sample(range(10**6), n)
+    observaciones = []
+    for i, dia, minuto in zip(range(1, n + 1), dias, minutos):
+        taxon_id = azar.choice(list(LINAJES))
+        lat = CENTRO[0] + azar.uniform(-0.05, 0.05)
+        lng = CENTRO[1] + azar.uniform(-0.05, 0.05)
+        observaciones.append({
+            "id": i,
+            "location": f"{lat},{lng}" if i % 25 else None,  # algunas sin coordenadas
+            "taxon": {"id": taxon_id, "name": f"Especie {taxon_id}", "ancestor_ids": LINAJES[taxon_id]},
+            "user": {"login": azar.choice(USUARIOS)},
+            "observed_on": (date(2010, 1, 1) + timedelta(days=dia)).isoformat(),
+            "created_at": (inicio + timedelta(minutes=minuto)).isoformat(),
+            "updated_at": inicio.isoformat(),
+        })
+    return observaciones
+
+
+def resumir(obs):
+    return {"id": obs["id"], "usuario": obs["user"]["login"]}
+
+
+def en_memoria(observaciones, lat, lng, radius, taxon_id=None, usuario=None, limite=10, order_by="created_at"):
+    """La misma búsqueda resuelta en Python sobre las observaciones completas"""
+    filas = []
+    for obs in observaciones:
+        if obs["location"] is None:
+            continue
+        o_lat, o_lng = map(float, obs["location"].split(","))
+        if distancia_km(lat, lng, o_lat, o_lng) > radius:
+            continue
+        if taxon_id is not None and taxon_id not in [obs["taxon"]["id"], *obs["taxon"]["ancestor_ids"]]:
+            continue
+        if usuario and obs["user"]["login"].lower() != usuario.lower():
+            continue
+        filas.append(obs)
+    filas.sort(key=lambda o: o[order_by], reverse=True)
+    return {"total": len(filas), "observaciones": [resumir(o) for o in filas[:max(0, limite)]]}
+
+
+class INaturalistArea:
+    """`solicitar` simulado que filtra por círculo y pagina por id como iNaturalist"""
+
+    def __init__(self, observaciones):
+        self.observaciones = observaciones
+
+    async def __call__(self, endpoint, params):
+        dentro = [
+            o for o in self.observaciones
+            if o["location"] is not None
+            and distancia_km(params["lat"], params["lng"], *map(float, o["location"].split(","))) <= params["radius"]
+            and o["id"] > params["id_above"]
+        ]
+        return {"total_results": len(dentro), "results": dentro[:params["per_page"]]}
+
+
+@pytest.fixture
+def observaciones():
+    return generar_observaciones()
+
+
+@pytest.fixture
+async def espejo(tmp_path, observaciones):
+    espejo = EspejoObservaciones(str(tmp_path / "espejo.sqlite"), resumir)
+    await espejo.sincronizar(INaturalistArea(observaciones), *CENTRO, 8.0)
+    yield espejo
+    espejo.cerrar()
+
+
+CONSULTAS = [
+    {},
+    {"radius": 2.0},
+    {"radius": 0.5, "limite": 100},
+    {"taxon_id": 101},
+    {"taxon_id": 10, "limite": 50},  # género: incluye a sus dos especies
+    {"taxon_id": 3, "limite": 500},  # clase
+    {"usuario": "BRUNO", "limite": 500},
+    {"taxon_id": 1, "usuario": "ana", "radius": 3.0},
+    {"order_by": "observed_on", "limite": 25},
+    {"order_by": "id", "limite": 25},
+    {"taxon_id": 999},
+    {"limite": 0},
+]
+
+
+@pytest.mark.parametrize("consulta", CONSULTAS)
+def test_el_espejo_coincide_con_la_busqueda_en_memoria(espejo, observaciones, consulta):
+    consulta = {"radius": 5.0, **consulta}
+    esperado = en_memoria(observaciones, *CENTRO, **consulta)
+    assert espejo.buscar(*CENTRO, **consulta) == esperado
+
+
+def test_el_espejo_coincide_con_una_consulta_desplazada(espejo, observaciones):
+    lat, lng = CENTRO[0] + 0.02, CENTRO[1] - 0.01
+    esperado = en_memoria(observaciones, lat, lng, 3.0, taxon_id=20, limite=40)
+    assert espejo.buscar(lat, lng, 3.0, taxon_id=20, limite=40) == esperado
+    assert esperado["total"] > 0
+
+
+def test_el_espejo_guarda_lo_mismo_que_responde_inaturalist(espejo, observaciones):
+    radio = 8.0
+    remotas = [o for o in observaciones if o["location"] is not None
+               and distancia_km(*CENTRO, *map(float, o["location"].split(","))) <= radio]
+    assert espejo.estado()["observaciones"] == len(remotas)
+    resultado = espejo.buscar(*CENTRO, radio, limite=len(remotas), order_by="id")
+    assert [o["id"] for o in resultado["observaciones"]] == sorted((o["id"] for o in remotas), reverse=True)
+
+
+def test_orden_desconocido_usa_created_at(espejo, observaciones):
+    esperado = en_memoria(observaciones, *CENTRO, 5.0, order_by="created_at")
+    assert espejo.buscar(*CENTRO, 5.0, order_by="votes") == esperado
+
+
+async def test_la_sincronizacion_incremental_reemplaza_la_identificacion(espejo, observaciones):
+    cambiada = next(o for o in observaciones if o["location"] is not None and o["taxon"]["id"] == 101)
+    cambiada["taxon"] = {"id": 301, "name": "Especie 301", "ancestor_ids": LINAJES[301]}
+    await espejo.sincronizar(INaturalistArea([cambiada]), *CENTRO, 8.0)
+
+    por_genero = espejo.buscar(*CENTRO, 8.0, taxon_id=10, limite=500)
+    assert cambiada["id"] not in [o["id"] for o in por_genero["observaciones"]]
+    assert espejo.buscar(*CENTRO, 8.0, taxon_id=30, limite=500) == en_memoria(
+        observaciones, *CENTRO, 8.0, taxon_id=30, limite=500
+    )
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def exportaciones(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DIR_EXPORTACION", tmp_path)
+    return tmp_path
+
+
+def ids_exportados(ruta):
+    with open(ruta, encoding="utf-8") as archivo:
+        return [json.loads(linea)["id"] for linea in archivo]
+
+
+def observaciones(n):
+    return [{"id": i, "species_guess": f"especie {i % 7}", "location": "4.75,-74.08"} for i in range(1, n + 1)]
+
+
+async def test_exportacion_completa(inaturalist, exportaciones):
+    inaturalist.observaciones = observaciones(450)
+    resultado = await server.exportar_observaciones("todo.ndjson")
+    assert resultado["completo"] is True
+    assert resultado["cursor"] is None
+    assert resultado["escritas"] == 450
+    assert ids_exportados(resultado["archivo"]) == list(range(1, 451))
+
+
+async def test_maximo_justo_al_final_de_las_observaciones(inaturalist, exportaciones):
+    inaturalist.observaciones = observaciones(400)
+    resultado = await server.exportar_observaciones("justo.ndjson", max_observaciones=400)
+    assert resultado["escritas"] == 400
+    assert resultado["completo"] is True
+    assert resultado["cursor"] is None
+
+
+async def test_maximo_justo_al_final_de_una_pagina_con_mas_pendientes(inaturalist, exportaciones):
+    inaturalist.observaciones = observaciones(401)
+    resultado = await server.exportar_observaciones("parcial.ndjson", max_observaciones=400)
+    assert resultado["escritas"] == 400
+    assert resultado["completo"] is False
+
+    retomado = await server.exportar_observaciones("parcial.ndjson", cursor=resultado["cursor"])
+    assert retomado["escritas"] == 1
+    assert retomado["completo"] is True
+    assert ids_exportados(retomado["archivo"]) == list(range(1, 402))
+
+
+async def test_maximo_a_mitad_de_pagina_y_retomar(inaturalist, exportaciones):
+    inaturalist.observaciones = observaciones(450)
+    primera = await server.exportar_observaciones("mitad.ndjson", max_observaciones=250)
+    assert primera["escritas"] == 250
+    assert primera["completo"] is False
+
+    segunda = await server.exportar_observaciones("mitad.ndjson", cursor=primera["cursor"], max_observaciones=150)
+    assert segunda["escritas"] == 150
+    assert segunda["completo"] is False
+
+    tercera = await server.exportar_observaciones("mitad.ndjson", cursor=segunda["cursor"])
+    assert tercera["escritas"] == 50
+    assert tercera["completo"] is True
+    assert ids_exportados(tercera["archivo"]) == list(range(1, 451))
+
+
+async def test_error_a_mitad_de_camino_retorna_el_cursor(inaturalist, exportaciones):
+    inaturalist.observaciones = observaciones(450)
+    # La segunda página falla también en sus dos reintentos
+    inaturalist.fallar_en = {2, 3, 4}
+    primera = await server.exportar_observaciones("error.ndjson")
+    assert "error" in primera
+    assert primera["escritas"] == 200
+
+    segunda = await server.exportar_observaciones("error.ndjson", cursor=primera["cursor"])
+    assert ids_exportados(segunda["archivo"]) == list(range(1, 451))
+
+
+async def test_archivo_fuera_del_directorio(inaturalist, exportaciones):
+    assert "error" in await server.exportar_observaciones("../fuera.ndjson")
@@ -0,0 +1,55 @@
+import pytest
+
+from formato import compactar_filas, expandir_tabla
+
+S3 = "https://inaturalist-open-data.s3.amazonaws.com/photos"
+ESTATICO = "https://static.inaturalist.org/photos"
+
+
+def _observacion(id, foto, especie="Rallus semiplumbeus", lugar="Humedal La Conejera"):
+    return {
+        "id": id,
+        "url": f"https://www.inaturalist.org/observations/{id}",
+        "especie": especie,
+        "lugar": lugar,
+        "foto_url": foto,
+        "coordenadas": {"lat": 4.7519, "lng": -74.0841},
+    }
+
+
+def test_la_plantilla_de_url_no_parte_los_ids():
+    filas = [_observacion(i, f"{S3}/{i}/square.jpg") for i in (4991, 4992, 4993)]
+    tabla = compactar_filas(filas)
+    assert tabla["plantillas"]["foto_url"] == f"{S3}/{{}}/square.jpg"
+    indice = tabla["columnas"].index("foto_url")
+    assert [fila[indice] for fila in tabla["filas"]] == ["4991", "4992", "4993"]
+
+
+def test_la_plantilla_corta_en_la_consulta():
+    filas = [{"foto_url": f"{ESTATICO}/1/medium.jpg?17000000{i}"} for i in (10, 11, 12)]
+    tabla = compactar_filas(filas)
+    assert tabla["plantillas"]["foto_url"] == f"{ESTATICO}/1/medium.jpg?{{}}"
+
+
+@pytest.mark.parametrize("filas", [
+    [],
+    [_observacion(1, f"{S3}/1/square.jpg")],
+    [_observacion(i, f"{S3}/{i}/square.jpg") for i in (4991, 4992, 4993)],
+    # Fotos faltantes
+    [_observacion(1, None), _observacion(2, f"{S3}/20/square.jpg"), _observacion(3, None)],
+    [_observacion(i, None) for i in range(3)],
+    # Hosts y extensiones distintas
+    [
+        _observacion(1, f"{S3}/101/square.jpg"),
+        _observacion(2, f"{ESTATICO}/102/square.jpeg"),
+        _observacion(3, "http://example.org/103/square.png"),
+        _observacion(4, None),
+    ],
+    # Ids que comparten dígitos con el prefijo y el sufijo
+    [_observacion(i, f"{S3}/{i}/{i}.jpg") for i in (1111, 1112, 2111)],
+    [_observacion(i, f"{S3}/{i}/square.jpg", especie=None if i % 2 else "Anas andium") for i in range(1, 9)],
+])
+def test_expandir_es_la_inversa_de_compactar(filas):
+    assert expandir_tabla(compactar_filas(filas)) == filas
+    plantillas = {"url": "https://www.inaturalist.org/observations/{id}"}
+    assert expandir_tabla(compactar_filas(filas, plantillas)) == filas
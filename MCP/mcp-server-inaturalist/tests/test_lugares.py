@@ -0,0 +1,49 @@
+import inspect
+
+import pytest
+
+import server
+
+
+def test_la_ubicacion_por_defecto_sale_del_nomenclator():
+    conejera = server.lugares.buscar("Humedal La Conejera")
+    for herramienta in (server.buscar_observaciones, server.estadisticas_biodiversidad, server.analizar_biodiversidad):
+        parametros = inspect.signature(herramienta).parameters
+        assert (parametros["lat"].default, parametros["lng"].default) == (conejera.lat, conejera.lng)
+    assert server._nombre_ubicacion(None, conejera.lat, conejera.lng) == "Humedal la Conejera, Bogotá"
+
+
+def test_resolver_lugar():
+    conejera = server.lugares.buscar("Humedal La Conejera")
+    assert server._resolver_lugar(None, 4.6, -74.0, None) == (4.6, -74.0, server.RADIO_DEFECTO_KM, None)
+    assert server._resolver_lugar(None, 4.6, -74.0, 7.5) == (4.6, -74.0, 7.5, None)
+    assert server._resolver_lugar("la conejera", 4.6, -74.0, None) == (conejera.lat, conejera.lng, conejera.radio_km, conejera)
+    assert server._resolver_lugar("la conejera", 4.6, -74.0, 2.0)[2] == 2.0
+
+
+def test_lugar_desconocido_sugiere_nombres():
+    assert server._resolver_lugar("humedal conejer", 4.6, -74.0, None)[3].nombre == "Humedal La Conejera"
+    error = server._resolver_lugar("desierto de la tatacoa", 4.6, -74.0, None)
+    assert error["error"] == "Lugar 'desierto de la tatacoa' no encontrado"
+    assert isinstance(error["sugerencias"], list)
+
+
+@pytest.mark.parametrize("herramienta, argumentos", [
+    (server.buscar_observaciones, {"source": "live"}),
+    (server.buscar_especies, {"nombre": "Rallus"}),
+    (server.observaciones_por_usuario, {"username": "alguien"}),
+])
+async def test_las_herramientas_buscan_en_el_lugar(inaturalist, herramienta, argumentos):
+    conejera = server.lugares.buscar("Humedal La Conejera")
+    async with server.ciclo_de_vida(server.mcp):
+        assert "error" not in await herramienta(lugar="La Conejera", **argumentos)
+        assert (await herramienta(lugar="desierto de la tatacoa", **argumentos))["error"].startswith("Lugar")
+    params = inaturalist.solicitudes[-1].url.params
+    assert (float(params["lat"]), float(params["lng"])) == (conejera.lat, conejera.lng)
+    assert float(params["radius"]) == conejera.radio_km
+
+
+async def test_estadisticas_usan_el_nombre_del_lugar(inaturalist):
+    async with server.ciclo_de_vida(server.mcp):
+        resultado = await server.estadisticas_biodiversidad(lugar="La Conejera")
+    assert "Humedal La Conejera" in str(resultado)
@@ -0,0 +1,29 @@
+import inspect
+import json
+
+import server
+from inaturalist_comun.metricas import HERRAMIENTA_DURACION
+
+
+async def test_las_herramientas_instrumentadas_conservan_su_esquema():
+    herramientas = {h.name: h for h in await server.mcp.list_tools()}
+    for nombre in ("buscar_observaciones", "exportar_observaciones", "analizar_biodiversidad"):
+        firma = inspect.signature(getattr(server, nombre))
+        esquema = herramientas[nombre].inputSchema
+        assert set(esquema["properties"]) == set(firma.parameters)
+        obligatorios = {p.name for p in firma.parameters.values() if p.default is inspect.Parameter.empty}
+        assert set(esquema.get("required", [])) == obligatorios
+        assert inspect.cleandoc(herramientas[nombre].description) == inspect.getdoc(getattr(server, nombre))
+
+
+async def test_llamar_una_herramienta_la_mide(inaturalist):
+    antes = HERRAMIENTA_DURACION.resumen().get("buscar_observaciones", {}).get("cantidad", 0)
+    async with server.ciclo_de_vida(server.mcp):
+        await server.mcp.call_tool("buscar_observaciones", {"source": "live"})
+    assert HERRAMIENTA_DURACION.resumen()["buscar_observaciones"]["cantidad"] == antes + 1
+
+    metricas = await server.mcp.read_resource("inaturalist://metricas")
+    texto = next(iter(metricas)).content
+    assert 'inaturalist_herramienta_duracion_segundos_count{herramienta="buscar_observaciones"}' in texto
+    resumen = json.loads(next(iter(await server.mcp.read_resource("inaturalist://metricas/resumen"))).content)
+    assert resumen["inaturalist_herramienta_duracion_segundos"]["buscar_observaciones"]["cantidad"] == antes + 1
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from inaturalist_comun import Observacion, Pagina as PaginaProyectada
+from paginacion import Cursor, recorrer_observaciones, recorrer_paginas
+
+
+class Paginas:
+    """`solicitar` simulado sobre las observaciones con ids 1..n"""
+
+    def __init__(self, n, fallar_en=None, proyectar=False):
+        self.ids = list(range(1, n + 1))
+        self.fallar_en = fallar_en
+        self.proyectar = proyectar
+        self.params = []
+
+    async def __call__(self, endpoint, params):
+        assert endpoint == "/observations"
+        self.params.append(params)
+        if self.fallar_en is not None and len(self.params) == self.fallar_en:
+            raise RuntimeError("iNaturalist no responde")
+        if params["order"] == "desc":
+            ids = [i for i in reversed(self.ids) if i < params.get("id_below", float("inf"))]
+        else:
+            ids = [i for i in self.ids if i > params["id_above"]]
+        ids = ids[:params["per_page"]]
+        if self.proyectar:
+            return PaginaProyectada(len(self.ids), tuple(Observacion.desde_inaturalist({"id": i}) for i in ids))
+        return {"total_results": len(self.ids), "results": [{"id": i} for i in ids]}
+
+
+def test_cursor_ida_y_vuelta():
+    ascendente = Cursor(params={"lat": 4.8155, "taxon_name": "Aves"}, id_above=42)
+    assert Cursor.decodificar(ascendente.codificar()) == ascendente
+    descendente = Cursor(params={"lat": 4.8155}, id_below=900, descendente=True)
+    assert Cursor.decodificar(descendente.codificar()) == descendente
+
+
+@pytest.mark.parametrize("token", ["", "no-es-un-cursor", "e30"])
+def test_cursor_invalido(token):
+    with pytest.raises(ValueError):
+        Cursor.decodificar(token)
+
+
+async def test_recorre_todas_las_paginas_en_orden():
+    solicitar = Paginas(450)
+    paginas = [p async for p in recorrer_paginas(solicitar, Cursor(params={"lat": 1}), por_pagina=200)]
+    assert [len(p.observaciones) for p in paginas] == [200, 200, 50]
+    assert [p.cursor.id_above for p in paginas] == [200, 400, 450]
+    assert [p["id_above"] for p in solicitar.params] == [0, 200, 400]
+    assert all(p["order_by"] == "id" and p["order"] == "asc" and p["lat"] == 1 for p in solicitar.params)
+
+
+async def test_pagina_completa_al_final_pide_una_mas():
+    solicitar = Paginas(400)
+    paginas = [p async for p in recorrer_paginas(solicitar, Cursor(params={}), por_pagina=200)]
+    assert len(paginas) == 2
+    assert len(solicitar.params) == 3
+
+
+async def test_retomar_desde_un_cursor():
+    solicitar = Paginas(450)
+    cursor = Cursor.decodificar(Cursor(params={}, id_above=400).codificar())
+    ids = [obs["id"] async for obs in recorrer_observaciones(solicitar, cursor)]
+    assert ids == list(range(401, 451))
+
+
+async def test_descendente_con_paginas_proyectadas():
+    solicitar = Paginas(450, proyectar=True)
+    paginas = [p async for p in recorrer_paginas(solicitar, Cursor(params={}, descendente=True), por_pagina=200)]
+    ids = [obs.id for p in paginas for obs in p.observaciones]
+    assert ids == list(range(450, 0, -1))
+    assert "id_below" not in solicitar.params[0]
+    assert [p["id_below"] for p in solicitar.params[1:]] == [251, 51]
+    assert paginas[0].total == 450
+
+
+async def test_el_error_se_propaga():
+    solicitar = Paginas(1000, fallar_en=2)
+    recibidas = []
+    with pytest.raises(RuntimeError):
+        async for pagina in recorrer_paginas(solicitar, Cursor(params={}), por_pagina=100):
+            recibidas.append(pagina)
+    assert len(recibidas) == 1
+
+
+async def test_la_precarga_acota_las_paginas_adelantadas():
+    solicitar = Paginas(5000)
+    paginas = recorrer_paginas(solicitar, Cursor(params={}), por_pagina=100, precarga=2)
+    await paginas.__anext__()
+    await asyncio.sleep(0.01)
+    # La que se entregó, dos en la cola y una esperando lugar en ella
+    assert len(solicitar.params) <= 4
+    await paginas.aclose()
+
+
+async def test_el_limite_detiene_la_precarga():
+    solicitar = Paginas(5000)
+    paginas = [p async for p in recorrer_paginas(solicitar, Cursor(params={}), por_pagina=100, precarga=5, limite=250)]
+    await asyncio.sleep(0.01)
+    assert [len(p.observaciones) for p in paginas] == [100, 100, 100]
+    assert len(solicitar.params) == 3
+
+
+async def test_cerrar_cancela_la_pagina_en_descarga():
+    liberar = asyncio.Event()
+    canceladas = []
+
+    async def solicitar(endpoint, params):
+        if params["id_above"] == 0:
+            return {"total_results": 1000, "results": [{"id": i} for i in range(1, 101)]}
+        try:
+            await liberar.wait()
+        except asyncio.CancelledError:
+            canceladas.append(params["id_above"])
+            raise
+
+    paginas = recorrer_paginas(solicitar, Cursor(params={}), por_pagina=100, precarga=2)
+    await paginas.__anext__()
+    await asyncio.sleep(0)
+    await paginas.aclose()
+    # La descarga de la segunda página terminó (cancelada) antes de que aclose retorne
+    assert canceladas == [100]
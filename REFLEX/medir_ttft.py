@@ -0,0 +1,62 @@
+"""
+Mide el tiempo hasta el primer fragmento (TTFT) y la duración total de las
+respuestas de Gemini, usando la misma función que la app.
+
+Sin red ni API key, con el modelo falso:
+    GEMINI_FALSO=1 python medir_ttft.py --repeticiones 10 --concurrencia 5
+
+Con Gemini real (requiere GEMINI_API_KEY en el .env):
+    python medir_ttft.py --prompt "¿Qué aves viven en el Humedal La Conejera?"
+
+La caché de respuestas está activa por defecto, así que desde la segunda
+repetición se miden aciertos; con GEMINI_CACHE=0 se mide siempre el modelo.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from prueba_reflex.prueba_reflex import cache_respuestas, process_gemini_request
+
+
+async def medir(prompt: str) -> Dict[str, float]:
+    inicio = time.perf_counter()
+    primero = None
+    fragmentos = 0
+    async for _ in process_gemini_request(prompt):
+        if primero is None:
+            primero = time.perf_counter()
+        fragmentos += 1
+    fin = time.perf_counter()
+    return {
+        "ttft_ms": ((primero or fin) - inicio) * 1000,
+        "total_ms": (fin - inicio) * 1000,
+        "fragmentos": fragmentos,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    mediciones: List[Dict[str, float]] = []
+    for i in range(0, args.repeticiones, args.concurrencia):
+        lote = min(args.concurrencia, args.repeticiones - i)
+        mediciones += await asyncio.gather(*(medir(args.prompt) for _ in range(lote)))
+
+    for clave in ("ttft_ms", "total_ms"):
+        valores = sorted(m[clave] for m in mediciones)
+        print(f"{clave:<9} p50={statistics.median(valores):>8.1f}  max={valores[-1]:>8.1f}")
+    print(f"fragmentos por respuesta: {statistics.median(m['fragmentos'] for m in mediciones):.0f}")
+    print(f"caché: {cache_respuestas.estadisticas()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TTFT y duración de las respuestas de Gemini")
+    parser.add_argument("--prompt", default="¿Qué es el Humedal La Conejera?")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--concurrencia", type=int, default=1, help="Respuestas simultáneas")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
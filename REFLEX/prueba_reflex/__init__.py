@@ -1 +1 @@
-"""Aplicación Hola Mundo con Reflex y Google ADK."""
+"""Aplicación Hola Mundo con Reflex y Gemini."""
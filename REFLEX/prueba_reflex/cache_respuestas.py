@@ -0,0 +1,232 @@
+"""
+Caché de respuestas de Gemini
+
+Muchas personas hacen las mismas preguntas sobre el humedal; una respuesta
+guardada se entrega en milisegundos en lugar de volver a pagar la latencia y
+el costo de Gemini.
+
+- Clave: nombre del modelo + pregunta normalizada (minúsculas, sin tildes,
+  sin signos de puntuación al inicio o final y con los espacios colapsados)
+- TTL y expulsión LRU en memoria
+- Persistencia opcional en SQLite, compartida por todos los workers de Reflex
+- Modo opcional de preguntas parecidas: si no hay coincidencia exacta se usa
+  la respuesta de la pregunta más similar (trigramas de caracteres, índice de
+  Jaccard) siempre que supere un umbral
+
+Configuración por variables de entorno:
+
+- GEMINI_CACHE: "0" deshabilita la caché (default: 1)
+- GEMINI_CACHE_TTL: Segundos que vale una respuesta (default: 86400)
+- GEMINI_CACHE_MAX_ENTRADAS: Respuestas en memoria (default: 512)
+- GEMINI_CACHE_RUTA: Archivo SQLite compartido entre workers (default: sólo memoria)
+- GEMINI_CACHE_SIMILARES: "1" para aceptar preguntas parecidas (default: 0)
+- GEMINI_CACHE_UMBRAL: Similitud mínima entre 0 y 1 en ese modo (default: 0.85)
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+
+def normalizar_pregunta(texto: str) -> str:
+    """Forma canónica de una pregunta para compararla con otras"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return texto.strip("¿?¡!.,;: ")
+
+
+def trigramas(texto: str) -> FrozenSet[str]:
+    relleno = f"  {texto} "
+    return frozenset(relleno[i:i + 3] for i in range(len(relleno) - 2))
+
+
+def similitud(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Índice de Jaccard entre dos conjuntos de trigramas"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class ConfigCacheGemini:
+    habilitada: bool = True
+    ttl: float = 86400.0
+    max_entradas: int = 512
+    ruta: Optional[str] = None
+    similares: bool = False
+    umbral: float = 0.85
+
+    @classmethod
+    def desde_entorno(cls) -> "ConfigCacheGemini":
+        return cls(
+            habilitada=os.getenv("GEMINI_CACHE", "1") != "0",
+            ttl=float(os.getenv("GEMINI_CACHE_TTL", "86400")),
+            max_entradas=int(os.getenv("GEMINI_CACHE_MAX_ENTRADAS", "512")),
+            ruta=os.getenv("GEMINI_CACHE_RUTA") or None,
+            similares=os.getenv("GEMINI_CACHE_SIMILARES", "0") == "1",
+            umbral=float(os.getenv("GEMINI_CACHE_UMBRAL", "0.85")),
+        )
+
+
+@dataclass
+class Entrada:
+    modelo: str
+    pregunta: str  # normalizada
+    respuesta: str
+    expira: float
+    trigramas: FrozenSet[str] = frozenset()
+
+
+class CacheGemini:
+    """Caché de respuestas por (modelo, pregunta normalizada)"""
+
+    def __init__(self, config: Optional[ConfigCacheGemini] = None):
+        self.config = config or ConfigCacheGemini()
+        self._entradas: "OrderedDict[str, Entrada]" = OrderedDict()
+        self._contadores = {"aciertos": 0, "aciertos_similares": 0, "fallos": 0, "expulsiones": 0}
+        self._lock = threading.Lock()
+        self._conexion: Optional[sqlite3.Connection] = None
+        if self.config.habilitada and self.config.ruta:
+            self._conexion = sqlite3.connect(self.config.ruta, check_same_thread=False, timeout=5.0)
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                """
+                CREATE TABLE IF NOT EXISTS respuestas_gemini (
+                    clave TEXT PRIMARY KEY,
+                    modelo TEXT NOT NULL,
+                    pregunta TEXT NOT NULL,
+                    respuesta TEXT NOT NULL,
+                    expira REAL NOT NULL,
+                    usada REAL NOT NULL
+                )
+                """
+            )
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_gemini_modelo ON respuestas_gemini (modelo, usada)")
+            self._conexion.commit()
+
+    @staticmethod
+    def clave(modelo: str, pregunta_normalizada: str) -> str:
+        return hashlib.sha256(f"{modelo}\0{pregunta_normalizada}".encode("utf-8")).hexdigest()
+
+    async def obtener(self, pregunta: str, modelo: str) -> Optional[Tuple[str, str]]:
+        """
+        Respuesta guardada para la pregunta, o None. Retorna (respuesta, tipo)
+        donde tipo es "exacta" o "similar".
+        """
+        if not self.config.habilitada:
+            return None
+        normalizada = normalizar_pregunta(pregunta)
+        clave = self.clave(modelo, normalizada)
+
+        entrada = self._leer_memoria(clave)
+        if entrada is None and self._conexion is not None:
+            entrada = await asyncio.to_thread(self._leer_sqlite, clave)
+            if entrada is not None:
+                self._insertar(clave, entrada)
+        if entrada is not None:
+            self._contadores["aciertos"] += 1
+            return entrada.respuesta, "exacta"
+
+        if self.config.similares:
+            parecida = await self._buscar_similar(modelo, normalizada)
+            if parecida is not None:
+                self._contadores["aciertos_similares"] += 1
+                return parecida.respuesta, "similar"
+
+        self._contadores["fallos"] += 1
+        return None
+
+    async def guardar(self, pregunta: str, modelo: str, respuesta: str) -> None:
+        if not self.config.habilitada or not respuesta:
+            return
+        normalizada = normalizar_pregunta(pregunta)
+        clave = self.clave(modelo, normalizada)
+        entrada = Entrada(modelo, normalizada, respuesta, time.time() + self.config.ttl, trigramas(normalizada))
+        self._insertar(clave, entrada)
+        if self._conexion is not None:
+            await asyncio.to_thread(self._escribir_sqlite, clave, entrada)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        consultas = sum(self._contadores[c] for c in ("aciertos", "aciertos_similares", "fallos"))
+        aciertos = self._contadores["aciertos"] + self._contadores["aciertos_similares"]
+        return {
+            **self._contadores,
+            "entradas": len(self._entradas),
+            "tasa_aciertos": round(aciertos / consultas, 3) if consultas else 0.0,
+            "persistente": self._conexion is not None,
+        }
+
+    # --- Internos ------------------------------------------------------------
+
+    def _leer_memoria(self, clave: str) -> Optional[Entrada]:
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if entrada.expira < time.time():
+            del self._entradas[clave]
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada
+
+    def _insertar(self, clave: str, entrada: Entrada) -> None:
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.config.max_entradas:
+            self._entradas.popitem(last=False)
+            self._contadores["expulsiones"] += 1
+
+    async def _buscar_similar(self, modelo: str, normalizada: str) -> Optional[Entrada]:
+        buscada = trigramas(normalizada)
+        candidatas: List[Entrada] = [e for e in self._entradas.values() if e.modelo == modelo]
+        if self._conexion is not None:
+            # Incluye las respuestas guardadas por otros workers
+            candidatas += await asyncio.to_thread(self._candidatas_sqlite, modelo)
+        ahora = time.time()
+        mejor, mejor_similitud = None, self.config.umbral
+        for entrada in candidatas:
+            if entrada.expira < ahora:
+                continue
+            valor = similitud(buscada, entrada.trigramas or trigramas(entrada.pregunta))
+            if valor >= mejor_similitud:
+                mejor, mejor_similitud = entrada, valor
+        return mejor
+
+    def _leer_sqlite(self, clave: str) -> Optional[Entrada]:
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT modelo, pregunta, respuesta, expira FROM respuestas_gemini WHERE clave = ? AND expira >= ?",
+                (clave, time.time()),
+            ).fetchone()
+            if fila is None:
+                return None
+            self._conexion.execute("UPDATE respuestas_gemini SET usada = ? WHERE clave = ?", (time.time(), clave))
+            self._conexion.commit()
+        return Entrada(fila[0], fila[1], fila[2], fila[3], trigramas(fila[1]))
+
+    def _candidatas_sqlite(self, modelo: str) -> List[Entrada]:
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT modelo, pregunta, respuesta, expira FROM respuestas_gemini "
+                "WHERE modelo = ? AND expira >= ? ORDER BY usada DESC LIMIT ?",
+                (modelo, time.time(), self.config.max_entradas),
+            ).fetchall()
+        return [Entrada(*fila) for fila in filas]
+
+    def _escribir_sqlite(self, clave: str, entrada: Entrada) -> None:
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas_gemini (clave, modelo, pregunta, respuesta, expira, usada) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, entrada.modelo, entrada.pregunta, entrada.respuesta, entrada.expira, time.time()),
+            )
+            self._conexion.execute("DELETE FROM respuestas_gemini WHERE expira < ?", (time.time(),))
+            self._conexion.commit()
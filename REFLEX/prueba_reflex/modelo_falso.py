@@ -0,0 +1,41 @@
+"""
+Modelo falso que imita la respuesta en streaming de Gemini sin salir a la red.
+
+Sirve para probar la app y medir el tiempo hasta el primer token sin API key.
+Se activa con GEMINI_FALSO=1 en el .env y se ajusta con:
+
+- GEMINI_FALSO_LATENCIA: Segundos hasta el primer fragmento (default: 0.5)
+- GEMINI_FALSO_INTERVALO: Segundos entre fragmentos (default: 0.05)
+"""
+
+import asyncio
+import os
+from typing import AsyncIterator
+
+RESPUESTA = (
+    "El Humedal La Conejera es un humedal urbano en la localidad de Suba, en Bogotá. "
+    "Es hogar de aves como la tingua bogotana y el cucarachero de pantano, y de una "
+    "gran variedad de plantas acuáticas. Esta es una respuesta de prueba del modelo falso "
+    "para la pregunta: "
+)
+
+
+class ModeloFalso:
+    """Genera una respuesta fija, palabra por palabra, con latencia configurable"""
+
+    def __init__(self, latencia: float = 0.5, intervalo: float = 0.05):
+        self.latencia = latencia
+        self.intervalo = intervalo
+
+    @classmethod
+    def desde_entorno(cls) -> "ModeloFalso":
+        return cls(
+            latencia=float(os.getenv("GEMINI_FALSO_LATENCIA", "0.5")),
+            intervalo=float(os.getenv("GEMINI_FALSO_INTERVALO", "0.05")),
+        )
+
+    async def transmitir(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latencia)
+        for palabra in (RESPUESTA + prompt).split(" "):
+            yield palabra + " "
+            await asyncio.sleep(self.intervalo)
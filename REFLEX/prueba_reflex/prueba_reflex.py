@@ -1,44 +1,93 @@
 """
-Aplicación Hola Mundo con Reflex y Google ADK + Gemini.
+Aplicación Hola Mundo con Reflex y Gemini.
 Una app simple que demuestra la integración de Reflex (frontend) con Gemini API.
 """
 
+import asyncio
+import functools
+import logging
 import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
 import reflex as rx
-from google.adk import Agent
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from prueba_reflex.cache_respuestas import CacheGemini, ConfigCacheGemini
+from prueba_reflex.modelo_falso import ModeloFalso
+
+logger = logging.getLogger(__name__)
+
 # Cargar variables de entorno
 load_dotenv()
 
-# Configurar API de Gemini
+# Configurar API de Gemini (o el modelo falso para probar sin red)
+MODELO = "gemini-2.5-flash"
 api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-2.5-flash")
-else:
-    model = None
+modelo_falso = ModeloFalso.desde_entorno() if os.getenv("GEMINI_FALSO") == "1" else None
 
+# Respuestas ya generadas, por modelo y pregunta normalizada
+cache_respuestas = CacheGemini(ConfigCacheGemini.desde_entorno())
 
-# Crear un agente ADK simple
-hello_agent = Agent(
-    name="GeminiAgent",
-    description="Agente que usa Gemini para procesar solicitudes",
-)
+
+# google.generativeai tarda en importarse; se carga con la primera pregunta y
+# no al arrancar cada worker de Reflex
+@functools.lru_cache(maxsize=None)
+def obtener_modelo():
+    """Modelo de Gemini, o None si no hay API key"""
+    if not api_key:
+        return None
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(MODELO)
 
 
 # Función para procesar solicitudes con Gemini
-def process_gemini_request(prompt: str) -> str:
-    """Procesa la solicitud usando Gemini API."""
+async def process_gemini_request(prompt: str, info: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """
+    Procesa la solicitud usando Gemini API, entregando la respuesta por fragmentos.
+
+    Si la pregunta ya se respondió, entrega la respuesta guardada en un solo
+    fragmento. En `info["cache"]` queda "exacta", "similar" o None.
+    """
+    nombre_modelo = "falso" if modelo_falso is not None else MODELO
+    guardada = await cache_respuestas.obtener(prompt, nombre_modelo)
+    if info is not None:
+        info["cache"] = guardada[1] if guardada else None
+    if guardada is not None:
+        yield guardada[0]
+        return
+
+    if modelo_falso is not None:
+        fragmentos = []
+        async for fragmento in modelo_falso.transmitir(prompt):
+            fragmentos.append(fragmento)
+            yield fragmento
+        await cache_respuestas.guardar(prompt, nombre_modelo, "".join(fragmentos))
+        return
+
+    # La primera vez importa google.generativeai fuera del event loop
+    model = await asyncio.to_thread(obtener_modelo)
     if not model:
-        return "⚠️ Error: GEMINI_API_KEY no configurada. Agrega tu API key en el archivo .env"
-    
+        yield "⚠️ Error: GEMINI_API_KEY no configurada. Agrega tu API key en el archivo .env"
+        return
+
     try:
-        response = model.generate_content(prompt)
-        return response.text if response.text else "No se obtuvo respuesta de Gemini"
+        response = await model.generate_content_async(prompt, stream=True)
+        fragmentos = []
+        async for chunk in response:
+            if chunk.text:
+                fragmentos.append(chunk.text)
+                yield chunk.text
+        if not fragmentos:
+            yield "No se obtuvo respuesta de Gemini"
+            return
     except Exception as e:
-        return f"❌ Error: {str(e)}"
+        yield f"❌ Error: {str(e)}"
+        return
+    # Sólo se guardan las respuestas completas; los errores no
+    await cache_respuestas.guardar(prompt, nombre_modelo, "".join(fragmentos))
 
 
 # Definir el estado de Reflex
@@ -49,25 +98,58 @@ class State(rx.State):
     response: str = "Escribe una pregunta y haz clic en el botón"
     loading: bool = False
     user_input: str = ""
+    # Tiempo hasta el primer fragmento y duración total de la última respuesta
+    ttft_ms: Optional[float] = None
+    duracion_ms: Optional[float] = None
+    # "exacta" o "similar" si la última respuesta salió de la caché
+    desde_cache: str = ""
+    tasa_aciertos_cache: float = 0.0
 
     def set_user_input(self, value: str):
         """Setter explícito para user_input."""
         self.user_input = value
 
-    def ask_gemini(self):
-        """Event handler que envía la pregunta a Gemini."""
-        if not self.user_input.strip():
-            self.response = "Por favor, escribe una pregunta"
-            return
-        
-        self.loading = True
-        try:
+    @rx.event(background=True)
+    async def ask_gemini(self):
+        """
+        Event handler en segundo plano que envía la pregunta a Gemini y va
+        mostrando la respuesta a medida que llegan los fragmentos. No bloquea
+        los eventos de otros usuarios mientras espera.
+        """
+        async with self:
+            if self.loading:
+                return
+            if not self.user_input.strip():
+                self.response = "Por favor, escribe una pregunta"
+                return
             prompt = self.user_input
-            self.response = process_gemini_request(prompt)
+            self.loading = True
+            self.response = ""
+            self.ttft_ms = None
+            self.duracion_ms = None
+            self.desde_cache = ""
+
+        inicio = time.perf_counter()
+        info: Dict[str, Any] = {}
+        try:
+            async for fragmento in process_gemini_request(prompt, info):
+                async with self:
+                    if self.ttft_ms is None:
+                        self.ttft_ms = round((time.perf_counter() - inicio) * 1000, 1)
+                    self.response += fragmento
         except Exception as e:
-            self.response = f"Error: {str(e)}"
+            async with self:
+                self.response = f"Error: {str(e)}"
         finally:
-            self.loading = False
+            async with self:
+                self.loading = False
+                self.duracion_ms = round((time.perf_counter() - inicio) * 1000, 1)
+                self.desde_cache = info.get("cache") or ""
+                self.tasa_aciertos_cache = cache_respuestas.estadisticas()["tasa_aciertos"]
+                logger.info(
+                    "Respuesta de Gemini: primer fragmento %s ms, total %s ms, caché %s",
+                    self.ttft_ms, self.duracion_ms, self.desde_cache or "no",
+                )
 
 
 # Definir la UI
@@ -95,6 +177,22 @@ def index() -> rx.Component:
             State.response,
             color="green",
         ),
+        rx.cond(
+            State.duracion_ms,
+            rx.text(
+                f"Primer fragmento: {State.ttft_ms} ms · Total: {State.duracion_ms} ms",
+                size="1",
+                color="gray",
+            ),
+        ),
+        rx.cond(
+            State.desde_cache,
+            rx.text(
+                f"Respuesta desde la caché ({State.desde_cache}) · Tasa de aciertos: {State.tasa_aciertos_cache}",
+                size="1",
+                color="gray",
+            ),
+        ),
     )
 
 
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Permite importar `prueba_reflex` sin instalar la aplicación
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
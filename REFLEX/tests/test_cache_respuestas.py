@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from prueba_reflex.cache_respuestas import CacheGemini, ConfigCacheGemini, normalizar_pregunta, similitud, trigramas
+
+MODELO = "gemini-2.0-flash"
+
+
+def test_normalizar_pregunta():
+    assert normalizar_pregunta("  ¿Qué AVES  hay en el humedal? ") == "que aves hay en el humedal"
+    assert normalizar_pregunta("¡Hola!") == "hola"
+
+
+def test_similitud():
+    a = trigramas("que aves hay en el humedal")
+    assert similitud(a, a) == 1.0
+    assert similitud(a, frozenset()) == 0.0
+    assert 0 < similitud(a, trigramas("que aves hay en el humedal hoy")) < 1
+
+
+def test_acierto_exacto_con_pregunta_normalizada():
+    async def probar():
+        cache = CacheGemini()
+        assert await cache.obtener("¿Qué aves hay?", MODELO) is None
+        await cache.guardar("¿Qué aves hay?", MODELO, "Tinguas y monjitas")
+        assert await cache.obtener("que aves   hay", MODELO) == ("Tinguas y monjitas", "exacta")
+        # Otro modelo no comparte la respuesta
+        assert await cache.obtener("que aves hay", "otro-modelo") is None
+        return cache.estadisticas()
+
+    estadisticas = asyncio.run(probar())
+    assert estadisticas["aciertos"] == 1
+    assert estadisticas["fallos"] == 2
+
+
+def test_no_guarda_respuestas_vacias_ni_deshabilitada():
+    async def probar():
+        cache = CacheGemini()
+        await cache.guardar("hola", MODELO, "")
+        deshabilitada = CacheGemini(ConfigCacheGemini(habilitada=False))
+        await deshabilitada.guardar("hola", MODELO, "hola")
+        return await cache.obtener("hola", MODELO), await deshabilitada.obtener("hola", MODELO)
+
+    assert asyncio.run(probar()) == (None, None)
+
+
+def test_ttl():
+    async def probar():
+        cache = CacheGemini(ConfigCacheGemini(ttl=60))
+        await cache.guardar("hola", MODELO, "respuesta")
+        for entrada in cache._entradas.values():
+            entrada.expira = time.time() - 1
+        return await cache.obtener("hola", MODELO)
+
+    assert asyncio.run(probar()) is None
+
+
+def test_expulsion_lru():
+    async def probar():
+        cache = CacheGemini(ConfigCacheGemini(max_entradas=2))
+        await cache.guardar("uno", MODELO, "1")
+        await cache.guardar("dos", MODELO, "2")
+        await cache.obtener("uno", MODELO)
+        await cache.guardar("tres", MODELO, "3")
+        return [await cache.obtener(p, MODELO) for p in ("uno", "dos", "tres")], cache.estadisticas()
+
+    resultados, estadisticas = asyncio.run(probar())
+    assert resultados == [("1", "exacta"), None, ("3", "exacta")]
+    assert estadisticas["expulsiones"] == 1
+
+
+def test_preguntas_parecidas():
+    async def probar(similares):
+        cache = CacheGemini(ConfigCacheGemini(similares=similares, umbral=0.7))
+        await cache.guardar("qué aves hay en el humedal la conejera", MODELO, "Tinguas")
+        return (
+            await cache.obtener("que aves hay en el humedal conejera", MODELO),
+            await cache.obtener("cuál es la capital de Colombia", MODELO),
+        )
+
+    assert asyncio.run(probar(True)) == (("Tinguas", "similar"), None)
+    assert asyncio.run(probar(False)) == (None, None)
+
+
+def test_sqlite_compartido_entre_workers(tmp_path):
+    ruta = str(tmp_path / "gemini.sqlite")
+
+    async def probar():
+        uno = CacheGemini(ConfigCacheGemini(ruta=ruta))
+        otro = CacheGemini(ConfigCacheGemini(ruta=ruta, similares=True, umbral=0.7))
+        await uno.guardar("¿Qué aves hay en el humedal?", MODELO, "Tinguas")
+        return (
+            await otro.obtener("que aves hay en el humedal", MODELO),
+            await otro.obtener("que aves hay en este humedal", MODELO),
+        )
+
+    exacta, similar = asyncio.run(probar())
+    assert exacta == ("Tinguas", "exacta")
+    assert similar == ("Tinguas", "similar")